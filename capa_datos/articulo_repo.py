@@ -1,6 +1,7 @@
 """
 Repositorio para la gestión de artículos en la base de datos
 """
+import json
 from loguru import logger
 
 class ArticuloRepositorio:
@@ -82,6 +83,48 @@ class ArticuloRepositorio:
             logger.error(f"Error al obtener artículo por ID {idarticulo}: {e}")
             return None
 
+    def obtener_por_ids(self, ids, tamano_bloque=1000):
+        """
+        Obtiene varios artículos con una consulta por bloque de IDs
+        (listas IN parametrizadas, por debajo del límite de 2100 parámetros)
+        
+        Args:
+            ids: Iterable de IDs de artículo
+            tamano_bloque: IDs por consulta
+            
+        Returns:
+            dict: {idarticulo: artículo}; los IDs inexistentes no aparecen.
+                  None si hay error (no confundir con "ninguno existe")
+        """
+        ids = list(dict.fromkeys(ids))
+        resultado = {}
+        try:
+            cursor = self.conn.cursor()
+            for inicio in range(0, len(ids), tamano_bloque):
+                bloque = ids[inicio:inicio + tamano_bloque]
+                query = f"""
+                SELECT a.idarticulo, a.codigo, a.nombre, a.descripcion, a.imagen,
+                       a.idcategoria, c.nombre as categoria,
+                       a.idpresentacion, p.nombre as presentacion,
+                       a.precio_venta, a.precio_referencia, a.stock_minimo,
+                       a.codigo_barras_original, a.id_impuesto,
+                       i.letra_fiscal, i.nombre as tipo_impuesto
+                FROM articulo a
+                LEFT JOIN categoria c ON a.idcategoria = c.idcategoria
+                LEFT JOIN presentacion p ON a.idpresentacion = p.idpresentacion
+                LEFT JOIN impuesto i ON a.id_impuesto = i.id_impuesto
+                WHERE a.idarticulo IN ({', '.join('?' * len(bloque))})
+                """
+                cursor.execute(query, bloque)
+                columns = [column[0] for column in cursor.description]
+                for row in cursor.fetchall():
+                    item = dict(zip(columns, row))
+                    resultado[item['idarticulo']] = item
+            return resultado
+        except Exception as e:
+            logger.error(f"Error al obtener artículos por IDs: {e}")
+            return None
+    
     def buscar_por_codigo(self, codigo):
         """
         Busca un artículo por su código de barras o código interno
@@ -176,6 +219,68 @@ class ArticuloRepositorio:
             self.conn.rollback()
             return None
     
+    def codigos_existentes(self):
+        """
+        Códigos internos y códigos de barras ya registrados (una sola consulta)
+
+        Returns:
+            tuple: (set de códigos, set de códigos de barras en mayúsculas) o None si hay error
+        """
+        try:
+            cursor = self.conn.cursor()
+            cursor.execute("SELECT codigo, codigo_barras_original FROM articulo")
+            codigos, barras = set(), set()
+            for codigo, codigo_barras in cursor.fetchall():
+                if codigo:
+                    codigos.add(str(codigo).strip().upper())
+                if codigo_barras:
+                    barras.add(str(codigo_barras).strip().upper())
+            return codigos, barras
+        except Exception as e:
+            logger.error(f"❌ Error leyendo códigos de artículos: {e}")
+            return None
+
+    def crear_lote(self, filas):
+        """
+        Inserta un lote de artículos con un solo executemany (fast_executemany).
+        Si el lote falla se deshace y se inserta fila por fila para aislar
+        las filas con error.
+
+        Args:
+            filas: Lista de tuplas (codigo, nombre, idcategoria, idpresentacion,
+                   codigo_barras_original, precio_venta, precio_referencia,
+                   stock_minimo, id_impuesto)
+
+        Returns:
+            list: Tuplas (indice en filas, mensaje) de las filas no insertadas
+        """
+        query = """
+        INSERT INTO articulo
+        (codigo, nombre, idcategoria, idpresentacion, codigo_barras_original,
+         precio_venta, precio_referencia, stock_minimo, id_impuesto)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+        """
+        try:
+            cursor = self.conn.cursor()
+            cursor.fast_executemany = True
+            cursor.executemany(query, filas)
+            self.conn.commit()
+            return []
+        except Exception as e:
+            logger.warning(f"⚠️ Lote de {len(filas)} artículos rechazado, se reintenta fila por fila: {e}")
+            self.conn.rollback()
+
+        errores = []
+        cursor = self.conn.cursor()
+        for indice, fila in enumerate(filas):
+            try:
+                cursor.execute(query, fila)
+                self.conn.commit()
+            except Exception as e:
+                self.conn.rollback()
+                errores.append((indice, str(e)))
+        return errores
+
     def actualizar_precio(self, idarticulo, nuevo_precio):
         """
         Actualiza el precio de venta de un artículo
@@ -207,6 +312,99 @@ class ArticuloRepositorio:
             self.conn.rollback()
             return False
     
+    @staticmethod
+    def _precios_masivo(reglas):
+        """
+        CTE con el precio nuevo de cada artículo afectado por las reglas
+        (la primera regla que aplica a un artículo es la que cuenta)
+
+        Args:
+            reglas: Lista de dicts validados por ArticuloService (idcategoria,
+                    idproveedor, porcentaje o margen_costo)
+
+        Returns:
+            tuple: (sql, params)
+        """
+        casos, condiciones, params_casos, params_condiciones = [], [], [], []
+        for regla in reglas:
+            filtros, params = [], []
+            if regla.get('idcategoria') is not None:
+                filtros.append("a.idcategoria = ?")
+                params.append(regla['idcategoria'])
+            if regla.get('idproveedor') is not None:
+                filtros.append("""EXISTS (SELECT 1 FROM detalle_ingreso di
+                    INNER JOIN ingreso i ON di.idingreso = i.idingreso
+                    WHERE di.idarticulo = a.idarticulo AND i.idproveedor = ?)""")
+                params.append(regla['idproveedor'])
+            if regla.get('margen_costo') is not None:
+                filtros.append("a.costo_promedio_usd > 0")
+                expresion = "a.costo_promedio_usd * (1 + CAST(? AS DECIMAL(9,4)) / 100)"
+                valor = str(regla['margen_costo'])
+            else:
+                expresion = "a.precio_venta * (1 + CAST(? AS DECIMAL(9,4)) / 100)"
+                valor = str(regla['porcentaje'])
+            condicion = " AND ".join(filtros) or "1 = 1"
+            casos.append(f"WHEN {condicion} THEN ROUND({expresion}, 2)")
+            params_casos += params + [valor]
+            condiciones.append(f"({condicion})")
+            params_condiciones += params
+
+        sql = f"""
+            WITH nuevos AS (
+                SELECT a.idarticulo, a.codigo, a.nombre, a.precio_venta,
+                       CAST(CASE {' '.join(casos)} END AS DECIMAL(18,2)) AS precio_nuevo
+                FROM articulo a
+                WHERE {' OR '.join(condiciones)}
+            )"""
+        return sql, params_casos + params_condiciones
+
+    def previsualizar_precios_masivo(self, reglas):
+        """
+        Cambios de precio que produciría actualizar_precios_masivo, sin aplicarlos
+
+        Returns:
+            list: Dicts (idarticulo, codigo, nombre, precio_venta, precio_nuevo); None si hay error
+        """
+        try:
+            cte, params = self._precios_masivo(reglas)
+            cursor = self.conn.cursor()
+            cursor.execute(cte + """
+            SELECT idarticulo, codigo, nombre, precio_venta, precio_nuevo
+            FROM nuevos
+            WHERE precio_nuevo > 0 AND precio_nuevo <> precio_venta
+            ORDER BY idarticulo
+            """, params)
+            columns = [column[0] for column in cursor.description]
+            return [dict(zip(columns, row)) for row in cursor.fetchall()]
+        except Exception as e:
+            logger.error(f"❌ Error previsualizando actualización masiva de precios: {e}")
+            return None
+
+    def actualizar_precios_masivo(self, reglas):
+        """
+        Aplica las reglas con una sola sentencia UPDATE sobre todos los artículos afectados
+
+        Returns:
+            list: Tuplas (idarticulo, precio_anterior, precio_nuevo) de las filas
+                  modificadas; None si hay error (no se aplica nada)
+        """
+        try:
+            cte, params = self._precios_masivo(reglas)
+            cursor = self.conn.cursor()
+            cursor.execute(cte + """
+            UPDATE nuevos SET precio_venta = precio_nuevo
+            OUTPUT deleted.idarticulo, deleted.precio_venta, inserted.precio_venta
+            WHERE precio_nuevo > 0 AND precio_nuevo <> precio_venta
+            """, params)
+            cambios = cursor.fetchall()
+            self.conn.commit()
+            logger.info(f"✅ Precios actualizados en BD: {len(cambios)} artículos")
+            return cambios
+        except Exception as e:
+            logger.error(f"❌ Error en actualización masiva de precios: {e}")
+            self.conn.rollback()
+            return None
+
     def actualizar_stock_minimo(self, idarticulo, stock_minimo):
         """
         Actualiza el stock mínimo de un artículo
@@ -312,3 +510,35 @@ class ArticuloRepositorio:
             logger.error(f"❌ Error actualizando categoría en BD: {e}")
             self.conn.rollback()
             return False
+    
+    def actualizar_costos_promedio(self, costos):
+        """
+        Actualiza el costo promedio de varios artículos en una sola sentencia
+        
+        Args:
+            costos: Lista de dict con idarticulo, costo_promedio_usd y costo_promedio_bs
+            
+        Returns:
+            int: Número de artículos actualizados (-1 si hay error)
+        """
+        try:
+            cursor = self.conn.cursor()
+            query = """
+            UPDATE a
+               SET costo_promedio_usd = c.costo_promedio_usd,
+                   costo_promedio_bs = c.costo_promedio_bs
+              FROM articulo a
+              JOIN OPENJSON(?) WITH (
+                   idarticulo INT, costo_promedio_usd DECIMAL(18, 4), costo_promedio_bs DECIMAL(18, 4)
+              ) c ON c.idarticulo = a.idarticulo
+            """
+            cursor.execute(query, (json.dumps(costos),))
+            actualizados = cursor.rowcount
+            self.conn.commit()
+            logger.info(f"✅ Costo promedio actualizado para {actualizados} artículos")
+            return actualizados
+            
+        except Exception as e:
+            logger.error(f"❌ Error actualizando costos promedio: {e}")
+            self.conn.rollback()
+            return -1
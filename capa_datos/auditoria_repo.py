@@ -2,6 +2,7 @@
 Repositorio para log de auditoría
 """
 from loguru import logger
+from capa_datos.enrutador_lectura import solo_lectura
 
 class AuditoriaRepositorio:
     """Maneja las operaciones de BD para auditoría"""
@@ -43,6 +44,7 @@ class AuditoriaRepositorio:
             self.conn.rollback()
             return False
     
+    @solo_lectura
     def consultar_por_fecha(self, fecha_inicio, fecha_fin):
         """
         Consulta registros de auditoría por rango de fechas
@@ -67,6 +69,7 @@ class AuditoriaRepositorio:
             logger.error(f"Error consultando auditoría: {e}")
             return []
     
+    @solo_lectura
     def consultar_por_usuario(self, usuario):
         """
         Consulta registros de un usuario específico
@@ -91,6 +94,7 @@ class AuditoriaRepositorio:
             logger.error(f"Error consultando auditoría: {e}")
             return []
     
+    @solo_lectura
     def consultar_por_tabla(self, tabla, registro_id):
         """
         Consulta historial de cambios en un registro específico
@@ -142,6 +142,62 @@ class ClienteRepositorio:
             self.conn.rollback()
             return None
     
+    def documentos_existentes(self):
+        """
+        Documentos de todos los clientes registrados (una sola consulta)
+        
+        Returns:
+            set: Tuplas (tipo_documento, num_documento) o None si hay error
+        """
+        try:
+            cursor = self.conn.cursor()
+            cursor.execute("SELECT tipo_documento, num_documento FROM cliente")
+            return {(str(tipo).strip().upper(), str(num).strip().upper())
+                    for tipo, num in cursor.fetchall() if tipo and num}
+        except Exception as e:
+            logger.error(f"❌ Error leyendo documentos de clientes: {e}")
+            return None
+    
+    def crear_lote(self, filas):
+        """
+        Inserta un lote de clientes con un solo executemany (fast_executemany).
+        Si el lote falla se deshace y se inserta fila por fila para aislar
+        las filas con error.
+        
+        Args:
+            filas: Lista de tuplas (nombre, apellidos, fecha_nacimiento, tipo_documento,
+                   num_documento, sexo, direccion, telefono, email)
+            
+        Returns:
+            list: Tuplas (indice en filas, mensaje) de las filas no insertadas
+        """
+        query = """
+        INSERT INTO cliente 
+        (nombre, apellidos, fecha_nacimiento, tipo_documento, num_documento, 
+         sexo, direccion, telefono, email)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+        """
+        try:
+            cursor = self.conn.cursor()
+            cursor.fast_executemany = True
+            cursor.executemany(query, filas)
+            self.conn.commit()
+            return []
+        except Exception as e:
+            logger.warning(f"⚠️ Lote de {len(filas)} clientes rechazado, se reintenta fila por fila: {e}")
+            self.conn.rollback()
+        
+        errores = []
+        cursor = self.conn.cursor()
+        for indice, fila in enumerate(filas):
+            try:
+                cursor.execute(query, fila)
+                self.conn.commit()
+            except Exception as e:
+                self.conn.rollback()
+                errores.append((indice, str(e)))
+        return errores
+    
     def actualizar(self, idcliente, nombre, apellidos, fecha_nacimiento, tipo_documento,
                    num_documento, sexo=None, direccion=None, telefono=None, email=None):
         """
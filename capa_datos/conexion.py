@@ -2,6 +2,7 @@ import pyodbc
 import os
 from dotenv import load_dotenv
 from loguru import logger
+from capa_datos.monitor_sql import monitorear
 
 # Cargar variables de entorno
 load_dotenv()
@@ -25,18 +26,23 @@ class ConexionDB:
         self.driver = os.getenv('DB_DRIVER', '{ODBC Driver 18 for SQL Server}')
         self.conn = None
     
+    def cadena_conexion(self, server=None, database=None, extra=""):
+        """Cadena ODBC con las credenciales configuradas (servidor y base opcionales)"""
+        return (
+            f"DRIVER={self.driver};"
+            f"SERVER={server or self.server};"
+            f"DATABASE={database or self.database};"
+            f"UID={self.username};"
+            f"PWD={self.password};"
+            f"TrustServerCertificate=yes;"
+            f"{extra}"
+        )
+    
     def conectar(self):
         """Establece conexión con la base de datos"""
         try:
-            conn_str = (
-                f"DRIVER={self.driver};"
-                f"SERVER={self.server};"
-                f"DATABASE={self.database};"
-                f"UID={self.username};"
-                f"PWD={self.password};"
-                f"TrustServerCertificate=yes;"
-            )
-            self.conn = pyodbc.connect(conn_str)
+            conn_str = self.cadena_conexion()
+            self.conn = monitorear(pyodbc.connect(conn_str))
             logger.success("✅ Conexión exitosa a SQL Server")
             return self.conn
         except Exception as e:
@@ -47,3 +53,45 @@ class ConexionDB:
         if self.conn:
             self.conn.close()
             logger.info("🔒 Conexión cerrada")
+
+
+def obtener_conexion():
+    """
+    Abre una conexión nueva y propia usando la configuración de ConexionDB,
+    sin tocar la conexión compartida del singleton (segura desde hilos:
+    cada llamada recibe su conexión y la puede cerrar)
+    
+    Returns:
+        Conexión a la base de datos o None si hay error
+    """
+    try:
+        return monitorear(pyodbc.connect(ConexionDB().cadena_conexion()))
+    except Exception as e:
+        logger.error(f"❌ Error de conexión: {e}")
+        return None
+
+
+def obtener_conexion_lectura():
+    """
+    Abre una conexión de solo lectura a la réplica de reportes
+    (DB_READ_CONNECTION completa, o DB_READ_SERVER / DB_READ_NAME con las
+    credenciales de la principal y ApplicationIntent=ReadOnly)
+    
+    Returns:
+        Conexión a la réplica o None si no está configurada o no responde
+    """
+    conn_str = os.getenv('DB_READ_CONNECTION')
+    servidor = os.getenv('DB_READ_SERVER')
+    if not conn_str and not servidor:
+        return None
+    if not conn_str:
+        conn_str = ConexionDB().cadena_conexion(
+            server=servidor,
+            database=os.getenv('DB_READ_NAME'),
+            extra="ApplicationIntent=ReadOnly;"
+        )
+    try:
+        return monitorear(pyodbc.connect(conn_str, readonly=True))
+    except Exception as e:
+        logger.warning(f"⚠️ Réplica de lectura no disponible: {e}")
+        return None
@@ -0,0 +1,199 @@
+"""
+Repositorio local (SQLite) para operar en contingencia cuando SQL Server no está disponible
+"""
+import json
+import sqlite3
+import threading
+from loguru import logger
+from config.seniat_config import SENIAT_CONFIG
+
+
+def ruta_base_local(url=None):
+    """Convierte 'sqlite:///contingencia.db' en la ruta del archivo"""
+    url = url or SENIAT_CONFIG['contingencia']['base_datos_local']
+    return url.split('sqlite:///', 1)[-1]
+
+
+def _serializar(valor):
+    if hasattr(valor, 'isoformat'):
+        return valor.isoformat()
+    return float(valor)
+
+
+class ContingenciaRepositorio:
+    """
+    Base SQLite con la copia del catálogo, la numeración de contingencia y la
+    cola de ventas pendientes de subir al servidor
+    """
+
+    def __init__(self, ruta=None):
+        self.ruta = ruta or ruta_base_local()
+        self.conn = sqlite3.connect(self.ruta, check_same_thread=False, isolation_level=None)
+        self.conn.row_factory = sqlite3.Row
+        self._lock = threading.Lock()
+        self._crear_tablas()
+
+    def _crear_tablas(self):
+        self.conn.executescript("""
+        PRAGMA journal_mode = WAL;
+        CREATE TABLE IF NOT EXISTS catalogo (
+            idarticulo INTEGER PRIMARY KEY,
+            codigo TEXT,
+            nombre TEXT,
+            precio_venta REAL,
+            stock INTEGER,
+            datos TEXT
+        );
+        CREATE INDEX IF NOT EXISTS ix_catalogo_codigo ON catalogo(codigo);
+        CREATE TABLE IF NOT EXISTS numeracion (
+            clave TEXT PRIMARY KEY,
+            ultimo INTEGER NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS venta_pendiente (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            numero_contingencia INTEGER NOT NULL UNIQUE,
+            venta_json TEXT NOT NULL,
+            fecha TEXT NOT NULL,
+            sincronizada INTEGER NOT NULL DEFAULT 0,
+            idventa_servidor INTEGER,
+            intentos INTEGER NOT NULL DEFAULT 0,
+            error TEXT
+        );
+        CREATE INDEX IF NOT EXISTS ix_venta_pendiente ON venta_pendiente(sincronizada, id);
+        """)
+
+    def guardar_catalogo(self, articulos):
+        """
+        Reemplaza la copia local del catálogo
+
+        Args:
+            articulos: Lista de artículos (dict con idarticulo, codigo, nombre, precio_venta, stock_actual)
+
+        Returns:
+            int: Artículos guardados (-1 si hay error)
+        """
+        try:
+            with self._lock:
+                self.conn.execute("BEGIN")
+                self.conn.execute("DELETE FROM catalogo")
+                self.conn.executemany(
+                    "INSERT INTO catalogo (idarticulo, codigo, nombre, precio_venta, stock, datos) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    [(a['idarticulo'], str(a.get('codigo') or '').strip().upper(), a.get('nombre'),
+                      float(a.get('precio_venta') or 0), int(a.get('stock_actual') or 0),
+                      json.dumps(a, default=_serializar))
+                     for a in articulos]
+                )
+                self.conn.execute("COMMIT")
+            return len(articulos)
+        except Exception as e:
+            if self.conn.in_transaction:
+                self.conn.execute("ROLLBACK")
+            logger.error(f"❌ Error guardando catálogo de contingencia: {e}")
+            return -1
+
+    def buscar_articulo(self, codigo_o_id):
+        """Busca un artículo del catálogo local por código o ID"""
+        texto = str(codigo_o_id).strip().upper()
+        fila = self.conn.execute(
+            "SELECT idarticulo, codigo, nombre, precio_venta, stock FROM catalogo "
+            "WHERE codigo = ? OR idarticulo = ?",
+            (texto, int(texto) if texto.isdigit() else -1)
+        ).fetchone()
+        return dict(fila) if fila else None
+
+    def contar_catalogo(self):
+        return self.conn.execute("SELECT COUNT(*) FROM catalogo").fetchone()[0]
+
+    def encolar_venta(self, venta, numero_inicio):
+        """
+        Asigna el siguiente número de contingencia, descuenta el stock local y
+        guarda la venta en la cola, todo en una transacción
+
+        Args:
+            venta: dict serializable con cabecera y 'detalle'
+            numero_inicio: Primer número de la serie de contingencia
+
+        Returns:
+            int: Número de contingencia asignado o None si falta stock local o hay error
+        """
+        try:
+            with self._lock:
+                self.conn.execute("BEGIN IMMEDIATE")
+                for item in venta['detalle']:
+                    cursor = self.conn.execute(
+                        "UPDATE catalogo SET stock = stock - ? WHERE idarticulo = ? AND stock >= ?",
+                        (item['cantidad'], item['idarticulo'], item['cantidad'])
+                    )
+                    if cursor.rowcount != 1:
+                        self.conn.execute("ROLLBACK")
+                        logger.warning(f"⚠️ Stock local insuficiente para el artículo {item['idarticulo']}")
+                        return None
+                self.conn.execute(
+                    "INSERT INTO numeracion (clave, ultimo) VALUES ('venta', ?) "
+                    "ON CONFLICT(clave) DO UPDATE SET ultimo = ultimo + 1",
+                    (numero_inicio,)
+                )
+                numero = self.conn.execute(
+                    "SELECT ultimo FROM numeracion WHERE clave = 'venta'").fetchone()[0]
+                self.conn.execute(
+                    "INSERT INTO venta_pendiente (numero_contingencia, venta_json, fecha) VALUES (?, ?, ?)",
+                    (numero, json.dumps(venta, default=_serializar), venta['fecha_hora'])
+                )
+                self.conn.execute("COMMIT")
+            return numero
+        except Exception as e:
+            if self.conn.in_transaction:
+                self.conn.execute("ROLLBACK")
+            logger.error(f"❌ Error guardando venta de contingencia: {e}")
+            return None
+
+    def pendientes(self, limite=50, max_intentos=None, desde_id=0):
+        """
+        Ventas aún no sincronizadas, en orden de emisión
+
+        Args:
+            limite: Máximo de ventas a devolver
+            max_intentos: Omitir las que ya fallaron este número de veces
+            desde_id: Solo ventas con id mayor (para recorrer la cola por lotes)
+
+        Returns:
+            list: dict con id, numero_contingencia, venta (dict), intentos, error
+        """
+        query = "SELECT id, numero_contingencia, venta_json, intentos, error FROM venta_pendiente " \
+                "WHERE sincronizada = 0 AND id > ?"
+        parametros = [desde_id]
+        if max_intentos is not None:
+            query += " AND intentos < ?"
+            parametros.append(max_intentos)
+        query += " ORDER BY id LIMIT ?"
+        parametros.append(limite)
+        return [
+            {'id': f['id'], 'numero_contingencia': f['numero_contingencia'],
+             'venta': json.loads(f['venta_json']), 'intentos': f['intentos'], 'error': f['error']}
+            for f in self.conn.execute(query, parametros).fetchall()
+        ]
+
+    def fecha_pendiente_mas_antigua(self):
+        """Fecha (ISO) de la venta pendiente más antigua o None"""
+        return self.conn.execute(
+            "SELECT MIN(fecha) FROM venta_pendiente WHERE sincronizada = 0").fetchone()[0]
+
+    def contar_pendientes(self):
+        return self.conn.execute(
+            "SELECT COUNT(*) FROM venta_pendiente WHERE sincronizada = 0").fetchone()[0]
+
+    def marcar_sincronizada(self, id_pendiente, idventa):
+        with self._lock:
+            self.conn.execute(
+                "UPDATE venta_pendiente SET sincronizada = 1, idventa_servidor = ?, error = NULL "
+                "WHERE id = ?", (idventa, id_pendiente))
+
+    def registrar_fallo(self, id_pendiente, error):
+        with self._lock:
+            self.conn.execute(
+                "UPDATE venta_pendiente SET intentos = intentos + 1, error = ? WHERE id = ?",
+                (str(error)[:500], id_pendiente))
+
+    def cerrar(self):
+        self.conn.close()
@@ -0,0 +1,129 @@
+"""
+Enrutamiento de consultas de solo lectura hacia la réplica de reportes
+"""
+import copy
+import functools
+import os
+import threading
+import time
+from loguru import logger
+from capa_datos.conexion import obtener_conexion_lectura
+
+# Retraso máximo (segundos) aceptado en la réplica; por encima se lee de la principal
+RETRASO_MAXIMO_SEG = float(os.getenv('DB_READ_MAX_RETRASO_SEG', '30'))
+# Cada cuánto se vuelve a medir el retraso de la réplica
+VERIFICAR_CADA_SEG = float(os.getenv('DB_READ_VERIFICAR_SEG', '10'))
+# Espera antes de reintentar conectar a una réplica caída
+REINTENTAR_CADA_SEG = float(os.getenv('DB_READ_REINTENTO_SEG', '60'))
+
+# Retraso en segundos: grupo de disponibilidad Always On o, si no aplica, log shipping
+RETRASO_SQL = os.getenv('DB_READ_RETRASO_SQL', """
+SELECT COALESCE(
+    (SELECT TOP 1 secondary_lag_seconds
+     FROM sys.dm_hadr_database_replica_states
+     WHERE is_local = 1 AND database_id = DB_ID()),
+    (SELECT TOP 1 DATEDIFF(second, last_restored_date, GETDATE())
+     FROM msdb.dbo.log_shipping_monitor_secondary
+     WHERE secondary_database = DB_NAME()))
+""")
+
+
+class EnrutadorLectura:
+    """
+    Entrega a cada hilo su propia conexión a la réplica (las conexiones pyodbc no
+    se comparten entre hilos) mientras el retraso medido esté dentro del límite.
+    Si la réplica no está configurada, no responde o está atrasada, devuelve
+    None y la consulta se hace en la conexión principal del repositorio.
+    """
+
+    def __init__(self, fabrica=obtener_conexion_lectura, retraso_maximo=RETRASO_MAXIMO_SEG):
+        self.fabrica = fabrica
+        self.retraso_maximo = retraso_maximo
+        self._local = threading.local()
+        self._caida_hasta = 0.0
+        self._lock = threading.Lock()
+
+    def _descartar(self):
+        conn = getattr(self._local, 'conn', None)
+        self._local.conn = None
+        if conn is not None:
+            try:
+                conn.close()
+            except Exception:
+                pass
+
+    def _marcar_caida(self):
+        with self._lock:
+            self._caida_hasta = time.monotonic() + REINTENTAR_CADA_SEG
+
+    def _medir_retraso(self, conn):
+        cursor = conn.cursor()
+        try:
+            cursor.execute(RETRASO_SQL)
+            fila = cursor.fetchone()
+            return None if not fila or fila[0] is None else float(fila[0])
+        finally:
+            cursor.close()
+
+    def conexion(self):
+        """
+        Returns:
+            Conexión a la réplica para el hilo actual, o None para usar la principal
+        """
+        ahora = time.monotonic()
+        if ahora < self._caida_hasta:
+            return None
+
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = self.fabrica()
+            if conn is None:
+                self._marcar_caida()
+                return None
+            self._local.conn = conn
+            self._local.verificado = 0.0
+            self._local.vigente = False
+
+        if ahora - self._local.verificado >= VERIFICAR_CADA_SEG:
+            try:
+                retraso = self._medir_retraso(conn)
+            except Exception as e:
+                logger.warning(f"⚠️ Réplica de lectura sin respuesta, se usa la principal: {e}")
+                self._descartar()
+                self._marcar_caida()
+                return None
+            vigente = retraso is not None and retraso <= self.retraso_maximo
+            if vigente != self._local.vigente:
+                if vigente:
+                    logger.info(f"📖 Lecturas hacia la réplica (retraso {retraso:.0f}s)")
+                else:
+                    logger.warning(f"⚠️ Réplica atrasada ({retraso if retraso is not None else '?'}s "
+                                   f"> {self.retraso_maximo:.0f}s), se lee de la principal")
+            self._local.vigente = vigente
+            self._local.verificado = ahora
+
+        return conn if self._local.vigente else None
+
+
+enrutador_lectura = EnrutadorLectura()
+
+
+def solo_lectura(metodo):
+    """
+    Marca un método de repositorio como de solo lectura: se ejecuta sobre una
+    copia superficial del repositorio cuya conexión apunta a la réplica (el
+    repositorio original, compartido con las escrituras, no se modifica).
+    """
+    @functools.wraps(metodo)
+    def envoltura(self, *args, **kwargs):
+        conn = enrutador_lectura.conexion()
+        if conn is None:
+            return metodo(self, *args, **kwargs)
+        replica = copy.copy(self)
+        replica.conn = conn
+        if 'cursor' in vars(self):
+            replica.cursor = conn.cursor()
+        return metodo(replica, *args, **kwargs)
+
+    envoltura.solo_lectura = True
+    return envoltura
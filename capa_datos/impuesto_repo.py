@@ -0,0 +1,22 @@
+"""
+Repositorio de la tabla de impuestos (letras fiscales)
+"""
+from loguru import logger
+
+
+class ImpuestoRepositorio:
+    def __init__(self, conn):
+        self.conn = conn
+
+    def listar(self):
+        """
+        Returns:
+            list: Tuplas (id_impuesto, letra_fiscal, nombre) o None si hay error
+        """
+        try:
+            cursor = self.conn.cursor()
+            cursor.execute("SELECT id_impuesto, letra_fiscal, nombre FROM impuesto ORDER BY id_impuesto")
+            return cursor.fetchall()
+        except Exception as e:
+            logger.error(f"❌ Error leyendo la tabla de impuestos: {e}")
+            return None
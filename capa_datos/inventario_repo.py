@@ -1,18 +1,27 @@
 """
 Repositorio para gestión de inventario (Kardex)
 """
+import json
 from loguru import logger
+from capa_datos.enrutador_lectura import solo_lectura
 from capa_datos.conexion import ConexionDB
 
 class InventarioRepositorio:
-    def __init__(self):
-        """Inicializa el repositorio de inventario"""
+    def __init__(self, conn=None):
+        """
+        Inicializa el repositorio de inventario
+        
+        Args:
+            conn: Conexión existente (opcional). Si no se indica, abre una nueva.
+        """
         self.db = ConexionDB()
-        self.conn = self.db.conectar()
+        self._conexion_propia = conn is None
+        self.conn = conn if conn is not None else self.db.conectar()
     
     def obtener_stock_actual(self, idarticulo):
         """
-        Obtiene el stock actual de un artículo desde kardex
+        Obtiene el stock actual de un artículo desde stock_articulo
+        (con respaldo en el último registro de kardex)
         
         Args:
             idarticulo: ID del artículo
@@ -23,15 +32,16 @@ class InventarioRepositorio:
         try:
             cursor = self.conn.cursor()
             query = """
-            SELECT TOP 1 stock_nuevo 
-            FROM kardex 
-            WHERE idarticulo = ? 
-            ORDER BY fecha_movimiento DESC
+            SELECT ISNULL(
+                (SELECT cantidad FROM stock_articulo WHERE idarticulo = ?),
+                (SELECT TOP 1 stock_nuevo FROM kardex 
+                 WHERE idarticulo = ? ORDER BY fecha_movimiento DESC)
+            )
             """
-            cursor.execute(query, (idarticulo,))
+            cursor.execute(query, (idarticulo, idarticulo))
             resultado = cursor.fetchone()
             
-            if resultado:
+            if resultado and resultado[0] is not None:
                 return resultado[0]
             return 0
             
@@ -39,6 +49,43 @@ class InventarioRepositorio:
             logger.error(f"Error obteniendo stock actual para artículo {idarticulo}: {e}")
             return 0
     
+    def obtener_stock_por_ids(self, ids, tamano_bloque=1000):
+        """
+        Obtiene el stock actual de varios artículos con una consulta por bloque de IDs
+        
+        Args:
+            ids: Iterable de IDs de artículo
+            tamano_bloque: IDs por consulta
+            
+        Returns:
+            dict: {idarticulo: stock} (0 para artículos sin movimientos),
+                  o None si hubo error
+        """
+        ids = list(dict.fromkeys(ids))
+        stocks = dict.fromkeys(ids, 0)
+        try:
+            cursor = self.conn.cursor()
+            for inicio in range(0, len(ids), tamano_bloque):
+                bloque = ids[inicio:inicio + tamano_bloque]
+                query = f"""
+                SELECT a.idarticulo, ISNULL(s.cantidad, k.stock_nuevo)
+                FROM articulo a
+                LEFT JOIN stock_articulo s ON s.idarticulo = a.idarticulo
+                OUTER APPLY (
+                    SELECT TOP 1 stock_nuevo FROM kardex
+                    WHERE idarticulo = a.idarticulo AND s.idarticulo IS NULL
+                    ORDER BY fecha_movimiento DESC
+                ) k
+                WHERE a.idarticulo IN ({', '.join('?' * len(bloque))})
+                """
+                cursor.execute(query, bloque)
+                for idarticulo, stock in cursor.fetchall():
+                    stocks[idarticulo] = stock or 0
+            return stocks
+        except Exception as e:
+            logger.error(f"Error obteniendo stock de {len(ids)} artículos: {e}")
+            return None
+    
     def registrar_movimiento(self, idarticulo, tipo_movimiento, cantidad,
                             referencia, precio_compra=None, lote=None,
                             fecha_vencimiento=None):
@@ -55,50 +102,252 @@ class InventarioRepositorio:
             fecha_vencimiento: Fecha de vencimiento (no se usa en esta estructura)
             
         Returns:
-            bool: True si se registró correctamente
+            dict: stock_anterior y stock_nuevo si se registró, False en caso contrario
+        """
+        # Validar y convertir tipo_movimiento a valores permitidos
+        tipo_valido = tipo_movimiento
+        if tipo_movimiento == 'ENTRADA':
+            tipo_valido = 'INGRESO'  # Asumimos que acepta 'INGRESO'
+        
+        if tipo_movimiento == 'ENTRADA':
+            resultado = self.reponer_stock_atomico(
+                idarticulo, cantidad, referencia, precio_compra, tipo_valido
+            )
+        else:  # SALIDA
+            resultado = self.descontar_stock_atomico(
+                idarticulo, cantidad, referencia, precio_compra, tipo_valido
+            )
+        
+        if resultado:
+            logger.info(f"✅ Movimiento registrado en kardex: {tipo_valido} {cantidad} und - Art {idarticulo}")
+        return resultado or False
+    
+    def descontar_stock_atomico(self, idarticulo, cantidad, documento,
+                                precio_unitario=None, tipo_kardex='VENTA'):
+        """
+        Descuenta stock con un único UPDATE condicional y registra el kardex
+        en el mismo lote de sentencias. Si el stock no alcanza no se modifica
+        nada y se devuelve None de inmediato (sin reintentos ni bloqueos previos).
+        
+        Args:
+            idarticulo: ID del artículo
+            cantidad: Cantidad a descontar
+            documento: Documento de referencia para kardex
+            precio_unitario: Precio unitario (opcional)
+            tipo_kardex: Tipo de movimiento en kardex
+            
+        Returns:
+            dict: stock_anterior y stock_nuevo, o None si el stock es insuficiente
+        """
+        valor_total = cantidad * precio_unitario if precio_unitario else 0
+        query = """
+        SET NOCOUNT ON;
+        DECLARE @mov TABLE (stock_anterior INT, stock_nuevo INT);
+        
+        UPDATE stock_articulo
+           SET cantidad = cantidad - ?, fecha_actualizacion = GETDATE()
+        OUTPUT DELETED.cantidad, INSERTED.cantidad INTO @mov
+         WHERE idarticulo = ? AND cantidad >= ?;
+        
+        INSERT INTO kardex 
+        (idarticulo, tipo_movimiento, documento_referencia, cantidad, 
+         precio_unitario, valor_total, stock_anterior, stock_nuevo, fecha_movimiento)
+        SELECT ?, ?, ?, ?, ?, ?, stock_anterior, stock_nuevo, GETDATE() FROM @mov;
+        
+        SELECT stock_anterior, stock_nuevo FROM @mov;
         """
         try:
             cursor = self.conn.cursor()
+            cursor.execute(query, (
+                cantidad, idarticulo, cantidad,
+                idarticulo, tipo_kardex, documento, cantidad, precio_unitario, valor_total
+            ))
+            row = cursor.fetchone()
+            self.conn.commit()
             
-            # Obtener stock actual
-            stock_actual = self.obtener_stock_actual(idarticulo)
-            
-            # Validar y convertir tipo_movimiento a valores permitidos
-            tipo_valido = tipo_movimiento
-            if tipo_movimiento == 'ENTRADA':
-                tipo_valido = 'INGRESO'  # Asumimos que acepta 'INGRESO'
-            
-            # Calcular stock nuevo
-            if tipo_movimiento == 'ENTRADA':
-                stock_nuevo = stock_actual + cantidad
-            else:  # SALIDA
-                stock_nuevo = stock_actual - cantidad
-            
-            # Calcular valor total
-            valor_total = cantidad * precio_compra if precio_compra else 0
-            
-            query = """
-            INSERT INTO kardex 
-            (idarticulo, fecha_movimiento, tipo_movimiento, documento_referencia,
-             cantidad, precio_unitario, valor_total, stock_anterior, stock_nuevo)
-            VALUES (?, GETDATE(), ?, ?, ?, ?, ?, ?, ?)
-            """
+            if not row:
+                logger.warning(f"⚠️ Stock insuficiente para artículo {idarticulo} (solicitado {cantidad})")
+                return None
+            return {'stock_anterior': row[0], 'stock_nuevo': row[1]}
             
+        except Exception as e:
+            logger.error(f"❌ Error descontando stock del artículo {idarticulo}: {e}")
+            self.conn.rollback()
+            return None
+    
+    def reponer_stock_atomico(self, idarticulo, cantidad, documento,
+                              precio_unitario=None, tipo_kardex='INGRESO'):
+        """
+        Incrementa stock y registra el kardex en un único lote de sentencias.
+        Crea la fila de stock_articulo si el artículo aún no la tiene.
+        
+        Returns:
+            dict: stock_anterior y stock_nuevo, o None si hubo error
+        """
+        valor_total = cantidad * precio_unitario if precio_unitario else 0
+        query = """
+        SET NOCOUNT ON;
+        DECLARE @mov TABLE (stock_anterior INT, stock_nuevo INT);
+        
+        UPDATE stock_articulo WITH (UPDLOCK, HOLDLOCK)
+           SET cantidad = cantidad + ?, fecha_actualizacion = GETDATE()
+        OUTPUT DELETED.cantidad, INSERTED.cantidad INTO @mov
+         WHERE idarticulo = ?;
+        
+        IF @@ROWCOUNT = 0
+            INSERT INTO stock_articulo (idarticulo, cantidad)
+            OUTPUT 0, INSERTED.cantidad INTO @mov
+            VALUES (?, ?);
+        
+        INSERT INTO kardex 
+        (idarticulo, tipo_movimiento, documento_referencia, cantidad, 
+         precio_unitario, valor_total, stock_anterior, stock_nuevo, fecha_movimiento)
+        SELECT ?, ?, ?, ?, ?, ?, stock_anterior, stock_nuevo, GETDATE() FROM @mov;
+        
+        SELECT stock_anterior, stock_nuevo FROM @mov;
+        """
+        try:
+            cursor = self.conn.cursor()
             cursor.execute(query, (
-                idarticulo, tipo_valido, referencia,
-                cantidad, precio_compra, valor_total,
-                stock_actual, stock_nuevo
+                cantidad, idarticulo,
+                idarticulo, cantidad,
+                idarticulo, tipo_kardex, documento, cantidad, precio_unitario, valor_total
             ))
-            
+            row = cursor.fetchone()
             self.conn.commit()
-            logger.info(f"✅ Movimiento registrado en kardex: {tipo_valido} {cantidad} und - Art {idarticulo}")
-            return True
+            return {'stock_anterior': row[0], 'stock_nuevo': row[1]} if row else None
             
         except Exception as e:
-            logger.error(f"❌ Error registrando movimiento en kardex: {e}")
+            logger.error(f"❌ Error reponiendo stock del artículo {idarticulo}: {e}")
             self.conn.rollback()
-            return False
+            return None
+    
+    _COLUMNAS_KARDEX_COSTOS = """
+        k.idkardex, k.idarticulo, k.fecha_movimiento, k.tipo_movimiento,
+        k.stock_anterior, k.stock_nuevo, k.precio_unitario, k.costo_unitario_usd,
+        k.tasa_cambio
+    """
+    
+    def listar_kardex_costos(self, idarticulo=None, hasta=None):
+        """
+        Lee los movimientos de kardex necesarios para reproducir el costo promedio,
+        ordenados por artículo y cronológicamente (idkardex)
+        
+        Args:
+            idarticulo: Limitar a un artículo (opcional)
+            hasta: Fecha límite inclusive (opcional)
+            
+        Returns:
+            list: Tuplas (idkardex, idarticulo, fecha_movimiento, tipo_movimiento,
+                  stock_anterior, stock_nuevo, precio_unitario, costo_unitario_usd,
+                  tasa_cambio) o None si hay error
+        """
+        try:
+            cursor = self.conn.cursor()
+            query = f"""
+            SELECT {self._COLUMNAS_KARDEX_COSTOS}
+            FROM kardex k
+            WHERE (? IS NULL OR k.idarticulo = ?)
+              AND (? IS NULL OR CAST(k.fecha_movimiento AS DATE) <= ?)
+            ORDER BY k.idarticulo, k.idkardex
+            """
+            cursor.execute(query, (idarticulo, idarticulo, hasta, hasta))
+            return [tuple(row) for row in cursor.fetchall()]
+            
+        except Exception as e:
+            logger.error(f"Error leyendo kardex para costo promedio: {e}")
+            return None
+    
+    def listar_kardex_cambios(self, marca=0):
+        """
+        Movimientos de kardex confirmados después de una marca de agua (columna
+        ROWVERSION). Solo se leen filas de transacciones ya confirmadas, de modo
+        que un idkardex menor que confirma tarde se lee en la siguiente llamada.
+        
+        Args:
+            marca: Última marca procesada (0 = todo el kardex)
+            
+        Returns:
+            tuple: (filas como en listar_kardex_costos o None si hay error, nueva marca)
+        """
+        try:
+            cursor = self.conn.cursor()
+            cursor.execute(f"""
+                SET NOCOUNT ON;
+                DECLARE @hasta BINARY(8) = MIN_ACTIVE_ROWVERSION();
+                
+                SELECT {self._COLUMNAS_KARDEX_COSTOS}
+                FROM kardex k
+                WHERE k.version > CONVERT(BINARY(8), CAST(? AS BIGINT))
+                  AND k.version < @hasta
+                ORDER BY k.idarticulo, k.idkardex;
+                
+                SELECT CAST(@hasta AS BIGINT) - 1;
+            """, (marca,))
+            filas = [tuple(row) for row in cursor.fetchall()]
+            cursor.nextset()
+            return filas, cursor.fetchone()[0]
+        except Exception as e:
+            logger.error(f"Error leyendo cambios de kardex para costo promedio: {e}")
+            return None, marca
+    
+    def listar_kardex_articulos(self, idarticulos, marca):
+        """
+        Historial completo de varios artículos hasta una marca de agua (inclusive),
+        para reproducir su costo cuando llegó un movimiento fuera de orden
+        
+        Returns:
+            list: Filas como en listar_kardex_costos o None si hay error
+        """
+        try:
+            cursor = self.conn.cursor()
+            cursor.execute(f"""
+                SELECT {self._COLUMNAS_KARDEX_COSTOS}
+                FROM kardex k
+                WHERE k.idarticulo IN (SELECT CAST(value AS INT) FROM OPENJSON(?))
+                  AND k.version <= CONVERT(BINARY(8), CAST(? AS BIGINT))
+                ORDER BY k.idarticulo, k.idkardex
+            """, (json.dumps(list(idarticulos)), marca))
+            return [tuple(row) for row in cursor.fetchall()]
+        except Exception as e:
+            logger.error(f"Error leyendo historial de kardex de {len(idarticulos)} artículos: {e}")
+            return None
+    
+    @solo_lectura
+    def iterar_kardex_por_fecha(self, fecha_inicio, fecha_fin, tamano_bloque=5000):
+        """
+        Recorre los movimientos de kardex de un rango de fechas por bloques (fetchmany)
+        
+        Args:
+            fecha_inicio: Fecha inicial
+            fecha_fin: Fecha final
+            tamano_bloque: Filas por bloque
+            
+        Yields:
+            tuple: (columnas, lista de filas) por cada bloque
+        """
+        cursor = self.conn.cursor()
+        query = """
+        SELECT k.idkardex, k.fecha_movimiento, k.idarticulo, a.codigo, a.nombre as articulo,
+               k.tipo_movimiento, k.documento_referencia, k.cantidad,
+               k.precio_unitario, k.valor_total, k.stock_anterior, k.stock_nuevo
+        FROM kardex k
+        JOIN articulo a ON a.idarticulo = k.idarticulo
+        WHERE k.fecha_movimiento >= ? AND k.fecha_movimiento < DATEADD(day, 1, CAST(? AS DATE))
+        ORDER BY k.fecha_movimiento, k.idkardex
+        """
+        try:
+            cursor.execute(query, (fecha_inicio, fecha_fin))
+            columns = [col[0] for col in cursor.description]
+            while True:
+                filas = cursor.fetchmany(tamano_bloque)
+                if not filas:
+                    break
+                yield columns, filas
+        finally:
+            cursor.close()
     
+    @solo_lectura
     def obtener_movimientos_articulo(self, idarticulo, limite=100):
         """
         Obtiene los últimos movimientos de un artículo
@@ -127,9 +376,9 @@ class InventarioRepositorio:
             return []
     
     def cerrar_conexion(self):
-        """Cierra la conexión a la base de datos"""
+        """Cierra la conexión a la base de datos (solo si la abrió este repositorio)"""
         try:
-            if hasattr(self, 'db'):
+            if hasattr(self, 'db') and self._conexion_propia:
                 self.db.cerrar()
         except:
             pass
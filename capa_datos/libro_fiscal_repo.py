@@ -0,0 +1,109 @@
+"""
+Repositorio de consultas para los libros fiscales (Libro de Ventas / Libro de Compras)
+"""
+from loguru import logger
+from capa_datos.enrutador_lectura import solo_lectura
+
+
+def _bases_por_letra(monto, letra, prefijo='base', letras=('E', 'G', 'R', 'A')):
+    """Columnas SUM(CASE ...) del monto por letra fiscal (sin impuesto = G)"""
+    return ",\n".join(
+        f"SUM(CASE WHEN ISNULL({letra}, 'G') = '{l}' THEN {monto} ELSE 0 END) AS {prefijo}_{l.lower()}"
+        for l in letras
+    )
+
+
+class LibroFiscalRepositorio:
+    def __init__(self, conn):
+        self.conn = conn
+
+    @solo_lectura
+    def ventas_del_dia(self, dia):
+        """
+        Facturas de venta de un día con la base imponible y el IVA en Bs. por letra
+        fiscal, tomados del desglose guardado con la venta (venta_impuesto). Las
+        ventas sin desglose (históricas) recalculan la base desde su detalle y
+        traen el IVA en NULL.
+
+        Args:
+            dia: Fecha (date) a consultar
+
+        Returns:
+            list: Tuplas (idventa, fecha_hora, tipo_comprobante, serie, numero_comprobante,
+                  estado, moneda, monto_divisa, rif, cliente, base_e, base_g, base_r, base_a,
+                  iva_g, iva_r, iva_a) ordenadas por fecha y número; None si hay error
+        """
+        try:
+            cursor = self.conn.cursor()
+            bases = ",\n".join(
+                f"CASE WHEN vi.filas > 0 THEN vi.base_{l} ELSE dv.base_{l} END * f.factor AS base_{l}"
+                for l in ('e', 'g', 'r', 'a')
+            )
+            ivas = ",\n".join(
+                f"CASE WHEN vi.filas > 0 THEN vi.iva_{l} * f.factor END AS iva_{l}"
+                for l in ('g', 'r', 'a')
+            )
+            query = f"""
+            SELECT v.idventa, v.fecha_hora, v.tipo_comprobante, v.serie, v.numero_comprobante,
+                   v.estado, v.moneda, v.monto_divisa,
+                   ISNULL(c.num_documento, '') AS rif,
+                   ISNULL(c.nombre + ' ' + c.apellidos, 'CONSUMIDOR FINAL') AS cliente,
+                   {bases},
+                   {ivas}
+            FROM venta v
+            LEFT JOIN cliente c ON v.idcliente = c.idcliente
+            CROSS APPLY (SELECT CASE WHEN v.moneda = 'VES' THEN 1
+                                     ELSE ISNULL(v.tasa_cambio, 1) END AS factor) f
+            OUTER APPLY (
+                SELECT COUNT(*) AS filas,
+                       {_bases_por_letra('x.base_imponible', 'x.letra_fiscal')},
+                       {_bases_por_letra('x.monto_impuesto', 'x.letra_fiscal', 'iva', ('G', 'R', 'A'))}
+                FROM venta_impuesto x
+                WHERE x.idventa = v.idventa
+            ) vi
+            OUTER APPLY (
+                SELECT {_bases_por_letra('d.cantidad * d.precio_venta', 'i.letra_fiscal')}
+                FROM detalle_venta d
+                LEFT JOIN articulo a ON a.idarticulo = d.idarticulo
+                LEFT JOIN impuesto i ON i.id_impuesto = a.id_impuesto
+                WHERE d.idventa = v.idventa AND vi.filas = 0
+            ) dv
+            WHERE v.fecha_hora >= ? AND v.fecha_hora < DATEADD(day, 1, CAST(? AS DATE))
+            ORDER BY v.fecha_hora, v.idventa
+            """
+            cursor.execute(query, (dia, dia))
+            return cursor.fetchall()
+        except Exception as e:
+            logger.error(f"❌ Error leyendo ventas del {dia} para el libro fiscal: {e}")
+            return None
+
+    @solo_lectura
+    def compras_del_dia(self, dia):
+        """
+        Facturas de compra de un día con la base imponible por letra fiscal
+
+        Returns:
+            list: Tuplas (idcompra, fecha_hora, tipo_comprobante, serie, numero_comprobante,
+                  estado, rif, proveedor, base_e, base_g, base_r, base_a); None si hay error
+        """
+        try:
+            cursor = self.conn.cursor()
+            query = f"""
+            SELECT c.idcompra, c.fecha_hora, c.tipo_comprobante, c.serie, c.numero_comprobante,
+                   c.estado, ISNULL(p.rif, '') AS rif, p.razon_social AS proveedor,
+                   {_bases_por_letra('d.subtotal', 'i.letra_fiscal')}
+            FROM compra c
+            JOIN proveedor p ON p.idproveedor = c.idproveedor
+            LEFT JOIN detalle_compra d ON d.idcompra = c.idcompra
+            LEFT JOIN articulo a ON a.idarticulo = d.idarticulo
+            LEFT JOIN impuesto i ON i.id_impuesto = a.id_impuesto
+            WHERE c.fecha_hora >= ? AND c.fecha_hora < DATEADD(day, 1, CAST(? AS DATE))
+            GROUP BY c.idcompra, c.fecha_hora, c.tipo_comprobante, c.serie, c.numero_comprobante,
+                     c.estado, p.rif, p.razon_social
+            ORDER BY c.fecha_hora, c.idcompra
+            """
+            cursor.execute(query, (dia, dia))
+            return cursor.fetchall()
+        except Exception as e:
+            logger.error(f"❌ Error leyendo compras del {dia} para el libro fiscal: {e}")
+            return None
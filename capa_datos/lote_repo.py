@@ -1,3 +1,4 @@
+import json
 from typing import List, Dict, Optional
 from datetime import datetime
 from loguru import logger
@@ -156,3 +157,67 @@ class LoteRepositorio:
         except Exception as e:
             logger.error(f"❌ Error al listar lotes vencidos: {e}")
             return []
+    
+    def listar_disponibles(self, idarticulos: List[int]) -> Optional[Dict[int, List[Dict]]]:
+        """
+        Carga en una sola consulta los lotes vendibles (con stock y no vencidos)
+        de varios artículos
+        
+        Returns:
+            dict: {idarticulo: [{idlote, fecha_vencimiento, stock_actual}, ...]}
+                  o None si hay error
+        """
+        try:
+            self.cursor.execute("""
+                SELECT l.idarticulo, l.idlote, l.fecha_vencimiento, l.stock_actual
+                FROM lote l
+                WHERE l.idarticulo IN (SELECT CAST(value AS INT) FROM OPENJSON(?))
+                  AND l.stock_actual > 0
+                  AND (l.fecha_vencimiento IS NULL
+                       OR l.fecha_vencimiento >= CAST(GETDATE() AS DATE))
+            """, (json.dumps(list(idarticulos)),))
+            resultados = {}
+            for row in self.cursor.fetchall():
+                resultados.setdefault(row[0], []).append({
+                    'idlote': row[1],
+                    'fecha_vencimiento': row[2],
+                    'stock_actual': row[3]
+                })
+            return resultados
+        except Exception as e:
+            logger.error(f"❌ Error al cargar lotes disponibles: {e}")
+            return None
+    
+    def listar_cambios_desde(self, marca: int = 0):
+        """
+        Lista los lotes insertados o modificados después de una marca de agua
+        (columna ROWVERSION). Solo se leen filas de transacciones ya confirmadas.
+        
+        Args:
+            marca: Última marca procesada (0 = carga completa)
+            
+        Returns:
+            tuple: (lista de lotes o None si hay error, nueva marca)
+        """
+        try:
+            self.cursor.execute("""
+                SET NOCOUNT ON;
+                DECLARE @hasta BINARY(8) = MIN_ACTIVE_ROWVERSION();
+                
+                SELECT l.idlote, l.idarticulo, l.codigo_lote, l.fecha_vencimiento,
+                       l.stock_actual, a.nombre as articulo, a.codigo
+                FROM lote l
+                INNER JOIN articulo a ON l.idarticulo = a.idarticulo
+                WHERE l.version > CONVERT(BINARY(8), CAST(? AS BIGINT))
+                  AND l.version < @hasta;
+                
+                SELECT CAST(@hasta AS BIGINT) - 1;
+            """, (marca,))
+            columnas = [column[0] for column in self.cursor.description]
+            lotes = [dict(zip(columnas, row)) for row in self.cursor.fetchall()]
+            self.cursor.nextset()
+            nueva_marca = self.cursor.fetchone()[0]
+            return lotes, nueva_marca
+        except Exception as e:
+            logger.error(f"❌ Error al listar lotes modificados: {e}")
+            return None, marca
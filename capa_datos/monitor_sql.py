@@ -0,0 +1,371 @@
+"""
+Monitor de sentencias SQL: registro de consultas lentas y presupuesto de round trips
+"""
+import hashlib
+import os
+import re
+import threading
+import time
+from contextlib import contextmanager
+from loguru import logger
+
+UMBRAL_LENTO_MS = float(os.getenv('SQL_UMBRAL_LENTO_MS', '250'))
+ARCHIVO_SQL_LENTO = os.getenv('SQL_ARCHIVO_LENTO', 'consultas_lentas.log')
+
+_PATRON_CADENAS = re.compile(r"'(?:[^']|'')*'")
+_PATRON_NUMEROS = re.compile(r"\b\d+(?:\.\d+)?\b")
+_PATRON_ESPACIOS = re.compile(r"\s+")
+
+
+class PresupuestoRoundTripsExcedido(Exception):
+    """Se lanza cuando un caso de uso supera el número de round trips permitido"""
+
+
+def normalizar_sql(sql):
+    """
+    Normaliza el texto de una sentencia para agrupar ejecuciones equivalentes
+    (literales reemplazados por '?' y espacios colapsados)
+    """
+    texto = _PATRON_CADENAS.sub('?', sql or '')
+    texto = _PATRON_NUMEROS.sub('?', texto)
+    return _PATRON_ESPACIOS.sub(' ', texto).strip()
+
+
+def huella_sql(sql):
+    """
+    Obtiene la huella (fingerprint) de una sentencia SQL
+
+    Returns:
+        tuple: (huella de 12 caracteres, texto normalizado)
+    """
+    normalizado = normalizar_sql(sql)
+    huella = hashlib.md5(normalizado.encode('utf-8')).hexdigest()[:12]
+    return huella, normalizado
+
+
+def forma_parametros(parametros, filas=None):
+    """
+    Describe la forma de los parámetros sin exponer sus valores
+    Ejemplo: '(int, str, float)' o '20 x (int, int)' para executemany
+    """
+    if not parametros:
+        return '()'
+    tipos = ', '.join(type(p).__name__ for p in parametros)
+    if filas is not None:
+        return f"{filas} x ({tipos})"
+    return f"({tipos})"
+
+
+class MonitorSQL:
+    """Acumula estadísticas por sentencia y controla presupuestos de round trips"""
+
+    def __init__(self, umbral_lento_ms=UMBRAL_LENTO_MS):
+        self.umbral_lento_ms = umbral_lento_ms
+        self.activo = os.getenv('SQL_MONITOR', '1') != '0'
+        self.estadisticas = {}
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    def _presupuestos_activos(self):
+        if not hasattr(self._local, 'presupuestos'):
+            self._local.presupuestos = []
+        return self._local.presupuestos
+
+    def registrar(self, sql, forma, duracion_ms, filas):
+        """
+        Registra la ejecución de una sentencia (un round trip)
+
+        Args:
+            sql: Texto de la sentencia
+            forma: Forma de los parámetros (ver forma_parametros)
+            duracion_ms: Duración en milisegundos
+            filas: Filas afectadas (-1 si el driver no lo informa)
+
+        Returns:
+            str: Huella de la sentencia
+        """
+        huella, normalizado = huella_sql(sql)
+
+        with self._lock:
+            est = self.estadisticas.get(huella)
+            if est is None:
+                est = {
+                    'huella': huella,
+                    'sql': normalizado,
+                    'ejecuciones': 0,
+                    'total_ms': 0.0,
+                    'max_ms': 0.0,
+                    'filas': 0,
+                    'lentas': 0
+                }
+                self.estadisticas[huella] = est
+            est['ejecuciones'] += 1
+            est['total_ms'] += duracion_ms
+            est['max_ms'] = max(est['max_ms'], duracion_ms)
+            if filas and filas > 0:
+                est['filas'] += filas
+            if duracion_ms >= self.umbral_lento_ms:
+                est['lentas'] += 1
+
+        for presupuesto in self._presupuestos_activos():
+            presupuesto['sentencias'].append(f"[{huella}] {normalizado[:80]}")
+
+        if duracion_ms >= self.umbral_lento_ms:
+            logger.bind(sql_lento=True).warning(
+                f"🐢 SQL lento {duracion_ms:.1f} ms | huella {huella} | "
+                f"parámetros {forma} | filas {filas if filas is not None and filas >= 0 else 'n/d'} | "
+                f"{normalizado[:500]}"
+            )
+        return huella
+
+    def registrar_filas(self, huella, filas):
+        """Suma filas leídas con fetch* a la estadística de la sentencia"""
+        if not huella or not filas:
+            return
+        with self._lock:
+            est = self.estadisticas.get(huella)
+            if est is not None:
+                est['filas'] += filas
+
+    def registrar_round_trip(self, operacion, duracion_ms):
+        """Registra un round trip que no es una sentencia (COMMIT / ROLLBACK)"""
+        with self._lock:
+            est = self.estadisticas.setdefault(operacion, {
+                'huella': operacion,
+                'sql': operacion,
+                'ejecuciones': 0,
+                'total_ms': 0.0,
+                'max_ms': 0.0,
+                'filas': 0,
+                'lentas': 0
+            })
+            est['ejecuciones'] += 1
+            est['total_ms'] += duracion_ms
+            est['max_ms'] = max(est['max_ms'], duracion_ms)
+
+        for presupuesto in self._presupuestos_activos():
+            presupuesto['sentencias'].append(operacion)
+
+    @contextmanager
+    def presupuesto(self, maximo, descripcion="caso de uso"):
+        """
+        Limita los round trips de un bloque de código
+
+        Ejemplo:
+            with monitor_sql.presupuesto(5, "venta de 20 líneas"):
+                venta_service.registrar(...)
+
+        Raises:
+            PresupuestoRoundTripsExcedido: si el bloque supera 'maximo' round trips
+        """
+        presupuesto = {'maximo': maximo, 'descripcion': descripcion, 'sentencias': []}
+        pila = self._presupuestos_activos()
+        pila.append(presupuesto)
+        error = False
+        try:
+            yield presupuesto
+        except Exception:
+            error = True
+            raise
+        finally:
+            pila.remove(presupuesto)
+            usados = len(presupuesto['sentencias'])
+            presupuesto['usados'] = usados
+            if not error and usados > maximo:
+                detalle = "\n   ".join(presupuesto['sentencias'])
+                raise PresupuestoRoundTripsExcedido(
+                    f"{descripcion}: {usados} round trips (máximo {maximo})\n   {detalle}"
+                )
+
+    def resumen(self, top=20):
+        """
+        Devuelve las sentencias más costosas ordenadas por tiempo total
+
+        Returns:
+            list: Lista de estadísticas por huella
+        """
+        with self._lock:
+            filas = [dict(est) for est in self.estadisticas.values()]
+        filas.sort(key=lambda e: e['total_ms'], reverse=True)
+        return filas[:top]
+
+    def reiniciar(self):
+        """Borra las estadísticas acumuladas"""
+        with self._lock:
+            self.estadisticas.clear()
+
+
+monitor_sql = MonitorSQL()
+
+
+def configurar_log_sql_lento(ruta=ARCHIVO_SQL_LENTO):
+    """
+    Agrega el archivo dedicado de consultas lentas al logger.
+    Debe llamarse después de cualquier logger.remove() de la aplicación.
+
+    Returns:
+        int: ID del handler agregado
+    """
+    return logger.add(
+        ruta,
+        rotation="10 MB",
+        filter=lambda registro: registro["extra"].get("sql_lento", False),
+        format="{time:YYYY-MM-DD HH:mm:ss.SSS} | {message}"
+    )
+
+
+class CursorMonitoreado:
+    """Envuelve un cursor pyodbc midiendo cada sentencia ejecutada"""
+
+    _PROPIOS = ('_cursor', '_monitor', '_huella')
+
+    def __init__(self, cursor, monitor=None):
+        object.__setattr__(self, '_cursor', cursor)
+        object.__setattr__(self, '_monitor', monitor or monitor_sql)
+        object.__setattr__(self, '_huella', None)
+
+    def execute(self, sql, *parametros):
+        if len(parametros) == 1 and isinstance(parametros[0], (list, tuple)):
+            valores = parametros[0]
+        else:
+            valores = parametros
+        inicio = time.perf_counter()
+        try:
+            self._cursor.execute(sql, *parametros)
+        finally:
+            duracion_ms = (time.perf_counter() - inicio) * 1000
+            huella = self._monitor.registrar(
+                sql, forma_parametros(valores), duracion_ms, self._filas_afectadas()
+            )
+            object.__setattr__(self, '_huella', huella)
+        return self
+
+    def executemany(self, sql, secuencia):
+        secuencia = list(secuencia)
+        inicio = time.perf_counter()
+        try:
+            self._cursor.executemany(sql, secuencia)
+        finally:
+            duracion_ms = (time.perf_counter() - inicio) * 1000
+            forma = forma_parametros(secuencia[0], len(secuencia)) if secuencia else '()'
+            huella = self._monitor.registrar(sql, forma, duracion_ms, self._filas_afectadas())
+            object.__setattr__(self, '_huella', huella)
+        return self
+
+    def _filas_afectadas(self):
+        try:
+            return self._cursor.rowcount
+        except Exception:
+            return -1
+
+    def fetchone(self):
+        fila = self._cursor.fetchone()
+        if fila is not None:
+            self._monitor.registrar_filas(self._huella, 1)
+        return fila
+
+    def fetchall(self):
+        filas = self._cursor.fetchall()
+        self._monitor.registrar_filas(self._huella, len(filas))
+        return filas
+
+    def fetchmany(self, tamano=None):
+        filas = self._cursor.fetchmany(tamano) if tamano else self._cursor.fetchmany()
+        self._monitor.registrar_filas(self._huella, len(filas))
+        return filas
+
+    def commit(self):
+        inicio = time.perf_counter()
+        try:
+            self._cursor.commit()
+        finally:
+            self._monitor.registrar_round_trip('COMMIT', (time.perf_counter() - inicio) * 1000)
+
+    def rollback(self):
+        inicio = time.perf_counter()
+        try:
+            self._cursor.rollback()
+        finally:
+            self._monitor.registrar_round_trip('ROLLBACK', (time.perf_counter() - inicio) * 1000)
+
+    def __iter__(self):
+        for fila in self._cursor:
+            self._monitor.registrar_filas(self._huella, 1)
+            yield fila
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self._cursor.close()
+
+    def __getattr__(self, nombre):
+        return getattr(self._cursor, nombre)
+
+    def __setattr__(self, nombre, valor):
+        if nombre in self._PROPIOS:
+            object.__setattr__(self, nombre, valor)
+        else:
+            setattr(self._cursor, nombre, valor)
+
+
+class ConexionMonitoreada:
+    """Envuelve una conexión pyodbc para que todos sus cursores sean monitoreados"""
+
+    def __init__(self, conexion, monitor=None):
+        object.__setattr__(self, '_conexion', conexion)
+        object.__setattr__(self, '_monitor', monitor or monitor_sql)
+
+    def cursor(self):
+        return CursorMonitoreado(self._conexion.cursor(), self._monitor)
+
+    def execute(self, sql, *parametros):
+        return self.cursor().execute(sql, *parametros)
+
+    def commit(self):
+        inicio = time.perf_counter()
+        try:
+            self._conexion.commit()
+        finally:
+            self._monitor.registrar_round_trip('COMMIT', (time.perf_counter() - inicio) * 1000)
+
+    def rollback(self):
+        inicio = time.perf_counter()
+        try:
+            self._conexion.rollback()
+        finally:
+            self._monitor.registrar_round_trip('ROLLBACK', (time.perf_counter() - inicio) * 1000)
+
+    @property
+    def conexion_original(self):
+        """Conexión pyodbc sin envolver"""
+        return self._conexion
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self._conexion.__exit__(*args)
+
+    def __getattr__(self, nombre):
+        return getattr(self._conexion, nombre)
+
+    def __setattr__(self, nombre, valor):
+        setattr(self._conexion, nombre, valor)
+
+
+def monitorear(conexion, monitor=None):
+    """
+    Envuelve una conexión si el monitor está activo
+
+    Args:
+        conexion: Conexión pyodbc (o None)
+        monitor: Monitor a usar (por defecto el global)
+
+    Returns:
+        Conexión monitoreada, la original si el monitor está apagado, o None
+    """
+    monitor = monitor or monitor_sql
+    if conexion is None or not monitor.activo or isinstance(conexion, ConexionMonitoreada):
+        return conexion
+    return ConexionMonitoreada(conexion, monitor)
@@ -0,0 +1,135 @@
+"""
+Repositorio de numeración de comprobantes: contador por serie y bloques reservados por terminal
+"""
+from loguru import logger
+
+
+class NumeracionRepositorio:
+    def __init__(self, conn):
+        self.conn = conn
+
+    def reservar_bloque(self, serie, terminal, tamano):
+        """
+        Reserva los próximos `tamano` números de la serie para una terminal.
+        El contador se incrementa con un UPDATE bajo bloqueo, de modo que dos
+        terminales nunca reciben rangos solapados. La primera vez que se usa
+        una serie el contador parte del mayor número ya emitido en venta.
+
+        Args:
+            serie: Serie del comprobante
+            terminal: Identificador de la terminal
+            tamano: Cantidad de números del bloque
+
+        Returns:
+            tuple: (idbloque, numero_desde, numero_hasta) o None si hay error
+        """
+        try:
+            cursor = self.conn.cursor()
+            cursor.execute("""
+            IF NOT EXISTS (SELECT 1 FROM comprobante_secuencia WITH (UPDLOCK, HOLDLOCK) WHERE serie = ?)
+                INSERT INTO comprobante_secuencia (serie, ultimo_numero)
+                SELECT ?, ISNULL(MAX(TRY_CAST(numero_comprobante AS BIGINT)), 0)
+                FROM venta WHERE serie = ?
+            """, (serie, serie, serie))
+            cursor.execute("""
+            UPDATE comprobante_secuencia WITH (UPDLOCK, HOLDLOCK)
+            SET ultimo_numero = ultimo_numero + ?, fecha_actualizacion = GETDATE()
+            OUTPUT INSERTED.ultimo_numero
+            WHERE serie = ?
+            """, (tamano, serie))
+            hasta = cursor.fetchone()[0]
+            desde = hasta - tamano + 1
+            cursor.execute("""
+            INSERT INTO comprobante_bloque (serie, terminal, numero_desde, numero_hasta)
+            OUTPUT INSERTED.idbloque
+            VALUES (?, ?, ?, ?)
+            """, (serie, terminal, desde, hasta))
+            idbloque = cursor.fetchone()[0]
+            self.conn.commit()
+            return idbloque, desde, hasta
+        except Exception as e:
+            logger.error(f"❌ Error reservando bloque de la serie {serie}: {e}")
+            self.conn.rollback()
+            return None
+
+    def bloque_abierto(self, serie, terminal):
+        """
+        Bloque que la terminal dejó abierto (p. ej. tras un cierre inesperado)
+
+        Returns:
+            tuple: (idbloque, numero_desde, numero_hasta), 0 si no hay o None si hay error
+        """
+        try:
+            cursor = self.conn.cursor()
+            cursor.execute("""
+            SELECT TOP 1 idbloque, numero_desde, numero_hasta
+            FROM comprobante_bloque
+            WHERE serie = ? AND terminal = ? AND estado = 'ABIERTO'
+            ORDER BY idbloque
+            """, (serie, terminal))
+            fila = cursor.fetchone()
+            return tuple(fila) if fila else 0
+        except Exception as e:
+            logger.error(f"❌ Error buscando bloque abierto de la serie {serie}: {e}")
+            return None
+
+    def numeros_usados(self, serie, desde, hasta):
+        """
+        Números de la serie dentro del rango que ya tienen una venta
+
+        Returns:
+            set: Números usados o None si hay error
+        """
+        try:
+            cursor = self.conn.cursor()
+            cursor.execute("""
+            SELECT n FROM (
+                SELECT TRY_CAST(numero_comprobante AS BIGINT) AS n
+                FROM venta WHERE serie = ?
+            ) v
+            WHERE n BETWEEN ? AND ?
+            """, (serie, desde, hasta))
+            return {fila[0] for fila in cursor.fetchall()}
+        except Exception as e:
+            logger.error(f"❌ Error leyendo números usados de la serie {serie}: {e}")
+            return None
+
+    def cerrar_bloque(self, idbloque, ultimo_usado):
+        """Marca el bloque como cerrado; los números no usados quedan como huecos"""
+        try:
+            cursor = self.conn.cursor()
+            cursor.execute("""
+            UPDATE comprobante_bloque
+            SET estado = 'CERRADO', ultimo_usado = ?, fecha_cierre = GETDATE()
+            WHERE idbloque = ? AND estado = 'ABIERTO'
+            """, (ultimo_usado, idbloque))
+            self.conn.commit()
+            return cursor.rowcount > 0
+        except Exception as e:
+            logger.error(f"❌ Error cerrando bloque {idbloque}: {e}")
+            self.conn.rollback()
+            return False
+
+    def listar_bloques(self, serie=None, estado=None):
+        """
+        Bloques reservados, del más reciente al más antiguo
+
+        Returns:
+            list: dict con idbloque, serie, terminal, numero_desde, numero_hasta,
+                  estado, ultimo_usado, fecha_reserva, fecha_cierre; [] si hay error
+        """
+        try:
+            cursor = self.conn.cursor()
+            query = """
+            SELECT idbloque, serie, terminal, numero_desde, numero_hasta,
+                   estado, ultimo_usado, fecha_reserva, fecha_cierre
+            FROM comprobante_bloque
+            WHERE (? IS NULL OR serie = ?) AND (? IS NULL OR estado = ?)
+            ORDER BY idbloque DESC
+            """
+            cursor.execute(query, (serie, serie, estado, estado))
+            columnas = [c[0] for c in cursor.description]
+            return [dict(zip(columnas, fila)) for fila in cursor.fetchall()]
+        except Exception as e:
+            logger.error(f"❌ Error listando bloques de numeración: {e}")
+            return []
@@ -0,0 +1,123 @@
+"""
+Repositorio de la lista de precios en Bs. vigente (precio_bs_vigente)
+"""
+from loguru import logger
+
+
+class PrecioBsRepositorio:
+    def __init__(self, conn):
+        self.conn = conn
+
+    def ultima_tasa(self, moneda='USD'):
+        """
+        Returns:
+            tuple: (idtasa, tasa) del último registro de la moneda o None si no hay / hay error
+        """
+        try:
+            cursor = self.conn.cursor()
+            cursor.execute("""
+            SELECT TOP 1 idtasa, tasa
+            FROM tasa_cambio
+            WHERE moneda_origen = ?
+            ORDER BY fecha_hora_registro DESC
+            """, (moneda,))
+            row = cursor.fetchone()
+            return (row[0], float(row[1])) if row and row[1] is not None else None
+        except Exception as e:
+            logger.error(f"❌ Error obteniendo la tasa vigente de {moneda}: {e}")
+            return None
+
+    def precios_divisa(self):
+        """
+        Returns:
+            list: Tuplas (idarticulo, precio_venta) de todos los artículos o None si hay error
+        """
+        try:
+            cursor = self.conn.cursor()
+            cursor.execute("SELECT idarticulo, ISNULL(precio_venta, 0) FROM articulo")
+            return cursor.fetchall()
+        except Exception as e:
+            logger.error(f"❌ Error leyendo precios de artículos: {e}")
+            return None
+
+    def reemplazar(self, idtasa, tasa, filas):
+        """
+        Sustituye la lista vigente completa en una sola transacción
+
+        Args:
+            idtasa: Registro de tasa_cambio usado
+            tasa: Valor de la tasa
+            filas: Lista de (idarticulo, precio_divisa, precio_bs)
+
+        Returns:
+            bool: True si se guardó
+        """
+        try:
+            cursor = self.conn.cursor()
+            cursor.execute("DELETE FROM precio_bs_vigente")
+            if filas:
+                cursor.fast_executemany = True
+                cursor.executemany("""
+                INSERT INTO precio_bs_vigente (idarticulo, idtasa, tasa, precio_divisa, precio_bs)
+                VALUES (?, ?, ?, ?, ?)
+                """, [(idarticulo, idtasa, tasa, divisa, bs) for idarticulo, divisa, bs in filas])
+            self.conn.commit()
+            return True
+        except Exception as e:
+            logger.error(f"❌ Error guardando la lista de precios en Bs.: {e}")
+            self.conn.rollback()
+            return False
+
+    def guardar_precio(self, idarticulo, idtasa, tasa, precio_divisa, precio_bs):
+        """
+        Inserta o actualiza el precio en Bs. de un artículo (cambio de precio individual)
+
+        Returns:
+            bool: True si se guardó
+        """
+        try:
+            cursor = self.conn.cursor()
+            cursor.execute("""
+            UPDATE precio_bs_vigente
+            SET idtasa = ?, tasa = ?, precio_divisa = ?, precio_bs = ?, fecha_calculo = GETDATE()
+            WHERE idarticulo = ?
+            """, (idtasa, tasa, precio_divisa, precio_bs, idarticulo))
+            if cursor.rowcount == 0:
+                cursor.execute("""
+                INSERT INTO precio_bs_vigente (idarticulo, idtasa, tasa, precio_divisa, precio_bs)
+                VALUES (?, ?, ?, ?, ?)
+                """, (idarticulo, idtasa, tasa, precio_divisa, precio_bs))
+            self.conn.commit()
+            return True
+        except Exception as e:
+            logger.error(f"❌ Error guardando el precio en Bs. del artículo {idarticulo}: {e}")
+            self.conn.rollback()
+            return False
+
+    def idtasa_vigente(self):
+        """
+        Returns:
+            int: idtasa más reciente de la lista guardada, 0 si la tabla está
+                 vacía o None si hay error
+        """
+        try:
+            cursor = self.conn.cursor()
+            cursor.execute("SELECT MAX(idtasa) FROM precio_bs_vigente")
+            row = cursor.fetchone()
+            return row[0] if row and row[0] is not None else 0
+        except Exception as e:
+            logger.error(f"❌ Error consultando la tasa de la lista de precios en Bs.: {e}")
+            return None
+
+    def listar(self):
+        """
+        Returns:
+            list: Tuplas (idarticulo, idtasa, tasa, precio_bs) o None si hay error
+        """
+        try:
+            cursor = self.conn.cursor()
+            cursor.execute("SELECT idarticulo, idtasa, tasa, precio_bs FROM precio_bs_vigente")
+            return cursor.fetchall()
+        except Exception as e:
+            logger.error(f"❌ Error leyendo la lista de precios en Bs.: {e}")
+            return None
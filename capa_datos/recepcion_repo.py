@@ -1,12 +1,13 @@
 """
 Repositorio para gestión de recepciones de mercancía
 """
+import json
 from loguru import logger
 from capa_datos.conexion import obtener_conexion
 
 class RecepcionRepositorio:
-    def __init__(self):
-        self.conn = obtener_conexion()
+    def __init__(self, conn=None):
+        self.conn = conn if conn is not None else obtener_conexion()
     
     def crear_recepcion(self, idproveedor, idtrabajador, idcompra_original=None, observaciones=None):
         """Crea una nueva recepción"""
@@ -56,6 +57,173 @@ class RecepcionRepositorio:
             self.conn.rollback()
             return None
     
+    def guardar_recepcion_lote(self, idproveedor, idtrabajador, idcompra_original,
+                               observaciones, tasa_bcv, lineas):
+        """
+        Escribe una recepción completa en una sola transacción: bloquea el stock
+        de los artículos, inserta cabecera y detalles, encadena el kardex a
+        partir del stock leído en la misma transacción, suma el stock y recalcula
+        el costo promedio ponderado (USD y Bs.). Si algún artículo no existe no
+        se inserta nada.
+        
+        Args:
+            lineas: Lista de dict con orden, idarticulo, cantidad_recibida,
+                    costo_unitario_usd, iddetalle_compra_original, cantidad_pedida,
+                    lote y fecha_vencimiento
+            
+        Returns:
+            tuple: (idrecepcion o None si falta algún artículo o hay error (se revierte todo),
+                    dict {idarticulo: (stock_anterior, stock_nuevo)},
+                    lista de idarticulo inexistentes)
+        """
+        query = """
+        SET NOCOUNT ON;
+        SET XACT_ABORT ON;
+        DECLARE @lineas TABLE (
+            orden INT PRIMARY KEY, idarticulo INT, cantidad_recibida INT,
+            costo_unitario_usd DECIMAL(18, 4), iddetalle_compra_original INT,
+            cantidad_pedida INT, lote VARCHAR(50), fecha_vencimiento DATE,
+            stock_anterior INT, stock_nuevo INT
+        );
+        DECLARE @estado TABLE (
+            idarticulo INT PRIMARY KEY, stock INT, costo DECIMAL(18, 4), cantidad INT,
+            ultimo_reinicio INT, costo_nuevo DECIMAL(18, 4)
+        );
+        DECLARE @faltantes TABLE (idarticulo INT PRIMARY KEY);
+        DECLARE @rec TABLE (idrecepcion INT);
+        DECLARE @idrecepcion INT;
+        DECLARE @tasa DECIMAL(18, 4) = ?;
+        
+        INSERT INTO @lineas (orden, idarticulo, cantidad_recibida, costo_unitario_usd,
+                             iddetalle_compra_original, cantidad_pedida, lote, fecha_vencimiento)
+        SELECT orden, idarticulo, cantidad_recibida, costo_unitario_usd,
+               iddetalle_compra_original, cantidad_pedida, lote, fecha_vencimiento
+        FROM OPENJSON(?) WITH (
+            orden INT, idarticulo INT, cantidad_recibida INT, costo_unitario_usd DECIMAL(18, 4),
+            iddetalle_compra_original INT, cantidad_pedida INT, lote VARCHAR(50),
+            fecha_vencimiento DATE
+        );
+        
+        -- Stock y costo leídos y bloqueados dentro de la transacción
+        INSERT INTO @estado (idarticulo, stock, costo, cantidad)
+        SELECT a.idarticulo, ISNULL(s.cantidad, 0), ISNULL(a.costo_promedio_usd, 0), t.cantidad
+        FROM (SELECT idarticulo, SUM(cantidad_recibida) AS cantidad FROM @lineas GROUP BY idarticulo) t
+        JOIN articulo a WITH (UPDLOCK) ON a.idarticulo = t.idarticulo
+        LEFT JOIN stock_articulo s WITH (UPDLOCK, HOLDLOCK) ON s.idarticulo = t.idarticulo;
+        
+        INSERT INTO @faltantes (idarticulo)
+        SELECT DISTINCT l.idarticulo
+        FROM @lineas l
+        WHERE NOT EXISTS (SELECT 1 FROM @estado e WHERE e.idarticulo = l.idarticulo);
+        
+        IF NOT EXISTS (SELECT 1 FROM @faltantes)
+        BEGIN
+            -- Cadena de kardex: stock leído + lo recibido en las líneas anteriores del artículo
+            UPDATE l
+               SET stock_anterior = c.stock_anterior,
+                   stock_nuevo = c.stock_anterior + l.cantidad_recibida
+              FROM @lineas l
+              JOIN (SELECT x.orden,
+                           e.stock + SUM(x.cantidad_recibida) OVER (PARTITION BY x.idarticulo ORDER BY x.orden
+                                                                    ROWS UNBOUNDED PRECEDING)
+                           - x.cantidad_recibida AS stock_anterior
+                      FROM @lineas x
+                      JOIN @estado e ON e.idarticulo = x.idarticulo) c ON c.orden = l.orden;
+            
+            -- Costo promedio ponderado: una línea que entra sin stock (<= 0) reinicia
+            -- el costo a su precio; desde la última que lo reinicia se pondera
+            UPDATE e
+               SET ultimo_reinicio = (SELECT MAX(l.orden) FROM @lineas l
+                                       WHERE l.idarticulo = e.idarticulo AND l.stock_anterior <= 0)
+              FROM @estado e;
+            
+            UPDATE e
+               SET costo_nuevo = CASE
+                   WHEN e.ultimo_reinicio IS NULL THEN
+                        (e.stock * e.costo
+                         + (SELECT SUM(l.cantidad_recibida * l.costo_unitario_usd) FROM @lineas l
+                             WHERE l.idarticulo = e.idarticulo)) / (e.stock + e.cantidad)
+                   WHEN NOT EXISTS (SELECT 1 FROM @lineas l
+                                     WHERE l.idarticulo = e.idarticulo AND l.orden > e.ultimo_reinicio) THEN
+                        (SELECT l.costo_unitario_usd FROM @lineas l WHERE l.orden = e.ultimo_reinicio)
+                   ELSE
+                        ((SELECT l.stock_nuevo * l.costo_unitario_usd FROM @lineas l WHERE l.orden = e.ultimo_reinicio)
+                         + (SELECT SUM(l.cantidad_recibida * l.costo_unitario_usd) FROM @lineas l
+                             WHERE l.idarticulo = e.idarticulo AND l.orden > e.ultimo_reinicio))
+                        / (e.stock + e.cantidad)
+               END
+              FROM @estado e;
+            
+            INSERT INTO recepcion (idcompra_original, idproveedor, idtrabajador,
+                                   fecha_recepcion, observaciones, estatus)
+            OUTPUT INSERTED.idrecepcion INTO @rec
+            VALUES (?, ?, ?, GETDATE(), ?, 'RECIBIDA');
+            SELECT @idrecepcion = idrecepcion FROM @rec;
+            
+            INSERT INTO detalle_recepcion
+            (idrecepcion, idarticulo, iddetalle_compra_original, cantidad_pedida,
+             cantidad_recibida, costo_unitario_usd, tasa_bcv, subtotal_usd, subtotal_bs,
+             lote, fecha_vencimiento)
+            SELECT @idrecepcion, idarticulo, iddetalle_compra_original, cantidad_pedida,
+                   cantidad_recibida, costo_unitario_usd, @tasa, cantidad_recibida * costo_unitario_usd,
+                   cantidad_recibida * costo_unitario_usd * @tasa, lote, fecha_vencimiento
+            FROM @lineas ORDER BY orden;
+            
+            INSERT INTO kardex
+            (idarticulo, tipo_movimiento, documento_referencia, cantidad,
+             precio_unitario, valor_total, stock_anterior, stock_nuevo, fecha_movimiento,
+             costo_unitario_usd, tasa_cambio)
+            SELECT idarticulo, 'INGRESO', CONCAT('RECEPCIÓN #', @idrecepcion), cantidad_recibida,
+                   costo_unitario_usd * @tasa, cantidad_recibida * costo_unitario_usd * @tasa,
+                   stock_anterior, stock_nuevo, GETDATE(), costo_unitario_usd, @tasa
+            FROM @lineas ORDER BY orden;
+            
+            UPDATE s
+               SET cantidad = e.stock + e.cantidad, fecha_actualizacion = GETDATE()
+              FROM stock_articulo s
+              JOIN @estado e ON e.idarticulo = s.idarticulo;
+            
+            INSERT INTO stock_articulo (idarticulo, cantidad)
+            SELECT e.idarticulo, e.stock + e.cantidad
+            FROM @estado e
+            WHERE NOT EXISTS (SELECT 1 FROM stock_articulo s WHERE s.idarticulo = e.idarticulo);
+            
+            UPDATE a
+               SET costo_promedio_usd = e.costo_nuevo,
+                   costo_promedio_bs = e.costo_nuevo * @tasa
+              FROM articulo a
+              JOIN @estado e ON e.idarticulo = a.idarticulo;
+        END
+        
+        SELECT @idrecepcion;
+        SELECT idarticulo FROM @faltantes;
+        SELECT idarticulo, stock, stock + cantidad FROM @estado;
+        """
+        try:
+            cursor = self.conn.cursor()
+            cursor.execute(query, (
+                tasa_bcv, json.dumps(lineas, default=str),
+                idcompra_original, idproveedor, idtrabajador, observaciones
+            ))
+            idrecepcion = cursor.fetchone()[0]
+            cursor.nextset()
+            faltantes = [row[0] for row in cursor.fetchall()]
+            cursor.nextset()
+            movimientos = {row[0]: (row[1], row[2]) for row in cursor.fetchall()}
+            
+            if faltantes:
+                self.conn.rollback()
+                logger.error(f"❌ Artículos inexistentes en la recepción: {faltantes}")
+                return None, {}, faltantes
+            
+            self.conn.commit()
+            logger.info(f"✅ Recepción #{idrecepcion} creada con {len(lineas)} detalles")
+            return idrecepcion, movimientos, []
+        except Exception as e:
+            logger.error(f"❌ Error guardando recepción: {e}")
+            self.conn.rollback()
+            return None, {}, []
+    
     def buscar_recepciones_pendientes(self, idcompra=None):
         """Busca recepciones pendientes (para completar órdenes)"""
         try:
@@ -1,7 +1,9 @@
 """
 Repositorio para la gestión de ventas en la base de datos
 """
+import json
 from loguru import logger
+from capa_datos.enrutador_lectura import solo_lectura
 
 class VentaRepositorio:
     """Clase que maneja las operaciones de base de datos para ventas"""
@@ -15,6 +17,7 @@ class VentaRepositorio:
         """
         self.conn = conn
     
+    @solo_lectura
     def listar(self):
         """
         Lista todas las ventas con todos los campos incluyendo multimoneda
@@ -107,11 +110,69 @@ class VentaRepositorio:
             logger.error(f"Error al obtener venta {idventa}: {e}")
             return None
     
+    def obtener_con_detalle(self, idventa):
+        """
+        Obtiene la cabecera y las líneas de una venta en un solo round trip
+        (dos conjuntos de resultados en el mismo lote)
+        
+        Args:
+            idventa (int): ID de la venta
+            
+        Returns:
+            dict: Datos de la venta con la clave 'detalle', o None si no existe
+        """
+        try:
+            cursor = self.conn.cursor()
+            query = """
+            SELECT v.idventa, 
+                   CONVERT(varchar, v.fecha_hora, 103) + ' ' + CONVERT(varchar, v.fecha_hora, 108) as fecha,
+                   v.fecha_hora,
+                   v.tipo_comprobante, 
+                   v.serie, v.numero_comprobante, v.igv, v.estado,
+                   v.moneda,
+                   v.tasa_cambio,
+                   v.monto_bs,
+                   v.monto_divisa,
+                   c.nombre + ' ' + c.apellidos as cliente,
+                   c.idcliente,
+                   t.nombre + ' ' + t.apellidos as trabajador,
+                   t.idtrabajador
+            FROM venta v
+            LEFT JOIN cliente c ON v.idcliente = c.idcliente
+            LEFT JOIN trabajador t ON v.idtrabajador = t.idtrabajador
+            WHERE v.idventa = ?;
+            
+            SELECT dv.iddetalle_venta, dv.cantidad, dv.precio_venta,
+                   a.idarticulo, a.nombre as articulo, a.codigo
+            FROM detalle_venta dv
+            JOIN articulo a ON dv.idarticulo = a.idarticulo
+            WHERE dv.idventa = ?;
+            """
+            cursor.execute(query, (idventa, idventa))
+            
+            columns = [column[0] for column in cursor.description]
+            row = cursor.fetchone()
+            if not row:
+                return None
+            venta = dict(zip(columns, row))
+            
+            cursor.nextset()
+            columns = [column[0] for column in cursor.description]
+            venta['detalle'] = [dict(zip(columns, r)) for r in cursor.fetchall()]
+            return venta
+            
+        except Exception as e:
+            logger.error(f"Error al obtener venta {idventa} con detalle: {e}")
+            return None
+    
     def crear(self, idtrabajador, idcliente, tipo_comprobante, 
               serie, numero_comprobante, igv, estado='REGISTRADO',
-              moneda='VES', tasa_cambio=1.0, monto_bs=None, monto_divisa=None):
+              moneda='VES', tasa_cambio=1.0, monto_bs=None, monto_divisa=None,
+              fecha_hora=None, clave_idempotencia=None):
         """
         Inserta una nueva venta con soporte multimoneda
+        (fecha_hora solo se indica al subir ventas emitidas en contingencia;
+        clave_idempotencia es el UUID único generado por la terminal)
         """
         try:
             cursor = self.conn.cursor()
@@ -120,14 +181,15 @@ class VentaRepositorio:
             INSERT INTO venta 
             (idtrabajador, idcliente, fecha_hora, tipo_comprobante, 
              serie, numero_comprobante, igv, estado,
-             moneda, tasa_cambio, monto_bs, monto_divisa)
+             moneda, tasa_cambio, monto_bs, monto_divisa, clave_idempotencia)
             OUTPUT INSERTED.idventa
-            VALUES (?, ?, GETDATE(), ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            VALUES (?, ?, COALESCE(?, GETDATE()), ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
             """
             
             cursor.execute(query, (
                 idtrabajador, 
                 idcliente,
+                fecha_hora,
                 tipo_comprobante,
                 serie, 
                 numero_comprobante, 
@@ -136,7 +198,8 @@ class VentaRepositorio:
                 moneda,
                 tasa_cambio,
                 monto_bs,
-                monto_divisa
+                monto_divisa,
+                clave_idempotencia
             ))
             
             row = cursor.fetchone()
@@ -150,6 +213,255 @@ class VentaRepositorio:
             logger.error(f"❌ Error al crear venta: {e}")
             self.conn.rollback()
             return None
+
+    def registrar_venta(self, cabecera, detalle, lineas, desglose_impuestos=None, asignaciones=None,
+                        permitir_negativo=False):
+        """
+        Registra una venta completa en una sola transacción: verifica que
+        existan el trabajador y el cliente, verifica y bloquea el stock de
+        todas las líneas, descuenta los lotes asignados, inserta la
+        cabecera y el detalle, descuenta el stock (stock_articulo + kardex) y
+        graba el consumo de lotes y el desglose de IVA.
+        Si falta stock o algún lote ya no alcanza no se inserta nada (el número
+        de comprobante queda libre) y ante cualquier error se revierte todo.
+        Con permitir_negativo (facturas de contingencia ya emitidas) la venta se
+        registra aunque falte stock y este queda en negativo.
+
+        Args:
+            cabecera (dict): idtrabajador, idcliente, tipo_comprobante, serie,
+                numero_comprobante, igv, moneda, tasa_cambio, monto_bs,
+                monto_divisa, fecha_hora y clave_idempotencia
+            detalle (list): Items con idarticulo, cantidad y precio_venta
+            lineas (list): Detalle agrupado por artículo (idarticulo, cantidad,
+                precio_unitario) para el descuento de stock
+            desglose_impuestos (dict): {letra: (base, impuesto)} (opcional)
+            asignaciones (list): Lotes a descontar {idlote, idarticulo, cantidad} (opcional)
+            permitir_negativo (bool): Registrar aunque falte stock
+
+        Returns:
+            tuple: (idventa; 0 si otra terminal consumió alguno de los lotes
+                    asignados (recalcular la asignación); None si falta stock, no
+                    existe el trabajador o el cliente, o hay error,
+                    dict {idarticulo: (stock_anterior, stock_nuevo)},
+                    lista de idarticulo sin stock suficiente (con permitir_negativo,
+                    los que quedaron en negativo))
+        """
+        from capa_negocio.motor_impuestos import ALICUOTAS
+        query = """
+        SET NOCOUNT ON;
+        SET XACT_ABORT ON;
+        DECLARE @lineas TABLE (idarticulo INT PRIMARY KEY, cantidad INT, precio_unitario DECIMAL(18, 4));
+        DECLARE @sin_stock TABLE (idarticulo INT PRIMARY KEY);
+        DECLARE @mov TABLE (idarticulo INT, stock_anterior INT, stock_nuevo INT);
+        DECLARE @asig TABLE (idlote INT PRIMARY KEY, idarticulo INT, cantidad INT);
+        DECLARE @venta TABLE (idventa INT, fecha_hora DATETIME);
+        DECLARE @idventa INT;
+        DECLARE @lotes_ok BIT = 1;
+        DECLARE @permitir_negativo BIT = ?;
+        DECLARE @idtrabajador INT = ?;
+        DECLARE @idcliente INT = ?;
+        DECLARE @cabecera_ok BIT = CASE
+            WHEN EXISTS (SELECT 1 FROM trabajador WHERE idtrabajador = @idtrabajador)
+             AND (@idcliente IS NULL OR EXISTS (SELECT 1 FROM cliente WHERE idcliente = @idcliente))
+            THEN 1 ELSE 0 END;
+
+        INSERT INTO @lineas (idarticulo, cantidad, precio_unitario)
+        SELECT idarticulo, cantidad, precio_unitario
+        FROM OPENJSON(?) WITH (idarticulo INT, cantidad INT, precio_unitario DECIMAL(18, 4));
+
+        INSERT INTO @asig (idlote, idarticulo, cantidad)
+        SELECT idlote, idarticulo, cantidad
+        FROM OPENJSON(?) WITH (idlote INT, idarticulo INT, cantidad INT);
+
+        -- Stock verificado y bloqueado antes de tocar la venta
+        INSERT INTO @sin_stock (idarticulo)
+        SELECT l.idarticulo
+        FROM @lineas l
+        LEFT JOIN stock_articulo s WITH (UPDLOCK, HOLDLOCK) ON s.idarticulo = l.idarticulo
+        WHERE ISNULL(s.cantidad, 0) < l.cantidad;
+
+        IF @cabecera_ok = 1 AND (@permitir_negativo = 1 OR NOT EXISTS (SELECT 1 FROM @sin_stock))
+        BEGIN
+            UPDATE l
+               SET stock_actual = l.stock_actual - a.cantidad
+              FROM lote l
+              JOIN @asig a ON a.idlote = l.idlote
+             WHERE l.stock_actual >= a.cantidad;
+
+            IF @@ROWCOUNT < (SELECT COUNT(*) FROM @asig)
+                SET @lotes_ok = 0;
+        END
+
+        IF @cabecera_ok = 1 AND (@permitir_negativo = 1 OR NOT EXISTS (SELECT 1 FROM @sin_stock)) AND @lotes_ok = 1
+        BEGIN
+            INSERT INTO venta
+            (idtrabajador, idcliente, fecha_hora, tipo_comprobante,
+             serie, numero_comprobante, igv, estado,
+             moneda, tasa_cambio, monto_bs, monto_divisa, clave_idempotencia)
+            OUTPUT INSERTED.idventa, INSERTED.fecha_hora INTO @venta
+            VALUES (@idtrabajador, @idcliente, COALESCE(?, GETDATE()), ?, ?, ?, ?, 'REGISTRADO', ?, ?, ?, ?, ?);
+
+            SELECT @idventa = idventa FROM @venta;
+
+            INSERT INTO detalle_venta (idventa, idarticulo, cantidad, precio_venta)
+            SELECT @idventa, idarticulo, cantidad, precio_venta
+            FROM OPENJSON(?) WITH (idarticulo INT, cantidad INT, precio_venta DECIMAL(18, 2));
+
+            UPDATE s
+               SET cantidad = s.cantidad - l.cantidad, fecha_actualizacion = GETDATE()
+            OUTPUT INSERTED.idarticulo, DELETED.cantidad, INSERTED.cantidad INTO @mov
+              FROM stock_articulo s
+              JOIN @lineas l ON l.idarticulo = s.idarticulo;
+
+            INSERT INTO stock_articulo (idarticulo, cantidad)
+            OUTPUT INSERTED.idarticulo, 0, INSERTED.cantidad INTO @mov
+            SELECT l.idarticulo, -l.cantidad
+            FROM @lineas l
+            WHERE NOT EXISTS (SELECT 1 FROM @mov m WHERE m.idarticulo = l.idarticulo);
+
+            INSERT INTO kardex
+            (idarticulo, tipo_movimiento, documento_referencia, cantidad,
+             precio_unitario, valor_total, stock_anterior, stock_nuevo, fecha_movimiento)
+            SELECT m.idarticulo, 'VENTA', CONCAT('VENTA-', @idventa), l.cantidad, l.precio_unitario,
+                   l.cantidad * ISNULL(l.precio_unitario, 0), m.stock_anterior, m.stock_nuevo, GETDATE()
+            FROM @mov m
+            JOIN @lineas l ON l.idarticulo = m.idarticulo;
+
+            INSERT INTO detalle_venta_lote (idventa, idlote, idarticulo, cantidad)
+            SELECT @idventa, idlote, idarticulo, cantidad FROM @asig;
+
+            INSERT INTO venta_impuesto (idventa, letra_fiscal, alicuota, base_imponible, monto_impuesto)
+            SELECT @idventa, letra_fiscal, alicuota, base_imponible, monto_impuesto
+            FROM OPENJSON(?) WITH (letra_fiscal CHAR(1), alicuota DECIMAL(5, 4),
+                                   base_imponible DECIMAL(18, 2), monto_impuesto DECIMAL(18, 2));
+
+            -- Días cerrados modificados: invalida la caché de reportes de todas las terminales
+            UPDATE d
+               SET version = d.version + 1, fecha_actualizacion = GETDATE()
+              FROM version_dia_venta d WITH (UPDLOCK, HOLDLOCK)
+             WHERE d.fecha IN (SELECT CAST(fecha_hora AS DATE) FROM @venta
+                               WHERE fecha_hora < CAST(GETDATE() AS DATE));
+
+            INSERT INTO version_dia_venta (fecha, version)
+            SELECT DISTINCT CAST(x.fecha_hora AS DATE), 1
+            FROM @venta x
+            WHERE x.fecha_hora < CAST(GETDATE() AS DATE)
+              AND NOT EXISTS (SELECT 1 FROM version_dia_venta d
+                              WHERE d.fecha = CAST(x.fecha_hora AS DATE));
+        END
+
+        SELECT @idventa, @lotes_ok, @cabecera_ok;
+        SELECT idarticulo FROM @sin_stock;
+        SELECT idarticulo, stock_anterior, stock_nuevo FROM @mov;
+        """
+        try:
+            impuestos = [{'letra_fiscal': letra, 'alicuota': ALICUOTAS[letra],
+                          'base_imponible': base, 'monto_impuesto': impuesto}
+                         for letra, (base, impuesto) in (desglose_impuestos or {}).items()]
+            cursor = self.conn.cursor()
+            cursor.execute(query, (
+                1 if permitir_negativo else 0, cabecera['idtrabajador'], cabecera['idcliente'],
+                json.dumps(lineas, default=str),
+                json.dumps(asignaciones or []),
+                cabecera.get('fecha_hora'),
+                cabecera['tipo_comprobante'], cabecera['serie'], cabecera['numero_comprobante'],
+                cabecera['igv'], cabecera['moneda'], cabecera['tasa_cambio'],
+                cabecera['monto_bs'], cabecera['monto_divisa'], cabecera.get('clave_idempotencia'),
+                json.dumps([{'idarticulo': i['idarticulo'], 'cantidad': i['cantidad'],
+                             'precio_venta': i['precio_venta']} for i in detalle], default=str),
+                json.dumps(impuestos, default=str)
+            ))
+            idventa, lotes_ok, cabecera_ok = cursor.fetchone()
+            cursor.nextset()
+            sin_stock = [row[0] for row in cursor.fetchall()]
+            cursor.nextset()
+            movimientos = {row[0]: (row[1], row[2]) for row in cursor.fetchall()}
+
+            if not cabecera_ok:
+                self.conn.rollback()
+                logger.error(f"❌ Trabajador {cabecera['idtrabajador']} o cliente {cabecera['idcliente']} "
+                             f"inexistente; no se registró {cabecera['serie']}-{cabecera['numero_comprobante']}")
+                return None, {}, []
+
+            if idventa is None and not lotes_ok:
+                self.conn.rollback()
+                logger.warning(f"⚠️ Lotes modificados concurrentemente al registrar "
+                               f"{cabecera['serie']}-{cabecera['numero_comprobante']}")
+                return 0, {}, []
+
+            if idventa is None:
+                self.conn.rollback()
+                logger.warning(f"⚠️ Stock insuficiente para {cabecera['serie']}-"
+                               f"{cabecera['numero_comprobante']} en artículos {sin_stock}")
+                return None, {}, sin_stock
+
+            self.conn.commit()
+            logger.info(f"✅ Venta #{idventa} registrada: {len(detalle)} líneas, "
+                        f"{len(movimientos)} artículos y {len(asignaciones or [])} lotes descontados")
+            return idventa, movimientos, sin_stock
+
+        except Exception as e:
+            logger.error(f"❌ Error al registrar venta {cabecera.get('serie')}-"
+                         f"{cabecera.get('numero_comprobante')}: {e}")
+            self.conn.rollback()
+            return None, {}, []
+
+    def buscar_por_clave(self, clave_idempotencia):
+        """
+        Busca la venta registrada con una clave de idempotencia
+        
+        Returns:
+            int: ID de la venta, 0 si no existe o -1 si hay error
+        """
+        try:
+            cursor = self.conn.cursor()
+            cursor.execute("SELECT idventa FROM venta WHERE clave_idempotencia = ?", (clave_idempotencia,))
+            row = cursor.fetchone()
+            return row[0] if row else 0
+        except Exception as e:
+            logger.error(f"❌ Error buscando venta por clave {clave_idempotencia}: {e}")
+            return -1
+    
+    def buscar_por_comprobante(self, serie, numero_comprobante):
+        """
+        Busca una venta por serie y número de comprobante
+        
+        Returns:
+            int: ID de la venta, 0 si no existe o -1 si hay error
+        """
+        try:
+            cursor = self.conn.cursor()
+            cursor.execute(
+                "SELECT TOP 1 idventa FROM venta WHERE serie = ? AND numero_comprobante = ?",
+                (serie, numero_comprobante)
+            )
+            row = cursor.fetchone()
+            return row[0] if row else 0
+        except Exception as e:
+            logger.error(f"❌ Error buscando comprobante {serie}-{numero_comprobante}: {e}")
+            return -1
+    
+    def registrar_factura_contingencia(self, factura_json, intentos):
+        """
+        Deja constancia en facturas_contingencia de una factura emitida offline
+        y ya subida al servidor
+        
+        Returns:
+            bool: True si se registró
+        """
+        try:
+            cursor = self.conn.cursor()
+            cursor.execute("""
+            INSERT INTO facturas_contingencia
+            (factura_json, sincronizada, fecha_sincronizacion, numero_intento)
+            VALUES (?, 1, GETDATE(), ?)
+            """, (factura_json, intentos))
+            self.conn.commit()
+            return True
+        except Exception as e:
+            logger.error(f"❌ Error registrando factura de contingencia: {e}")
+            self.conn.rollback()
+            return False
     
     def agregar_detalle(self, idventa, idarticulo, cantidad, precio_venta):
         """
@@ -179,6 +491,62 @@ class VentaRepositorio:
             self.conn.rollback()
             return None
     
+    def guardar_impuestos(self, desgloses):
+        """
+        Guarda (reemplaza) el desglose de IVA por letra fiscal de una o varias ventas
+        
+        Args:
+            desgloses: {idventa: {letra: (base, impuesto)}}
+            
+        Returns:
+            bool: True si se guardó, False si hay error
+        """
+        from capa_negocio.motor_impuestos import ALICUOTAS
+        try:
+            cursor = self.conn.cursor()
+            ids = list(desgloses)
+            for i in range(0, len(ids), 1000):
+                bloque = ids[i:i + 1000]
+                marcadores = ','.join('?' * len(bloque))
+                cursor.execute(f"DELETE FROM venta_impuesto WHERE idventa IN ({marcadores})", bloque)
+            filas = [(idventa, letra, ALICUOTAS[letra], base, impuesto)
+                     for idventa, desglose in desgloses.items()
+                     for letra, (base, impuesto) in desglose.items()]
+            if filas:
+                cursor.executemany("""
+                INSERT INTO venta_impuesto (idventa, letra_fiscal, alicuota, base_imponible, monto_impuesto)
+                VALUES (?, ?, ?, ?, ?)
+                """, filas)
+            self.conn.commit()
+            return True
+        except Exception as e:
+            logger.error(f"❌ Error guardando el desglose de impuestos: {e}")
+            self.conn.rollback()
+            return False
+    
+    def lineas_para_impuestos(self, fecha_inicio, fecha_fin):
+        """
+        Líneas de las ventas no anuladas de un rango con el impuesto de cada artículo
+        (para recalcular el desglose de IVA de facturas históricas)
+        
+        Returns:
+            list: Tuplas (idventa, id_impuesto, cantidad, precio_venta) o None si hay error
+        """
+        try:
+            cursor = self.conn.cursor()
+            cursor.execute("""
+            SELECT d.idventa, a.id_impuesto, d.cantidad, d.precio_venta
+            FROM venta v
+            JOIN detalle_venta d ON d.idventa = v.idventa
+            JOIN articulo a ON a.idarticulo = d.idarticulo
+            WHERE v.fecha_hora >= ? AND v.fecha_hora < DATEADD(day, 1, CAST(? AS DATE))
+              AND v.estado <> 'ANULADO'
+            """, (fecha_inicio, fecha_fin))
+            return cursor.fetchall()
+        except Exception as e:
+            logger.error(f"❌ Error leyendo líneas para recalcular impuestos: {e}")
+            return None
+    
     def obtener_detalles(self, idventa):
         """
         Obtiene los detalles de una venta
@@ -229,6 +597,131 @@ class VentaRepositorio:
             self.conn.rollback()
             return False
     
+    def anular_lote(self, idventas, usuario, motivo=None):
+        """
+        Anula varias ventas en una sola transacción: estado, reposición de stock
+        (stock_articulo + kardex), reversión de lotes, auditoría y versión de
+        los días cerrados afectados (caché de reportes).
+        Las ventas inexistentes o ya anuladas se ignoran.
+        
+        Args:
+            idventas (list): IDs de las ventas a anular
+            usuario (str): Usuario que anula (auditoría)
+            motivo (str): Motivo de la anulación (opcional)
+            
+        Returns:
+            tuple: (dict {idventa anulada: fecha_hora},
+                    dict {idarticulo: (stock_anterior, stock_nuevo, cantidad)})
+                   o (None, None) si hubo error (no se aplica nada)
+        """
+        query = """
+        SET NOCOUNT ON;
+        SET XACT_ABORT ON;
+        DECLARE @anuladas TABLE (idventa INT PRIMARY KEY, estado_anterior VARCHAR(20), fecha_hora DATETIME);
+        DECLARE @lineas TABLE (idarticulo INT PRIMARY KEY, cantidad INT);
+        DECLARE @mov TABLE (idarticulo INT, stock_anterior INT, stock_nuevo INT);
+        
+        UPDATE v
+           SET estado = 'ANULADO'
+        OUTPUT INSERTED.idventa, DELETED.estado, INSERTED.fecha_hora INTO @anuladas
+          FROM venta v
+         WHERE v.idventa IN (SELECT CAST(value AS INT) FROM OPENJSON(?))
+           AND v.estado <> 'ANULADO';
+        
+        INSERT INTO @lineas (idarticulo, cantidad)
+        SELECT dv.idarticulo, SUM(dv.cantidad)
+        FROM detalle_venta dv
+        JOIN @anuladas a ON a.idventa = dv.idventa
+        GROUP BY dv.idarticulo;
+        
+        UPDATE s
+           SET cantidad = s.cantidad + l.cantidad, fecha_actualizacion = GETDATE()
+        OUTPUT INSERTED.idarticulo, DELETED.cantidad, INSERTED.cantidad INTO @mov
+          FROM stock_articulo s WITH (UPDLOCK, HOLDLOCK)
+          JOIN @lineas l ON l.idarticulo = s.idarticulo;
+        
+        INSERT INTO stock_articulo (idarticulo, cantidad)
+        OUTPUT INSERTED.idarticulo, 0, INSERTED.cantidad INTO @mov
+        SELECT l.idarticulo, l.cantidad
+        FROM @lineas l
+        WHERE NOT EXISTS (SELECT 1 FROM @mov m WHERE m.idarticulo = l.idarticulo);
+        
+        -- Un movimiento de kardex por venta y artículo, con la cadena de stock continua
+        INSERT INTO kardex 
+        (idarticulo, tipo_movimiento, documento_referencia, cantidad, 
+         precio_unitario, valor_total, stock_anterior, stock_nuevo, fecha_movimiento)
+        SELECT x.idarticulo, 'DEVOLUCION', CONCAT('ANULACION-VENTA-', x.idventa), x.cantidad,
+               x.precio_unitario, x.cantidad * x.precio_unitario,
+               m.stock_anterior + x.acumulado - x.cantidad, m.stock_anterior + x.acumulado, GETDATE()
+        FROM (
+            SELECT dv.idventa, dv.idarticulo, SUM(dv.cantidad) AS cantidad,
+                   MAX(dv.precio_venta) AS precio_unitario,
+                   SUM(SUM(dv.cantidad)) OVER (PARTITION BY dv.idarticulo ORDER BY dv.idventa
+                                                ROWS UNBOUNDED PRECEDING) AS acumulado
+            FROM detalle_venta dv
+            JOIN @anuladas a ON a.idventa = dv.idventa
+            GROUP BY dv.idventa, dv.idarticulo
+        ) x
+        JOIN @mov m ON m.idarticulo = x.idarticulo
+        ORDER BY x.idarticulo, x.idventa;
+        
+        UPDATE l
+           SET stock_actual = l.stock_actual + d.cantidad
+          FROM lote l
+          JOIN (SELECT dl.idlote, SUM(dl.cantidad) AS cantidad
+                FROM detalle_venta_lote dl
+                JOIN @anuladas a ON a.idventa = dl.idventa
+                WHERE dl.revertido = 0
+                GROUP BY dl.idlote) d ON d.idlote = l.idlote;
+        
+        UPDATE dl SET revertido = 1
+          FROM detalle_venta_lote dl
+          JOIN @anuladas a ON a.idventa = dl.idventa
+         WHERE dl.revertido = 0;
+        
+        INSERT INTO log_auditoria
+        (usuario, accion, tabla_afectada, registro_id, datos_anteriores, datos_nuevos, fecha_hora)
+        SELECT ?, 'ANULAR', 'venta', idventa, estado_anterior, ?, GETDATE()
+        FROM @anuladas;
+        
+        -- Días cerrados modificados: invalida la caché de reportes de todas las terminales
+        UPDATE d
+           SET version = d.version + 1, fecha_actualizacion = GETDATE()
+          FROM version_dia_venta d WITH (UPDLOCK, HOLDLOCK)
+         WHERE d.fecha IN (SELECT CAST(fecha_hora AS DATE) FROM @anuladas
+                           WHERE fecha_hora < CAST(GETDATE() AS DATE));
+        
+        INSERT INTO version_dia_venta (fecha, version)
+        SELECT DISTINCT CAST(x.fecha_hora AS DATE), 1
+        FROM @anuladas x
+        WHERE x.fecha_hora < CAST(GETDATE() AS DATE)
+          AND NOT EXISTS (SELECT 1 FROM version_dia_venta d
+                          WHERE d.fecha = CAST(x.fecha_hora AS DATE));
+        
+        SELECT idventa, fecha_hora FROM @anuladas;
+        SELECT m.idarticulo, m.stock_anterior, m.stock_nuevo, l.cantidad
+        FROM @mov m JOIN @lineas l ON l.idarticulo = m.idarticulo;
+        """
+        try:
+            cursor = self.conn.cursor()
+            cursor.execute(query, (
+                json.dumps(list(idventas)), usuario,
+                f"ANULADO{' - ' + motivo if motivo else ''}"
+            ))
+            anuladas = {row[0]: row[1] for row in cursor.fetchall()}
+            cursor.nextset()
+            movimientos = {row[0]: (row[1], row[2], row[3]) for row in cursor.fetchall()}
+            self.conn.commit()
+            
+            logger.info(f"✅ {len(anuladas)} ventas anuladas, {len(movimientos)} artículos repuestos")
+            return anuladas, movimientos
+            
+        except Exception as e:
+            logger.error(f"❌ Error al anular ventas {list(idventas)[:10]}: {e}")
+            self.conn.rollback()
+            return None, None
+    
+    @solo_lectura
     def ventas_por_cliente(self, idcliente):
         """
         Obtiene todas las ventas de un cliente
@@ -260,6 +753,126 @@ class VentaRepositorio:
             logger.error(f"Error al obtener ventas del cliente {idcliente}: {e}")
             return []
     
+    @solo_lectura
+    def iterar_ventas_por_fecha(self, fecha_inicio, fecha_fin, tamano_bloque=5000):
+        """
+        Recorre las ventas de un rango de fechas por bloques (fetchmany),
+        sin cargar el resultado completo en memoria
+        
+        Args:
+            fecha_inicio: Fecha inicial
+            fecha_fin: Fecha final
+            tamano_bloque: Filas por bloque
+            
+        Yields:
+            tuple: (columnas, lista de filas) por cada bloque
+        """
+        cursor = self.conn.cursor()
+        query = """
+        SELECT 
+            v.idventa, 
+            v.fecha_hora,
+            v.tipo_comprobante, 
+            v.serie, 
+            v.numero_comprobante, 
+            v.igv, 
+            v.estado,
+            v.moneda,
+            v.tasa_cambio,
+            v.monto_bs,
+            v.monto_divisa,
+            ISNULL(c.nombre + ' ' + c.apellidos, 'CONSUMIDOR FINAL') as cliente,
+            t.nombre + ' ' + t.apellidos as trabajador
+        FROM venta v
+        LEFT JOIN cliente c ON v.idcliente = c.idcliente
+        LEFT JOIN trabajador t ON v.idtrabajador = t.idtrabajador
+        WHERE v.fecha_hora >= ? AND v.fecha_hora < DATEADD(day, 1, CAST(? AS DATE))
+        ORDER BY v.fecha_hora
+        """
+        try:
+            cursor.execute(query, (fecha_inicio, fecha_fin))
+            columns = [column[0] for column in cursor.description]
+            while True:
+                filas = cursor.fetchmany(tamano_bloque)
+                if not filas:
+                    break
+                yield columns, filas
+        finally:
+            cursor.close()
+    
+    def versiones_dias(self, fecha_inicio, fecha_fin):
+        """
+        Versión de las ventas de cada día cerrado de un rango (cambia al anular
+        una venta o subir una de contingencia de ese día). Valida las entradas
+        de la caché de reportes, así que lee siempre de la principal.
+        
+        Returns:
+            dict: {date: version} (días nunca modificados ausentes = versión 0)
+                  o None si hay error
+        """
+        try:
+            cursor = self.conn.cursor()
+            cursor.execute("""
+            SELECT fecha, version FROM version_dia_venta
+            WHERE fecha >= CAST(? AS DATE) AND fecha <= CAST(? AS DATE)
+            """, (fecha_inicio, fecha_fin))
+            return {row[0]: row[1] for row in cursor.fetchall()}
+        except Exception as e:
+            logger.error(f"❌ Error leyendo versiones de días {fecha_inicio} a {fecha_fin}: {e}")
+            return None
+    
+    def ventas_por_dia(self, fecha_inicio, fecha_fin):
+        """
+        Obtiene las ventas de un rango de fechas agrupadas por día
+        (a diferencia de ventas_por_fecha distingue un error de un rango sin ventas).
+        Alimenta la caché persistente de reportes, así que lee siempre de la principal.
+        
+        Args:
+            fecha_inicio: Fecha inicial
+            fecha_fin: Fecha final
+            
+        Returns:
+            dict: {date: [ventas del día, de la más reciente a la más antigua]}
+                  con los días sin ventas ausentes; None si hay error
+        """
+        try:
+            cursor = self.conn.cursor()
+            query = """
+            SELECT 
+                v.idventa, 
+                CONVERT(varchar, v.fecha_hora, 103) + ' ' + CONVERT(varchar, v.fecha_hora, 108) as fecha,
+                v.fecha_hora,
+                v.tipo_comprobante, 
+                v.serie, 
+                v.numero_comprobante, 
+                v.igv, 
+                v.estado,
+                v.moneda,
+                v.tasa_cambio,
+                v.monto_bs,
+                v.monto_divisa,
+                ISNULL(c.nombre + ' ' + c.apellidos, 'CONSUMIDOR FINAL') as cliente,
+                t.nombre + ' ' + t.apellidos as trabajador
+            FROM venta v
+            LEFT JOIN cliente c ON v.idcliente = c.idcliente
+            LEFT JOIN trabajador t ON v.idtrabajador = t.idtrabajador
+            WHERE v.fecha_hora >= ? AND v.fecha_hora < DATEADD(day, 1, CAST(? AS DATE))
+            ORDER BY v.fecha_hora DESC
+            """
+            cursor.execute(query, (fecha_inicio, fecha_fin))
+            
+            columns = [column[0] for column in cursor.description]
+            dias = {}
+            for row in cursor.fetchall():
+                venta = dict(zip(columns, row))
+                dias.setdefault(venta['fecha_hora'].date(), []).append(venta)
+            return dias
+            
+        except Exception as e:
+            logger.error(f"Error al obtener ventas por día: {e}")
+            return None
+    
+    @solo_lectura
     def ventas_por_fecha(self, fecha_inicio, fecha_fin):
         """
         Obtiene ventas en un rango de fechas
@@ -1,24 +1,28 @@
 """
 Servicio para gestión de artículos
 """
+import json
 from loguru import logger
 from typing import List, Dict, Optional
 from capa_negocio.base_service import BaseService
+from capa_negocio.catalogo_cache import catalogo_cache
 from capa_datos.articulo_repo import ArticuloRepositorio
 from capa_datos.categoria_repo import CategoriaRepositorio
 
 class ArticuloService(BaseService):
-    def __init__(self, repositorio: ArticuloRepositorio, categoria_service=None):
+    def __init__(self, repositorio: ArticuloRepositorio, categoria_service=None, precio_bs_service=None):
         """
         Inicializa el servicio de artículos
         
         Args:
             repositorio: Repositorio de artículos
             categoria_service: Servicio de categorías (opcional)
+            precio_bs_service: Lista de precios en Bs. a mantener al cambiar precios (opcional)
         """
         super().__init__()
         self.repositorio = repositorio
         self.categoria_service = categoria_service
+        self.precio_bs_service = precio_bs_service
         
     def listar_articulos(self) -> List[Dict]:
         """
@@ -59,6 +63,26 @@ class ArticuloService(BaseService):
             logger.error(f"❌ Error buscando artículo {idarticulo}: {e}")
             return None
     
+    def obtener_por_ids(self, ids: List[int]) -> Optional[Dict[int, Dict]]:
+        """
+        Obtiene varios artículos en una sola ida a la base de datos por bloque
+        
+        Args:
+            ids: Lista de IDs de artículo
+            
+        Returns:
+            Dict[int, Dict]: {idarticulo: artículo}; los inexistentes no aparecen.
+                             None si no se pudieron leer
+        """
+        try:
+            ids = [i for i in ids if self.validar_entero_positivo(i, "ID del artículo")]
+            if not ids:
+                return {}
+            return self.repositorio.obtener_por_ids(ids)
+        except Exception as e:
+            logger.error(f"❌ Error al obtener artículos por IDs: {e}")
+            return None
+    
     def buscar_por_codigo(self, codigo: str) -> Optional[Dict]:
         """
         Busca un artículo por su código de barras o PLU
@@ -374,6 +398,9 @@ class ArticuloService(BaseService):
             if resultado:
                 logger.info(f"✅ Precio actualizado para artículo {idarticulo}: ${nuevo_precio:.2f}")
                 
+                if self.precio_bs_service:
+                    self.precio_bs_service.actualizar_articulo(idarticulo, nuevo_precio)
+                
                 # Registrar en auditoría si existe el método
                 if hasattr(self, 'registrar_auditoria'):
                     self.registrar_auditoria(
@@ -393,6 +420,114 @@ class ArticuloService(BaseService):
             logger.error(f"❌ Error en actualizar_precio: {e}")
             return False
     
+    def _validar_reglas_precio(self, reglas) -> Optional[List[Dict]]:
+        """
+        Valida las reglas de actualización masiva de precios
+        
+        Cada regla es un dict con filtros opcionales 'idcategoria' y 'idproveedor'
+        y exactamente uno de:
+            'porcentaje': variación sobre el precio actual (10 = +10%, -5 = -5%)
+            'margen_costo': margen sobre el costo promedio en USD (30 = costo + 30%)
+        
+        Returns:
+            List[Dict]: Reglas normalizadas o None si alguna no es válida
+        """
+        if isinstance(reglas, dict):
+            reglas = [reglas]
+        if not reglas:
+            logger.warning("⚠️ Debe indicar al menos una regla de precios")
+            return None
+        
+        normalizadas = []
+        for regla in reglas:
+            if ('porcentaje' in regla) == ('margen_costo' in regla):
+                logger.warning(f"⚠️ La regla debe indicar 'porcentaje' o 'margen_costo' (solo uno): {regla}")
+                return None
+            for filtro in ('idcategoria', 'idproveedor'):
+                if regla.get(filtro) is not None and not self.validar_entero_positivo(regla[filtro], filtro):
+                    return None
+            try:
+                if 'porcentaje' in regla:
+                    valor = round(float(regla['porcentaje']), 4)
+                    if valor <= -100 or valor >= 10000:
+                        logger.warning(f"⚠️ Porcentaje fuera de rango: {valor}")
+                        return None
+                    normalizadas.append({'idcategoria': regla.get('idcategoria'),
+                                         'idproveedor': regla.get('idproveedor'), 'porcentaje': valor})
+                else:
+                    valor = round(float(regla['margen_costo']), 4)
+                    if valor < 0 or valor >= 10000:
+                        logger.warning(f"⚠️ Margen sobre costo fuera de rango: {valor}")
+                        return None
+                    normalizadas.append({'idcategoria': regla.get('idcategoria'),
+                                         'idproveedor': regla.get('idproveedor'), 'margen_costo': valor})
+            except (TypeError, ValueError):
+                logger.warning(f"⚠️ Valor no numérico en la regla: {regla}")
+                return None
+        return normalizadas
+    
+    def previsualizar_precios_masivo(self, reglas) -> Optional[List[Dict]]:
+        """
+        Muestra qué precios cambiarían con las reglas, sin aplicarlas
+        
+        Args:
+            reglas: Regla o lista de reglas (ver _validar_reglas_precio); si un
+                    artículo cumple varias, se aplica la primera
+        
+        Returns:
+            List[Dict]: idarticulo, codigo, nombre, precio_venta, precio_nuevo;
+                        None si las reglas no son válidas o hubo error
+        """
+        reglas = self._validar_reglas_precio(reglas)
+        if reglas is None:
+            return None
+        return self.repositorio.previsualizar_precios_masivo(reglas)
+    
+    def actualizar_precios_masivo(self, reglas, usuario=None) -> Optional[Dict]:
+        """
+        Aplica las reglas de precios a todos los artículos afectados en una
+        sola sentencia y deja un único registro de auditoría con los cambios
+        
+        Args:
+            reglas: Regla o lista de reglas (ver _validar_reglas_precio)
+            usuario: Usuario que aplica el cambio (para la auditoría)
+        
+        Returns:
+            Dict: {'actualizados': n, 'cambios': [(idarticulo, anterior, nuevo), ...],
+                   'auditoria': (datos_anteriores, datos_nuevos) en JSON compacto o None}
+                  o None si las reglas no son válidas o hubo error
+        """
+        reglas = self._validar_reglas_precio(reglas)
+        if reglas is None:
+            return None
+        
+        cambios = self.repositorio.actualizar_precios_masivo(reglas)
+        if cambios is None:
+            return None
+        
+        resumen = {'actualizados': len(cambios), 'cambios': cambios, 'auditoria': None}
+        if cambios:
+            resumen['auditoria'] = (
+                json.dumps({c[0]: float(c[1]) for c in cambios}, separators=(',', ':')),
+                json.dumps({'usuario': usuario, 'reglas': reglas,
+                            'precios': {c[0]: float(c[2]) for c in cambios}}, separators=(',', ':'))
+            )
+            self.registrar_auditoria(
+                accion='ACTUALIZAR_PRECIO_MASIVO',
+                tabla='articulo',
+                registro_id=0,
+                datos_anteriores=resumen['auditoria'][0],
+                datos_nuevos=resumen['auditoria'][1]
+            )
+            for idarticulo, _, nuevo in cambios:
+                if catalogo_cache.obtener(idarticulo) is not None:
+                    catalogo_cache.actualizar_articulo({'idarticulo': idarticulo, 'precio_venta': nuevo})
+            if self.precio_bs_service:
+                self.precio_bs_service.recalcular()
+        
+        logger.info(f"✅ Actualización masiva de precios: {len(cambios)} artículos")
+        return resumen
+    
     def actualizar_stock_minimo(self, idarticulo, stock_minimo):
         """
         Actualiza el stock mínimo de un artículo
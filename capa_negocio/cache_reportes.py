@@ -0,0 +1,99 @@
+"""
+Caché en disco de resultados de reportes por día cerrado
+"""
+import hashlib
+import os
+import pickle
+import shutil
+import threading
+from datetime import date, datetime
+from loguru import logger
+
+
+def _dia(fecha):
+    if isinstance(fecha, datetime):
+        return fecha.date()
+    return fecha
+
+
+class CacheReportes:
+    """
+    Guarda resultados de reportes por (tipo, día, parámetros) en
+    <directorio>/AAAAMMDD/<tipo>_<hash>.pkl. Solo se guardan días cerrados
+    (anteriores a hoy), que ya no cambian salvo por anulaciones o ventas de
+    contingencia subidas después. Cada entrada lleva la versión del día en la
+    base de datos (version_dia_venta) con que se calculó; si otra terminal
+    modificó el día la versión no coincide y el próximo reporte lo recalcula.
+    """
+
+    def __init__(self, directorio="cache_reportes"):
+        self.directorio = directorio
+        self._lock = threading.Lock()
+
+    def _carpeta(self, dia):
+        return os.path.join(self.directorio, _dia(dia).strftime('%Y%m%d'))
+
+    def _ruta(self, tipo, dia, parametros):
+        clave = hashlib.sha1(repr(parametros).encode('utf-8')).hexdigest()[:16]
+        return os.path.join(self._carpeta(dia), f"{tipo}_{clave}.pkl")
+
+    def obtener(self, tipo, dia, parametros=None, version=0):
+        """
+        Args:
+            version: Versión actual del día en la base de datos
+
+        Returns:
+            Resultado guardado o None si no está en caché o es de otra versión
+        """
+        ruta = self._ruta(tipo, dia, parametros)
+        try:
+            with open(ruta, 'rb') as archivo:
+                guardado_version, valor = pickle.load(archivo)
+            return valor if guardado_version == version else None
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            logger.warning(f"⚠️ Entrada de caché de reportes ilegible {ruta}: {e}")
+            return None
+
+    def guardar(self, tipo, dia, valor, parametros=None, version=0):
+        """
+        Guarda el resultado de un día cerrado (los días abiertos se ignoran)
+        junto con la versión del día con que se calculó
+
+        Returns:
+            bool: True si se guardó
+        """
+        if _dia(dia) >= date.today():
+            return False
+        ruta = self._ruta(tipo, dia, parametros)
+        temporal = f"{ruta}.{threading.get_ident()}.tmp"
+        try:
+            with self._lock:
+                os.makedirs(os.path.dirname(ruta), exist_ok=True)
+                with open(temporal, 'wb') as archivo:
+                    pickle.dump((version, valor), archivo, protocol=pickle.HIGHEST_PROTOCOL)
+                os.replace(temporal, ruta)
+            return True
+        except Exception as e:
+            logger.warning(f"⚠️ No se pudo guardar en caché de reportes {ruta}: {e}")
+            return False
+
+    def invalidar_dia(self, dia):
+        """
+        Descarta todos los reportes guardados de un día en esta terminal
+        (las demás lo detectan por la versión del día)
+        """
+        with self._lock:
+            carpeta = self._carpeta(dia)
+            if os.path.isdir(carpeta):
+                shutil.rmtree(carpeta, ignore_errors=True)
+                logger.info(f"🗑️ Caché de reportes del {_dia(dia)} invalidada")
+
+    def limpiar(self):
+        """Elimina toda la caché de reportes"""
+        with self._lock:
+            shutil.rmtree(self.directorio, ignore_errors=True)
+
+
+cache_reportes = CacheReportes(os.getenv('CACHE_REPORTES_DIR', 'cache_reportes'))
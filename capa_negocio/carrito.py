@@ -0,0 +1,266 @@
+"""
+Carrito de venta en memoria: líneas validadas al agregarlas y totales incrementales
+"""
+from decimal import Decimal, ROUND_HALF_UP
+from typing import Dict, List, Optional
+from loguru import logger
+from capa_negocio.base_service import BaseService
+from capa_negocio.dinero import Dinero
+from capa_negocio.moneda_service import IGTFService
+from capa_negocio.motor_impuestos import LETRA_POR_DEFECTO, MotorImpuestos
+
+MONEDAS_DIVISA = ('USD', 'EUR')
+
+
+class LineaCarrito:
+    """Línea del carrito (un artículo); __slots__ para no crear un dict por línea"""
+
+    __slots__ = ('idarticulo', 'nombre', 'cantidad', 'precio_venta', 'stock', 'letra_fiscal', 'precio_bs')
+
+    def __init__(self, idarticulo, nombre, cantidad, precio_venta, stock=None,
+                 letra_fiscal=LETRA_POR_DEFECTO, precio_bs=None):
+        self.idarticulo = idarticulo
+        self.nombre = nombre
+        self.cantidad = cantidad
+        self.precio_venta = precio_venta
+        self.stock = stock
+        self.letra_fiscal = letra_fiscal
+        self.precio_bs = precio_bs
+
+    @property
+    def subtotal(self) -> Decimal:
+        return self.precio_venta * self.cantidad
+
+    @property
+    def subtotal_bs(self) -> Optional[Decimal]:
+        return self.precio_bs * self.cantidad if self.precio_bs is not None else None
+
+    def como_detalle(self) -> Dict:
+        """Item en el formato de detalle que usa VentaService.registrar"""
+        return {'idarticulo': self.idarticulo, 'cantidad': self.cantidad,
+                'precio_venta': float(self.precio_venta), 'nombre': self.nombre}
+
+
+class Carrito:
+    """
+    Carrito de una venta. Cada línea se valida al agregarla o modificarla
+    (cantidad entera positiva, precio positivo y stock conocido) y el subtotal
+    se mantiene al día sumando y restando solo la línea afectada, de modo que
+    IVA, IGTF y los montos por moneda se obtienen sin recorrer el carrito.
+    Con un MotorImpuestos la base se acumula además por letra fiscal y el IVA
+    se calcula por alícuota; sin él se aplica el `igv` único a todo el ticket.
+
+    En una factura en divisa, si todas las líneas traen su precio de la lista
+    en Bs. (el que se exhibe), el monto en Bs. se cobra a partir de esos
+    precios y no convirtiendo el total, para que el cobro coincida con el
+    precio del anaquel con cualquier redondeo de la lista.
+
+    Un artículo escaneado dos veces suma su cantidad a la línea existente.
+    """
+
+    def __init__(self, moneda='VES', moneda_pago=None, tasa_cambio=None, igv=16.0,
+                 motor_impuestos=None):
+        """
+        Args:
+            moneda: Moneda de la factura (VES, USD, EUR)
+            moneda_pago: Moneda con que paga el cliente (si es diferente)
+            tasa_cambio: Bs. por unidad de divisa (obligatoria si interviene una divisa)
+            igv: Porcentaje de IVA (solo si no hay motor de impuestos)
+            motor_impuestos: MotorImpuestos para el IVA por letra fiscal
+        """
+        if (moneda in MONEDAS_DIVISA or moneda_pago in MONEDAS_DIVISA) and not tasa_cambio:
+            raise ValueError("La tasa de cambio es obligatoria para ventas o pagos en divisas")
+        self.moneda = moneda
+        self.moneda_pago = moneda_pago
+        self.tasa_cambio = float(tasa_cambio) if tasa_cambio else 1.0
+        self.igv = igv
+        self.motor_impuestos = motor_impuestos
+        self._lineas: Dict[int, LineaCarrito] = {}
+        self._subtotal = Decimal('0')
+        self._bases: Dict[str, Decimal] = {}
+        self._bases_bs: Dict[str, Decimal] = {}
+        self._sin_precio_bs = 0
+
+    # ======================================================
+    # LÍNEAS
+    # ======================================================
+
+    @staticmethod
+    def _validar(cantidad, precio_venta, stock, nombre) -> bool:
+        if not BaseService.validar_entero_positivo(cantidad, f"Cantidad de {nombre}"):
+            return False
+        try:
+            precio_venta = float(precio_venta)
+        except (TypeError, ValueError):
+            logger.warning(f"⚠️ Precio de {nombre} debe ser un número")
+            return False
+        if not BaseService.validar_decimal_positivo(precio_venta, f"Precio de {nombre}"):
+            return False
+        if stock is not None and cantidad > stock:
+            logger.warning(f"⚠️ Stock insuficiente para {nombre}: disponible {stock}, solicitado {cantidad}")
+            return False
+        return True
+
+    def _sumar(self, linea, cantidad):
+        """Suma (o resta, con cantidad negativa) `cantidad` unidades de la línea a los acumulados"""
+        importe = linea.precio_venta * cantidad
+        self._subtotal += importe
+        self._bases[linea.letra_fiscal] = self._bases.get(linea.letra_fiscal, Decimal('0')) + importe
+        if linea.precio_bs is not None:
+            importe_bs = linea.precio_bs * cantidad
+            self._bases_bs[linea.letra_fiscal] = self._bases_bs.get(linea.letra_fiscal, Decimal('0')) + importe_bs
+
+    def agregar(self, idarticulo, nombre, cantidad, precio_venta, stock=None,
+                id_impuesto=None, precio_bs=None) -> Optional[LineaCarrito]:
+        """
+        Agrega un artículo; si ya está en el carrito suma la cantidad a su línea
+
+        Args:
+            idarticulo: ID del artículo
+            nombre: Nombre para mostrar
+            cantidad: Unidades a agregar
+            precio_venta: Precio unitario en la moneda de la factura (float o Decimal)
+            stock: Stock disponible (None = no se verifica aquí)
+            id_impuesto: Impuesto del artículo (define su letra fiscal)
+            precio_bs: Precio unitario de la lista en Bs. con la tasa del carrito
+                       (None = el monto en Bs. se obtiene convirtiendo el total)
+
+        Returns:
+            LineaCarrito: Línea resultante o None si no pasó la validación
+        """
+        linea = self._lineas.get(idarticulo)
+        if linea is not None:
+            if stock is None:
+                stock = linea.stock
+            if not self._validar(cantidad, linea.precio_venta, stock, nombre):
+                return None
+            return self.cambiar_cantidad(idarticulo, linea.cantidad + cantidad, stock)
+
+        if not self._validar(cantidad, precio_venta, stock, nombre):
+            return None
+        letra = self.motor_impuestos.letra(id_impuesto) if self.motor_impuestos else LETRA_POR_DEFECTO
+        linea = LineaCarrito(idarticulo, nombre, cantidad, Decimal(str(precio_venta)), stock, letra,
+                             Decimal(str(precio_bs)) if precio_bs is not None else None)
+        self._lineas[idarticulo] = linea
+        if linea.precio_bs is None:
+            self._sin_precio_bs += 1
+        self._sumar(linea, cantidad)
+        return linea
+
+    def cambiar_cantidad(self, idarticulo, cantidad, stock=None) -> Optional[LineaCarrito]:
+        """
+        Cambia la cantidad de una línea (0 = anular la línea)
+
+        Returns:
+            LineaCarrito: Línea modificada o None si no existe, se anuló o no pasó la validación
+        """
+        linea = self._lineas.get(idarticulo)
+        if linea is None:
+            logger.warning(f"⚠️ El artículo {idarticulo} no está en el carrito")
+            return None
+        if cantidad == 0:
+            self.anular_linea(idarticulo)
+            return None
+        if stock is not None:
+            linea.stock = stock
+        if not self._validar(cantidad, linea.precio_venta, linea.stock, linea.nombre):
+            return None
+        self._sumar(linea, cantidad - linea.cantidad)
+        linea.cantidad = cantidad
+        return linea
+
+    def anular_linea(self, idarticulo) -> bool:
+        """Quita una línea del carrito"""
+        linea = self._lineas.pop(idarticulo, None)
+        if linea is None:
+            return False
+        if linea.precio_bs is None:
+            self._sin_precio_bs -= 1
+        self._sumar(linea, -linea.cantidad)
+        return True
+
+    def lineas(self) -> List[LineaCarrito]:
+        return list(self._lineas.values())
+
+    def detalle(self) -> List[Dict]:
+        """Líneas en el formato de detalle de VentaService.registrar"""
+        return [linea.como_detalle() for linea in self._lineas.values()]
+
+    def __len__(self):
+        return len(self._lineas)
+
+    def __bool__(self):
+        return bool(self._lineas)
+
+    # ======================================================
+    # TOTALES (en la moneda de la factura)
+    # ======================================================
+
+    @property
+    def subtotal(self) -> float:
+        return float(self._subtotal)
+
+    def desglose_impuestos(self) -> Dict[str, tuple]:
+        """
+        Base e IVA por letra fiscal (Decimal, redondeados a céntimos)
+
+        Returns:
+            dict: {letra: (base, impuesto)}; vacío si no hay motor de impuestos
+        """
+        if not self.motor_impuestos:
+            return {}
+        desglose = {}
+        for letra, base in self._bases.items():
+            if base:
+                base = base.quantize(Decimal('0.01'), ROUND_HALF_UP)
+                desglose[letra] = (base, MotorImpuestos.impuesto(letra, base))
+        return desglose
+
+    def _total_bs(self) -> Optional[Dinero]:
+        """Total en Bs. a partir de los precios de la lista; None si alguna línea no lo trae"""
+        if self.moneda not in MONEDAS_DIVISA or not self._lineas or self._sin_precio_bs:
+            return None
+        subtotal = Dinero.desde(sum(self._bases_bs.values(), Decimal('0')), 'VES')
+        if not self.motor_impuestos:
+            return subtotal + subtotal.porcentaje(self.igv)
+        impuestos = (MotorImpuestos.impuesto(letra, base.quantize(Decimal('0.01'), ROUND_HALF_UP))
+                     for letra, base in self._bases_bs.items() if base)
+        return subtotal + Dinero.sumar(impuestos, 'VES')
+
+    def _iva_dinero(self) -> Dinero:
+        if self.motor_impuestos:
+            return Dinero.sumar((iva for _, iva in self.desglose_impuestos().values()), self.moneda)
+        return Dinero.desde(self._subtotal, self.moneda).porcentaje(self.igv)
+
+    def _total_dinero(self) -> Dinero:
+        return Dinero.desde(self._subtotal, self.moneda) + self._iva_dinero()
+
+    @property
+    def iva(self) -> float:
+        return float(self._iva_dinero())
+
+    @property
+    def total(self) -> float:
+        return float(self._total_dinero())
+
+    @property
+    def igtf(self) -> float:
+        return IGTFService.calcular_igtf(self.total, self.moneda_pago or self.moneda, self.moneda)
+
+    def montos(self):
+        """
+        Montos para la cabecera de la venta, con el mismo criterio de VentaService.registrar
+        salvo que, en divisa, el monto en Bs. sale de los precios de la lista si
+        todas las líneas los traen
+
+        Returns:
+            tuple: (monto_bs, monto_divisa); monto_divisa es None si no interviene una divisa
+        """
+        total = self._total_dinero()
+        if self.moneda == 'VES':
+            monto_divisa = float(total.convertir('USD', self.tasa_cambio)) if self.moneda_pago == 'USD' else None
+            return float(total), monto_divisa
+        total_bs = self._total_bs()
+        if total_bs is None:
+            total_bs = total.convertir('VES', self.tasa_cambio)
+        return float(total_bs), float(total)
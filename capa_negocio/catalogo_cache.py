@@ -0,0 +1,105 @@
+"""
+Caché en memoria del catálogo de artículos (con columna de stock)
+"""
+import threading
+from datetime import datetime
+from loguru import logger
+
+
+class CatalogoCache:
+    """Mantiene el catálogo en memoria indexado por ID, código y código de barras"""
+
+    def __init__(self):
+        self._articulos = {}
+        self._por_codigo = {}
+        self._lock = threading.RLock()
+        self.cargado = False
+        self.fecha_carga = None
+
+    def cargar(self, articulos):
+        """
+        Reemplaza el contenido de la caché
+
+        Args:
+            articulos: Lista de artículos (dict con idarticulo, codigo, ...)
+        """
+        with self._lock:
+            self._articulos = {}
+            self._por_codigo = {}
+            for art in articulos:
+                self._indexar(dict(art))
+            self.cargado = True
+            self.fecha_carga = datetime.now()
+        logger.info(f"📦 Catálogo en caché: {len(self._articulos)} artículos")
+
+    def _indexar(self, articulo):
+        self._articulos[articulo['idarticulo']] = articulo
+        for campo in ('codigo', 'codigo_barras_original'):
+            valor = articulo.get(campo)
+            if valor:
+                self._por_codigo[str(valor).strip().upper()] = articulo
+
+    def obtener(self, idarticulo):
+        """Obtiene un artículo por ID o None si no está en caché"""
+        with self._lock:
+            return self._articulos.get(idarticulo)
+
+    def buscar_por_codigo(self, codigo):
+        """Busca un artículo por código interno o código de barras"""
+        if not codigo:
+            return None
+        with self._lock:
+            return self._por_codigo.get(str(codigo).strip().upper())
+
+    def listar(self):
+        """Devuelve una copia de la lista de artículos en caché"""
+        with self._lock:
+            return list(self._articulos.values())
+
+    def actualizar_articulo(self, articulo):
+        """Inserta o reemplaza un artículo en la caché"""
+        with self._lock:
+            anterior = self._articulos.get(articulo['idarticulo'])
+            if anterior:
+                self._quitar_codigos(anterior)
+                nuevo = dict(anterior)
+                nuevo.update(articulo)
+            else:
+                nuevo = dict(articulo)
+            self._indexar(nuevo)
+
+    def _quitar_codigos(self, articulo):
+        for campo in ('codigo', 'codigo_barras_original'):
+            valor = articulo.get(campo)
+            if valor:
+                self._por_codigo.pop(str(valor).strip().upper(), None)
+
+    def invalidar(self, idarticulo=None):
+        """
+        Invalida un artículo o toda la caché
+
+        Args:
+            idarticulo: ID a invalidar (None = toda la caché)
+        """
+        with self._lock:
+            if idarticulo is None:
+                self._articulos = {}
+                self._por_codigo = {}
+                self.cargado = False
+                return
+            articulo = self._articulos.pop(idarticulo, None)
+            if articulo:
+                self._quitar_codigos(articulo)
+
+    def aplicar_evento_stock(self, evento):
+        """Suscriptor del bus de stock: actualiza la columna stock_actual"""
+        with self._lock:
+            articulo = self._articulos.get(evento['idarticulo'])
+            if articulo is not None:
+                articulo['stock_actual'] = evento['stock_nuevo']
+
+    def __len__(self):
+        return len(self._articulos)
+
+
+catalogo_cache = CatalogoCache()
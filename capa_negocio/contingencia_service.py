@@ -0,0 +1,306 @@
+"""
+Servicio de contingencia: ventas sin conexión al servidor y su sincronización posterior
+"""
+import json
+import os
+import threading
+import time
+import uuid
+from datetime import datetime
+from typing import Dict, List, Optional
+from loguru import logger
+from capa_datos.contingencia_repo import ContingenciaRepositorio, ruta_base_local
+from capa_negocio.base_service import BaseService
+from capa_negocio.cache_reportes import cache_reportes
+from capa_negocio.numeracion_service import TERMINAL_ID
+from config.seniat_config import SENIAT_CONFIG
+
+
+class ContingenciaService(BaseService):
+    """
+    Registra ventas en la base local (SQLite) con numeración propia de
+    contingencia y las sube al servidor cuando vuelve la conexión.
+    Cada terminal numera en su propia serie (CONT-<terminal>), ya que los
+    contadores locales de todas empiezan en el mismo número.
+    """
+
+    SERIE = 'CONT'
+    MAX_INTENTOS = 5
+    LOTE_SINCRONIZACION = 50
+
+    def __init__(self, repositorio=None, config=None, terminal=None):
+        """
+        Args:
+            repositorio: ContingenciaRepositorio (por defecto el de SENIAT_CONFIG)
+            config: Sección 'contingencia' de SENIAT_CONFIG
+            terminal: Identificador de la terminal (por defecto TERMINAL_ID)
+        """
+        self.config = config or SENIAT_CONFIG['contingencia']
+        # venta.serie admite 20 caracteres
+        self.serie = f"{self.SERIE}-{terminal or TERMINAL_ID}"[:20]
+        self.activo = self.config.get('activo', False)
+        if repositorio is None:
+            repositorio = ContingenciaRepositorio(ruta_base_local(self.config.get('base_datos_local')))
+        self.repositorio = repositorio
+        self._lock_sincronizacion = threading.Lock()
+
+    # ======================================================
+    # OPERACIÓN SIN CONEXIÓN
+    # ======================================================
+
+    def respaldar_catalogo(self, articulos: List[Dict]) -> int:
+        """Guarda la copia local del catálogo con stock (mientras hay conexión)"""
+        total = self.repositorio.guardar_catalogo(articulos)
+        if total >= 0:
+            logger.info(f"💾 Catálogo de contingencia actualizado: {total} artículos")
+        return total
+
+    def disponible(self) -> bool:
+        """True si la contingencia está activa y hay catálogo local para vender"""
+        return self.activo and self.repositorio.contar_catalogo() > 0
+
+    def buscar_articulo(self, codigo) -> Optional[Dict]:
+        return self.repositorio.buscar_articulo(codigo)
+
+    def dias_en_contingencia(self) -> int:
+        """Días transcurridos desde la venta pendiente más antigua"""
+        fecha = self.repositorio.fecha_pendiente_mas_antigua()
+        if not fecha:
+            return 0
+        return (datetime.now() - datetime.fromisoformat(fecha)).days
+
+    def registrar_venta(self, idtrabajador, detalle: List[Dict], idcliente=None,
+                        tipo_comprobante='FACTURA', igv=16.0, moneda='VES',
+                        moneda_pago=None, tasa_cambio=None) -> Optional[int]:
+        """
+        Registra una venta en la base local
+
+        Args:
+            idtrabajador: ID del trabajador
+            detalle: Items con idarticulo, cantidad y precio_venta
+            idcliente: ID del cliente o None (consumidor final)
+            tipo_comprobante, igv, moneda, moneda_pago, tasa_cambio: como en VentaService.registrar
+
+        Returns:
+            int: Número de contingencia asignado o None si no se pudo registrar
+        """
+        if not self.activo:
+            logger.error("❌ El modo contingencia no está activo")
+            return None
+        if not self.validar_entero_positivo(idtrabajador, "ID del trabajador"):
+            return None
+        if not detalle:
+            logger.error("La venta debe tener al menos un producto")
+            return None
+        for idx, item in enumerate(detalle, 1):
+            if not self.validar_entero_positivo(item.get('cantidad'), f"Cantidad del item {idx}"):
+                return None
+            if not self.validar_decimal_positivo(item.get('precio_venta'), f"Precio del item {idx}"):
+                return None
+        if (moneda != 'VES' or moneda_pago in ('USD', 'EUR')) and not tasa_cambio:
+            logger.error("❌ En contingencia la tasa de cambio debe indicarse manualmente")
+            return None
+
+        max_dias = self.config.get('max_dias_contingencia', 5)
+        if self.dias_en_contingencia() >= max_dias:
+            logger.error(f"❌ Se superó el máximo de {max_dias} días en contingencia; "
+                         f"sincronice antes de seguir facturando")
+            return None
+
+        venta = {
+            'clave_idempotencia': str(uuid.uuid4()),
+            'serie': self.serie,
+            'idtrabajador': idtrabajador,
+            'idcliente': idcliente,
+            'tipo_comprobante': tipo_comprobante,
+            'igv': igv,
+            'moneda': moneda,
+            'moneda_pago': moneda_pago,
+            'tasa_cambio': tasa_cambio,
+            'fecha_hora': datetime.now().isoformat(timespec='seconds'),
+            'detalle': [{'idarticulo': i['idarticulo'], 'cantidad': i['cantidad'],
+                         'precio_venta': float(i['precio_venta'])} for i in detalle]
+        }
+        numero = self.repositorio.encolar_venta(venta, self.config.get('numeracion_inicio', 9000000))
+        if numero:
+            logger.info(f"📴 Venta de contingencia {self.serie}-{numero} guardada localmente")
+        return numero
+
+    def pendientes(self, limite=100) -> List[Dict]:
+        return self.repositorio.pendientes(limite)
+
+    def contar_pendientes(self) -> int:
+        return self.repositorio.contar_pendientes()
+
+    # ======================================================
+    # SINCRONIZACIÓN
+    # ======================================================
+
+    def sincronizar(self, venta_service):
+        """
+        Sube las ventas pendientes por lotes. Cada venta se registra con su número
+        y fecha de contingencia; si ya existe en el servidor (un intento anterior
+        que no alcanzó a marcarse, reconocido por su clave de idempotencia) solo
+        se marca como sincronizada. Una factura ya emitida no se rechaza por falta
+        de stock: se registra dejando el stock en negativo y se alerta.
+
+        Args:
+            venta_service: VentaService conectado al servidor
+
+        Returns:
+            tuple: (ventas subidas, ventas rechazadas)
+        """
+        if not self._lock_sincronizacion.acquire(blocking=False):
+            return 0, 0
+        subidas = rechazadas = 0
+        try:
+            ultimo_id = 0
+            while True:
+                lote = self.repositorio.pendientes(self.LOTE_SINCRONIZACION, self.MAX_INTENTOS, ultimo_id)
+                if not lote:
+                    break
+                for pendiente in lote:
+                    ultimo_id = pendiente['id']
+                    resultado = self._subir_venta(venta_service, pendiente)
+                    if resultado is None:
+                        logger.warning("⚠️ Servidor no disponible, sincronización interrumpida")
+                        return subidas, rechazadas
+                    if resultado:
+                        subidas += 1
+                    else:
+                        rechazadas += 1
+            if subidas or rechazadas:
+                logger.info(f"🔄 Contingencia sincronizada: {subidas} subidas, {rechazadas} rechazadas")
+            return subidas, rechazadas
+        finally:
+            self._lock_sincronizacion.release()
+
+    def _subir_venta(self, venta_service, pendiente):
+        """
+        Returns:
+            bool: True si quedó en el servidor, False si fue rechazada;
+                  None si no hay conexión (se reintenta después)
+        """
+        numero = str(pendiente['numero_contingencia'])
+        venta = pendiente['venta']
+        # Las ventas encoladas antes de la serie por terminal no la guardan
+        serie = venta.get('serie', self.SERIE)
+        clave = venta.get('clave_idempotencia')
+        repositorio = venta_service.repositorio
+
+        if clave:
+            existente = repositorio.buscar_por_clave(clave)
+        else:
+            existente = repositorio.buscar_por_comprobante(serie, numero)
+        if existente < 0:
+            return None
+        if existente:
+            self.repositorio.marcar_sincronizada(pendiente['id'], existente)
+            return True
+
+        fecha_hora = datetime.fromisoformat(venta['fecha_hora'])
+        idventa = venta_service.registrar(
+            idtrabajador=venta['idtrabajador'],
+            idcliente=venta['idcliente'],
+            tipo_comprobante=venta['tipo_comprobante'],
+            serie=serie,
+            numero_comprobante=numero,
+            igv=venta['igv'],
+            detalle=venta['detalle'],
+            moneda=venta['moneda'],
+            moneda_pago=venta['moneda_pago'],
+            tasa_cambio=venta['tasa_cambio'] or 1.0,
+            fecha_hora=fecha_hora,
+            clave_idempotencia=clave,
+            permitir_stock_negativo=True
+        )
+        if not idventa:
+            self.repositorio.registrar_fallo(pendiente['id'], "Rechazada por el servidor (ver log)")
+            if pendiente['intentos'] + 1 >= self.MAX_INTENTOS:
+                logger.critical(f"🚨 Factura de contingencia {serie}-{numero} rechazada "
+                                f"{self.MAX_INTENTOS} veces; queda en la cola local y debe "
+                                f"registrarse manualmente")
+            return False
+
+        self.repositorio.marcar_sincronizada(pendiente['id'], idventa)
+        repositorio.registrar_factura_contingencia(
+            json.dumps(dict(venta, serie=serie, numero_comprobante=numero, idventa=idventa)),
+            pendiente['intentos'] + 1
+        )
+        cache_reportes.invalidar_dia(fecha_hora)
+        return True
+
+
+def _servicio_ventas(conn):
+    """VentaService mínimo sobre una conexión propia (para el hilo de sincronización)"""
+    from capa_datos.articulo_repo import ArticuloRepositorio
+    from capa_datos.cliente_repo import ClienteRepositorio
+    from capa_datos.impuesto_repo import ImpuestoRepositorio
+    from capa_datos.trabajador_repo import TrabajadorRepositorio
+    from capa_datos.venta_repo import VentaRepositorio
+    from capa_negocio.articulo_service import ArticuloService
+    from capa_negocio.cliente_service import ClienteService
+    from capa_negocio.inventario_service import InventarioService
+    from capa_negocio.motor_impuestos import MotorImpuestos
+    from capa_negocio.trabajador_service import TrabajadorService
+    from capa_negocio.venta_service import VentaService
+    return VentaService(
+        VentaRepositorio(conn),
+        ClienteService(ClienteRepositorio(conn)),
+        TrabajadorService(TrabajadorRepositorio(conn)),
+        InventarioService(ArticuloService(ArticuloRepositorio(conn))),
+        motor_impuestos=MotorImpuestos(ImpuestoRepositorio(conn))
+    )
+
+
+class SincronizadorContingencia(threading.Thread):
+    """
+    Hilo en segundo plano que, con su propia conexión, sube la cola de
+    contingencia cuando el servidor responde y refresca el catálogo local
+    """
+
+    INTERVALO_SEG = int(os.getenv('CONTINGENCIA_INTERVALO_SEG', '30'))
+    REFRESCO_CATALOGO_SEG = int(os.getenv('CONTINGENCIA_CATALOGO_SEG', '900'))
+
+    def __init__(self, servicio: ContingenciaService, fabrica_conexion=None):
+        super().__init__(name="sincronizador-contingencia", daemon=True)
+        if fabrica_conexion is None:
+            from capa_datos.conexion import obtener_conexion
+            fabrica_conexion = obtener_conexion
+        self.servicio = servicio
+        self.fabrica_conexion = fabrica_conexion
+        self._detener = threading.Event()
+        self._ultimo_respaldo = 0.0
+
+    def detener(self):
+        self._detener.set()
+
+    def ciclo(self):
+        """Un ciclo de sincronización; devuelve False si el servidor no respondió"""
+        respaldar = time.monotonic() - self._ultimo_respaldo >= self.REFRESCO_CATALOGO_SEG
+        if not respaldar and not self.servicio.contar_pendientes():
+            return True
+        conn = self.fabrica_conexion()
+        if conn is None:
+            return False
+        try:
+            venta_service = _servicio_ventas(conn)
+            self.servicio.sincronizar(venta_service)
+            if respaldar:
+                articulos = venta_service.inventario_service.listar_con_stock()
+                if articulos and self.servicio.respaldar_catalogo(articulos) >= 0:
+                    self._ultimo_respaldo = time.monotonic()
+            return True
+        except Exception as e:
+            logger.error(f"❌ Error en sincronización de contingencia: {e}")
+            return False
+        finally:
+            try:
+                conn.close()
+            except Exception:
+                pass
+
+    def run(self):
+        while not self._detener.is_set():
+            self.ciclo()
+            self._detener.wait(self.INTERVALO_SEG)
@@ -0,0 +1,281 @@
+"""
+Motor de costo promedio ponderado (móvil) sobre el kardex, vectorizado con NumPy
+"""
+import threading
+import numpy as np
+from loguru import logger
+
+# Ancho máximo (en logaritmo natural) del rango de factores dentro de un bloque;
+# mantiene exp(-R) por debajo de ~1e260 y evita desbordes en historiales largos
+_BANDA_LOG = 600.0
+_TIPOS_ENTRADA_COSTEADA = ('INGRESO',)
+
+
+def stock_movil(inicio_grupo, delta, stock_inicial):
+    """
+    Stock antes y después de cada movimiento, acumulado por grupo (artículo)
+
+    Args:
+        inicio_grupo: bool[n], True en la primera fila de cada artículo
+        delta: int[n], variación de stock de cada fila
+        stock_inicial: float[n], stock previo del artículo (solo se lee en inicio_grupo)
+
+    Returns:
+        tuple: (stock_antes, stock_despues) como arrays float
+    """
+    acumulado = np.cumsum(delta, dtype=np.float64)
+    primera = np.maximum.accumulate(np.where(inicio_grupo, np.arange(len(delta)), 0))
+    despues = acumulado + (stock_inicial - (acumulado - delta))[primera]
+    return despues - delta, despues
+
+
+def costo_movil(inicio_grupo, stock_antes, stock_despues, precio, costo_inicial):
+    """
+    Costo promedio ponderado después de cada fila.
+
+    En cada entrada costeada: c = w * c_anterior + (1 - w) * precio, con
+    w = stock_antes / stock_despues (w = 0 si no había stock). Las demás filas
+    no cambian el costo (w = 1). La recurrencia se resuelve por bloques con
+    sumas acumuladas en espacio logarítmico; solo se recorre en Python la
+    lista de bloques (uno por artículo, reinicio de stock o banda de rango).
+
+    Args:
+        inicio_grupo: bool[n], True en la primera fila de cada artículo
+        stock_antes, stock_despues: float[n] (ver stock_movil)
+        precio: float[n], costo unitario de la entrada; NaN si la fila no fija costo
+        costo_inicial: float[n], costo previo del artículo (solo se lee en inicio_grupo)
+
+    Returns:
+        np.ndarray: float[n] con el costo promedio vigente tras cada fila
+    """
+    n = len(precio)
+    costo = np.empty(n)
+    if n == 0:
+        return costo
+
+    entrada = ~np.isnan(precio) & (stock_despues > stock_antes)
+    w = np.ones(n)
+    reinicio = entrada & (stock_antes <= 0)
+    normal = entrada & ~reinicio
+    w[normal] = stock_antes[normal] / stock_despues[normal]
+    w[reinicio] = 0.0
+    p = np.where(entrada, np.nan_to_num(precio), 0.0)
+
+    log_w = np.zeros(n)
+    log_w[normal] = np.log(w[normal])
+    L = np.cumsum(log_w)
+
+    banda = np.floor(-L / _BANDA_LOG)
+    corte = inicio_grupo | reinicio
+    corte[0] = True
+    corte[1:] |= banda[1:] != banda[:-1]
+    inicios = np.flatnonzero(corte)
+    finales = np.append(inicios[1:], n)
+
+    termino = (1.0 - w) * p
+    anterior = 0.0
+    for b, e in zip(inicios, finales):
+        if inicio_grupo[b]:
+            anterior = costo_inicial[b]
+        R = L[b:e] - L[b]
+        acumulado = np.cumsum(termino[b:e] * np.exp(-R))
+        costo[b:e] = np.exp(R) * (acumulado + w[b] * anterior)
+        anterior = costo[e - 1]
+    return costo
+
+
+class MotorCostoPromedio:
+    """
+    Recalcula el costo promedio (USD y Bs) reproduciendo el kardex en orden
+    cronológico (idkardex). Mantiene el estado por artículo para procesar
+    solo los movimientos nuevos en modo incremental.
+
+    La marca del modo incremental es la ROWVERSION del kardex acotada a las
+    transacciones confirmadas (idkardex se asigna al insertar, no al confirmar).
+    Si un movimiento confirma tarde con un idkardex menor que el último
+    procesado de su artículo, ese artículo se reproduce completo.
+    """
+
+    def __init__(self, inventario_repo, articulo_repo=None):
+        """
+        Args:
+            inventario_repo: InventarioRepositorio (lectura de kardex)
+            articulo_repo: ArticuloRepositorio (para guardar los costos); opcional
+        """
+        self.inventario_repo = inventario_repo
+        self.articulo_repo = articulo_repo
+        self.estado = {}
+        self.ultimo_idkardex = {}
+        self.marca = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _a_arrays(filas):
+        """
+        Convierte filas de kardex (idkardex, idarticulo, fecha, tipo, stock_anterior,
+        stock_nuevo, precio_unitario, costo_unitario_usd, tasa_cambio) en arrays
+        """
+        n = len(filas)
+        idkardex = np.fromiter((f[0] for f in filas), dtype=np.int64, count=n)
+        idarticulo = np.fromiter((f[1] for f in filas), dtype=np.int64, count=n)
+        delta = np.fromiter((f[5] - f[4] for f in filas), dtype=np.float64, count=n)
+        costeada = np.fromiter((f[3] in _TIPOS_ENTRADA_COSTEADA for f in filas), dtype=bool, count=n)
+        precio_bs = np.fromiter((np.nan if f[6] is None else float(f[6]) for f in filas),
+                                dtype=np.float64, count=n)
+        precio_usd = np.fromiter((np.nan if f[7] is None else float(f[7]) for f in filas),
+                                 dtype=np.float64, count=n)
+        tasa = np.fromiter((np.nan if not f[8] else float(f[8]) for f in filas),
+                           dtype=np.float64, count=n)
+
+        # Filas antiguas sin costo en USD: derivarlo del costo en Bs y su tasa
+        precio_usd = np.where(np.isnan(precio_usd), precio_bs / tasa, precio_usd)
+        precio_bs = np.where(costeada, precio_bs, np.nan)
+        precio_usd = np.where(costeada, precio_usd, np.nan)
+        return idkardex, idarticulo, delta, precio_usd, precio_bs
+
+    def calcular(self, filas, estado_inicial=None):
+        """
+        Calcula stock y costo promedio tras cada fila de kardex
+
+        Args:
+            filas: Filas de kardex ordenadas por idarticulo, idkardex
+            estado_inicial: {idarticulo: (stock, costo_usd, costo_bs)} previo a las filas
+
+        Returns:
+            dict: arrays 'idkardex', 'idarticulo', 'stock', 'costo_usd', 'costo_bs'
+        """
+        estado_inicial = estado_inicial or {}
+        idkardex, idarticulo, delta, precio_usd, precio_bs = self._a_arrays(filas)
+        n = len(idkardex)
+
+        inicio_grupo = np.ones(n, dtype=bool)
+        inicio_grupo[1:] = idarticulo[1:] != idarticulo[:-1]
+        previo = np.zeros((n, 3))
+        for i in np.flatnonzero(inicio_grupo):
+            previo[i] = estado_inicial.get(int(idarticulo[i]), (0, 0.0, 0.0))
+
+        antes, despues = stock_movil(inicio_grupo, delta, previo[:, 0])
+        return {
+            'idkardex': idkardex,
+            'idarticulo': idarticulo,
+            'stock': despues,
+            'costo_usd': costo_movil(inicio_grupo, antes, despues, precio_usd, previo[:, 1]),
+            'costo_bs': costo_movil(inicio_grupo, antes, despues, precio_bs, previo[:, 2])
+        }
+
+    @staticmethod
+    def _ultimos(resultado):
+        """Estado final {idarticulo: (stock, costo_usd, costo_bs)} de cada artículo"""
+        idarticulo = resultado['idarticulo']
+        if len(idarticulo) == 0:
+            return {}
+        ultimo = np.ones(len(idarticulo), dtype=bool)
+        ultimo[:-1] = idarticulo[:-1] != idarticulo[1:]
+        return {
+            int(a): (float(s), float(u), float(b))
+            for a, s, u, b in zip(idarticulo[ultimo], resultado['stock'][ultimo],
+                                  resultado['costo_usd'][ultimo], resultado['costo_bs'][ultimo])
+        }
+
+    @staticmethod
+    def _ultimos_idkardex(resultado):
+        """Último idkardex procesado {idarticulo: idkardex} de cada artículo"""
+        ultimos = {}
+        for a, k in zip(resultado['idarticulo'].tolist(), resultado['idkardex'].tolist()):
+            ultimos[a] = k
+        return ultimos
+
+    def _guardar(self, estados):
+        if not self.articulo_repo or not estados:
+            return
+        self.articulo_repo.actualizar_costos_promedio([
+            {'idarticulo': a, 'costo_promedio_usd': round(u, 4), 'costo_promedio_bs': round(b, 4)}
+            for a, (_, u, b) in estados.items()
+        ])
+
+    def reconstruir(self):
+        """
+        Modo completo: procesa todo el kardex en una pasada y guarda los costos
+
+        Returns:
+            int: Número de artículos recalculados (-1 si hay error)
+        """
+        with self._lock:
+            filas, marca = self.inventario_repo.listar_kardex_cambios()
+            if filas is None:
+                return -1
+            resultado = self.calcular(filas)
+            self.estado = self._ultimos(resultado)
+            self.ultimo_idkardex = self._ultimos_idkardex(resultado)
+            self.marca = marca
+            self._guardar(self.estado)
+            logger.info(f"🧮 Costo promedio reconstruido: {len(filas)} movimientos, "
+                        f"{len(self.estado)} artículos")
+            return len(self.estado)
+
+    def actualizar(self):
+        """
+        Modo incremental: aplica solo los movimientos confirmados después de la
+        última marca (la primera vez hace una reconstrucción completa)
+
+        Returns:
+            int: Número de artículos actualizados (-1 si hay error)
+        """
+        if not self.marca:
+            return self.reconstruir()
+        with self._lock:
+            filas, marca = self.inventario_repo.listar_kardex_cambios(self.marca)
+            if filas is None:
+                return -1
+            if not filas:
+                self.marca = marca
+                return 0
+
+            # Movimientos confirmados tarde, anteriores al último ya aplicado del artículo
+            tardios = {f[1] for f in filas if f[0] < self.ultimo_idkardex.get(f[1], 0)}
+            estado_inicial = self.estado
+            if tardios:
+                historial = self.inventario_repo.listar_kardex_articulos(sorted(tardios), marca)
+                if historial is None:
+                    return -1
+                logger.info(f"🧮 Movimientos fuera de orden en {len(tardios)} artículos: se reproduce su historial")
+                filas = [f for f in filas if f[1] not in tardios] + historial
+                filas.sort(key=lambda f: (f[1], f[0]))
+                estado_inicial = {a: e for a, e in self.estado.items() if a not in tardios}
+
+            resultado = self.calcular(filas, estado_inicial)
+            cambios = self._ultimos(resultado)
+            self.estado.update(cambios)
+            self.ultimo_idkardex.update(self._ultimos_idkardex(resultado))
+            self.marca = marca
+            self._guardar(cambios)
+            return len(cambios)
+
+    def costos_en_rango(self, idarticulo, desde, hasta):
+        """
+        Evolución del stock y del costo promedio de un artículo en un rango de fechas
+        (el historial anterior a 'desde' se reproduce para partir del costo correcto)
+
+        Returns:
+            list: dict por movimiento con idkardex, fecha, tipo_movimiento, cantidad,
+                  stock, costo_promedio_usd y costo_promedio_bs
+        """
+        filas = self.inventario_repo.listar_kardex_costos(idarticulo=idarticulo, hasta=hasta)
+        if not filas:
+            return []
+        resultado = self.calcular(filas)
+        movimientos = []
+        for i, fila in enumerate(filas):
+            fecha = fila[2]
+            if fecha is None or (fecha.date() if hasattr(fecha, 'date') else fecha) < desde:
+                continue
+            movimientos.append({
+                'idkardex': fila[0],
+                'fecha': fecha,
+                'tipo_movimiento': fila[3],
+                'cantidad': fila[5] - fila[4],
+                'stock': int(resultado['stock'][i]),
+                'costo_promedio_usd': float(resultado['costo_usd'][i]),
+                'costo_promedio_bs': float(resultado['costo_bs'][i])
+            })
+        return movimientos
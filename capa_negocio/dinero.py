@@ -0,0 +1,180 @@
+"""
+Aritmética de dinero en punto fijo: importes en céntimos enteros (VES, USD, EUR)
+y factores (tasas de cambio, alícuotas) como enteros escalados a 8 decimales
+"""
+from decimal import Decimal, ROUND_HALF_UP
+
+# Decimales con que se representan tasas de cambio y porcentajes
+DECIMALES_FACTOR = 8
+ESCALA_FACTOR = 10 ** DECIMALES_FACTOR
+MONEDAS = ('VES', 'USD', 'EUR')
+_CENTIMO = Decimal('0.01')
+
+
+def _div_redondeo(numerador, denominador):
+    """División entera redondeando a la mitad hacia arriba (lejos de cero), denominador > 0"""
+    if numerador >= 0:
+        return (2 * numerador + denominador) // (2 * denominador)
+    return -((-2 * numerador + denominador) // (2 * denominador))
+
+
+def a_centimos(valor):
+    """
+    Convierte un importe (int, float, Decimal o str) a céntimos enteros,
+    redondeando a la mitad hacia arriba
+
+    Los float se tratan por su valor decimal visible (1.005 -> 101), no por
+    su representación binaria exacta: se redondean primero a la escala de
+    los factores (8 decimales) y luego, en enteros, al céntimo.
+    """
+    if valor is None:
+        return 0
+    if isinstance(valor, int):
+        return valor * 100
+    if isinstance(valor, float):
+        escalado = round(valor * ESCALA_FACTOR)
+        mitad = ESCALA_FACTOR // 200
+        if escalado >= 0:
+            return (escalado + mitad) // (2 * mitad)
+        return -((mitad - escalado) // (2 * mitad))
+    return int((Decimal(str(valor)) * 100).to_integral_value(ROUND_HALF_UP))
+
+
+def de_centimos(centimos):
+    """Céntimos enteros a Decimal con dos decimales"""
+    return Decimal(centimos).scaleb(-2).quantize(_CENTIMO)
+
+
+def factor(valor):
+    """Tasa o porcentaje (0.16, 36.5, Decimal...) como entero escalado por ESCALA_FACTOR"""
+    if isinstance(valor, int):
+        return valor * ESCALA_FACTOR
+    if isinstance(valor, float):
+        return round(valor * ESCALA_FACTOR)
+    return int((Decimal(str(valor)) * ESCALA_FACTOR).to_integral_value(ROUND_HALF_UP))
+
+
+def multiplicar(centimos, valor):
+    """centimos * valor, redondeado a céntimos (valor: cantidad, tasa o alícuota)"""
+    if isinstance(valor, int):
+        return centimos * valor
+    return _div_redondeo(centimos * factor(valor), ESCALA_FACTOR)
+
+
+def dividir(centimos, valor):
+    """centimos / valor, redondeado a céntimos (p. ej. Bs. a divisa con la tasa)"""
+    divisor = factor(valor)
+    if divisor == 0:
+        raise ZeroDivisionError("División de un importe entre cero")
+    if divisor < 0:
+        centimos, divisor = -centimos, -divisor
+    return _div_redondeo(centimos * ESCALA_FACTOR, divisor)
+
+
+def porcentaje(centimos, porciento):
+    """Impuesto o recargo de un importe: porciento en escala 0-100 (16.0 -> 16%)"""
+    return _div_redondeo(centimos * factor(porciento), 100 * ESCALA_FACTOR)
+
+
+class Dinero:
+    """
+    Importe inmutable en una moneda, guardado en céntimos enteros. Las sumas
+    son exactas; multiplicaciones y conversiones redondean una sola vez al
+    céntimo (mitad hacia arriba).
+    """
+
+    __slots__ = ('centimos', 'moneda')
+
+    def __init__(self, centimos=0, moneda='VES'):
+        if moneda not in MONEDAS:
+            raise ValueError(f"Moneda no soportada: {moneda}")
+        object.__setattr__(self, 'centimos', int(centimos))
+        object.__setattr__(self, 'moneda', moneda)
+
+    def __setattr__(self, nombre, valor):
+        raise AttributeError("Dinero es inmutable")
+
+    @classmethod
+    def desde(cls, valor, moneda='VES'):
+        """Crea un importe a partir de unidades (10.5 -> 1050 céntimos)"""
+        return cls(a_centimos(valor), moneda)
+
+    @classmethod
+    def sumar(cls, valores, moneda='VES'):
+        """Suma exacta de importes (Dinero o unidades) en una moneda"""
+        total = 0
+        for valor in valores:
+            total += cls._centimos_de(valor, moneda)
+        return cls(total, moneda)
+
+    @staticmethod
+    def _centimos_de(valor, moneda):
+        if isinstance(valor, Dinero):
+            if valor.moneda != moneda:
+                raise ValueError(f"No se pueden operar {valor.moneda} y {moneda} sin convertir")
+            return valor.centimos
+        return a_centimos(valor)
+
+    def __add__(self, otro):
+        return Dinero(self.centimos + self._centimos_de(otro, self.moneda), self.moneda)
+
+    __radd__ = __add__
+
+    def __sub__(self, otro):
+        return Dinero(self.centimos - self._centimos_de(otro, self.moneda), self.moneda)
+
+    def __neg__(self):
+        return Dinero(-self.centimos, self.moneda)
+
+    def __mul__(self, valor):
+        return Dinero(multiplicar(self.centimos, valor), self.moneda)
+
+    __rmul__ = __mul__
+
+    def porcentaje(self, porciento):
+        """Importe del porcentaje indicado (16.0 = 16%)"""
+        return Dinero(porcentaje(self.centimos, porciento), self.moneda)
+
+    def convertir(self, moneda, tasa):
+        """
+        Convierte a otra moneda con la tasa en Bs. por unidad de divisa
+
+        Args:
+            moneda: Moneda destino
+            tasa: Bs. por unidad de la divisa que interviene (VES<->USD/EUR);
+                  entre dos divisas, unidades de destino por unidad de origen
+        """
+        if moneda == self.moneda:
+            return self
+        if self.moneda == 'VES':
+            return Dinero(dividir(self.centimos, tasa), moneda)
+        return Dinero(multiplicar(self.centimos, tasa), moneda)
+
+    def decimal(self):
+        return de_centimos(self.centimos)
+
+    def __float__(self):
+        return self.centimos / 100
+
+    def __bool__(self):
+        return self.centimos != 0
+
+    def __eq__(self, otro):
+        if isinstance(otro, Dinero):
+            return self.centimos == otro.centimos and self.moneda == otro.moneda
+        return NotImplemented
+
+    def __lt__(self, otro):
+        return self.centimos < self._centimos_de(otro, self.moneda)
+
+    def __hash__(self):
+        return hash((self.centimos, self.moneda))
+
+    def __repr__(self):
+        return f"Dinero({self.decimal()} {self.moneda})"
+
+    def __str__(self):
+        return f"{self.decimal()} {self.moneda}"
+
+    def __format__(self, especificacion):
+        return format(self.decimal(), especificacion)
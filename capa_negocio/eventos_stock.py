@@ -0,0 +1,212 @@
+"""
+Bus de eventos de stock (publicación/suscripción en proceso)
+y suscriptores que mantienen alertas y resúmenes de forma incremental
+"""
+import threading
+from datetime import datetime
+from loguru import logger
+from capa_negocio.catalogo_cache import catalogo_cache
+
+STOCK_CRITICO = 3
+STOCK_BAJO = 6
+
+
+def nivel_stock(stock):
+    """Devuelve 'CRÍTICO', 'BAJO' o 'NORMAL' según el stock"""
+    if stock < STOCK_CRITICO:
+        return 'CRÍTICO'
+    if stock < STOCK_BAJO:
+        return 'BAJO'
+    return 'NORMAL'
+
+
+def crear_evento(idarticulo, tipo, cantidad, stock_anterior, stock_nuevo, referencia=None):
+    """
+    Crea un evento de cambio de stock
+
+    Args:
+        idarticulo: ID del artículo
+        tipo: 'ENTRADA' o 'SALIDA'
+        cantidad: Cantidad movida
+        stock_anterior: Stock antes del movimiento
+        stock_nuevo: Stock después del movimiento
+        referencia: Documento de referencia
+
+    Returns:
+        dict: Evento
+    """
+    return {
+        'idarticulo': idarticulo,
+        'tipo': tipo,
+        'cantidad': cantidad,
+        'stock_anterior': stock_anterior,
+        'stock_nuevo': stock_nuevo,
+        'referencia': referencia,
+        'fecha': datetime.now()
+    }
+
+
+class BusEventosStock:
+    """Distribuye eventos de stock a los suscriptores registrados"""
+
+    def __init__(self):
+        self._suscriptores = []
+        self._lock = threading.Lock()
+
+    def suscribir(self, callback):
+        """Registra un callable que recibe cada evento"""
+        with self._lock:
+            if callback not in self._suscriptores:
+                self._suscriptores.append(callback)
+
+    def desuscribir(self, callback):
+        """Elimina un suscriptor"""
+        with self._lock:
+            if callback in self._suscriptores:
+                self._suscriptores.remove(callback)
+
+    def publicar(self, evento):
+        """
+        Publica un evento. Un error en un suscriptor no afecta a los demás
+        ni a la operación que publicó el evento.
+        """
+        with self._lock:
+            suscriptores = list(self._suscriptores)
+        for callback in suscriptores:
+            try:
+                callback(evento)
+            except Exception as e:
+                logger.error(f"Error en suscriptor de stock {callback}: {e}")
+
+
+class AlertasStock:
+    """Conjunto incremental de artículos en nivel CRÍTICO o BAJO"""
+
+    def __init__(self, catalogo=None):
+        self.catalogo = catalogo
+        self.alertas = {}
+        self.contadores = {'CRÍTICO': 0, 'BAJO': 0, 'NORMAL': 0}
+        self.stock_total = 0
+        self.cargado = False
+        self._conocidos = set()
+        self._lock = threading.Lock()
+
+    def cargar(self, articulos):
+        """
+        Inicializa el estado a partir de un listado completo con stock (una sola vez)
+
+        Args:
+            articulos: Lista de artículos con idarticulo, nombre y stock_actual
+        """
+        with self._lock:
+            self.alertas = {}
+            self.contadores = {'CRÍTICO': 0, 'BAJO': 0, 'NORMAL': 0}
+            self.stock_total = 0
+            self._conocidos = set()
+            for art in articulos:
+                stock = art.get('stock_actual', 0) or 0
+                nivel = nivel_stock(stock)
+                self._conocidos.add(art['idarticulo'])
+                self.contadores[nivel] += 1
+                self.stock_total += stock
+                if nivel != 'NORMAL':
+                    self.alertas[art['idarticulo']] = {
+                        'idarticulo': art['idarticulo'],
+                        'nombre': art.get('nombre', ''),
+                        'stock_actual': stock,
+                        'nivel': nivel
+                    }
+            self.cargado = True
+
+    @property
+    def total_articulos(self):
+        return len(self._conocidos)
+
+    def __call__(self, evento):
+        if not self.cargado:
+            return
+        idarticulo = evento['idarticulo']
+        nivel_nuevo = nivel_stock(evento['stock_nuevo'])
+
+        with self._lock:
+            if idarticulo in self._conocidos:
+                self.contadores[nivel_stock(evento['stock_anterior'])] -= 1
+                self.stock_total -= evento['stock_anterior']
+            else:
+                self._conocidos.add(idarticulo)
+            self.contadores[nivel_nuevo] += 1
+            self.stock_total += evento['stock_nuevo']
+
+            if nivel_nuevo == 'NORMAL':
+                self.alertas.pop(idarticulo, None)
+                return
+
+            alerta = self.alertas.get(idarticulo)
+            if alerta is None:
+                alerta = {'idarticulo': idarticulo, 'nombre': self._nombre(idarticulo)}
+                self.alertas[idarticulo] = alerta
+            alerta['stock_actual'] = evento['stock_nuevo']
+            alerta['nivel'] = nivel_nuevo
+
+    def _nombre(self, idarticulo):
+        if self.catalogo:
+            articulo = self.catalogo.obtener(idarticulo)
+            if articulo:
+                return articulo.get('nombre', '')
+        return f"Artículo {idarticulo}"
+
+    def listar(self, nivel=None):
+        """
+        Lista las alertas vigentes ordenadas por stock ascendente
+
+        Args:
+            nivel: 'CRÍTICO' o 'BAJO' (None = ambos)
+        """
+        with self._lock:
+            alertas = [dict(a) for a in self.alertas.values()
+                       if nivel is None or a['nivel'] == nivel]
+        alertas.sort(key=lambda a: a['stock_actual'])
+        return alertas
+
+
+class ResumenDiarioStock:
+    """Acumula entradas y salidas por día y artículo a partir de los eventos"""
+
+    def __init__(self):
+        self.dias = {}
+        self._lock = threading.Lock()
+
+    def __call__(self, evento):
+        fecha = evento['fecha'].date()
+        with self._lock:
+            dia = self.dias.setdefault(fecha, {})
+            fila = dia.get(evento['idarticulo'])
+            if fila is None:
+                fila = {'entradas': 0, 'salidas': 0, 'movimientos': 0}
+                dia[evento['idarticulo']] = fila
+            if evento['tipo'] == 'ENTRADA':
+                fila['entradas'] += evento['cantidad']
+            else:
+                fila['salidas'] += evento['cantidad']
+            fila['movimientos'] += 1
+
+    def obtener(self, fecha=None):
+        """
+        Devuelve el resumen de un día {idarticulo: {entradas, salidas, movimientos}}
+
+        Args:
+            fecha: Fecha (date); None = hoy
+        """
+        if fecha is None:
+            fecha = datetime.now().date()
+        with self._lock:
+            return {k: dict(v) for k, v in self.dias.get(fecha, {}).items()}
+
+
+bus_eventos_stock = BusEventosStock()
+alertas_stock = AlertasStock(catalogo_cache)
+resumen_diario_stock = ResumenDiarioStock()
+
+bus_eventos_stock.suscribir(catalogo_cache.aplicar_evento_stock)
+bus_eventos_stock.suscribir(alertas_stock)
+bus_eventos_stock.suscribir(resumen_diario_stock)
@@ -0,0 +1,128 @@
+"""
+Exportación en streaming (memoria constante) de resultados por bloques a CSV, CSV.GZ o XLSX
+"""
+import csv
+import gzip
+import os
+from datetime import datetime
+from decimal import Decimal
+from loguru import logger
+
+# Límite de filas de una hoja de Excel (incluye el encabezado)
+FILAS_MAX_XLSX = 1048576
+
+
+def _valor_csv(valor):
+    if valor is None:
+        return ''
+    if isinstance(valor, datetime):
+        return valor.strftime('%Y-%m-%d %H:%M:%S')
+    return valor
+
+
+def _valor_xlsx(valor):
+    if isinstance(valor, Decimal):
+        return float(valor)
+    return valor
+
+
+class EscritorCSV:
+    """Escribe filas bloque a bloque en CSV, opcionalmente comprimido con gzip"""
+
+    def __init__(self, ruta, comprimir=False):
+        self.ruta = ruta
+        if comprimir:
+            self._archivo = gzip.open(ruta, 'wt', newline='', encoding='utf-8')
+        else:
+            self._archivo = open(ruta, 'w', newline='', encoding='utf-8')
+        self._writer = csv.writer(self._archivo)
+
+    def encabezado(self, columnas):
+        self._writer.writerow(columnas)
+
+    def filas(self, filas):
+        self._writer.writerows([_valor_csv(v) for v in fila] for fila in filas)
+
+    def cerrar(self):
+        self._archivo.close()
+
+
+class EscritorXLSX:
+    """
+    Escribe filas con openpyxl en modo write_only (no guarda la hoja en memoria).
+    Al llegar al límite de filas de Excel continúa en una hoja nueva.
+    """
+
+    def __init__(self, ruta, titulo="Datos"):
+        try:
+            from openpyxl import Workbook
+        except ImportError:
+            raise ImportError("Para exportar a XLSX instale openpyxl (pip install openpyxl)")
+        self.ruta = ruta
+        self.titulo = titulo
+        self._libro = Workbook(write_only=True)
+        self._columnas = None
+        self._hoja = None
+        self._filas_hoja = 0
+        self._hojas = 0
+
+    def _nueva_hoja(self):
+        self._hojas += 1
+        nombre = self.titulo if self._hojas == 1 else f"{self.titulo} {self._hojas}"
+        self._hoja = self._libro.create_sheet(nombre[:31])
+        self._hoja.append(self._columnas)
+        self._filas_hoja = 1
+
+    def encabezado(self, columnas):
+        self._columnas = list(columnas)
+        self._nueva_hoja()
+
+    def filas(self, filas):
+        for fila in filas:
+            if self._filas_hoja >= FILAS_MAX_XLSX:
+                self._nueva_hoja()
+            self._hoja.append([_valor_xlsx(v) for v in fila])
+            self._filas_hoja += 1
+
+    def cerrar(self):
+        self._libro.save(self.ruta)
+
+
+def exportar_bloques(bloques, nombre_archivo, formato='csv', comprimir=False,
+                     progreso=None, directorio="reportes"):
+    """
+    Vuelca a disco un generador de bloques (columnas, filas) sin acumularlos
+
+    Args:
+        bloques: Iterable de tuplas (columnas, filas), p. ej. VentaRepositorio.iterar_ventas_por_fecha
+        nombre_archivo: Nombre base del archivo (sin extensión)
+        formato: 'csv' o 'xlsx'
+        comprimir: Comprimir con gzip (solo CSV; XLSX ya está comprimido)
+        progreso: Callable opcional que recibe el total de filas escritas tras cada bloque
+        directorio: Carpeta de salida
+
+    Returns:
+        tuple: (ruta del archivo, filas escritas)
+    """
+    os.makedirs(directorio, exist_ok=True)
+    if formato == 'xlsx':
+        ruta = os.path.join(directorio, f"{nombre_archivo}.xlsx")
+        escritor = EscritorXLSX(ruta, titulo=nombre_archivo.split('_')[0].capitalize())
+    else:
+        ruta = os.path.join(directorio, f"{nombre_archivo}.csv{'.gz' if comprimir else ''}")
+        escritor = EscritorCSV(ruta, comprimir)
+
+    total = 0
+    try:
+        for columnas, filas in bloques:
+            if total == 0:
+                escritor.encabezado(columnas)
+            escritor.filas(filas)
+            total += len(filas)
+            if progreso:
+                progreso(total)
+    finally:
+        escritor.cerrar()
+
+    logger.info(f"✅ Exportación completada: {ruta} ({total} filas)")
+    return ruta, total
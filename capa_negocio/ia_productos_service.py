@@ -324,6 +324,30 @@ class IAProductosService:
         
         return None
     
+    def clasificar_lote(self, nombres) -> Dict[str, Dict]:
+        """
+        Clasifica muchos productos sin interacción: cada nombre distinto se
+        analiza una sola vez
+        
+        Args:
+            nombres: Iterable de nombres de producto
+            
+        Returns:
+            Dict: {nombre: {'id_impuesto', 'idcategoria', 'confianza'}}; confianza 0
+                  si la IA no reconoció el producto (impuesto General por defecto)
+        """
+        resultado = {}
+        for nombre in nombres:
+            if nombre in resultado:
+                continue
+            sugerencia = self.analizar_producto(nombre) or {}
+            resultado[nombre] = {
+                'id_impuesto': sugerencia.get('id_impuesto', 2),
+                'idcategoria': sugerencia.get('idcategoria') or self.detectar_categoria_venezolana(nombre),
+                'confianza': sugerencia.get('confianza', 0)
+            }
+        return resultado
+    
     def obtener_nombre_impuesto(self, id_impuesto: int) -> str:
         """Obtiene el nombre del impuesto por su ID"""
         mapa = {1: 'Exento', 2: 'General', 3: 'Reducida', 4: 'Adicional'}
@@ -0,0 +1,211 @@
+"""
+Importación masiva de artículos desde el CSV de un proveedor (lectura en
+streaming, clasificación de impuesto por lote e inserción por bloques)
+"""
+import csv
+import time
+import unicodedata
+from typing import Dict, List, Optional
+from loguru import logger
+from capa_negocio.catalogo_cache import catalogo_cache
+from capa_negocio.ia_productos_service import IAProductosService
+from capa_negocio.utils import generar_codigo_unico_existente
+
+# Nombres de columna aceptados para cada campo (se comparan en minúsculas)
+COLUMNAS = {
+    'codigo_barras': ('codigo_barras', 'codigo_barras_original', 'barcode', 'ean', 'upc'),
+    'nombre': ('nombre', 'producto', 'descripcion'),
+    'precio_venta': ('precio_venta', 'precio', 'pvp'),
+    'precio_referencia': ('precio_referencia', 'precio_compra', 'costo'),
+    'idcategoria': ('idcategoria', 'id_categoria'),
+    'id_impuesto': ('id_impuesto', 'impuesto'),
+    'stock_minimo': ('stock_minimo',),
+}
+OBLIGATORIAS = ('codigo_barras', 'nombre', 'precio_venta')
+# Espacio de códigos LNNNN (letra + 4 dígitos)
+MAX_CODIGOS = 26 * 10000
+IMPUESTOS_VALIDOS = (1, 2, 3, 4)
+CONFIANZA_MINIMA = 0.9
+
+
+def normalizar_nombre(nombre) -> str:
+    """Nombre en mayúsculas, sin espacios repetidos y con acentos en forma compuesta (NFC)"""
+    return ' '.join(unicodedata.normalize('NFC', str(nombre or '')).split()).upper()
+
+
+def _numero(valor, tipo=float):
+    """Convierte un texto del CSV a número (admite coma decimal); None si está vacío"""
+    valor = (valor or '').strip()
+    if not valor:
+        return None
+    if tipo is float and ',' in valor:
+        valor = valor.replace('.', '').replace(',', '.') if '.' in valor else valor.replace(',', '.')
+    return tipo(valor)
+
+
+class ImportadorArticulos:
+    """
+    Importa el CSV fila a fila sin cargarlo completo en memoria. Las filas
+    válidas se acumulan en bloques de `tamano_lote`; por bloque se clasifica
+    el impuesto con IAProductosService (sin preguntar al usuario), se asignan
+    códigos LNNNN libres y se inserta con un solo executemany.
+
+    Los duplicados se detectan por código de barras contra los artículos ya
+    registrados (una consulta al inicio más el índice del catálogo en memoria)
+    y contra las filas anteriores del mismo archivo.
+    """
+
+    def __init__(self, repositorio, ia_service=None, tamano_lote=1000):
+        """
+        Args:
+            repositorio: ArticuloRepositorio
+            ia_service: IAProductosService (se crea uno si no se indica)
+            tamano_lote: Filas por inserción
+        """
+        self.repositorio = repositorio
+        self.ia_service = ia_service or IAProductosService()
+        self.tamano_lote = tamano_lote
+
+    def importar(self, ruta, encoding='utf-8-sig') -> Optional[Dict]:
+        """
+        Importa un archivo CSV (separador ',' o ';', detectado en la cabecera)
+
+        Args:
+            ruta: Ruta del archivo
+            encoding: Codificación del archivo
+
+        Returns:
+            Dict: {'leidas', 'insertadas', 'duplicadas': [(fila, codigo_barras)],
+                   'errores': [(fila, motivo)], 'revisar_impuesto': [fila, ...],
+                   'segundos'}; None si no se pudo iniciar la importación
+        """
+        existentes = self.repositorio.codigos_existentes()
+        if existentes is None:
+            return None
+        self._codigos, self._barras = existentes
+        self._resumen = {'leidas': 0, 'insertadas': 0, 'duplicadas': [], 'errores': [],
+                         'revisar_impuesto': [], 'segundos': 0.0}
+        inicio = time.perf_counter()
+
+        try:
+            with open(ruta, newline='', encoding=encoding) as archivo:
+                cabecera = archivo.readline()
+                archivo.seek(0)
+                separador = ';' if cabecera.count(';') > cabecera.count(',') else ','
+                lector = csv.DictReader(archivo, delimiter=separador)
+                columnas = self._mapear_columnas(lector.fieldnames or [])
+                if columnas is None:
+                    return None
+
+                lote = []
+                for numero, fila in enumerate(lector, start=2):
+                    self._resumen['leidas'] += 1
+                    articulo = self._preparar(numero, fila, columnas)
+                    if articulo is None:
+                        continue
+                    lote.append(articulo)
+                    if len(lote) >= self.tamano_lote:
+                        self._procesar_lote(lote)
+                        lote = []
+                if lote:
+                    self._procesar_lote(lote)
+        except (OSError, UnicodeDecodeError, csv.Error) as e:
+            logger.error(f"❌ Error leyendo {ruta}: {e}")
+            self._resumen['errores'].append((0, f"Lectura interrumpida: {e}"))
+
+        self._resumen['errores'].sort(key=lambda e: e[0])
+        self._resumen['segundos'] = time.perf_counter() - inicio
+        logger.info(f"📥 Importación de artículos: {self._resumen['insertadas']}/{self._resumen['leidas']} "
+                    f"insertados en {self._resumen['segundos']:.1f} s")
+        return self._resumen
+
+    @staticmethod
+    def _mapear_columnas(encabezados) -> Optional[Dict[str, str]]:
+        """Campo -> nombre de la columna en el CSV; None si falta una obligatoria"""
+        disponibles = {str(e).strip().lower(): e for e in encabezados if e}
+        columnas = {}
+        for campo, alias in COLUMNAS.items():
+            for nombre in alias:
+                if nombre in disponibles:
+                    columnas[campo] = disponibles[nombre]
+                    break
+        faltantes = [c for c in OBLIGATORIAS if c not in columnas]
+        if faltantes:
+            logger.error(f"❌ Faltan columnas obligatorias en el CSV: {', '.join(faltantes)}")
+            return None
+        return columnas
+
+    def _preparar(self, numero, fila, columnas) -> Optional[Dict]:
+        """Valida y normaliza una fila; registra el error o duplicado y devuelve None si no sirve"""
+        try:
+            codigo_barras = (fila.get(columnas['codigo_barras']) or '').strip()
+            nombre = normalizar_nombre(fila.get(columnas['nombre']))
+            if not codigo_barras:
+                raise ValueError("Código de barras vacío")
+            if not nombre:
+                raise ValueError("Nombre vacío")
+            precio_venta = _numero(fila.get(columnas['precio_venta']))
+            if precio_venta is None or precio_venta <= 0:
+                raise ValueError("Precio de venta inválido")
+            opcionales = {}
+            for campo, tipo in (('precio_referencia', float), ('idcategoria', int),
+                                ('id_impuesto', int), ('stock_minimo', int)):
+                opcionales[campo] = _numero(fila.get(columnas[campo]), tipo) if campo in columnas else None
+            if opcionales['id_impuesto'] is not None and opcionales['id_impuesto'] not in IMPUESTOS_VALIDOS:
+                raise ValueError(f"Impuesto desconocido: {opcionales['id_impuesto']}")
+        except (TypeError, ValueError) as e:
+            self._resumen['errores'].append((numero, str(e)))
+            return None
+
+        clave = codigo_barras.upper()
+        if clave in self._barras or catalogo_cache.buscar_por_codigo(clave):
+            self._resumen['duplicadas'].append((numero, codigo_barras))
+            return None
+        self._barras.add(clave)
+
+        return {'fila': numero, 'codigo_barras': codigo_barras, 'nombre': nombre,
+                'precio_venta': round(precio_venta, 2), **opcionales}
+
+    def _procesar_lote(self, lote: List[Dict]):
+        """Clasifica, asigna códigos e inserta un bloque de filas válidas"""
+        sin_impuesto = [a['nombre'] for a in lote if a['id_impuesto'] is None or a['idcategoria'] is None]
+        clasificacion = self.ia_service.clasificar_lote(sin_impuesto)
+
+        filas = []
+        for articulo in lote:
+            sugerencia = clasificacion.get(articulo['nombre'])
+            if articulo['id_impuesto'] is None:
+                articulo['id_impuesto'] = sugerencia['id_impuesto']
+                if sugerencia['confianza'] < CONFIANZA_MINIMA:
+                    self._resumen['revisar_impuesto'].append(articulo['fila'])
+            if articulo['idcategoria'] is None:
+                articulo['idcategoria'] = sugerencia['idcategoria']
+
+            if len(self._codigos) >= MAX_CODIGOS:
+                self._resumen['errores'].append((articulo['fila'], "No quedan códigos LNNNN libres"))
+                continue
+            codigo = generar_codigo_unico_existente(self._codigos)
+            self._codigos.add(codigo)
+            articulo['codigo'] = codigo
+
+            precio_referencia = articulo['precio_referencia']
+            filas.append((codigo, articulo['nombre'], articulo['idcategoria'], 1, articulo['codigo_barras'],
+                          articulo['precio_venta'],
+                          round(precio_referencia, 2) if precio_referencia else articulo['precio_venta'],
+                          articulo['stock_minimo'] if articulo['stock_minimo'] is not None else 5,
+                          articulo['id_impuesto']))
+            articulo['indice'] = len(filas) - 1
+
+        if not filas:
+            return
+        errores = dict(self.repositorio.crear_lote(filas))
+        for articulo in lote:
+            indice = articulo.get('indice')
+            if indice is None:
+                continue
+            if indice in errores:
+                self._resumen['errores'].append((articulo['fila'], errores[indice]))
+                self._barras.discard(articulo['codigo_barras'].upper())
+                if articulo['fila'] in self._resumen['revisar_impuesto']:
+                    self._resumen['revisar_impuesto'].remove(articulo['fila'])
+        self._resumen['insertadas'] += len(filas) - len(errores)
@@ -0,0 +1,232 @@
+"""
+Importación masiva de clientes desde CSV (migración del sistema anterior):
+validación de cédula/RIF, teléfono y email por lotes e inserción por bloques
+"""
+import csv
+import re
+import time
+from typing import Dict, List, Optional
+from loguru import logger
+from capa_negocio.validacion_venezuela import ValidacionVenezuela, VALOR_LETRA_RIF
+
+# Nombres de columna aceptados para cada campo (se comparan en minúsculas)
+COLUMNAS = {
+    'nombre': ('nombre', 'nombres', 'razon_social'),
+    'apellidos': ('apellidos', 'apellido'),
+    'tipo_documento': ('tipo_documento', 'tipo'),
+    'num_documento': ('num_documento', 'documento', 'cedula', 'rif'),
+    'fecha_nacimiento': ('fecha_nacimiento',),
+    'sexo': ('sexo',),
+    'direccion': ('direccion',),
+    'telefono': ('telefono', 'celular'),
+    'email': ('email', 'correo'),
+}
+OBLIGATORIAS = ('nombre', 'apellidos', 'num_documento')
+
+# Patrones compilados una sola vez (las reglas son las de ClienteService/ValidacionVenezuela)
+_SEPARADORES_DOCUMENTO = re.compile(r'[\s\-\.]')
+_DOCUMENTO = re.compile(r'([VEJGC])?(\d{5,9})')
+_PASAPORTE = re.compile(r'[A-Z0-9]{6,12}')
+_SEPARADORES_TELEFONO = re.compile(r'[\+\-\s\(\)\.]')
+_TELEFONO = re.compile(r'\d{10,12}')
+_EMAIL = re.compile(r'[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}')
+_FECHA_ISO = re.compile(r'\d{4}-\d{2}-\d{2}')
+
+
+class ImportadorClientes:
+    """
+    Lee el CSV en bloques de `tamano_lote` filas y valida cada bloque de una
+    vez: documento, teléfono y email con patrones precompilados y los dígitos
+    verificadores de todos los RIF del bloque en una sola operación NumPy.
+    Los documentos se normalizan al formato de ClienteService (tipo V, E, J,
+    G o C con 8 dígitos; el verificador del RIF se comprueba y no se guarda)
+    y los duplicados se descartan contra un conjunto con los documentos ya
+    registrados y los del propio archivo.
+    """
+
+    def __init__(self, repositorio, tamano_lote=2000):
+        """
+        Args:
+            repositorio: ClienteRepositorio
+            tamano_lote: Filas por bloque de validación e inserción
+        """
+        self.repositorio = repositorio
+        self.tamano_lote = tamano_lote
+
+    def importar(self, ruta, encoding='utf-8-sig') -> Optional[Dict]:
+        """
+        Importa un archivo CSV (separador ',' o ';', detectado en la cabecera)
+
+        Args:
+            ruta: Ruta del archivo
+            encoding: Codificación del archivo
+
+        Returns:
+            Dict: {'leidas', 'insertadas', 'duplicadas': [(fila, documento)],
+                   'errores': [(fila, motivo)], 'segundos'};
+                  None si no se pudo iniciar la importación
+        """
+        existentes = self.repositorio.documentos_existentes()
+        if existentes is None:
+            return None
+        self._documentos = existentes
+        self._resumen = {'leidas': 0, 'insertadas': 0, 'duplicadas': [], 'errores': [], 'segundos': 0.0}
+        inicio = time.perf_counter()
+
+        try:
+            with open(ruta, newline='', encoding=encoding) as archivo:
+                cabecera = archivo.readline()
+                archivo.seek(0)
+                separador = ';' if cabecera.count(';') > cabecera.count(',') else ','
+                lector = csv.DictReader(archivo, delimiter=separador)
+                columnas = self._mapear_columnas(lector.fieldnames or [])
+                if columnas is None:
+                    return None
+
+                bloque = []
+                for numero, fila in enumerate(lector, start=2):
+                    self._resumen['leidas'] += 1
+                    bloque.append((numero, {campo: (fila.get(col) or '').strip()
+                                            for campo, col in columnas.items()}))
+                    if len(bloque) >= self.tamano_lote:
+                        self._procesar_bloque(bloque)
+                        bloque = []
+                if bloque:
+                    self._procesar_bloque(bloque)
+        except (OSError, UnicodeDecodeError, csv.Error) as e:
+            logger.error(f"❌ Error leyendo {ruta}: {e}")
+            self._resumen['errores'].append((0, f"Lectura interrumpida: {e}"))
+
+        self._resumen['errores'].sort(key=lambda e: e[0])
+        self._resumen['segundos'] = time.perf_counter() - inicio
+        logger.info(f"📥 Importación de clientes: {self._resumen['insertadas']}/{self._resumen['leidas']} "
+                    f"insertados en {self._resumen['segundos']:.1f} s")
+        return self._resumen
+
+    @staticmethod
+    def _mapear_columnas(encabezados) -> Optional[Dict[str, str]]:
+        """Campo -> nombre de la columna en el CSV; None si falta una obligatoria"""
+        disponibles = {str(e).strip().lower(): e for e in encabezados if e}
+        columnas = {}
+        for campo, alias in COLUMNAS.items():
+            for nombre in alias:
+                if nombre in disponibles:
+                    columnas[campo] = disponibles[nombre]
+                    break
+        faltantes = [c for c in OBLIGATORIAS if c not in columnas]
+        if faltantes:
+            logger.error(f"❌ Faltan columnas obligatorias en el CSV: {', '.join(faltantes)}")
+            return None
+        return columnas
+
+    @staticmethod
+    def _documento(fila):
+        """
+        Normaliza el documento de una fila
+
+        Returns:
+            tuple: (tipo, numero de 8 dígitos o pasaporte, verificador del RIF o None)
+
+        Raises:
+            ValueError: Si el documento no tiene un formato válido
+        """
+        tipo = fila.get('tipo_documento', '').upper()
+        documento = _SEPARADORES_DOCUMENTO.sub('', fila['num_documento'].upper())
+        if tipo == 'PASAPORTE':
+            if not _PASAPORTE.fullmatch(documento):
+                raise ValueError("El pasaporte debe tener entre 6 y 12 letras o números")
+            return tipo, documento, None
+
+        coincidencia = _DOCUMENTO.fullmatch(documento)
+        if not coincidencia:
+            raise ValueError(f"Documento inválido: {fila['num_documento']}")
+        letra, digitos = coincidencia.groups()
+        if letra and tipo and letra != tipo:
+            raise ValueError(f"El documento {fila['num_documento']} no corresponde al tipo {tipo}")
+        tipo = letra or tipo or 'V'
+        if tipo not in ('V', 'E', 'J', 'G', 'C'):
+            raise ValueError(f"Tipo de documento no válido: {tipo}")
+        if len(digitos) == 9:
+            if tipo not in VALOR_LETRA_RIF:
+                raise ValueError(f"El tipo {tipo} no lleva dígito verificador")
+            return tipo, digitos[:8], int(digitos[8])
+        return tipo, digitos.zfill(8), None
+
+    def _validar(self, fila):
+        """
+        Valida los campos de una fila (excepto el verificador del RIF)
+
+        Returns:
+            tuple: (datos del cliente, verificador del RIF o None)
+
+        Raises:
+            ValueError: Con el motivo del rechazo
+        """
+        nombre, apellidos = fila['nombre'], fila['apellidos']
+        if not nombre:
+            raise ValueError("El nombre es obligatorio")
+        if not apellidos:
+            raise ValueError("Los apellidos son obligatorios")
+        tipo, numero, verificador = self._documento(fila)
+
+        telefono = fila.get('telefono') or None
+        if telefono and not _TELEFONO.fullmatch(_SEPARADORES_TELEFONO.sub('', telefono)):
+            raise ValueError(f"Teléfono inválido: {telefono}")
+        email = (fila.get('email') or '').lower() or None
+        if email and not _EMAIL.fullmatch(email):
+            raise ValueError(f"Email inválido: {email}")
+
+        fecha = fila.get('fecha_nacimiento') or None
+        if fecha and not _FECHA_ISO.fullmatch(fecha):
+            valida, fecha_obj, mensaje = ValidacionVenezuela.validar_fecha(fecha)
+            if not valida:
+                raise ValueError(f"Fecha de nacimiento inválida: {fecha}")
+            fecha = ValidacionVenezuela.formatear_fecha_para_bd(fecha_obj)
+        sexo = (fila.get('sexo') or '').upper()[:1]
+
+        datos = (nombre, apellidos, fecha, tipo, numero, sexo if sexo in ('M', 'F', 'O') else None,
+                 fila.get('direccion') or None, telefono, email)
+        return datos, verificador
+
+    def _procesar_bloque(self, bloque: List):
+        """Valida, descarta duplicados e inserta un bloque de filas"""
+        validas = []
+        for numero, fila in bloque:
+            try:
+                datos, verificador = self._validar(fila)
+            except ValueError as e:
+                self._resumen['errores'].append((numero, str(e)))
+                continue
+            validas.append((numero, datos, verificador))
+
+        # Dígitos verificadores de todos los RIF del bloque en una sola pasada
+        con_rif = [i for i, (_, _, verificador) in enumerate(validas) if verificador is not None]
+        if con_rif:
+            calculados = ValidacionVenezuela.digitos_verificadores_rif(
+                [validas[i][1][3] for i in con_rif], [validas[i][1][4] for i in con_rif])
+            invalidos = set()
+            for i, calculado in zip(con_rif, calculados.tolist()):
+                if calculado != validas[i][2]:
+                    numero, datos, verificador = validas[i]
+                    self._resumen['errores'].append(
+                        (numero, f"Dígito verificador del RIF inválido: {datos[3]}-{datos[4]}-{verificador}"))
+                    invalidos.add(i)
+            validas = [v for i, v in enumerate(validas) if i not in invalidos]
+
+        filas, numeros = [], []
+        for numero, datos, _ in validas:
+            clave = (datos[3], datos[4])
+            if clave in self._documentos:
+                self._resumen['duplicadas'].append((numero, f"{datos[3]}-{datos[4]}"))
+                continue
+            self._documentos.add(clave)
+            filas.append(datos)
+            numeros.append(numero)
+
+        if not filas:
+            return
+        errores = self.repositorio.crear_lote(filas)
+        for indice, mensaje in errores:
+            self._resumen['errores'].append((numeros[indice], mensaje))
+            self._documentos.discard((filas[indice][3], filas[indice][4]))
+        self._resumen['insertadas'] += len(filas) - len(errores)
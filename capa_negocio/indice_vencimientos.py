@@ -0,0 +1,123 @@
+"""
+Índice en memoria de vencimientos de lotes (calendario agrupado por día)
+"""
+import bisect
+import csv
+import os
+import threading
+from datetime import date, datetime, timedelta
+from loguru import logger
+
+
+def _dia(fecha):
+    if isinstance(fecha, datetime):
+        return fecha.date()
+    return fecha
+
+
+class IndiceVencimientos:
+    """
+    Calendario {día: {idlote: lote}} con los lotes que tienen stock y fecha de
+    vencimiento. Se alimenta con los lotes modificados desde la última marca
+    de agua, así que las consultas no vuelven a recorrer la tabla lote.
+    """
+
+    def __init__(self):
+        self._dias = {}
+        self._dias_ordenados = []
+        self._dia_de_lote = {}
+        self.marca = 0
+        self.fecha_ultimo_reporte = None
+        self._lock = threading.RLock()
+
+    def aplicar(self, lote):
+        """
+        Inserta, mueve o elimina un lote del calendario según su estado actual
+
+        Args:
+            lote: dict con idlote, fecha_vencimiento, stock_actual, articulo, ...
+        """
+        with self._lock:
+            self._quitar(lote['idlote'])
+            dia = _dia(lote.get('fecha_vencimiento'))
+            if dia is None or not lote.get('stock_actual'):
+                return
+            if dia not in self._dias:
+                self._dias[dia] = {}
+                bisect.insort(self._dias_ordenados, dia)
+            self._dias[dia][lote['idlote']] = dict(lote, fecha_vencimiento=dia)
+            self._dia_de_lote[lote['idlote']] = dia
+
+    def quitar(self, idlote):
+        """Elimina un lote del calendario (p. ej. al borrarlo)"""
+        with self._lock:
+            self._quitar(idlote)
+
+    def _quitar(self, idlote):
+        dia = self._dia_de_lote.pop(idlote, None)
+        if dia is None:
+            return
+        lotes = self._dias[dia]
+        lotes.pop(idlote, None)
+        if not lotes:
+            del self._dias[dia]
+            self._dias_ordenados.pop(bisect.bisect_left(self._dias_ordenados, dia))
+
+    def _entre(self, desde, hasta):
+        """Lotes con vencimiento en [desde, hasta) ordenados por fecha"""
+        with self._lock:
+            inicio = bisect.bisect_left(self._dias_ordenados, desde) if desde else 0
+            fin = bisect.bisect_left(self._dias_ordenados, hasta)
+            return [dict(lote)
+                    for dia in self._dias_ordenados[inicio:fin]
+                    for lote in self._dias[dia].values()]
+
+    def proximos_vencer(self, dias=30, hoy=None):
+        """Lotes que vencen desde hoy hasta dentro de 'dias' días (inclusive)"""
+        hoy = hoy or date.today()
+        return self._entre(hoy, hoy + timedelta(days=dias + 1))
+
+    def vencidos(self, hoy=None):
+        """Lotes con stock cuya fecha de vencimiento ya pasó"""
+        return self._entre(None, hoy or date.today())
+
+    def __len__(self):
+        return len(self._dia_de_lote)
+
+    def generar_reporte_diario(self, dias=30, hoy=None, directorio="reportes"):
+        """
+        Escribe el reporte de stock vencido y por vencer del día
+        (reportes/vencimientos_AAAAMMDD.csv)
+
+        Returns:
+            str: Ruta del archivo generado
+        """
+        hoy = hoy or date.today()
+        os.makedirs(directorio, exist_ok=True)
+        ruta = os.path.join(directorio, f"vencimientos_{hoy.strftime('%Y%m%d')}.csv")
+
+        with open(ruta, 'w', newline='', encoding='utf-8') as csvfile:
+            writer = csv.writer(csvfile)
+            writer.writerow(['REPORTE DE VENCIMIENTOS'])
+            writer.writerow([f'Fecha: {hoy}', f'Horizonte: {dias} días'])
+            writer.writerow([])
+            writer.writerow(['Estado', 'Vence', 'Días', 'Lote', 'Código', 'Artículo', 'Stock'])
+            for estado, lotes in (('VENCIDO', self.vencidos(hoy)),
+                                  ('POR VENCER', self.proximos_vencer(dias, hoy))):
+                for lote in lotes:
+                    writer.writerow([
+                        estado,
+                        lote['fecha_vencimiento'],
+                        (lote['fecha_vencimiento'] - hoy).days,
+                        lote.get('codigo_lote') or lote['idlote'],
+                        lote.get('codigo', ''),
+                        lote.get('articulo', ''),
+                        lote['stock_actual']
+                    ])
+
+        self.fecha_ultimo_reporte = hoy
+        logger.info(f"✅ Reporte de vencimientos generado: {ruta}")
+        return ruta
+
+
+indice_vencimientos = IndiceVencimientos()
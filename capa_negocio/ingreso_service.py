@@ -77,6 +77,15 @@ class IngresoService(BaseService):
             logger.warning("⚠️ El ingreso debe tener al menos un artículo")
             return None
         
+        # Artículos del documento en una sola consulta
+        articulos = {}
+        if self.articulo_service:
+            ids = [item.get('idarticulo') for item in detalle if isinstance(item.get('idarticulo'), int)]
+            articulos = self.articulo_service.obtener_por_ids(ids)
+            if articulos is None:
+                logger.error("❌ No se pudieron leer los artículos del ingreso")
+                return None
+        
         total = 0
         for item in detalle:
             # Validar artículo
@@ -92,8 +101,7 @@ class IngresoService(BaseService):
             
             # Verificar que el artículo existe
             if self.articulo_service:
-                articulo = self.articulo_service.obtener_por_id(item['idarticulo'])
-                if not articulo:
+                if item['idarticulo'] not in articulos:
                     logger.warning(f"⚠️ El artículo {item['idarticulo']} no existe")
                     return None
             
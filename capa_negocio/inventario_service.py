@@ -3,6 +3,11 @@ Servicio para la gestión de inventario y stock - VERSIÓN CORREGIDA
 """
 from loguru import logger
 from capa_negocio.base_service import BaseService
+from capa_negocio.catalogo_cache import catalogo_cache
+from capa_negocio.precio_bs_service import lista_precios_bs
+from capa_negocio.eventos_stock import (
+    bus_eventos_stock, alertas_stock, resumen_diario_stock, crear_evento, nivel_stock
+)
 
 class InventarioService(BaseService):
     """Servicio que implementa la lógica de negocio para inventario"""
@@ -12,48 +17,61 @@ class InventarioService(BaseService):
     COLOR_VERDE = '\033[92m'
     COLOR_RESET = '\033[0m'
     
-    def __init__(self, articulo_service):
-        """Inicializa el servicio de inventario"""
+    def __init__(self, articulo_service, bus=None):
+        """
+        Inicializa el servicio de inventario
+        
+        Args:
+            articulo_service: Servicio de artículos
+            bus: Bus de eventos de stock (por defecto el compartido del proceso)
+        """
         self.articulo_service = articulo_service
+        self.bus = bus or bus_eventos_stock
         from capa_datos.inventario_repo import InventarioRepositorio
-        self.repo = InventarioRepositorio()
+        conn = articulo_service.repositorio.conn if articulo_service else None
+        self.repo = InventarioRepositorio(conn)
+        self.lote_service = None
+        if conn is not None:
+            from capa_datos.lote_repo import LoteRepositorio
+            from capa_negocio.lote_service import LoteService
+            self.lote_service = LoteService(LoteRepositorio(conn))
         logger.info("✅ InventarioService inicializado")
     
     def obtener_stock_articulo(self, idarticulo):
         """
-        Obtiene el stock actual de un artículo desde la tabla kardex
+        Obtiene el stock actual de un artículo (stock_articulo, con respaldo en kardex)
         """
         try:
             if not self.validar_entero_positivo(idarticulo, "ID del artículo"):
                 return 0
             
-            # Obtener conexión
-            conn = self.articulo_service.repositorio.conn
-            cursor = conn.cursor()
-            
-            # Consultar el último stock registrado en kardex
-            query = """
-            SELECT TOP 1 stock_nuevo 
-            FROM kardex 
-            WHERE idarticulo = ? 
-            ORDER BY fecha_movimiento DESC
-            """
-            cursor.execute(query, (idarticulo,))
-            row = cursor.fetchone()
-            
-            if row and row[0] is not None:
-                stock = row[0]
-                logger.info(f"Stock del artículo {idarticulo} desde kardex: {stock} unidades")
-                return stock
-            else:
-                # Si no hay movimientos, stock inicial = 0
-                logger.warning(f"No hay registros en kardex para artículo {idarticulo}")
-                return 0
+            stock = self.repo.obtener_stock_actual(idarticulo)
+            logger.info(f"Stock del artículo {idarticulo}: {stock} unidades")
+            return stock
             
         except Exception as e:
             logger.error(f"Error al obtener stock del artículo {idarticulo}: {e}")
             return 0
 
+    def obtener_stock_por_ids(self, ids):
+        """
+        Obtiene el stock actual de varios artículos en una sola consulta por bloque
+        
+        Args:
+            ids (list): IDs de artículo
+            
+        Returns:
+            dict: {idarticulo: stock}, o None si hubo error
+        """
+        try:
+            ids = [i for i in ids if self.validar_entero_positivo(i, "ID del artículo")]
+            if not ids:
+                return {}
+            return self.repo.obtener_stock_por_ids(ids)
+        except Exception as e:
+            logger.error(f"Error al obtener stock de varios artículos: {e}")
+            return None
+
     def registrar_movimiento(self, idarticulo, tipo_movimiento, cantidad, 
                             referencia, precio_compra=None, lote=None, 
                             fecha_vencimiento=None):
@@ -102,6 +120,10 @@ class InventarioService(BaseService):
             
             if resultado:
                 logger.info(f"✅ Movimiento registrado: {tipo_movimiento} {cantidad} unidades - Artículo {idarticulo}")
+                self.bus.publicar(crear_evento(
+                    idarticulo, tipo_movimiento, cantidad,
+                    resultado['stock_anterior'], resultado['stock_nuevo'], referencia
+                ))
                 return True
             else:
                 logger.error(f"❌ Error registrando movimiento en repositorio")
@@ -125,9 +147,12 @@ class InventarioService(BaseService):
             INSERT INTO kardex 
             (idarticulo, tipo_movimiento, documento_referencia, cantidad, 
              precio_unitario, valor_total, stock_anterior, stock_nuevo, fecha_movimiento)
-            VALUES (?, 'INGRESO', 'INVENTARIO INICIAL', 0, 0, 0, 0, 0, GETDATE())
+            VALUES (?, 'INGRESO', 'INVENTARIO INICIAL', 0, 0, 0, 0, 0, GETDATE());
+            
+            IF NOT EXISTS (SELECT 1 FROM stock_articulo WHERE idarticulo = ?)
+                INSERT INTO stock_articulo (idarticulo, cantidad) VALUES (?, 0);
             """
-            cursor.execute(query, (idarticulo,))
+            cursor.execute(query, (idarticulo, idarticulo, idarticulo))
             conn.commit()
             logger.info(f"📝 Stock inicial creado para artículo {idarticulo} (tipo: INGRESO)")
         except Exception as e:
@@ -154,34 +179,19 @@ class InventarioService(BaseService):
             if not self.validar_entero_positivo(cantidad, "Cantidad a descontar"):
                 return False
             
-            # Obtener stock actual
-            stock_actual = self.obtener_stock_articulo(idarticulo)
-            
-            if stock_actual < cantidad:
-                logger.error(f"Stock insuficiente. Disponible: {stock_actual}, Solicitado: {cantidad}")
-                return False
-            
-            # Calcular nuevo stock
-            stock_nuevo = stock_actual - cantidad
-            
-            # Calcular valor total
-            valor_total = cantidad * precio_unitario if precio_unitario else 0
-            
-            # Insertar en kardex
-            conn = self.articulo_service.repositorio.conn
-            cursor = conn.cursor()
-            
             documento = f"VENTA-{idventa}" if idventa else "VENTA-DIRECTA"
+            valor_total = cantidad * precio_unitario if precio_unitario else 0
             
-            query = """
-            INSERT INTO kardex 
-            (idarticulo, tipo_movimiento, documento_referencia, cantidad, 
-             precio_unitario, valor_total, stock_anterior, stock_nuevo, fecha_movimiento)
-            VALUES (?, 'VENTA', ?, ?, ?, ?, ?, ?, GETDATE())
-            """
+            # Descuento atómico: falla de inmediato si el stock no alcanza
+            movimiento = self.repo.descontar_stock_atomico(
+                idarticulo, cantidad, documento, precio_unitario
+            )
+            if not movimiento:
+                logger.error(f"Stock insuficiente para artículo {idarticulo}. Solicitado: {cantidad}")
+                return False
             
-            cursor.execute(query, (idarticulo, documento, cantidad, precio_unitario, valor_total, stock_actual, stock_nuevo))
-            conn.commit()
+            stock_actual = movimiento['stock_anterior']
+            stock_nuevo = movimiento['stock_nuevo']
             
             logger.info(f"✅ Descontando {cantidad} unidades del artículo {idarticulo}")
             logger.info(f"   Stock: {stock_actual} → {stock_nuevo}")
@@ -191,6 +201,9 @@ class InventarioService(BaseService):
             if idventa:
                 logger.info(f"   Venta asociada: #{idventa}")
             
+            self.bus.publicar(crear_evento(
+                idarticulo, 'SALIDA', cantidad, stock_actual, stock_nuevo, documento
+            ))
             return True
             
         except Exception as e:
@@ -218,28 +231,17 @@ class InventarioService(BaseService):
             if not self.validar_entero_positivo(cantidad, "Cantidad a reponer"):
                 return False
             
-            # Obtener stock actual
-            stock_actual = self.obtener_stock_articulo(idarticulo)
-            stock_nuevo = stock_actual + cantidad
-            
-            # Calcular valor total
-            valor_total = cantidad * precio_compra if precio_compra else 0
-            
-            # Insertar en kardex
-            conn = self.articulo_service.repositorio.conn
-            cursor = conn.cursor()
-            
             documento = f"INGRESO-{idingreso}" if idingreso else "INGRESO-MANUAL"
+            valor_total = cantidad * precio_compra if precio_compra else 0
             
-            query = """
-            INSERT INTO kardex 
-            (idarticulo, tipo_movimiento, documento_referencia, cantidad, 
-             precio_unitario, valor_total, stock_anterior, stock_nuevo, fecha_movimiento)
-            VALUES (?, 'INGRESO', ?, ?, ?, ?, ?, ?, GETDATE())
-            """
+            movimiento = self.repo.reponer_stock_atomico(
+                idarticulo, cantidad, documento, precio_compra
+            )
+            if not movimiento:
+                return False
             
-            cursor.execute(query, (idarticulo, documento, cantidad, precio_compra, valor_total, stock_actual, stock_nuevo))
-            conn.commit()
+            stock_actual = movimiento['stock_anterior']
+            stock_nuevo = movimiento['stock_nuevo']
             
             logger.info(f"✅ Reponiendo {cantidad} unidades del artículo {idarticulo}")
             logger.info(f"   Stock: {stock_actual} → {stock_nuevo}")
@@ -249,12 +251,78 @@ class InventarioService(BaseService):
             if idingreso:
                 logger.info(f"   Ingreso asociado: #{idingreso}")
             
+            self.bus.publicar(crear_evento(
+                idarticulo, 'ENTRADA', cantidad, stock_actual, stock_nuevo, documento
+            ))
             return True
             
         except Exception as e:
             logger.error(f"Error al reponer stock del artículo {idarticulo}: {e}")
             return False
     
+    def lineas_venta(self, detalle):
+        """
+        Agrupa el detalle de una venta por artículo para el descuento atómico
+        
+        Args:
+            detalle (list): Items con idarticulo, cantidad y precio_venta
+            
+        Returns:
+            list: Dict con idarticulo, cantidad y precio_unitario (uno por artículo)
+        """
+        return list(self._agrupar_lineas(detalle).values())
+    
+    def planificar_lotes(self, lineas):
+        """
+        Asignación FEFO de los lotes de una venta, para descontarlos en la
+        misma transacción que el stock
+        
+        Args:
+            lineas (list): Líneas agrupadas (ver lineas_venta)
+            
+        Returns:
+            list: Asignaciones {idlote, idarticulo, cantidad} (vacía si no se
+                  manejan lotes) o None si no se pudieron leer los lotes
+        """
+        if not self.lote_service:
+            return []
+        return self.lote_service.planificar_venta(lineas)
+    
+    def confirmar_salida_venta(self, lineas, movimientos, idventa):
+        """
+        Publica los eventos de salida de una venta ya registrada (stock y lotes
+        descontados en la misma transacción que la venta)
+        
+        Args:
+            lineas (list): Líneas agrupadas (ver lineas_venta)
+            movimientos (dict): {idarticulo: (stock_anterior, stock_nuevo)}
+            idventa (int): ID de la venta
+        """
+        documento = f"VENTA-{idventa}"
+        cantidades = {l['idarticulo']: l['cantidad'] for l in lineas}
+        for idarticulo, (stock_anterior, stock_nuevo) in movimientos.items():
+            self.bus.publicar(crear_evento(
+                idarticulo, 'SALIDA', cantidades[idarticulo],
+                stock_anterior, stock_nuevo, documento
+            ))
+        logger.info(f"✅ Stock descontado para {len(movimientos)} artículos de la venta #{idventa}")
+    
+    @staticmethod
+    def _agrupar_lineas(detalle):
+        """Agrupa por artículo (el mismo artículo puede venir en varias líneas)"""
+        lineas = {}
+        for item in detalle:
+            linea = lineas.get(item['idarticulo'])
+            if linea is None:
+                lineas[item['idarticulo']] = {
+                    'idarticulo': item['idarticulo'],
+                    'cantidad': item['cantidad'],
+                    'precio_unitario': float(item['precio_venta'])
+                }
+            else:
+                linea['cantidad'] += item['cantidad']
+        return lineas
+    
     def obtener_nivel_stock(self, stock_actual):
         """
         Determina el nivel de stock (CRÍTICO, BAJO, NORMAL)
@@ -265,14 +333,15 @@ class InventarioService(BaseService):
         Returns:
             dict: Nivel de stock con color y mensaje
         """
-        if stock_actual < 3:
+        nivel = nivel_stock(stock_actual)
+        if nivel == 'CRÍTICO':
             return {
                 'nivel': 'CRÍTICO',
                 'color': self.COLOR_ROJO,
                 'emoji': '🔴',
                 'mensaje': '¡URGENTE! Reponer stock inmediatamente'
             }
-        elif stock_actual < 6:
+        elif nivel == 'BAJO':
             return {
                 'nivel': 'BAJO',
                 'color': self.COLOR_AMARILLO,
@@ -346,6 +415,19 @@ class InventarioService(BaseService):
         
         return "\n".join(lineas)
     
+    def _asegurar_estado_stock(self):
+        """
+        Carga una única vez el catálogo con stock en la caché y en el conjunto
+        de alertas; a partir de ahí ambos se mantienen con los eventos de stock
+        """
+        if alertas_stock.cargado:
+            return
+        articulos = self.listar_con_stock()
+        for art in articulos:
+            art['precio_bs'] = lista_precios_bs.precio(art['idarticulo'])
+        catalogo_cache.cargar(articulos)
+        alertas_stock.cargar(articulos)
+    
     def mostrar_resumen_stock(self):
         """
         Muestra un resumen del inventario
@@ -353,33 +435,28 @@ class InventarioService(BaseService):
         Returns:
             str: Resumen formateado
         """
-        articulos = self.listar_con_stock()
+        self._asegurar_estado_stock()
         
-        if not articulos:
+        if alertas_stock.total_articulos == 0:
             return "📭 No hay artículos registrados"
         
-        total_articulos = len(articulos)
-        criticos = sum(1 for a in articulos if a['nivel_stock'] == 'CRÍTICO')
-        bajos = sum(1 for a in articulos if a['nivel_stock'] == 'BAJO')
-        normales = sum(1 for a in articulos if a['nivel_stock'] == 'NORMAL')
-        stock_total = sum(a['stock_actual'] for a in articulos)
+        criticos = alertas_stock.listar('CRÍTICO')
         
         resumen = []
         resumen.append("📊 RESUMEN DE INVENTARIO")
         resumen.append("=" * 40)
-        resumen.append(f"Total artículos: {total_articulos}")
-        resumen.append(f"Stock total: {stock_total} unidades")
+        resumen.append(f"Total artículos: {alertas_stock.total_articulos}")
+        resumen.append(f"Stock total: {alertas_stock.stock_total} unidades")
         resumen.append("")
-        resumen.append(f"{self.COLOR_ROJO}🔴 Críticos: {criticos}{self.COLOR_RESET}")
-        resumen.append(f"{self.COLOR_AMARILLO}🟡 Bajos: {bajos}{self.COLOR_RESET}")
-        resumen.append(f"{self.COLOR_VERDE}🟢 Normales: {normales}{self.COLOR_RESET}")
+        resumen.append(f"{self.COLOR_ROJO}🔴 Críticos: {alertas_stock.contadores['CRÍTICO']}{self.COLOR_RESET}")
+        resumen.append(f"{self.COLOR_AMARILLO}🟡 Bajos: {alertas_stock.contadores['BAJO']}{self.COLOR_RESET}")
+        resumen.append(f"{self.COLOR_VERDE}🟢 Normales: {alertas_stock.contadores['NORMAL']}{self.COLOR_RESET}")
         
-        if criticos > 0:
+        if criticos:
             resumen.append("")
             resumen.append(f"{self.COLOR_ROJO}⚠️ Artículos críticos:{self.COLOR_RESET}")
-            for art in articulos:
-                if art['nivel_stock'] == 'CRÍTICO':
-                    resumen.append(f"   - {art['nombre']} (Stock: {art['stock_actual']})")
+            for art in criticos:
+                resumen.append(f"   - {art['nombre']} (Stock: {art['stock_actual']})")
         
         return "\n".join(resumen)
     
@@ -390,17 +467,98 @@ class InventarioService(BaseService):
         Returns:
             list: Lista de alertas formateadas
         """
-        articulos = self.listar_con_stock()
+        self._asegurar_estado_stock()
         alertas = []
         
-        for art in articulos:
-            if art['nivel_stock'] == 'CRÍTICO':
+        for art in alertas_stock.listar():
+            if art['nivel'] == 'CRÍTICO':
                 alertas.append(f"{self.COLOR_ROJO}🔴 {art['nombre']} - Stock CRÍTICO ({art['stock_actual']} und){self.COLOR_RESET}")
-            elif art['nivel_stock'] == 'BAJO':
+            else:
                 alertas.append(f"{self.COLOR_AMARILLO}🟡 {art['nombre']} - Stock BAJO ({art['stock_actual']} und){self.COLOR_RESET}")
         
         return alertas
     
+    def listar_alertas_stock(self, nivel=None):
+        """
+        Lista los artículos en alerta sin recorrer el catálogo completo
+        
+        Args:
+            nivel: 'CRÍTICO' o 'BAJO' (None = ambos)
+            
+        Returns:
+            list: Artículos con idarticulo, codigo, nombre, stock_actual, nivel_stock y color
+        """
+        self._asegurar_estado_stock()
+        resultado = []
+        for alerta in alertas_stock.listar(nivel):
+            articulo = catalogo_cache.obtener(alerta['idarticulo']) or {}
+            resultado.append({
+                'idarticulo': alerta['idarticulo'],
+                'codigo': articulo.get('codigo', ''),
+                'nombre': alerta['nombre'],
+                'stock_actual': alerta['stock_actual'],
+                'nivel_stock': alerta['nivel'],
+                'color': self.COLOR_ROJO if alerta['nivel'] == 'CRÍTICO' else self.COLOR_AMARILLO
+            })
+        return resultado
+    
+    def resumen_movimientos_dia(self, fecha=None):
+        """
+        Entradas y salidas del día por artículo, acumuladas desde los eventos de stock
+        
+        Args:
+            fecha: Fecha (date); None = hoy
+            
+        Returns:
+            dict: {idarticulo: {entradas, salidas, movimientos}}
+        """
+        return resumen_diario_stock.obtener(fecha)
+    
+    def _motor_costos(self):
+        if getattr(self, 'motor_costos', None) is None:
+            from capa_negocio.costo_promedio import MotorCostoPromedio
+            articulo_repo = self.articulo_service.repositorio if self.articulo_service else None
+            self.motor_costos = MotorCostoPromedio(self.repo, articulo_repo)
+        return self.motor_costos
+    
+    def recalcular_costos_promedio(self, completo=False):
+        """
+        Recalcula el costo promedio ponderado (USD y Bs) reproduciendo el kardex
+        
+        Args:
+            completo (bool): True = reconstruir todo el historial;
+                             False = solo movimientos nuevos desde el último cálculo
+            
+        Returns:
+            int: Número de artículos actualizados (-1 si hay error)
+        """
+        try:
+            motor = self._motor_costos()
+            return motor.reconstruir() if completo else motor.actualizar()
+        except Exception as e:
+            logger.error(f"Error al recalcular costos promedio: {e}")
+            return -1
+    
+    def costos_promedio_en_rango(self, idarticulo, fecha_inicio, fecha_fin):
+        """
+        Evolución del costo promedio de un artículo entre dos fechas
+        
+        Args:
+            idarticulo (int): ID del artículo
+            fecha_inicio (date): Fecha inicial
+            fecha_fin (date): Fecha final
+            
+        Returns:
+            list: Movimientos con stock y costo promedio en USD y Bs
+        """
+        try:
+            if not self.validar_entero_positivo(idarticulo, "ID del artículo"):
+                return []
+            return self._motor_costos().costos_en_rango(idarticulo, fecha_inicio, fecha_fin)
+        except Exception as e:
+            logger.error(f"Error al calcular costos del artículo {idarticulo}: {e}")
+            return []
+    
     def verificar_stock_para_venta(self, items):
         """
         Verifica si hay stock suficiente para una venta
@@ -412,8 +570,9 @@ class InventarioService(BaseService):
             tuple: (bool, list) - (aprobado, lista de errores)
         """
         errores = []
+        stocks = self.obtener_stock_por_ids([item['idarticulo'] for item in items]) or {}
         for item in items:
-            stock = self.obtener_stock_articulo(item['idarticulo'])
+            stock = stocks.get(item['idarticulo'], 0)
             if item['cantidad'] > stock:
                 errores.append(f"Artículo {item['idarticulo']}: requiere {item['cantidad']}, disponible {stock}")
         
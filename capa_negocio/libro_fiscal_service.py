@@ -0,0 +1,181 @@
+"""
+Servicio de libros fiscales SENIAT (Libro de Ventas y Libro de Compras)
+"""
+import calendar
+import os
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+from decimal import Decimal, ROUND_HALF_UP
+from loguru import logger
+from capa_datos.conexion import obtener_conexion
+from capa_datos.libro_fiscal_repo import LibroFiscalRepositorio
+from capa_negocio.base_service import BaseService
+from capa_negocio.exportador import exportar_bloques
+from capa_negocio.moneda_service import IGTFService
+from capa_negocio.motor_impuestos import ALICUOTAS
+from capa_negocio.trabajos_reportes import TrabajoCancelado
+
+_CENTIMO = Decimal('0.01')
+
+COLUMNAS_VENTAS = ['Nro', 'Fecha', 'RIF/CI', 'Cliente', 'Tipo', 'Serie', 'Nro Factura', 'Estado',
+                   'Total Bs', 'Exento', 'Base G', 'IVA G', 'Base R', 'IVA R', 'Base A', 'IVA A', 'IGTF']
+COLUMNAS_COMPRAS = ['Nro', 'Fecha', 'RIF', 'Proveedor', 'Tipo', 'Serie', 'Nro Factura', 'Estado',
+                    'Total Bs', 'Exento', 'Base G', 'IVA G', 'Base R', 'IVA R', 'Base A', 'IVA A']
+
+
+def _monto(valor):
+    return Decimal(str(valor or 0)).quantize(_CENTIMO, ROUND_HALF_UP)
+
+
+def _importes(bases, anulada, ivas=None):
+    """
+    Total, exento y (base, IVA) de cada letra gravada a partir de las bases E, G, R, A
+    y, si se conocen, los IVA G, R, A ya calculados (si no, se calculan de la base)
+
+    Returns:
+        list: [total, exento, base_g, iva_g, base_r, iva_r, base_a, iva_a]
+    """
+    if anulada:
+        return [Decimal('0.00')] * 8
+    exento = _monto(bases[0])
+    importes = [exento]
+    total = exento
+    for letra, base, iva in zip(('G', 'R', 'A'), bases[1:], ivas or (None, None, None)):
+        base = _monto(base)
+        if iva is None:
+            iva = (base * ALICUOTAS[letra]).quantize(_CENTIMO, ROUND_HALF_UP)
+        else:
+            iva = _monto(iva)
+        importes += [base, iva]
+        total += base + iva
+    return [total] + importes
+
+
+def _linea_venta(fila):
+    (_, fecha, tipo, serie, numero, estado, moneda, monto_divisa, rif, cliente) = fila[:10]
+    anulada = estado == 'ANULADO'
+    importes = _importes(fila[10:14], anulada, fila[14:17])
+    pago_divisa = moneda != 'VES' or monto_divisa is not None
+    igtf = Decimal('0.00')
+    if pago_divisa and not anulada:
+        igtf = (importes[0] * Decimal(str(IGTFService.TASA_IGTF))).quantize(_CENTIMO, ROUND_HALF_UP)
+    return [fecha.strftime('%d/%m/%Y'), rif, cliente, tipo, serie, numero, estado] + importes + [igtf]
+
+
+def _linea_compra(fila):
+    (_, fecha, tipo, serie, numero, estado, rif, proveedor) = fila[:8]
+    importes = _importes(fila[8:12], estado == 'ANULADA')
+    return [fecha.strftime('%d/%m/%Y'), rif, proveedor, tipo, serie, numero, estado] + importes
+
+
+class LibroFiscalService(BaseService):
+    """
+    Genera los libros fiscales de un mes. Cada día se consulta y se formatea en un
+    hilo del pool con su propia conexión; los días se escriben en orden a medida
+    que terminan, de modo que solo se mantienen en memoria los días en curso.
+    """
+
+    HILOS = int(os.getenv('LIBRO_FISCAL_HILOS', '4'))
+
+    def __init__(self, fabrica_conexion=obtener_conexion, hilos=None):
+        """
+        Args:
+            fabrica_conexion: Función que abre una conexión nueva (una por día procesado)
+            hilos: Número de hilos del pool (por defecto LIBRO_FISCAL_HILOS)
+        """
+        self.fabrica_conexion = fabrica_conexion
+        self.hilos = hilos or self.HILOS
+
+    def _procesar_dia(self, tipo, dia):
+        """Consulta y formatea las facturas de un día (se ejecuta en un hilo del pool)"""
+        conn = self.fabrica_conexion()
+        if conn is None:
+            raise RuntimeError(f"Sin conexión para procesar el {dia}")
+        try:
+            repo = LibroFiscalRepositorio(conn)
+            if tipo == 'ventas':
+                filas, formatear = repo.ventas_del_dia(dia), _linea_venta
+            else:
+                filas, formatear = repo.compras_del_dia(dia), _linea_compra
+            if filas is None:
+                raise RuntimeError(f"No se pudieron leer las {tipo} del {dia}")
+            return [formatear(fila) for fila in filas]
+        finally:
+            conn.close()
+
+    def _bloques(self, tipo, anio, mes, columnas):
+        """
+        Genera (columnas, filas) por día en orden cronológico y al final la fila de totales.
+        Si el generador se cierra antes de terminar (error o cancelación) los días
+        que aún no empezaron se cancelan en lugar de procesarse.
+        """
+        dias = [date(anio, mes, d) for d in range(1, calendar.monthrange(anio, mes)[1] + 1)]
+        numero = 0
+        totales = None
+        pool = ThreadPoolExecutor(max_workers=self.hilos)
+        try:
+            futuros = [pool.submit(self._procesar_dia, tipo, dia) for dia in dias]
+            for futuro in futuros:
+                lineas = futuro.result()
+                if not lineas:
+                    continue
+                if totales is None:
+                    totales = [Decimal('0.00')] * (len(lineas[0]) - 7)
+                for linea in lineas:
+                    numero += 1
+                    linea.insert(0, numero)
+                    totales = [t + v for t, v in zip(totales, linea[8:])]
+                yield columnas, lineas
+        finally:
+            pool.shutdown(wait=True, cancel_futures=True)
+        if totales is not None:
+            yield columnas, [['', '', '', 'TOTALES', '', '', '', ''] + totales]
+
+    def _generar(self, tipo, anio, mes, columnas, progreso=None, directorio="reportes"):
+        if not (1 <= mes <= 12):
+            logger.warning("⚠️ El mes debe estar entre 1 y 12")
+            return None, 0
+        nombre = f"libro_{tipo}_{anio}{mes:02d}"
+        bloques = self._bloques(tipo, anio, mes, columnas)
+        try:
+            ruta, filas = exportar_bloques(bloques, nombre, progreso=progreso, directorio=directorio)
+            # La fila de totales no es una factura
+            return ruta, max(filas - 1, 0)
+        except TrabajoCancelado:
+            raise
+        except Exception as e:
+            logger.error(f"❌ Error generando libro de {tipo} {mes:02d}/{anio}: {e}")
+            return None, 0
+        finally:
+            # Cancela de inmediato los días pendientes si se cortó antes de terminar
+            bloques.close()
+
+    def generar_libro_ventas(self, anio, mes, progreso=None, directorio="reportes"):
+        """
+        Genera el Libro de Ventas del mes (una línea por factura)
+
+        Args:
+            anio: Año
+            mes: Mes (1-12)
+            progreso: Callable opcional que recibe las líneas escritas hasta el momento
+            directorio: Carpeta de salida
+
+        Returns:
+            tuple: (ruta del CSV, número de facturas) o (None, 0) si hay error
+
+        Raises:
+            TrabajoCancelado: si el callback de progreso cancela el trabajo
+        """
+        return self._generar('ventas', anio, mes, COLUMNAS_VENTAS, progreso, directorio)
+
+    def generar_libro_compras(self, anio, mes, progreso=None, directorio="reportes"):
+        """
+        Genera el Libro de Compras del mes (una línea por factura de proveedor)
+
+        Returns:
+            tuple: (ruta del CSV, número de facturas) o (None, 0) si hay error
+
+        Raises:
+            TrabajoCancelado: si el callback de progreso cancela el trabajo
+        """
+        return self._generar('compras', anio, mes, COLUMNAS_COMPRAS, progreso, directorio)
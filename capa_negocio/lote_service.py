@@ -0,0 +1,154 @@
+"""
+Servicio de lotes: asignación FEFO (primero en vencer, primero en salir) de las ventas
+"""
+import heapq
+from datetime import date, datetime
+from typing import List, Dict, Optional
+from loguru import logger
+from capa_negocio.base_service import BaseService
+from capa_negocio.indice_vencimientos import indice_vencimientos
+
+
+def _clave_vencimiento(fecha) -> date:
+    """Los lotes sin fecha de vencimiento salen de últimos"""
+    if fecha is None:
+        return date.max
+    if isinstance(fecha, datetime):
+        return fecha.date()
+    return fecha
+
+
+class AsignadorFEFO:
+    """
+    Mantiene por artículo un min-heap de lotes ordenado por vencimiento
+    y reparte cada cantidad vendida entre los lotes que vencen primero
+    """
+
+    def __init__(self, lotes_por_articulo: Dict[int, List[Dict]]):
+        """
+        Args:
+            lotes_por_articulo: {idarticulo: [{idlote, fecha_vencimiento, stock_actual}, ...]}
+        """
+        self._heaps = {}
+        for idarticulo, lotes in lotes_por_articulo.items():
+            heap = [(_clave_vencimiento(l['fecha_vencimiento']), l['idlote'], l['stock_actual'])
+                    for l in lotes if l['stock_actual'] > 0]
+            heapq.heapify(heap)
+            self._heaps[idarticulo] = heap
+
+    def tiene_lotes(self, idarticulo: int) -> bool:
+        return bool(self._heaps.get(idarticulo))
+
+    def asignar(self, idarticulo: int, cantidad: int):
+        """
+        Reparte una cantidad entre los lotes del artículo
+
+        Returns:
+            tuple: (lista de (idlote, cantidad), cantidad sin lote)
+        """
+        heap = self._heaps.get(idarticulo)
+        asignado = []
+        while cantidad > 0 and heap:
+            vencimiento, idlote, disponible = heapq.heappop(heap)
+            toma = min(disponible, cantidad)
+            asignado.append((idlote, toma))
+            cantidad -= toma
+            if disponible > toma:
+                heapq.heappush(heap, (vencimiento, idlote, disponible - toma))
+        return asignado, cantidad
+
+
+class LoteService(BaseService):
+    """Servicio que asigna por FEFO los lotes de las ventas y mantiene el índice de vencimientos"""
+
+    REINTENTOS = 3
+    DIAS_REPORTE_VENCIMIENTOS = 30
+
+    def __init__(self, repositorio, indice=None):
+        """
+        Args:
+            repositorio: Instancia de LoteRepositorio
+            indice: Índice de vencimientos (por defecto el compartido del proceso)
+        """
+        self.repositorio = repositorio
+        self.indice = indice if indice is not None else indice_vencimientos
+
+    def planificar_venta(self, detalle: List[Dict]) -> Optional[List[Dict]]:
+        """
+        Calcula la asignación FEFO de las líneas de una venta
+        (una consulta para todos los artículos, sin consultas por lote).
+        Los lotes se descuentan en la misma transacción que registra la venta.
+
+        Args:
+            detalle: Items con idarticulo y cantidad
+
+        Returns:
+            list: Asignaciones {idlote, idarticulo, cantidad}, una por lote;
+                  None si no se pudieron leer los lotes
+        """
+        idarticulos = list(dict.fromkeys(item['idarticulo'] for item in detalle))
+        disponibles = self.repositorio.listar_disponibles(idarticulos)
+        if disponibles is None:
+            return None
+        asignador = AsignadorFEFO(disponibles)
+
+        por_lote = {}
+        for item in detalle:
+            if not asignador.tiene_lotes(item['idarticulo']):
+                continue
+            asignado, sin_lote = asignador.asignar(item['idarticulo'], item['cantidad'])
+            for idlote, cantidad in asignado:
+                if idlote in por_lote:
+                    por_lote[idlote]['cantidad'] += cantidad
+                else:
+                    por_lote[idlote] = {'idlote': idlote, 'idarticulo': item['idarticulo'],
+                                        'cantidad': cantidad}
+            if sin_lote:
+                logger.warning(f"⚠️ {sin_lote} unidades del artículo {item['idarticulo']} "
+                               f"sin lote vigente que descontar")
+        return list(por_lote.values())
+
+    def refrescar_vencimientos(self) -> bool:
+        """
+        Aplica al índice los lotes modificados desde la última marca de agua
+        y genera el reporte diario de vencimientos la primera vez de cada día
+
+        Returns:
+            bool: False si no se pudo consultar la base de datos
+        """
+        lotes, marca = self.repositorio.listar_cambios_desde(self.indice.marca)
+        if lotes is None:
+            return False
+        for lote in lotes:
+            self.indice.aplicar(lote)
+        if lotes:
+            logger.info(f"📅 Índice de vencimientos: {len(lotes)} lotes actualizados")
+        self.indice.marca = marca
+
+        if self.indice.fecha_ultimo_reporte != date.today():
+            try:
+                self.indice.generar_reporte_diario(self.DIAS_REPORTE_VENCIMIENTOS)
+            except Exception as e:
+                logger.error(f"❌ Error al generar reporte de vencimientos: {e}")
+        return True
+
+    def proximos_vencer(self, dias: int = 30) -> List[Dict]:
+        """Lotes con stock que vencen en los próximos 'dias' días"""
+        if not self.validar_entero_positivo(dias, "Días"):
+            return []
+        self.refrescar_vencimientos()
+        return self.indice.proximos_vencer(dias)
+
+    def vencidos(self) -> List[Dict]:
+        """Lotes con stock ya vencidos"""
+        self.refrescar_vencimientos()
+        return self.indice.vencidos()
+
+    def eliminar(self, idlote: int) -> bool:
+        """Elimina un lote y lo quita del índice de vencimientos"""
+        if not self.validar_entero_positivo(idlote, "ID de lote"):
+            return False
+        if self.repositorio.eliminar(idlote):
+            self.indice.quitar(idlote)
+            return True
+        return False
@@ -4,6 +4,7 @@ Servicio para gestión de multimoneda y tasas de cambio
 from datetime import datetime
 from loguru import logger
 import requests
+from capa_negocio.dinero import Dinero, a_centimos, de_centimos, multiplicar
 
 class MonedaService:
     """Servicio para manejar operaciones con múltiples monedas"""
@@ -101,21 +102,23 @@ class MonedaService:
             tasa: Tasa de cambio (si es None, usa la actual)
         
         Returns:
-            float: Monto convertido
+            float: Monto convertido, redondeado al céntimo
         """
         if moneda_origen == moneda_destino:
             return monto
         
+        if 'VES' not in (moneda_origen, moneda_destino) or \
+                moneda_origen not in self.MONEDAS or moneda_destino not in self.MONEDAS:
+            logger.error(f"Conversión no soportada: {moneda_origen} → {moneda_destino}")
+            return monto
+        
         if tasa is None:
+            if 'EUR' in (moneda_origen, moneda_destino):
+                logger.error("La conversión con EUR requiere indicar la tasa")
+                return monto
             tasa = self.obtener_tasa_actual()
         
-        if moneda_origen == 'USD' and moneda_destino == 'VES':
-            return monto * tasa
-        elif moneda_origen == 'VES' and moneda_destino == 'USD':
-            return monto / tasa
-        else:
-            logger.error(f"Conversión no soportada: {moneda_origen} → {moneda_destino}")
-            return monto
+        return float(Dinero.desde(monto, moneda_origen).convertir(moneda_destino, tasa))
     
     def formatear_monto(self, monto, moneda='VES'):
         """Formatea un monto según la moneda"""
@@ -139,8 +142,8 @@ class IGTFService:
             moneda_transaccion: Moneda de la factura
             
         Returns:
-            float: Monto del IGTF
+            float: Monto del IGTF, redondeado al céntimo
         """
         if moneda_pago in ['USD', 'EUR']:
-            return monto * IGTFService.TASA_IGTF
+            return float(de_centimos(multiplicar(a_centimos(monto), IGTFService.TASA_IGTF)))
         return 0.0
@@ -0,0 +1,138 @@
+"""
+Motor de IVA por letra fiscal: tabla de alícuotas en memoria y desglose por línea
+(en una pasada para una venta, vectorizado con NumPy para recalcular historiales)
+"""
+import threading
+from decimal import Decimal, ROUND_HALF_UP
+import numpy as np
+from loguru import logger
+
+# Alícuotas de IVA por letra fiscal: Exento, General, Reducida y Adicional (lujo: 16% + 15%)
+ALICUOTAS = {'E': Decimal('0'), 'G': Decimal('0.16'), 'R': Decimal('0.08'), 'A': Decimal('0.31')}
+LETRAS = tuple(ALICUOTAS)
+# Artículos sin impuesto asignado tributan a la alícuota general (igual que el libro fiscal)
+LETRA_POR_DEFECTO = 'G'
+_CENTIMO = Decimal('0.01')
+_ALICUOTAS_ARRAY = np.array([float(ALICUOTAS[l]) for l in LETRAS])
+
+
+def _centimos(valores):
+    """Redondeo a céntimos mitad hacia arriba (como ROUND_HALF_UP en Decimal; np.round es bancario)"""
+    return np.floor(np.round(valores * 100, 6) + 0.5) / 100
+
+
+def desglose_vectorizado(grupo, letra, base, n_grupos):
+    """
+    Base e impuesto por grupo (venta) y letra fiscal
+
+    Args:
+        grupo: int[n], índice del grupo de cada línea (0..n_grupos-1)
+        letra: int[n], índice de la letra de cada línea en LETRAS
+        base: float[n], cantidad * precio de cada línea
+        n_grupos: Número de grupos
+
+    Returns:
+        tuple: (bases, impuestos) como arrays float[n_grupos, len(LETRAS)];
+               el impuesto se redondea a céntimos por grupo y letra
+    """
+    celdas = n_grupos * len(LETRAS)
+    bases = np.bincount(grupo * len(LETRAS) + letra, weights=base, minlength=celdas)
+    bases = _centimos(bases).reshape(n_grupos, len(LETRAS))
+    return bases, _centimos(bases * _ALICUOTAS_ARRAY)
+
+
+class MotorImpuestos:
+    """
+    Resuelve la letra fiscal de cada línea con la tabla `impuesto`, que se lee
+    una sola vez por sesión, y calcula base imponible e IVA por letra.
+    """
+
+    def __init__(self, impuesto_repo):
+        """
+        Args:
+            impuesto_repo: ImpuestoRepositorio
+        """
+        self.impuesto_repo = impuesto_repo
+        self._letras = None
+        self._lock = threading.Lock()
+
+    def tabla(self):
+        """
+        Returns:
+            dict: {id_impuesto: letra_fiscal}; vacío si no se pudo leer (se reintenta luego)
+        """
+        if self._letras is None:
+            with self._lock:
+                if self._letras is None:
+                    filas = self.impuesto_repo.listar()
+                    if filas is None:
+                        return {}
+                    self._letras = {
+                        f[0]: (f[1] or LETRA_POR_DEFECTO).strip().upper()
+                        for f in filas if (f[1] or LETRA_POR_DEFECTO).strip().upper() in ALICUOTAS
+                    }
+                    logger.info(f"🧾 Tabla de impuestos cargada: {len(self._letras)} alícuotas")
+        return self._letras
+
+    def recargar(self):
+        """Descarta la tabla en memoria (se vuelve a leer en el próximo cálculo)"""
+        with self._lock:
+            self._letras = None
+
+    def letra(self, id_impuesto):
+        """Letra fiscal de un id_impuesto (G si no tiene o no se conoce)"""
+        if id_impuesto is None:
+            return LETRA_POR_DEFECTO
+        return self.tabla().get(id_impuesto, LETRA_POR_DEFECTO)
+
+    @staticmethod
+    def impuesto(letra, base):
+        """IVA de una base (Decimal) a la alícuota de la letra, redondeado a céntimos"""
+        return (base * ALICUOTAS[letra]).quantize(_CENTIMO, ROUND_HALF_UP)
+
+    def desglosar(self, lineas):
+        """
+        Desglose de una venta en una pasada sobre sus líneas
+
+        Args:
+            lineas: Iterable de (id_impuesto, cantidad, precio_unitario)
+
+        Returns:
+            dict: {letra: (base, impuesto)} en Decimal, solo letras con base
+        """
+        bases = {}
+        for id_impuesto, cantidad, precio in lineas:
+            letra = self.letra(id_impuesto)
+            bases[letra] = bases.get(letra, Decimal('0')) + Decimal(str(precio)) * cantidad
+        desglose = {}
+        for letra, base in bases.items():
+            if base:
+                base = base.quantize(_CENTIMO, ROUND_HALF_UP)
+                desglose[letra] = (base, self.impuesto(letra, base))
+        return desglose
+
+    def recalcular_ventas(self, filas):
+        """
+        Desglose de muchas ventas a la vez (recalculo de facturas históricas)
+
+        Args:
+            filas: Secuencia de (idventa, id_impuesto, cantidad, precio_venta)
+
+        Returns:
+            dict: {idventa: {letra: (base, impuesto)}} en float, solo letras con base
+        """
+        n = len(filas)
+        if n == 0:
+            return {}
+        indice_letra = {l: i for i, l in enumerate(LETRAS)}
+        idventa = np.fromiter((f[0] for f in filas), dtype=np.int64, count=n)
+        letra = np.fromiter((indice_letra[self.letra(f[1])] for f in filas), dtype=np.int64, count=n)
+        base = np.fromiter((float(f[2]) * float(f[3]) for f in filas), dtype=np.float64, count=n)
+
+        ventas, grupo = np.unique(idventa, return_inverse=True)
+        bases, impuestos = desglose_vectorizado(grupo, letra, base, len(ventas))
+        return {
+            int(v): {LETRAS[j]: (float(bases[i, j]), float(impuestos[i, j]))
+                     for j in np.flatnonzero(bases[i])}
+            for i, v in enumerate(ventas)
+        }
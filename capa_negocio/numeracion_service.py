@@ -0,0 +1,148 @@
+"""
+Servicio de numeración automática de comprobantes por serie
+"""
+import os
+import socket
+import threading
+from typing import Dict, List, Optional
+from loguru import logger
+from capa_negocio.base_service import BaseService
+from config.seniat_config import SENIAT_CONFIG
+
+# Identificador de la terminal; debe ser único por caja en ejecución
+TERMINAL_ID = os.getenv('TERMINAL_ID') or socket.gethostname()
+
+
+class NumeracionService(BaseService):
+    """
+    Asigna el número de comprobante en memoria a partir de un bloque de
+    números reservado en el servidor para esta terminal, y reserva otro
+    bloque solo cuando se agota (un viaje a la base cada `tamano_bloque`
+    ventas). Los bloques de distintas terminales nunca se solapan.
+    """
+
+    def __init__(self, repositorio, terminal=None, config=None):
+        """
+        Args:
+            repositorio: NumeracionRepositorio
+            terminal: Identificador de la terminal (por defecto TERMINAL_ID)
+            config: Sección 'numeracion' de SENIAT_CONFIG
+        """
+        self.repositorio = repositorio
+        self.terminal = terminal or TERMINAL_ID
+        self.config = config or SENIAT_CONFIG['numeracion']
+        self.tamano_bloque = int(os.getenv('NUMERACION_BLOQUE', self.config.get('tamano_bloque', 50)))
+        self.digitos = self.config.get('digitos', 8)
+        self._bloques: Dict[str, Dict] = {}
+        self._lock = threading.Lock()
+
+    def serie_para(self, tipo_comprobante) -> str:
+        """Serie configurada para el tipo de comprobante"""
+        return self.config['series'].get(tipo_comprobante, 'F001')
+
+    def formatear(self, numero) -> str:
+        return str(numero).zfill(self.digitos)
+
+    def siguiente(self, serie) -> Optional[str]:
+        """
+        Próximo número de la serie para esta terminal
+
+        Returns:
+            str: Número con relleno de ceros o None si no se pudo reservar un bloque
+        """
+        with self._lock:
+            bloque = self._bloques.get(serie)
+            if bloque is None or bloque['siguiente'] > bloque['hasta']:
+                if bloque is not None:
+                    self.repositorio.cerrar_bloque(bloque['idbloque'], bloque['hasta'])
+                bloque = self._obtener_bloque(serie)
+                if bloque is None:
+                    return None
+                self._bloques[serie] = bloque
+            numero = bloque['siguiente']
+            bloque['siguiente'] += 1
+            return self.formatear(numero)
+
+    def devolver(self, serie, numero) -> bool:
+        """
+        Devuelve un número que no llegó a usarse (la venta fue rechazada y no se
+        grabó nada) para que lo reciba la próxima venta de la serie. Solo puede
+        devolverse el último número entregado; cualquier otro queda como hueco.
+
+        Returns:
+            bool: True si el número se reutilizará
+        """
+        with self._lock:
+            bloque = self._bloques.get(serie)
+            try:
+                numero = int(numero)
+            except (TypeError, ValueError):
+                return False
+            if bloque is None or bloque['siguiente'] - 1 != numero:
+                return False
+            bloque['siguiente'] = numero
+            return True
+
+    def _obtener_bloque(self, serie):
+        """Retoma el bloque que esta terminal dejó abierto o reserva uno nuevo"""
+        while True:
+            abierto = self.repositorio.bloque_abierto(serie, self.terminal)
+            if abierto is None:
+                return None
+            if not abierto:
+                break
+            idbloque, desde, hasta = abierto
+            usados = self.repositorio.numeros_usados(serie, desde, hasta)
+            if usados is None:
+                return None
+            siguiente = max(usados) + 1 if usados else desde
+            if siguiente <= hasta:
+                logger.info(f"🔢 Serie {serie}: se retoma el bloque {desde}-{hasta} desde {siguiente}")
+                return {'idbloque': idbloque, 'siguiente': siguiente, 'hasta': hasta}
+            self.repositorio.cerrar_bloque(idbloque, hasta)
+
+        reservado = self.repositorio.reservar_bloque(serie, self.terminal, self.tamano_bloque)
+        if reservado is None:
+            return None
+        idbloque, desde, hasta = reservado
+        logger.info(f"🔢 Serie {serie}: bloque {desde}-{hasta} reservado para {self.terminal}")
+        return {'idbloque': idbloque, 'siguiente': desde, 'hasta': hasta}
+
+    def liberar(self):
+        """
+        Cierra los bloques en uso al salir del sistema; los números que no se
+        alcanzaron a usar quedan reportados como huecos
+        """
+        with self._lock:
+            for serie, bloque in self._bloques.items():
+                ultimo = bloque['siguiente'] - 1
+                self.repositorio.cerrar_bloque(bloque['idbloque'], ultimo if ultimo >= 0 else None)
+            self._bloques.clear()
+
+    def huecos(self, serie=None) -> List[Dict]:
+        """
+        Números de bloques cerrados que no llegaron a tener venta (bloques
+        abandonados o cajas que se cerraron antes de agotarlos)
+
+        Args:
+            serie: Limitar a una serie (None = todas)
+
+        Returns:
+            list: dict con serie, idbloque, terminal, desde, hasta (rango de números faltantes)
+        """
+        huecos = []
+        for bloque in self.repositorio.listar_bloques(serie, 'CERRADO'):
+            usados = self.repositorio.numeros_usados(
+                bloque['serie'], bloque['numero_desde'], bloque['numero_hasta'])
+            if usados is None:
+                continue
+            inicio = None
+            for numero in range(bloque['numero_desde'], bloque['numero_hasta'] + 2):
+                falta = numero <= bloque['numero_hasta'] and numero not in usados
+                if falta and inicio is None:
+                    inicio = numero
+                elif not falta and inicio is not None:
+                    huecos.append({'serie': bloque['serie'], 'idbloque': bloque['idbloque'],
+                                   'terminal': bloque['terminal'], 'desde': inicio, 'hasta': numero - 1})
+                    inicio = None
+        return huecos
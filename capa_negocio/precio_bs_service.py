@@ -0,0 +1,227 @@
+"""
+Lista de precios en Bs. materializada: se recalcula (vectorizado con NumPy)
+una sola vez por cambio de tasa y se consulta en memoria
+"""
+import threading
+from typing import Dict, Optional
+import numpy as np
+from loguru import logger
+from capa_negocio.base_service import BaseService
+from capa_negocio.catalogo_cache import catalogo_cache
+from config.seniat_config import SENIAT_CONFIG
+
+MODOS_REDONDEO = ('cercano', 'arriba')
+
+
+def precios_en_bs(precios, tasa, redondeo=0.01, modo='cercano'):
+    """
+    Convierte precios en divisa a Bs. y los lleva al múltiplo de redondeo
+
+    Args:
+        precios: float[n], precios en divisa
+        tasa: Bs. por unidad de divisa
+        redondeo: Múltiplo en Bs. (0.01 = al céntimo)
+        modo: 'cercano' (mitad hacia arriba) o 'arriba' (nunca por debajo del precio convertido)
+
+    Returns:
+        np.ndarray: float[n] con los precios en Bs., exactos al céntimo
+    """
+    centimos = np.round(np.asarray(precios, dtype=np.float64) * tasa * 100, 6)
+    paso = max(int(round(redondeo * 100)), 1)
+    if modo == 'arriba':
+        multiplos = np.ceil(centimos / paso)
+    else:
+        multiplos = np.floor(centimos / paso + 0.5)
+    return multiplos * paso / 100
+
+
+class ListaPreciosBs:
+    """Precios en Bs. vigentes en memoria, con la tasa con que se calcularon"""
+
+    def __init__(self):
+        self._precios: Dict[int, float] = {}
+        self._lock = threading.Lock()
+        self.idtasa = None
+        self.tasa = None
+
+    def cargar(self, idtasa, tasa, precios):
+        """
+        Args:
+            idtasa: Registro de tasa_cambio usado
+            tasa: Valor de la tasa
+            precios: dict {idarticulo: precio_bs}
+        """
+        with self._lock:
+            self._precios = precios
+            self.idtasa = idtasa
+            self.tasa = tasa
+
+    def fijar(self, idarticulo, precio_bs):
+        with self._lock:
+            self._precios[idarticulo] = precio_bs
+
+    def precio(self, idarticulo) -> Optional[float]:
+        with self._lock:
+            return self._precios.get(idarticulo)
+
+    def __len__(self):
+        return len(self._precios)
+
+
+lista_precios_bs = ListaPreciosBs()
+
+
+class PrecioBsService(BaseService):
+    """
+    Mantiene la tabla precio_bs_vigente y la lista en memoria. Los precios de
+    artículo están en divisa; cuando se registra una tasa nueva se recalculan
+    todos de una vez, en lugar de convertir en cada pantalla y cada venta.
+    """
+
+    def __init__(self, repositorio, config=None):
+        """
+        Args:
+            repositorio: PrecioBsRepositorio
+            config: Sección 'precios_bs' de SENIAT_CONFIG
+        """
+        self.repositorio = repositorio
+        self.config = config or SENIAT_CONFIG['precios_bs']
+        self.moneda = self.config.get('moneda', 'USD')
+        self.redondeo = float(self.config.get('redondeo', 0.01))
+        self.modo = self.config.get('modo', 'cercano')
+        if self.modo not in MODOS_REDONDEO:
+            logger.warning(f"⚠️ Modo de redondeo desconocido '{self.modo}', se usa 'cercano'")
+            self.modo = 'cercano'
+
+    def sincronizar(self):
+        """
+        Carga la lista guardada; si se calculó con una tasa anterior a la
+        vigente (o no existe) la recalcula
+
+        Returns:
+            bool: True si hay una lista vigente en memoria
+        """
+        vigente = self.repositorio.ultima_tasa(self.moneda)
+        if vigente is None:
+            logger.warning(f"⚠️ Sin tasa {self.moneda}: no hay lista de precios en Bs.")
+            return False
+        filas = self.repositorio.listar()
+        if filas and all(f[1] == vigente[0] for f in filas):
+            lista_precios_bs.cargar(vigente[0], vigente[1], {f[0]: float(f[3]) for f in filas})
+            self._actualizar_catalogo()
+            logger.info(f"💱 Lista de precios en Bs. cargada: {len(filas)} artículos (tasa {vigente[1]:.2f})")
+            return True
+        return self.recalcular(vigente)
+
+    def recalcular(self, vigente=None):
+        """
+        Recalcula y guarda el precio en Bs. de todos los artículos
+
+        Args:
+            vigente: (idtasa, tasa) a usar; por defecto la última registrada
+
+        Returns:
+            bool: True si se guardó la lista nueva
+        """
+        vigente = vigente or self.repositorio.ultima_tasa(self.moneda)
+        if vigente is None:
+            logger.warning(f"⚠️ Sin tasa {self.moneda}: no se recalculan los precios en Bs.")
+            return False
+        idtasa, tasa = vigente
+
+        filas = self.repositorio.precios_divisa()
+        if filas is None:
+            logger.warning("⚠️ No se pudieron leer los precios: se conserva la lista de precios en Bs. vigente")
+            return False
+        ids = np.fromiter((f[0] for f in filas), dtype=np.int64, count=len(filas))
+        divisa = np.fromiter((float(f[1]) for f in filas), dtype=np.float64, count=len(filas))
+        divisa = np.floor(np.round(divisa * 100, 6) + 0.5) / 100
+        bs = precios_en_bs(divisa, tasa, self.redondeo, self.modo)
+
+        if not self.repositorio.reemplazar(idtasa, tasa, list(zip(ids.tolist(), divisa.tolist(), bs.tolist()))):
+            return False
+        lista_precios_bs.cargar(idtasa, tasa, dict(zip(ids.tolist(), bs.tolist())))
+        self._actualizar_catalogo()
+        logger.info(f"💱 Precios en Bs. recalculados: {len(filas)} artículos con tasa {tasa:.2f}")
+        return True
+
+    def actualizar_articulo(self, idarticulo, precio_divisa):
+        """
+        Recalcula el precio en Bs. de un solo artículo (tras cambiar su precio)
+        con la tasa de la lista vigente
+
+        Returns:
+            bool: True si se guardó; False si no hay lista vigente o hubo error
+        """
+        if lista_precios_bs.idtasa is None:
+            return False
+        divisa = round(float(precio_divisa), 2)
+        bs = float(precios_en_bs([divisa], lista_precios_bs.tasa, self.redondeo, self.modo)[0])
+        if not self.repositorio.guardar_precio(idarticulo, lista_precios_bs.idtasa, lista_precios_bs.tasa,
+                                               divisa, bs):
+            return False
+        lista_precios_bs.fijar(idarticulo, bs)
+        if catalogo_cache.obtener(idarticulo) is not None:
+            catalogo_cache.actualizar_articulo({'idarticulo': idarticulo, 'precio_bs': bs})
+        return True
+
+    def refrescar(self):
+        """
+        Recarga la lista si la guardada se calculó con otra tasa que la de
+        memoria (otra terminal registró una tasa nueva y la recalculó). Se
+        llama al iniciar cada venta; cuesta una consulta.
+
+        Returns:
+            bool: True si hay una lista vigente en memoria
+        """
+        idtasa = self.repositorio.idtasa_vigente()
+        if idtasa is None:
+            return lista_precios_bs.idtasa is not None
+        if idtasa and idtasa == lista_precios_bs.idtasa:
+            return True
+        logger.info(f"💱 La lista de precios en Bs. cambió (tasa {lista_precios_bs.idtasa} -> {idtasa}), recargando")
+        return self.sincronizar()
+
+    def precio_bs_venta(self, articulo, tasa) -> Optional[float]:
+        """
+        Precio en Bs. con que se cobra un artículo en una venta
+
+        Args:
+            articulo: dict del artículo o ID
+            tasa: Tasa de cambio de la venta
+
+        Returns:
+            float: Precio de la lista (el mismo que se exhibe) si se calculó con
+                   esa tasa; None si la lista es de otra tasa, y entonces el
+                   monto en Bs. se obtiene convirtiendo el total
+        """
+        if lista_precios_bs.tasa is None or round(lista_precios_bs.tasa, 4) != round(float(tasa), 4):
+            return None
+        return self.precio_bs(articulo)
+
+    def al_registrar_tasa(self, moneda, tasa):
+        """Suscriptor de TasaService: recalcula si cambió la tasa de la moneda de los precios"""
+        if moneda == self.moneda:
+            self.recalcular()
+
+    def _actualizar_catalogo(self):
+        """Pone el precio en Bs. vigente en los artículos de la caché del catálogo"""
+        for articulo in catalogo_cache.listar():
+            precio = lista_precios_bs.precio(articulo['idarticulo'])
+            if precio is not None:
+                catalogo_cache.actualizar_articulo({'idarticulo': articulo['idarticulo'], 'precio_bs': precio})
+
+    def precio_bs(self, articulo) -> Optional[float]:
+        """
+        Precio en Bs. vigente de un artículo (dict o ID)
+
+        Returns:
+            float: Precio precalculado; si el artículo no está en la lista se
+                   convierte al vuelo con la tasa vigente; None si no hay tasa
+        """
+        idarticulo = articulo['idarticulo'] if isinstance(articulo, dict) else articulo
+        precio = lista_precios_bs.precio(idarticulo)
+        if precio is not None or lista_precios_bs.tasa is None or not isinstance(articulo, dict):
+            return precio
+        return float(precios_en_bs([float(articulo.get('precio_venta') or 0)], lista_precios_bs.tasa,
+                                   self.redondeo, self.modo)[0])
@@ -5,31 +5,35 @@ from datetime import datetime, timedelta
 from loguru import logger
 import csv
 import os
+from capa_negocio.cache_reportes import cache_reportes
+from capa_negocio.dinero import a_centimos, de_centimos
+from capa_negocio.exportador import exportar_bloques
 
 class ReporteContableService:
     """Genera reportes contables para ventas y movimientos"""
     
-    def __init__(self, venta_service, inventario_service):
+    def __init__(self, venta_service, inventario_service, cache=None):
         self.venta_service = venta_service
         self.inventario_service = inventario_service
+        self.cache = cache if cache is not None else cache_reportes
         logger.info("✅ ReporteContableService inicializado")
     
     def obtener_ventas_por_periodo(self, fecha_inicio, fecha_fin):
         """
         Obtiene todas las ventas en un período
         """
-        ventas = self.venta_service.ventas_por_fecha(fecha_inicio, fecha_fin)
+        ventas = self._ventas_periodo(fecha_inicio, fecha_fin)
         
         print("\n" + "="*60)
         print("🔍 DEPURACIÓN DE VENTAS")
         print("="*60)
         print(f"Total ventas encontradas: {len(ventas)}")
         
-        # Calcular totales por moneda
-        total_bs = 0.0
-        total_usd = 0.0
-        total_eur = 0.0
-        igtf_total = 0.0
+        # Calcular totales por moneda (en céntimos enteros: sumas exactas)
+        total_bs = 0
+        total_usd = 0
+        total_eur = 0
+        igtf_total = 0
         
         for idx, v in enumerate(ventas):
             print(f"\n--- VENTA #{idx+1} (ID: {v.get('idventa')}) ---")
@@ -51,17 +55,20 @@ class ReporteContableService:
             
             # Sumar según moneda
             if moneda == 'VES' and monto_bs is not None:
-                total_bs += float(monto_bs)
-                print(f"   ✓ Sumando a Bs.: +{float(monto_bs)}")
+                total_bs += a_centimos(monto_bs)
+                print(f"   ✓ Sumando a Bs.: +{monto_bs}")
             elif moneda == 'USD' and monto_divisa is not None:
-                total_usd += float(monto_divisa)
-                print(f"   ✓ Sumando a USD: +{float(monto_divisa)}")
+                total_usd += a_centimos(monto_divisa)
+                print(f"   ✓ Sumando a USD: +{monto_divisa}")
             elif moneda == 'EUR' and monto_divisa is not None:
-                total_eur += float(monto_divisa)
-                print(f"   ✓ Sumando a EUR: +{float(monto_divisa)}")
+                total_eur += a_centimos(monto_divisa)
+                print(f"   ✓ Sumando a EUR: +{monto_divisa}")
             else:
                 print(f"   ✗ No se pudo sumar - moneda: {moneda}, monto_bs: {monto_bs}, monto_divisa: {monto_divisa}")
         
+        total_bs, total_usd, total_eur, igtf_total = (
+            de_centimos(total_bs), de_centimos(total_usd), de_centimos(total_eur), de_centimos(igtf_total))
+        
         print("\n" + "="*60)
         print("📊 TOTALES CALCULADOS:")
         print(f"   Bs.: {total_bs}")
@@ -82,6 +89,52 @@ class ReporteContableService:
             'detalle': self._agrupar_por_dia(ventas)
         }
     
+    def _ventas_periodo(self, fecha_inicio, fecha_fin):
+        """
+        Ventas del período (más recientes primero). Los días cerrados salen de la
+        caché si su versión coincide con la de la base de datos; los que faltan y
+        el día en curso se consultan por tramos consecutivos.
+        """
+        inicio = fecha_inicio.date() if isinstance(fecha_inicio, datetime) else fecha_inicio
+        fin = fecha_fin.date() if isinstance(fecha_fin, datetime) else fecha_fin
+        hoy = datetime.now().date()
+        dias = [inicio + timedelta(days=i) for i in range((fin - inicio).days + 1)]
+        
+        # Sin versiones (error de consulta) no se usa ni se alimenta la caché
+        versiones = self.venta_service.versiones_dias(inicio, fin) if inicio < hoy else {}
+        
+        por_dia = {}
+        faltantes = []
+        for dia in dias:
+            ventas = None
+            if dia < hoy and versiones is not None:
+                ventas = self.cache.obtener('ventas_dia', dia, version=versiones.get(dia, 0))
+            if ventas is None:
+                faltantes.append(dia)
+            else:
+                por_dia[dia] = ventas
+        
+        # Una consulta por cada tramo consecutivo de días que no están en caché
+        tramos = []
+        for dia in faltantes:
+            if tramos and (dia - tramos[-1][1]).days == 1:
+                tramos[-1][1] = dia
+            else:
+                tramos.append([dia, dia])
+        for desde, hasta in tramos:
+            consultadas = self.venta_service.ventas_por_dia(desde, hasta)
+            if consultadas is None:
+                return self.venta_service.ventas_por_fecha(fecha_inicio, fecha_fin)
+            for dia in (desde + timedelta(days=i) for i in range((hasta - desde).days + 1)):
+                por_dia[dia] = consultadas.get(dia, [])
+                if versiones is not None:
+                    self.cache.guardar('ventas_dia', dia, por_dia[dia], version=versiones.get(dia, 0))
+        if faltantes:
+            logger.info(f"📦 Reporte {inicio} a {fin}: {len(dias) - len(faltantes)} días desde caché, "
+                        f"{len(faltantes)} consultados")
+        
+        return [venta for dia in reversed(dias) for venta in por_dia[dia]]
+    
     def _agrupar_por_dia(self, ventas):
         """Agrupa ventas por día para reportes detallados"""
         dias = {}
@@ -95,9 +148,9 @@ class ReporteContableService:
             if fecha not in dias:
                 dias[fecha] = {
                     'ventas': 0,
-                    'bs': 0.0,
-                    'usd': 0.0,
-                    'eur': 0.0
+                    'bs': 0,
+                    'usd': 0,
+                    'eur': 0
                 }
             
             dias[fecha]['ventas'] += 1
@@ -108,12 +161,16 @@ class ReporteContableService:
             monto_divisa = v.get('monto_divisa')
             
             if moneda == 'VES' and monto_bs is not None:
-                dias[fecha]['bs'] += float(monto_bs)
+                dias[fecha]['bs'] += a_centimos(monto_bs)
             elif moneda == 'USD' and monto_divisa is not None:
-                dias[fecha]['usd'] += float(monto_divisa)
+                dias[fecha]['usd'] += a_centimos(monto_divisa)
             elif moneda == 'EUR' and monto_divisa is not None:
-                dias[fecha]['eur'] += float(monto_divisa)
+                dias[fecha]['eur'] += a_centimos(monto_divisa)
         
+        # Céntimos acumulados -> importes con dos decimales
+        for dia in dias.values():
+            for moneda in ('bs', 'usd', 'eur'):
+                dia[moneda] = de_centimos(dia[moneda])
         return dias
     
     def reporte_diario(self, fecha=None):
@@ -194,3 +251,40 @@ class ReporteContableService:
         
         logger.info(f"✅ Reporte exportado: {ruta_completa}")
         return ruta_completa
+    
+    def exportar_ventas_stream(self, fecha_inicio, fecha_fin, formato='csv', comprimir=False, progreso=None):
+        """
+        Exporta fila a fila las ventas de un período sin cargarlas en memoria
+        
+        Args:
+            fecha_inicio: Fecha inicial
+            fecha_fin: Fecha final
+            formato: 'csv' o 'xlsx'
+            comprimir: Generar .csv.gz
+            progreso: Callable opcional que recibe las filas escritas hasta el momento
+            
+        Returns:
+            tuple: (ruta del archivo, filas exportadas) o (None, 0) si hay error
+        """
+        nombre = f"ventas_{fecha_inicio:%Y%m%d}_{fecha_fin:%Y%m%d}"
+        bloques = self.venta_service.repositorio.iterar_ventas_por_fecha(fecha_inicio, fecha_fin)
+        try:
+            return exportar_bloques(bloques, nombre, formato, comprimir, progreso)
+        except Exception as e:
+            logger.error(f"❌ Error exportando ventas: {e}")
+            return None, 0
+    
+    def exportar_kardex_stream(self, fecha_inicio, fecha_fin, formato='csv', comprimir=False, progreso=None):
+        """
+        Exporta fila a fila los movimientos de kardex de un período sin cargarlos en memoria
+        
+        Returns:
+            tuple: (ruta del archivo, filas exportadas) o (None, 0) si hay error
+        """
+        nombre = f"kardex_{fecha_inicio:%Y%m%d}_{fecha_fin:%Y%m%d}"
+        bloques = self.inventario_service.repo.iterar_kardex_por_fecha(fecha_inicio, fecha_fin)
+        try:
+            return exportar_bloques(bloques, nombre, formato, comprimir, progreso)
+        except Exception as e:
+            logger.error(f"❌ Error exportando kardex: {e}")
+            return None, 0
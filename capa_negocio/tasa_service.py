@@ -26,8 +26,26 @@ class TasaService(BaseService):
         super().__init__()
         self.repo = repositorio_tasa
         self.modo_automatico = False  # Por ahora manual
+        self._suscriptores = []
         logger.info("✅ TasaService inicializado en modo MANUAL")
     
+    def suscribir(self, callback):
+        """
+        Registra un callable(moneda, tasa) que se invoca al registrar una tasa nueva
+        
+        Args:
+            callback: Función a notificar (p. ej. el recálculo de precios en Bs.)
+        """
+        if callback not in self._suscriptores:
+            self._suscriptores.append(callback)
+    
+    def _notificar(self, moneda, tasa):
+        for callback in list(self._suscriptores):
+            try:
+                callback(moneda, tasa)
+            except Exception as e:
+                logger.error(f"Error en suscriptor de tasa {callback}: {e}")
+    
     def obtener_tasa_del_dia(self, moneda='USD'):
         """
         Obtiene la última tasa registrada para una moneda
@@ -83,6 +101,7 @@ class TasaService(BaseService):
             
             if resultado:
                 logger.info(f"✅ Tasa {moneda} registrada: {tasa:.2f} por {usuario}")
+                self._notificar(moneda, tasa)
                 return True
             return False
             
@@ -0,0 +1,297 @@
+"""
+Ejecución de reportes y exportaciones pesadas en un pool de procesos
+(el menú de caja sigue respondiendo mientras se generan)
+"""
+import itertools
+import multiprocessing
+import os
+import sys
+import threading
+from concurrent.futures import ProcessPoolExecutor, CancelledError
+from concurrent.futures import TimeoutError as TiempoAgotado
+from datetime import datetime
+from loguru import logger
+
+PROCESOS_REPORTES = int(os.getenv('REPORTES_PROCESOS', '2'))
+TIMEOUT_CONSULTA_SEG = int(os.getenv('REPORTES_TIMEOUT_SEG', '300'))
+
+
+class TrabajoCancelado(Exception):
+    """El usuario canceló el trabajo mientras se ejecutaba"""
+
+
+# ======================================================
+# LADO DEL PROCESO DE TRABAJO
+# ======================================================
+
+_conexion_proceso = None
+_progreso = None
+_cancelados = None
+
+
+def _inicializar_proceso(progreso, cancelados):
+    """Inicializador de cada proceso del pool"""
+    global _progreso, _cancelados
+    _progreso = progreso
+    _cancelados = cancelados
+    # Los reportes imprimen depuración; no debe mezclarse con la pantalla de caja
+    sys.stdout = open(os.devnull, 'w')
+
+
+def _abrir_conexion():
+    """Conexión nueva de solo lectura con timeout de consulta"""
+    from capa_datos.conexion import obtener_conexion
+    conn = obtener_conexion()
+    if conn is None:
+        raise RuntimeError("No se pudo conectar a la base de datos")
+    conn.timeout = TIMEOUT_CONSULTA_SEG
+    return conn
+
+
+def _conexion():
+    """Conexión del proceso, reutilizada entre trabajos"""
+    global _conexion_proceso
+    if _conexion_proceso is None:
+        _conexion_proceso = _abrir_conexion()
+    return _conexion_proceso
+
+
+def _descartar_conexion():
+    global _conexion_proceso
+    if _conexion_proceso is not None:
+        try:
+            _conexion_proceso.close()
+        except Exception:
+            pass
+        _conexion_proceso = None
+
+
+def _informar(idtrabajo):
+    """Callback de progreso: publica las filas procesadas y atiende la cancelación"""
+    def progreso(filas):
+        _progreso[idtrabajo] = filas
+        if _cancelados.get(idtrabajo):
+            raise TrabajoCancelado(f"Trabajo {idtrabajo} cancelado")
+    return progreso
+
+
+def _servicio_reportes():
+    from capa_datos.venta_repo import VentaRepositorio
+    from capa_negocio.venta_service import VentaService
+    from capa_negocio.reporte_contable_service import ReporteContableService
+    venta_service = VentaService(VentaRepositorio(_conexion()), None, None, None)
+    return ReporteContableService(venta_service, None)
+
+
+def _reporte_periodo(idtrabajo, fecha_inicio, fecha_fin):
+    datos = _servicio_reportes().obtener_ventas_por_periodo(fecha_inicio, fecha_fin)
+    _informar(idtrabajo)(datos['total_ventas'])
+    return datos
+
+
+def _exportar_resumen(idtrabajo, fecha_inicio, fecha_fin):
+    servicio = _servicio_reportes()
+    datos = servicio.obtener_ventas_por_periodo(fecha_inicio, fecha_fin)
+    _informar(idtrabajo)(datos['total_ventas'])
+    return servicio.exportar_a_csv(datos), len(datos['detalle'])
+
+
+def _exportar_ventas(idtrabajo, fecha_inicio, fecha_fin, formato='csv', comprimir=False):
+    from capa_datos.venta_repo import VentaRepositorio
+    from capa_negocio.exportador import exportar_bloques
+    bloques = VentaRepositorio(_conexion()).iterar_ventas_por_fecha(fecha_inicio, fecha_fin)
+    nombre = f"ventas_{fecha_inicio:%Y%m%d}_{fecha_fin:%Y%m%d}"
+    return exportar_bloques(bloques, nombre, formato, comprimir, _informar(idtrabajo))
+
+
+def _exportar_kardex(idtrabajo, fecha_inicio, fecha_fin, formato='csv', comprimir=False):
+    from capa_datos.inventario_repo import InventarioRepositorio
+    from capa_negocio.exportador import exportar_bloques
+    bloques = InventarioRepositorio(_conexion()).iterar_kardex_por_fecha(fecha_inicio, fecha_fin)
+    nombre = f"kardex_{fecha_inicio:%Y%m%d}_{fecha_fin:%Y%m%d}"
+    return exportar_bloques(bloques, nombre, formato, comprimir, _informar(idtrabajo))
+
+
+def _libro_fiscal(idtrabajo, libro, anio, mes):
+    from capa_negocio.libro_fiscal_service import LibroFiscalService
+    servicio = LibroFiscalService(fabrica_conexion=_abrir_conexion)
+    generar = servicio.generar_libro_ventas if libro == 'ventas' else servicio.generar_libro_compras
+    ruta, facturas = generar(anio, mes, _informar(idtrabajo))
+    if ruta is None:
+        raise RuntimeError(f"No se pudo generar el libro de {libro} {mes:02d}/{anio}")
+    return ruta, facturas
+
+
+TAREAS = {
+    'reporte_periodo': _reporte_periodo,
+    'exportar_resumen': _exportar_resumen,
+    'exportar_ventas': _exportar_ventas,
+    'exportar_kardex': _exportar_kardex,
+    'libro_fiscal': _libro_fiscal,
+}
+
+
+def _ejecutar(idtrabajo, tarea, args, kwargs):
+    """Punto de entrada en el proceso de trabajo"""
+    try:
+        return TAREAS[tarea](idtrabajo, *args, **kwargs)
+    except TrabajoCancelado:
+        raise
+    except Exception:
+        # La conexión pudo quedar inutilizable (timeout, red); el próximo trabajo abre otra
+        _descartar_conexion()
+        raise
+
+
+# ======================================================
+# LADO DEL MENÚ
+# ======================================================
+
+class TrabajoReporte:
+    """Manejador de un trabajo enviado al pool, para consultar su estado desde el menú"""
+
+    def __init__(self, idtrabajo, descripcion, future, ejecutor):
+        self.idtrabajo = idtrabajo
+        self.descripcion = descripcion
+        self.inicio = datetime.now()
+        self._future = future
+        self._ejecutor = ejecutor
+
+    def estado(self):
+        """PENDIENTE, EN CURSO, TERMINADO, CANCELADO o ERROR"""
+        if self._future.cancelled():
+            return 'CANCELADO'
+        if not self._future.done():
+            return 'EN CURSO' if self._future.running() else 'PENDIENTE'
+        error = self._future.exception()
+        if isinstance(error, TrabajoCancelado):
+            return 'CANCELADO'
+        return 'ERROR' if error else 'TERMINADO'
+
+    def terminado(self):
+        return self._future.done()
+
+    def progreso(self):
+        """Filas procesadas hasta el momento"""
+        return self._ejecutor.progreso(self.idtrabajo)
+
+    def resultado(self, timeout=None):
+        """
+        Espera el resultado del trabajo
+
+        Returns:
+            Resultado de la tarea o None si terminó con error o fue cancelado
+        """
+        try:
+            return self._future.result(timeout)
+        except (CancelledError, TrabajoCancelado):
+            return None
+        except TiempoAgotado:
+            raise
+        except Exception as e:
+            logger.error(f"❌ Trabajo {self.idtrabajo} ({self.descripcion}) falló: {e}")
+            return None
+
+    def error(self):
+        if self._future.done() and not self._future.cancelled():
+            return self._future.exception()
+        return None
+
+    def cancelar(self):
+        """
+        Cancela el trabajo: si no empezó se descarta; si está en curso se
+        detiene en el siguiente bloque de filas
+
+        Returns:
+            bool: True si se pidió la cancelación
+        """
+        if self._future.done():
+            return False
+        if self._future.cancel():
+            return True
+        self._ejecutor.pedir_cancelacion(self.idtrabajo)
+        return True
+
+
+class EjecutorReportes:
+    """
+    Pool de procesos para reportes. Cada proceso mantiene su propia conexión de
+    lectura (con timeout de consulta) y la reutiliza entre trabajos; el progreso
+    y las cancelaciones se comparten mediante un Manager.
+    """
+
+    def __init__(self, procesos=None):
+        self.procesos = procesos or PROCESOS_REPORTES
+        self._pool = None
+        self._manager = None
+        self._progreso = None
+        self._cancelados = None
+        self._trabajos = []
+        self._contador = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def _iniciar(self):
+        # spawn: los procesos no heredan la conexión ni los hilos del menú
+        contexto = multiprocessing.get_context('spawn')
+        self._manager = contexto.Manager()
+        self._progreso = self._manager.dict()
+        self._cancelados = self._manager.dict()
+        self._pool = ProcessPoolExecutor(
+            max_workers=self.procesos,
+            mp_context=contexto,
+            initializer=_inicializar_proceso,
+            initargs=(self._progreso, self._cancelados)
+        )
+        logger.info(f"✅ Pool de reportes iniciado ({self.procesos} procesos)")
+
+    def enviar(self, tarea, *args, descripcion=None, **kwargs):
+        """
+        Envía una tarea al pool
+
+        Args:
+            tarea: Clave de TAREAS ('reporte_periodo', 'exportar_resumen', 'exportar_ventas',
+                   'exportar_kardex', 'libro_fiscal')
+            *args, **kwargs: Argumentos de la tarea
+            descripcion: Texto para mostrar en la lista de trabajos
+
+        Returns:
+            TrabajoReporte: Manejador del trabajo
+        """
+        if tarea not in TAREAS:
+            raise ValueError(f"Tarea de reporte desconocida: {tarea}")
+        with self._lock:
+            if self._pool is None:
+                self._iniciar()
+            idtrabajo = next(self._contador)
+            future = self._pool.submit(_ejecutar, idtrabajo, tarea, args, kwargs)
+            trabajo = TrabajoReporte(idtrabajo, descripcion or tarea, future, self)
+            self._trabajos.append(trabajo)
+        logger.info(f"📤 Trabajo {idtrabajo} enviado: {trabajo.descripcion}")
+        return trabajo
+
+    def trabajos(self):
+        """Trabajos enviados en esta sesión, del más reciente al más antiguo"""
+        return list(reversed(self._trabajos))
+
+    def progreso(self, idtrabajo):
+        if self._progreso is None:
+            return 0
+        return self._progreso.get(idtrabajo, 0)
+
+    def pedir_cancelacion(self, idtrabajo):
+        if self._cancelados is not None:
+            self._cancelados[idtrabajo] = True
+
+    def cerrar(self):
+        """Cancela los trabajos pendientes y detiene los procesos"""
+        with self._lock:
+            if self._pool is None:
+                return
+            for trabajo in self._trabajos:
+                trabajo.cancelar()
+            self._pool.shutdown(wait=True, cancel_futures=True)
+            self._manager.shutdown()
+            self._pool = None
+            self._manager = None
+            self._progreso = None
+            self._cancelados = None
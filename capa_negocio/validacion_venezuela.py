@@ -1,5 +1,11 @@
 from datetime import datetime
 import re
+import numpy as np
+
+# Dígito verificador del RIF (módulo 11): valor de la letra y pesos de letra + 8 dígitos
+VALOR_LETRA_RIF = {'V': 1, 'E': 2, 'J': 3, 'P': 4, 'G': 5}
+PESOS_RIF = np.array([3, 2, 7, 6, 5, 4, 3, 2])
+PESO_LETRA_RIF = 4
 
 class ValidacionVenezuela:
     """Clase con métodos de validación para documentos venezolanos"""
@@ -23,7 +29,8 @@ class ValidacionVenezuela:
     @staticmethod
     def validar_rif(rif):
         """
-        Valida un RIF venezolano (formato: J123456789, G123456789, etc)
+        Valida un RIF venezolano (formato: J123456789, G123456789, etc),
+        incluido el dígito verificador
         Retorna: (bool, mensaje_error)
         """
         if not rif:
@@ -34,8 +41,42 @@ class ValidacionVenezuela:
         if not re.match(patron, rif):
             return False, "Formato inválido. Debe ser letra (J,P,G,V,E) seguida de 9 dígitos"
         
+        if ValidacionVenezuela.digito_verificador_rif(rif[0], rif[1:9]) != int(rif[9]):
+            return False, "Dígito verificador del RIF inválido"
+        
         return True, ""
     
+    @staticmethod
+    def digito_verificador_rif(letra, numero):
+        """
+        Calcula el dígito verificador de un RIF
+        
+        Args:
+            letra: V, E, J, P o G
+            numero: Los 8 dígitos del RIF (sin el verificador)
+        """
+        return int(ValidacionVenezuela.digitos_verificadores_rif([letra], [numero])[0])
+    
+    @staticmethod
+    def digitos_verificadores_rif(letras, numeros):
+        """
+        Dígitos verificadores de muchos RIF a la vez (vectorizado con NumPy)
+        
+        Args:
+            letras: Secuencia de letras (V, E, J, P, G)
+            numeros: Secuencia de cadenas de 8 dígitos, en el mismo orden
+        Retorna: np.ndarray de enteros 0-9
+        """
+        if not len(numeros):
+            return np.zeros(0, dtype=np.int64)
+        digitos = (np.frombuffer(''.join(numeros).encode('ascii'), dtype=np.uint8)
+                   .reshape(len(numeros), 8).astype(np.int64) - ord('0'))
+        letra = np.array([VALOR_LETRA_RIF[l] for l in letras], dtype=np.int64)
+        resto = (letra * PESO_LETRA_RIF + digitos @ PESOS_RIF) % 11
+        verificador = 11 - resto
+        verificador[verificador >= 10] = 0
+        return verificador
+    
     @staticmethod
     def validar_fecha(fecha_str):
         """
@@ -1,15 +1,27 @@
 """
 Servicio para la gestión de ventas - VERSIÓN CON MULTIMONEDA Y TASAS DE CAMBIO
 """
+import os
+import threading
+import uuid
+from collections import OrderedDict
 from loguru import logger
 from capa_negocio.base_service import BaseService
+from capa_negocio.cache_reportes import cache_reportes
+from capa_negocio.dinero import Dinero, a_centimos, multiplicar
+from capa_negocio.eventos_stock import crear_evento
+from capa_negocio.lote_service import LoteService
 from capa_negocio.moneda_service import IGTFService
 from capa_negocio.tasa_service import TasaService
 
 class VentaService(BaseService):
     """Servicio que implementa la lógica de negocio para ventas con soporte multimoneda"""
     
-    def __init__(self, repositorio, cliente_service, trabajador_service, inventario_service, tasa_repo=None):
+    # Ventas recientes guardadas en memoria en esta terminal (reimpresión inmediata)
+    VENTAS_EN_CACHE = int(os.getenv('VENTAS_EN_CACHE', '20'))
+    
+    def __init__(self, repositorio, cliente_service, trabajador_service, inventario_service, tasa_repo=None,
+                 motor_impuestos=None):
         """
         Inicializa el servicio de ventas
         
@@ -19,12 +31,14 @@ class VentaService(BaseService):
             trabajador_service: Servicio de trabajadores
             inventario_service: Servicio de inventario
             tasa_repo: Repositorio de tasas (opcional, para multimoneda)
+            motor_impuestos: MotorImpuestos (opcional, IVA por letra fiscal)
         """
         super().__init__()
         self.repositorio = repositorio
         self.cliente_service = cliente_service
         self.trabajador_service = trabajador_service
         self.inventario_service = inventario_service
+        self.motor_impuestos = motor_impuestos
         
         # Inicializar servicio de tasas si se proporciona el repositorio
         if tasa_repo:
@@ -34,6 +48,9 @@ class VentaService(BaseService):
             self.tasa_service = None
             logger.warning("⚠️ Servicio de tasas no disponible - solo moneda VES")
         
+        self._ventas_recientes = OrderedDict()
+        self._lock_cache = threading.Lock()
+        
         logger.info("✅ VentaService inicializado")
     
     def listar(self):
@@ -49,12 +66,14 @@ class VentaService(BaseService):
             logger.error(f"Error al listar ventas: {e}")
             return []
     
-    def obtener_por_id(self, idventa):
+    def obtener_por_id(self, idventa, usar_cache=False):
         """
-        Obtiene una venta por su ID con todos los detalles
+        Obtiene una venta por su ID con todos los detalles (un solo round trip)
         
         Args:
             idventa (int): ID de la venta
+            usar_cache (bool): Devolver la copia en memoria si la venta es reciente
+                               (reimpresiones)
             
         Returns:
             dict: Datos de la venta o None si no existe
@@ -63,24 +82,61 @@ class VentaService(BaseService):
             if not self.validar_entero_positivo(idventa, "ID de venta"):
                 return None
             
-            venta = self.repositorio.obtener_por_id(idventa)
+            if usar_cache:
+                with self._lock_cache:
+                    venta = self._ventas_recientes.get(idventa)
+                    if venta is not None:
+                        self._ventas_recientes.move_to_end(idventa)
+                        return self._copiar_venta(venta)
+            
+            venta = self.repositorio.obtener_con_detalle(idventa)
             if not venta:
                 logger.warning(f"Venta {idventa} no encontrada")
                 return None
             
-            detalles = self.repositorio.obtener_detalles(idventa)
-            venta['detalle'] = detalles
-            return venta
+            self._guardar_en_cache(venta)
+            return self._copiar_venta(venta)
             
         except Exception as e:
             logger.error(f"Error al obtener venta {idventa}: {e}")
             return None
     
+    @staticmethod
+    def _copiar_venta(venta):
+        copia = dict(venta)
+        copia['detalle'] = [dict(d) for d in venta.get('detalle', [])]
+        return copia
+    
+    def _guardar_en_cache(self, venta):
+        if self.VENTAS_EN_CACHE <= 0:
+            return
+        with self._lock_cache:
+            self._ventas_recientes[venta['idventa']] = venta
+            self._ventas_recientes.move_to_end(venta['idventa'])
+            while len(self._ventas_recientes) > self.VENTAS_EN_CACHE:
+                self._ventas_recientes.popitem(last=False)
+    
+    def invalidar_cache(self, idventa=None):
+        """
+        Descarta una venta (o todas) de la caché de ventas recientes
+        
+        Args:
+            idventa (int): ID de la venta; None = vaciar la caché
+        """
+        with self._lock_cache:
+            if idventa is None:
+                self._ventas_recientes.clear()
+            else:
+                self._ventas_recientes.pop(idventa, None)
+    
     def registrar(self, idtrabajador, idcliente, tipo_comprobante, 
                   serie, numero_comprobante, igv, detalle,
-                  moneda='VES', moneda_pago=None, tasa_cambio=None):
+                  moneda='VES', moneda_pago=None, tasa_cambio=None, fecha_hora=None,
+                  clave_idempotencia=None, permitir_stock_negativo=False):
         """
-        Registra una nueva venta con soporte multimoneda
+        Registra una nueva venta con soporte multimoneda. La existencia del
+        trabajador y del cliente y el stock se verifican en el mismo lote SQL
+        que registra la venta (sin consultas previas).
         
         Args:
             idtrabajador (int): ID del trabajador que realiza la venta
@@ -93,26 +149,31 @@ class VentaService(BaseService):
             moneda (str): Moneda de la factura (VES, USD, EUR)
             moneda_pago (str): Moneda con que paga el cliente (si es diferente)
             tasa_cambio (float): Tasa de cambio (si viene, se usa; si no, se pide)
+            fecha_hora (datetime): Fecha de emisión (ventas de contingencia); por defecto la actual
+            clave_idempotencia (str): UUID generado una vez por venta en la terminal; si
+                ya existe una venta con esa clave (reintento) se devuelve esa venta
+            permitir_stock_negativo (bool): Registrar aunque falte stock, dejándolo en
+                negativo con una alerta (facturas de contingencia ya emitidas)
             
         Returns:
-            int or None: ID de la venta creada o None si hay error
+            int or None: ID de la venta creada (o ya registrada con la clave) o None si hay error
         """
         try:
+            # ===== IDEMPOTENCIA =====
+            existente = self._venta_previa(clave_idempotencia)
+            if existente:
+                return existente if existente > 0 else None
+            
             # Validar campos obligatorios
             if not self.validar_entero_positivo(idtrabajador, "ID del trabajador"):
                 logger.error("ID del trabajador inválido")
                 return None
             
-            # Para consumidor final, idcliente puede ser None
+            # Para consumidor final, idcliente puede ser None (su existencia y la del
+            # trabajador se verifican en el mismo lote que registra la venta)
             if idcliente is not None:
                 if not self.validar_entero_positivo(idcliente, "ID del cliente"):
                     return None
-                
-                # Verificar que el cliente existe
-                cliente = self.cliente_service.obtener_por_id(idcliente)
-                if not cliente:
-                    logger.error(f"Cliente {idcliente} no encontrado")
-                    return None
             
             # Validar tipo de comprobante
             tipos_validos = ['FACTURA', 'BOLETA', 'TICKET']
@@ -171,10 +232,18 @@ class VentaService(BaseService):
             else:
                 tasa_final = 1.0  # Tasa por defecto para VES
             
-            # ===== CÁLCULO DE MONTOS =====
+            # ===== CÁLCULO DE MONTOS (céntimos enteros) =====
             # Calcular subtotal y total
-            subtotal = sum(item['cantidad'] * item['precio_venta'] for item in detalle)
-            iva_total = subtotal * (igv / 100)
+            subtotal = Dinero(sum(multiplicar(a_centimos(item['precio_venta']), item['cantidad'])
+                                  for item in detalle), moneda)
+            desglose = self._desglose_detalle(detalle)
+            if desglose is None:
+                logger.error("❌ No se pudieron leer los impuestos de los artículos; venta no registrada")
+                return None
+            if desglose:
+                iva_total = Dinero.sumar((iva for _, iva in desglose.values()), moneda)
+            else:
+                iva_total = subtotal.porcentaje(igv)
             total = subtotal + iva_total
             
             # Calcular montos por moneda
@@ -182,26 +251,26 @@ class VentaService(BaseService):
             monto_divisa = None
             
             if moneda == 'VES':
-                monto_bs = total
+                monto_bs = total.decimal()
                 if moneda_pago == 'USD':
-                    monto_divisa = total / tasa_final
+                    monto_divisa = total.convertir('USD', tasa_final).decimal()
                     logger.info(f"   Pago en USD: ${monto_divisa:.2f} (tasa {tasa_final:.2f})")
             else:  # USD u otra divisa
-                monto_divisa = total
-                monto_bs = total * tasa_final
+                monto_divisa = total.decimal()
+                monto_bs = total.convertir('VES', tasa_final).decimal()
                 logger.info(f"   Equivalente en Bs.: Bs. {monto_bs:.2f} (tasa {tasa_final:.2f})")
             
             # Calcular IGTF si aplica (3% para pagos en divisas)
             igtf = IGTFService.calcular_igtf(
-                monto=total,
+                monto=total.decimal(),
                 moneda_pago=moneda_pago or moneda,
                 moneda_transaccion=moneda
             )
             if igtf > 0:
                 logger.info(f"💰 IGTF (3%): {igtf:.2f}")
             
-            # ===== VALIDAR STOCK =====
-            logger.info("🔍 Verificando stock disponible...")
+            # ===== VALIDAR LÍNEAS =====
+            # El stock se verifica y bloquea en el mismo lote que registra la venta
             for idx, item in enumerate(detalle, 1):
                 # Validar que cada item tenga los campos requeridos
                 if 'idarticulo' not in item:
@@ -223,73 +292,16 @@ class VentaService(BaseService):
                 # Validar que precio sea positivo
                 if not self.validar_decimal_positivo(item['precio_venta'], f"Precio del item {idx}"):
                     return None
-                
-                # Verificar stock usando inventario_service
-                try:
-                    stock_actual = self.inventario_service.obtener_stock_articulo(item['idarticulo'])
-                    logger.info(f"   Artículo ID {item['idarticulo']}: Stock disponible {stock_actual}, Solicitado {item['cantidad']}")
-                    
-                    if item['cantidad'] > stock_actual:
-                        logger.error(f"❌ Stock insuficiente para artículo ID {item['idarticulo']}. "
-                                   f"Disponible: {stock_actual}, Solicitado: {item['cantidad']}")
-                        return None
-                except AttributeError as e:
-                    logger.error(f"ERROR: inventario_service no tiene el método obtener_stock_articulo")
-                    logger.error(f"   - Tipo de inventario_service: {type(self.inventario_service).__name__}")
-                    return None
-            
-            # Validar que el trabajador existe
-            trabajador = self.trabajador_service.obtener_por_id(idtrabajador)
-            if not trabajador:
-                logger.error(f"Trabajador ID {idtrabajador} no encontrado")
-                return None
             
             # ===== REGISTRAR VENTA =====
-            logger.info("📝 Registrando venta en base de datos...")
-            idventa = self.repositorio.crear(
-                idtrabajador=idtrabajador,
-                idcliente=idcliente,
-                tipo_comprobante=tipo_comprobante,
-                serie=serie,
-                numero_comprobante=numero_comprobante,
-                igv=igv,
-                estado='REGISTRADO',
-                moneda=moneda,
-                tasa_cambio=tasa_final,
-                monto_bs=monto_bs,
-                monto_divisa=monto_divisa
+            idventa = self._guardar_venta(
+                idtrabajador, idcliente, tipo_comprobante, serie, numero_comprobante, igv,
+                detalle, moneda, tasa_final, monto_bs, monto_divisa, fecha_hora, clave_idempotencia,
+                desglose, permitir_stock_negativo=permitir_stock_negativo
             )
-            
             if not idventa:
-                logger.error("No se pudo crear la venta en la base de datos")
                 return None
             
-            logger.info(f"✅ Venta #{idventa} creada en BD")
-            
-            # ===== REGISTRAR DETALLE Y DESCONTAR STOCK =====
-            for item in detalle:
-                # Agregar detalle a la venta
-                detalle_id = self.repositorio.agregar_detalle(
-                    idventa=idventa,
-                    idarticulo=item['idarticulo'],
-                    cantidad=item['cantidad'],
-                    precio_venta=item['precio_venta']
-                )
-                
-                if not detalle_id:
-                    logger.error(f"Error al agregar detalle para artículo {item['idarticulo']}")
-                    continue
-                
-                logger.info(f"   ✅ Detalle agregado: {item['cantidad']} x {item['precio_venta']:.2f}")
-                
-                # Actualizar stock usando inventario_service
-                self.inventario_service.descontar_stock(
-                    idarticulo=item['idarticulo'],
-                    cantidad=item['cantidad'],
-                    idventa=idventa,
-                    precio_unitario=item['precio_venta']
-                )
-            
             # ===== RESUMEN FINAL =====
             tipo_cliente = "CONSUMIDOR FINAL" if idcliente is None else "CLIENTE IDENTIFICADO"
             
@@ -317,53 +329,270 @@ class VentaService(BaseService):
             logger.error(f"❌ Error al registrar venta: {e}")
             return None
     
-    def anular(self, idventa):
+    def _desglose_detalle(self, detalle):
         """
-        Anula una venta (cambia estado a ANULADO) y repone stock
+        Desglose de IVA por letra fiscal de un detalle sin carrito (letra de cada
+        artículo según su id_impuesto, una consulta para todos)
+        
+        Returns:
+            dict: {letra: (base, impuesto)}; vacío si no hay motor de impuestos
+                  (se usa el IGV general); None si no se pudieron leer los
+                  artículos (la venta no debe registrarse con otra alícuota)
+        """
+        articulo_service = getattr(self.inventario_service, 'articulo_service', None)
+        if not self.motor_impuestos or not articulo_service:
+            return {}
+        articulos = articulo_service.obtener_por_ids([item['idarticulo'] for item in detalle])
+        if articulos is None:
+            return None
+        if not articulos:
+            return {}
+        return self.motor_impuestos.desglosar(
+            (articulos.get(item['idarticulo'], {}).get('id_impuesto'), item['cantidad'], item['precio_venta'])
+            for item in detalle
+        )
+    
+    def registrar_carrito(self, carrito, idtrabajador, idcliente, tipo_comprobante,
+                          serie, numero_comprobante, clave_idempotencia=None):
+        """
+        Registra una venta a partir de un Carrito. Las líneas ya se validaron
+        al agregarlas y los totales vienen calculados, por lo que solo se
+        valida la cabecera; el stock, el trabajador y el cliente los confirma
+        el lote que registra la venta.
+        
+        Args:
+            carrito (Carrito): Carrito con al menos una línea
+            idtrabajador, idcliente, tipo_comprobante, serie, numero_comprobante,
+            clave_idempotencia: como en registrar
+            
+        Returns:
+            int or None: ID de la venta creada (o ya registrada con la clave) o None si hay error
+        """
+        try:
+            existente = self._venta_previa(clave_idempotencia)
+            if existente:
+                return existente if existente > 0 else None
+            
+            if not carrito:
+                logger.error("La venta debe tener al menos un producto")
+                return None
+            if not self.validar_entero_positivo(idtrabajador, "ID del trabajador"):
+                return None
+            if idcliente is not None and not self.validar_entero_positivo(idcliente, "ID del cliente"):
+                return None
+            if tipo_comprobante not in ('FACTURA', 'BOLETA', 'TICKET'):
+                logger.error(f"Tipo de comprobante inválido: {tipo_comprobante}")
+                return None
+            if not serie or not str(numero_comprobante or '').strip():
+                logger.error("La serie y el número del comprobante son obligatorios")
+                return None
+            
+            monto_bs, monto_divisa = carrito.montos()
+            idventa = self._guardar_venta(
+                idtrabajador, idcliente, tipo_comprobante, serie, numero_comprobante, carrito.igv,
+                carrito.detalle(), carrito.moneda, carrito.tasa_cambio, monto_bs, monto_divisa,
+                None, clave_idempotencia, carrito.desglose_impuestos()
+            )
+            if idventa:
+                logger.info(f"✅ Venta {idventa} registrada: {len(carrito)} líneas, "
+                            f"total {carrito.total:.2f} {carrito.moneda}")
+            return idventa
+        except Exception as e:
+            logger.error(f"❌ Error al registrar venta: {e}")
+            return None
+    
+    def venta_registrada(self, clave_idempotencia):
+        """
+        Consulta si un envío llegó a registrarse en el servidor (tras un fallo)
+        
+        Returns:
+            int: ID de la venta, 0 si no se registró, -1 si no se pudo consultar
+                 (resultado desconocido: conexión o tiempo de espera)
+        """
+        return self.repositorio.buscar_por_clave(clave_idempotencia)
+    
+    def _venta_previa(self, clave_idempotencia):
+        """
+        Venta ya registrada con la clave de idempotencia
+        
+        Returns:
+            int: ID de la venta existente, 0 si no hay (o no se indicó clave),
+                 -1 si la clave es inválida o no se pudo consultar
+        """
+        if clave_idempotencia is None:
+            return 0
+        try:
+            uuid.UUID(str(clave_idempotencia))
+        except ValueError:
+            logger.error(f"Clave de idempotencia inválida: {clave_idempotencia}")
+            return -1
+        existente = self.repositorio.buscar_por_clave(clave_idempotencia)
+        if existente > 0:
+            logger.info(f"♻️ Venta {existente} ya registrada con la clave {clave_idempotencia}; "
+                        f"no se duplica")
+        return existente
+    
+    def _guardar_venta(self, idtrabajador, idcliente, tipo_comprobante, serie, numero_comprobante,
+                       igv, detalle, moneda, tasa_cambio, monto_bs, monto_divisa, fecha_hora,
+                       clave_idempotencia, desglose_impuestos=None, permitir_stock_negativo=False):
+        """
+        Registra cabecera, detalle, descuento de stock y de lotes (FEFO) de
+        todas las líneas y, si se indica, el desglose de IVA por letra fiscal
+        en una sola transacción. Si falta stock no se inserta nada (salvo con
+        permitir_stock_negativo, que deja el stock en negativo y alerta); si
+        otra terminal consumió los lotes asignados se recalcula la asignación.
+        
+        Returns:
+            int or None: ID de la venta o None si no se pudo registrar
+        """
+        logger.info("📝 Registrando venta en base de datos...")
+        cabecera = {
+            'idtrabajador': idtrabajador,
+            'idcliente': idcliente,
+            'tipo_comprobante': tipo_comprobante,
+            'serie': serie,
+            'numero_comprobante': numero_comprobante,
+            'igv': igv,
+            'moneda': moneda,
+            'tasa_cambio': tasa_cambio,
+            'monto_bs': monto_bs,
+            'monto_divisa': monto_divisa,
+            'fecha_hora': fecha_hora,
+            'clave_idempotencia': clave_idempotencia
+        }
+        lineas = self.inventario_service.lineas_venta(detalle)
+        for intento in range(1, LoteService.REINTENTOS + 1):
+            asignaciones = self.inventario_service.planificar_lotes(lineas)
+            if asignaciones is None:
+                logger.error("❌ No se pudieron leer los lotes de la venta; no se registró")
+                return None
+            idventa, movimientos, sin_stock = self.repositorio.registrar_venta(
+                cabecera, detalle, lineas, desglose_impuestos, asignaciones, permitir_stock_negativo
+            )
+            if idventa != 0:
+                break
+            logger.info(f"🔁 Lotes modificados por otra terminal; recalculando asignación ({intento})")
+        else:
+            logger.error(f"❌ No se pudieron asignar lotes a la venta {serie}-{numero_comprobante}")
+            return None
+        
+        if not idventa and sin_stock:
+            logger.error(f"❌ Stock insuficiente al confirmar la venta {serie}-{numero_comprobante} "
+                         f"(artículos {sin_stock}); no se registró")
+            return None
+        
+        if not idventa and clave_idempotencia is not None:
+            # Un envío concurrente con la misma clave ganó el índice único
+            existente = self.repositorio.buscar_por_clave(clave_idempotencia)
+            if existente > 0:
+                logger.info(f"♻️ Venta {existente} registrada por un envío concurrente "
+                            f"con la clave {clave_idempotencia}")
+                return existente
+        
+        if not idventa:
+            logger.error("No se pudo registrar la venta en la base de datos")
+            return None
+        
+        logger.info(f"✅ Venta #{idventa} creada en BD")
+        if sin_stock:
+            logger.warning(f"🚨 Venta #{idventa} ({serie}-{numero_comprobante}) dejó stock negativo "
+                           f"en los artículos {sin_stock}; revisar inventario")
+        self.inventario_service.confirmar_salida_venta(lineas, movimientos, idventa)
+        return idventa
+    
+    def recalcular_impuestos(self, fecha_inicio, fecha_fin):
+        """
+        Recalcula y guarda el desglose de IVA por letra fiscal de las ventas de un
+        rango (facturas históricas o registradas sin desglose), en una sola pasada
+        vectorizada sobre todas sus líneas
+        
+        Args:
+            fecha_inicio: Fecha inicial
+            fecha_fin: Fecha final
+            
+        Returns:
+            int: Ventas recalculadas (-1 si hay error)
+        """
+        if self.motor_impuestos is None:
+            logger.error("❌ No hay motor de impuestos configurado")
+            return -1
+        filas = self.repositorio.lineas_para_impuestos(fecha_inicio, fecha_fin)
+        if filas is None:
+            return -1
+        desgloses = self.motor_impuestos.recalcular_ventas(filas)
+        if desgloses and not self.repositorio.guardar_impuestos(desgloses):
+            return -1
+        logger.info(f"🧾 Desglose de IVA recalculado: {len(desgloses)} ventas, {len(filas)} líneas")
+        return len(desgloses)
+    
+    def anular(self, idventa, motivo=None):
+        """
+        Anula una venta (cambia estado a ANULADO) y repone stock y lotes,
+        todo en una sola transacción
         
         Args:
             idventa (int): ID de la venta a anular
+            motivo (str): Motivo de la anulación (opcional)
             
         Returns:
             bool: True si se anuló correctamente, False en caso contrario
         """
+        if not self.validar_entero_positivo(idventa, "ID de venta"):
+            return False
+        
+        anuladas = self.anular_lote([idventa], motivo)
+        if idventa in anuladas:
+            logger.info(f"✅ Venta {idventa} anulada correctamente")
+            return True
+        logger.error(f"❌ No se pudo anular la venta {idventa} (no existe o ya está anulada)")
+        return False
+    
+    def anular_lote(self, idventas, motivo=None):
+        """
+        Anula varias ventas (p. ej. un lote de contingencia) en una sola transacción:
+        estados, stock, kardex, lotes y auditoría se confirman juntos o nada
+        
+        Args:
+            idventas (list): IDs de las ventas a anular
+            motivo (str): Motivo de la anulación (opcional)
+            
+        Returns:
+            list: IDs efectivamente anulados (las ya anuladas o inexistentes se omiten)
+        """
         try:
-            if not self.validar_entero_positivo(idventa, "ID de venta"):
-                return False
+            idventas = [i for i in dict.fromkeys(idventas)
+                        if self.validar_entero_positivo(i, "ID de venta")]
+            if not idventas:
+                return []
             
-            venta = self.obtener_por_id(idventa)
-            if not venta:
-                logger.error(f"Venta {idventa} no encontrada")
-                return False
+            usuario_actual = self.trabajador_service.get_usuario_actual()
+            usuario = (f"{usuario_actual['nombre']} {usuario_actual['apellidos']}"
+                       if usuario_actual else "SISTEMA")
             
-            if venta.get('estado') == 'ANULADO':
-                logger.warning(f"La venta {idventa} ya está anulada")
-                return False
+            anuladas, movimientos = self.repositorio.anular_lote(idventas, usuario, motivo)
+            if anuladas is None:
+                return []
             
-            # Anular venta
-            resultado = self.repositorio.anular(idventa)
+            for idventa, fecha_hora in anuladas.items():
+                self.invalidar_cache(idventa)
+                cache_reportes.invalidar_dia(fecha_hora)
             
-            if resultado:
-                logger.info(f"✅ Venta {idventa} anulada correctamente")
-                
-                # Reponer stock
-                if venta.get('detalle'):
-                    logger.info("   Reponiendo stock...")
-                    for item in venta['detalle']:
-                        self.inventario_service.reponer_stock(
-                            idarticulo=item['idarticulo'],
-                            cantidad=item['cantidad'],
-                            idingreso=None,
-                            precio_compra=item['precio_venta']
-                        )
-            else:
-                logger.error(f"❌ No se pudo anular la venta {idventa}")
+            # Mantener alertas, catálogo y resúmenes en memoria
+            documento = (f"ANULACION-VENTA-{next(iter(anuladas))}" if len(anuladas) == 1
+                         else f"ANULACION-{len(anuladas)}-VENTAS")
+            for idarticulo, (stock_anterior, stock_nuevo, cantidad) in movimientos.items():
+                self.inventario_service.bus.publicar(crear_evento(
+                    idarticulo, 'ENTRADA', cantidad, stock_anterior, stock_nuevo, documento
+                ))
             
-            return resultado
+            omitidas = len(idventas) - len(anuladas)
+            if omitidas:
+                logger.warning(f"⚠️ {omitidas} ventas no se anularon (inexistentes o ya anuladas)")
+            return list(anuladas)
             
         except Exception as e:
-            logger.error(f"Error al anular venta {idventa}: {e}")
-            return False
+            logger.error(f"Error al anular ventas: {e}")
+            return []
     
     def ventas_por_cliente(self, idcliente):
         """
@@ -383,6 +612,24 @@ class VentaService(BaseService):
             logger.error(f"Error al obtener ventas del cliente {idcliente}: {e}")
             return []
     
+    def ventas_por_dia(self, fecha_inicio, fecha_fin):
+        """
+        Obtiene las ventas de un rango de fechas agrupadas por día
+        
+        Returns:
+            dict: {date: [ventas]} (días sin ventas ausentes) o None si hay error
+        """
+        return self.repositorio.ventas_por_dia(fecha_inicio, fecha_fin)
+    
+    def versiones_dias(self, fecha_inicio, fecha_fin):
+        """
+        Versión en la base de datos de cada día de un rango (caché de reportes)
+        
+        Returns:
+            dict: {date: version} (días nunca modificados ausentes) o None si hay error
+        """
+        return self.repositorio.versiones_dias(fecha_inicio, fecha_fin)
+    
     def ventas_por_fecha(self, fecha_inicio, fecha_fin):
         """
         Obtiene ventas en un rango de fechas
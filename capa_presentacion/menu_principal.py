@@ -4,13 +4,15 @@ Menú principal del sistema de ventas (Interfaz de consola)
 """
 import os
 import sys
+import uuid
 import readchar
-from datetime import datetime
+from datetime import datetime, timedelta
 
 # Añadir el directorio padre al path para importar módulos
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from capa_datos.conexion import ConexionDB
+from capa_datos.monitor_sql import configurar_log_sql_lento
 from capa_datos.categoria_repo import CategoriaRepositorio
 from capa_datos.cliente_repo import ClienteRepositorio
 from capa_datos.articulo_repo import ArticuloRepositorio
@@ -28,6 +30,8 @@ from capa_negocio.cliente_service import ClienteService
 from capa_negocio.articulo_service import ArticuloService
 from capa_negocio.trabajador_service import TrabajadorService
 from capa_negocio.venta_service import VentaService
+from capa_negocio.carrito import Carrito
+from capa_negocio.precio_bs_service import lista_precios_bs
 from capa_negocio.rol_service import RolService, PermisoDenegadoError
 from capa_negocio.base_service import BaseService
 from capa_negocio.email_service import EmailService
@@ -54,6 +58,7 @@ from loguru import logger
 # Configurar logger
 logger.remove()
 logger.add(sys.stderr, format="<level>{level: <8}</level> | <cyan>{name}</cyan>:<cyan>{function}</cyan>:<cyan>{line}</cyan> - <level>{message}</level>")
+configurar_log_sql_lento()
 
 class SistemaVentas:
     """Clase principal del sistema"""
@@ -110,11 +115,17 @@ class SistemaVentas:
         from capa_datos.tasa_repo import TasaRepositorio
         tasa_repo = TasaRepositorio(self.conn)
         
+        # Lista de precios en Bs. (se recalcula una vez por cada tasa nueva)
+        from capa_datos.precio_bs_repo import PrecioBsRepositorio
+        from capa_negocio.precio_bs_service import PrecioBsService
+        self.precio_bs_service = PrecioBsService(PrecioBsRepositorio(self.conn))
+        
         # Inicializar servicios base
         self.trabajador_service = TrabajadorService(trabajador_repo)
         self.categoria_service = CategoriaService(categoria_repo)
         self.cliente_service = ClienteService(cliente_repo)
-        self.articulo_service = ArticuloService(articulo_repo, self.categoria_service)
+        self.articulo_service = ArticuloService(articulo_repo, self.categoria_service,
+                                                precio_bs_service=self.precio_bs_service)
         self.proveedor_service = ProveedorService(proveedor_repo)
         self.proveedor_archivo_service = ProveedorArchivoService(proveedor_archivo_repo, self.proveedor_service)
         
@@ -122,16 +133,29 @@ class SistemaVentas:
         self.inventario_service = InventarioService(self.articulo_service)
         logger.info("✅ InventarioService inicializado")
         
+        # Cargar índice de vencimientos (genera el reporte diario si no existe)
+        if self.inventario_service.lote_service:
+            self.inventario_service.lote_service.refrescar_vencimientos()
+        
+        # IVA por letra fiscal (la tabla de impuestos se lee una vez por sesión)
+        from capa_datos.impuesto_repo import ImpuestoRepositorio
+        from capa_negocio.motor_impuestos import MotorImpuestos
+        self.motor_impuestos = MotorImpuestos(ImpuestoRepositorio(self.conn))
+        
         # Inicializar venta con soporte de tasas
         self.venta_service = VentaService(
             venta_repo, 
             self.cliente_service, 
             self.trabajador_service, 
             self.inventario_service,
-            tasa_repo=tasa_repo
+            tasa_repo=tasa_repo,
+            motor_impuestos=self.motor_impuestos
         )
         logger.info("✅ VentaService inicializado con soporte de tasas")
         
+        self.venta_service.tasa_service.suscribir(self.precio_bs_service.al_registrar_tasa)
+        self.precio_bs_service.sincronizar()
+        
         self.ingreso_service = IngresoService(
             ingreso_repo, 
             self.articulo_service, 
@@ -166,6 +190,22 @@ class SistemaVentas:
         )
         logger.info("✅ ReporteContableService inicializado")
         
+        # Reportes pesados en procesos aparte (los procesos se crean al primer trabajo)
+        from capa_negocio.trabajos_reportes import EjecutorReportes
+        self.ejecutor_reportes = EjecutorReportes()
+        
+        # Numeración automática de comprobantes por bloques de esta terminal
+        from capa_datos.numeracion_repo import NumeracionRepositorio
+        from capa_negocio.numeracion_service import NumeracionService
+        self.numeracion_service = NumeracionService(NumeracionRepositorio(self.conn))
+        
+        # Contingencia: sube ventas offline pendientes y mantiene la copia local del catálogo
+        from capa_negocio.contingencia_service import ContingenciaService, SincronizadorContingencia
+        self.contingencia_service = ContingenciaService()
+        if self.contingencia_service.activo:
+            self.sincronizador_contingencia = SincronizadorContingencia(self.contingencia_service)
+            self.sincronizador_contingencia.start()
+        
         return True
     
     def limpiar_pantalla(self):
@@ -1056,6 +1096,7 @@ class SistemaVentas:
             print("3. Crear cliente")
             print("4. Editar cliente")
             print("5. Eliminar cliente")
+            print("6. 📥 Importar clientes desde CSV")
             print("0. Volver")
             print()
             
@@ -1071,12 +1112,55 @@ class SistemaVentas:
                 self._editar_cliente()
             elif opcion == '5':
                 self._eliminar_cliente()
+            elif opcion == '6':
+                self._importar_clientes_csv()
             elif opcion == '0':
                 break
             else:
                 print("❌ Opción no válida")
                 self.pausa()
     
+    @requiere_permiso('clientes_crear')
+    def _importar_clientes_csv(self):
+        """Importa clientes en bloque desde un CSV (migración del sistema anterior)"""
+        self.mostrar_cabecera("IMPORTAR CLIENTES DESDE CSV")
+        print("Columnas: nombre, apellidos, num_documento (obligatorias; ej: V12345678, J-30123456-7);")
+        print("opcionales: tipo_documento, fecha_nacimiento, sexo, direccion, telefono, email\n")
+        
+        ruta = input("Ruta del archivo CSV: ").strip().strip('"')
+        if not ruta or not os.path.isfile(ruta):
+            print(f"{self.COLOR_ROJO}❌ Archivo no encontrado{self.COLOR_RESET}")
+            self.pausa()
+            return
+        
+        from capa_datos.cliente_repo import ClienteRepositorio
+        from capa_negocio.importador_clientes import ImportadorClientes
+        resumen = ImportadorClientes(ClienteRepositorio(self.conn)).importar(ruta)
+        if resumen is None:
+            print(f"{self.COLOR_ROJO}❌ No se pudo importar (revise las columnas del archivo){self.COLOR_RESET}")
+            self.pausa()
+            return
+        
+        print(f"\n📥 Filas leídas: {resumen['leidas']}")
+        print(f"{self.COLOR_VERDE}✅ Insertados: {resumen['insertadas']} en {resumen['segundos']:.1f} s{self.COLOR_RESET}")
+        print(f"🔁 Duplicados (documento ya registrado): {len(resumen['duplicadas'])}")
+        if resumen['errores']:
+            print(f"{self.COLOR_ROJO}❌ Errores: {len(resumen['errores'])}{self.COLOR_RESET}")
+            for fila, motivo in resumen['errores'][:20]:
+                print(f"   Fila {fila}: {motivo}")
+            if len(resumen['errores']) > 20:
+                print(f"   ... y {len(resumen['errores']) - 20} más")
+        
+        if resumen['insertadas']:
+            self.registrar_auditoria(
+                accion="IMPORTAR",
+                tabla="cliente",
+                registro_id=0,
+                datos_nuevos=f"Archivo: {os.path.basename(ruta)}, Insertados: {resumen['insertadas']}, "
+                             f"Duplicados: {len(resumen['duplicadas'])}, Errores: {len(resumen['errores'])}"
+            )
+        self.pausa()
+    
     @requiere_permiso('clientes_ver')
     def _listar_clientes(self):
         """Lista todos los clientes"""
@@ -1569,6 +1653,8 @@ class SistemaVentas:
             print("5. Eliminar artículo")
             print("6. Ver stock por lote")
             print("7. 🔍 Búsqueda avanzada (código barras/PLU)")
+            print("8. 💲 Actualización masiva de precios")
+            print("9. 📥 Importar artículos desde CSV")
             print("0. Volver")
             print()
             
@@ -1588,6 +1674,10 @@ class SistemaVentas:
                 self._ver_stock_lotes()
             elif opcion == '7':
                 self._buscar_articulo_gestion()
+            elif opcion == '8':
+                self._actualizar_precios_masivo()
+            elif opcion == '9':
+                self._importar_articulos_csv()
             elif opcion == '0':
                 break
             else:
@@ -1969,6 +2059,121 @@ class SistemaVentas:
         
         self.pausa()
     
+    @requiere_permiso('articulos_editar')
+    def _actualizar_precios_masivo(self):
+        """Reajusta precios por categoría/proveedor con porcentaje o margen sobre costo"""
+        self.mostrar_cabecera("ACTUALIZACIÓN MASIVA DE PRECIOS")
+        
+        try:
+            for cat in self.categoria_service.listar():
+                print(f"   {cat['idcategoria']:>4}  {cat['nombre']}")
+            entrada = input("\nID de categoría (Enter = todas): ").strip()
+            idcategoria = int(entrada) if entrada else None
+            entrada = input("ID de proveedor (Enter = todos): ").strip()
+            idproveedor = int(entrada) if entrada else None
+            
+            print("\n1. Porcentaje sobre el precio actual (ej: 10 = +10%, -5 = -5%)")
+            print("2. Margen sobre el costo promedio (ej: 30 = costo + 30%)")
+            tipo = input("Tipo de regla: ").strip()
+            if tipo not in ('1', '2'):
+                print("❌ Opción no válida")
+                self.pausa()
+                return
+            valor = float(input("Valor (%): ").strip().replace(',', '.'))
+        except ValueError:
+            print("❌ Valor inválido")
+            self.pausa()
+            return
+        
+        regla = {'idcategoria': idcategoria, 'idproveedor': idproveedor,
+                 'porcentaje' if tipo == '1' else 'margen_costo': valor}
+        
+        cambios = self.articulo_service.previsualizar_precios_masivo(regla)
+        if cambios is None:
+            print(f"{self.COLOR_ROJO}❌ No se pudo calcular la previsualización{self.COLOR_RESET}")
+            self.pausa()
+            return
+        if not cambios:
+            print("📭 Ningún precio cambia con esta regla")
+            self.pausa()
+            return
+        
+        print(f"\n{'ID':<6} {'CÓDIGO':<15} {'NOMBRE':<30} {'ACTUAL $':>10} {'NUEVO $':>10}")
+        print("-" * 75)
+        for c in cambios[:20]:
+            print(f"{c['idarticulo']:<6} {str(c['codigo'] or '')[:14]:<15} {str(c['nombre'])[:29]:<30} "
+                  f"{float(c['precio_venta']):>10.2f} {float(c['precio_nuevo']):>10.2f}")
+        if len(cambios) > 20:
+            print(f"... y {len(cambios) - 20} artículos más")
+        
+        confirmar = input(f"\n{self.COLOR_AMARILLO}¿Aplicar a {len(cambios)} artículos? (s/N): {self.COLOR_RESET}").lower()
+        if confirmar != 's':
+            print("Operación cancelada")
+            self.pausa()
+            return
+        
+        usuario = self.trabajador_service.get_usuario_actual()
+        nombre_usuario = f"{usuario['nombre']} {usuario['apellidos']}" if usuario else None
+        resultado = self.articulo_service.actualizar_precios_masivo(regla, usuario=nombre_usuario)
+        if resultado is None:
+            print(f"{self.COLOR_ROJO}❌ Error aplicando la actualización (no se modificó ningún precio){self.COLOR_RESET}")
+        else:
+            print(f"{self.COLOR_VERDE}✅ {resultado['actualizados']} precios actualizados{self.COLOR_RESET}")
+            if resultado['auditoria']:
+                self.registrar_auditoria(
+                    accion="ACTUALIZAR_PRECIO_MASIVO",
+                    tabla="articulo",
+                    registro_id=0,
+                    datos_anteriores=resultado['auditoria'][0],
+                    datos_nuevos=resultado['auditoria'][1]
+                )
+        self.pausa()
+    
+    @requiere_permiso('articulos_crear')
+    def _importar_articulos_csv(self):
+        """Importa artículos en bloque desde el CSV de un proveedor"""
+        self.mostrar_cabecera("IMPORTAR ARTÍCULOS DESDE CSV")
+        print("Columnas: codigo_barras, nombre, precio_venta (obligatorias);")
+        print("opcionales: precio_referencia, idcategoria, id_impuesto, stock_minimo\n")
+        
+        ruta = input("Ruta del archivo CSV: ").strip().strip('"')
+        if not ruta or not os.path.isfile(ruta):
+            print(f"{self.COLOR_ROJO}❌ Archivo no encontrado{self.COLOR_RESET}")
+            self.pausa()
+            return
+        
+        from capa_datos.articulo_repo import ArticuloRepositorio
+        from capa_negocio.importador_articulos import ImportadorArticulos
+        resumen = ImportadorArticulos(ArticuloRepositorio(self.conn)).importar(ruta)
+        if resumen is None:
+            print(f"{self.COLOR_ROJO}❌ No se pudo importar (revise las columnas del archivo){self.COLOR_RESET}")
+            self.pausa()
+            return
+        
+        print(f"\n📥 Filas leídas: {resumen['leidas']}")
+        print(f"{self.COLOR_VERDE}✅ Insertadas: {resumen['insertadas']} en {resumen['segundos']:.1f} s{self.COLOR_RESET}")
+        print(f"🔁 Duplicadas (código de barras): {len(resumen['duplicadas'])}")
+        if resumen['revisar_impuesto']:
+            print(f"{self.COLOR_AMARILLO}⚠️ Impuesto a revisar en {len(resumen['revisar_impuesto'])} filas "
+                  f"(primeras: {', '.join(map(str, resumen['revisar_impuesto'][:10]))}){self.COLOR_RESET}")
+        if resumen['errores']:
+            print(f"{self.COLOR_ROJO}❌ Errores: {len(resumen['errores'])}{self.COLOR_RESET}")
+            for fila, motivo in resumen['errores'][:20]:
+                print(f"   Fila {fila}: {motivo}")
+            if len(resumen['errores']) > 20:
+                print(f"   ... y {len(resumen['errores']) - 20} más")
+        
+        if resumen['insertadas']:
+            self.precio_bs_service.recalcular()
+            self.registrar_auditoria(
+                accion="IMPORTAR",
+                tabla="articulo",
+                registro_id=0,
+                datos_nuevos=f"Archivo: {os.path.basename(ruta)}, Insertados: {resumen['insertadas']}, "
+                             f"Duplicados: {len(resumen['duplicadas'])}, Errores: {len(resumen['errores'])}"
+            )
+        self.pausa()
+    
     @requiere_permiso('articulos_eliminar')
     def _eliminar_articulo(self):
         """Elimina un artículo"""
@@ -2111,11 +2316,12 @@ class SistemaVentas:
         print("1. Boleta  2. Ticket")
         tipo = input(f"{self.COLOR_AMARILLO}🔹 Seleccione: {self.COLOR_RESET}").strip()
         tipo_comp = 'BOLETA' if tipo == '1' else 'TICKET'
-        serie = input("Serie: ").strip() or "F001"
-        numero = input("Número: ").strip() or "001"
+        serie = self.numeracion_service.serie_para(tipo_comp)
         
         # ===== PRODUCTOS (INTERFAZ LIMPIA) =====
-        detalle = []
+        self.precio_bs_service.refrescar()
+        carrito = Carrito(moneda='USD', moneda_pago=moneda_pago, tasa_cambio=tasa_usd,
+                          motor_impuestos=self.motor_impuestos)
         print("\n" + "="*60)
         print("🛒 PRODUCTOS")
         print("="*60)
@@ -2175,47 +2381,48 @@ class SistemaVentas:
                 precio = 0.0
                 
             stock = self.inventario_service.obtener_stock_articulo(art['idarticulo'])
-            print(f"\n📌 {art['nombre']} - ${precio:.2f} - Stock: {stock}")
+            precio_bs = self.precio_bs_service.precio_bs_venta(art, tasa_usd)
+            precio_bs_str = f" (Bs. {precio_bs:,.2f})" if precio_bs is not None else ""
+            print(f"\n📌 {art['nombre']} - ${precio:.2f}{precio_bs_str} - Stock: {stock}")
             
             try:
                 cant = int(input("Cantidad: "))
-                if cant <= 0 or cant > stock:
-                    print("❌ Cantidad inválida")
-                    continue
             except:
                 print("❌ Cantidad inválida")
                 continue
             
-            subtotal = cant * precio
-            print(f"   Subtotal: ${subtotal:.2f} = Bs. {subtotal * tasa_usd:.2f}")
+            # La línea se valida aquí (cantidad, precio y stock); si el artículo ya estaba se suma
+            linea = carrito.agregar(art['idarticulo'], art['nombre'], cant, precio, stock,
+                                    art.get('id_impuesto'), precio_bs)
+            if not linea:
+                print("❌ Cantidad inválida")
+                continue
             
-            detalle.append({
-                'idarticulo': art['idarticulo'],
-                'cantidad': cant,
-                'precio_venta': precio,
-                'nombre': art['nombre']
-            })
-            print("✅ Agregado")
+            subtotal = float(linea.subtotal)
+            subtotal_bs = linea.subtotal_bs if linea.subtotal_bs is not None else subtotal * tasa_usd
+            print(f"   Línea: {linea.cantidad} x ${precio:.2f} = ${subtotal:.2f} = Bs. {subtotal_bs:.2f}")
+            print(f"✅ Agregado (total ${carrito.total:.2f})")
         
-        if not detalle:
+        if not carrito:
             print("❌ Sin productos")
             self.pausa()
             return
         
         # ===== RESUMEN =====
-        total = sum(d['cantidad'] * d['precio_venta'] for d in detalle)
-        iva = total * 0.16
-        total_iva = total + iva
-        total_bs = total_iva * tasa_usd
+        total = carrito.subtotal
+        iva = carrito.iva
+        total_iva = carrito.total
+        total_bs = carrito.montos()[0]
         
         print("\n" + "="*60)
         print("📋 RESUMEN")
         print("="*60)
-        for d in detalle:
-            print(f"  {d['nombre']:<30} x{d['cantidad']}  ${d['precio_venta']:.2f}")
+        for d in carrito.lineas():
+            print(f"  {d.nombre:<30} x{d.cantidad}  ${d.precio_venta:.2f}")
         print("-"*60)
         print(f"SUBTOTAL: ${total:.2f}")
-        print(f"IVA 16%:  ${iva:.2f}")
+        for letra, (base, impuesto) in sorted(carrito.desglose_impuestos().items()):
+            print(f"IVA ({letra}) sobre ${base:.2f}: ${impuesto:.2f}")
         print(f"TOTAL:    ${total_iva:.2f} = Bs. {total_bs:.2f}")
         print("="*60)
         
@@ -2225,19 +2432,50 @@ class SistemaVentas:
             return
         
         # ===== REGISTRAR =====
-        idv = self.venta_service.registrar(
-            usuario['idtrabajador'], idcliente, tipo_comp,
-            serie, numero, 16.0, detalle,
-            moneda='USD', moneda_pago=moneda_pago, tasa_cambio=tasa_usd
-        )
+        numero = self._numero_comprobante(serie)
+        idv = self._enviar_venta(carrito, usuario['idtrabajador'], idcliente, tipo_comp, serie, numero)
         
         if idv:
-            print(f"\n✅ Venta #{idv} registrada")
+            print(f"\n✅ Venta #{idv} registrada ({serie}-{numero})")
         else:
             print("❌ Error")
         
         self.pausa()
 
+    def _numero_comprobante(self, serie):
+        """Número automático de la serie; si el servidor no lo asigna se pide a mano"""
+        numero = self.numeracion_service.siguiente(serie)
+        if numero:
+            return numero
+        print(f"{self.COLOR_ROJO}⚠️ No se pudo asignar el número automático de la serie {serie}{self.COLOR_RESET}")
+        return input("Número: ").strip()
+    
+    def _enviar_venta(self, carrito, idtrabajador, idcliente, tipo_comprobante, serie, numero):
+        """
+        Registra la venta con una clave de idempotencia generada una sola vez.
+        Si falla se consulta la clave en el servidor: si la venta no llegó a
+        grabarse el rechazo es definitivo (validación, stock) y el número se
+        devuelve a la serie; solo cuando no se puede saber (conexión, tiempo de
+        espera) se ofrece reintentar con la misma clave, sin duplicar la factura.
+        """
+        clave = str(uuid.uuid4())
+        while True:
+            idventa = self.venta_service.registrar_carrito(
+                carrito, idtrabajador, idcliente, tipo_comprobante, serie, numero,
+                clave_idempotencia=clave
+            )
+            if idventa:
+                return idventa
+            registrada = self.venta_service.venta_registrada(clave)
+            if registrada > 0:
+                return registrada
+            if registrada == 0:
+                self.numeracion_service.devolver(serie, numero)
+                return None
+            if input("⚠️ Sin respuesta del servidor: no se sabe si la venta se registró. "
+                     "¿Reintentar? (s/n): ").strip().lower() != 's':
+                return None
+    
     def _continuar_flujo_venta(self, usuario, idcliente, cliente, opcion_ident):
         """Continuación del flujo de venta después de seleccionar cliente"""
         
@@ -2257,6 +2495,11 @@ class SistemaVentas:
         moneda_pago_map = {'1': 'USD', '2': 'VES', '3': 'EUR'}
         moneda_pago = moneda_pago_map.get(opcion_pago, 'USD')
         
+        if not tasa_usd or tasa_usd <= 0:
+            print(f"{self.COLOR_AMARILLO}⚠️ Configure tasa con [X]{self.COLOR_RESET}")
+            self.pausa()
+            return
+        
         # ===== DATOS DEL COMPROBANTE =====
         print("\n" + "="*60)
         print("📄 DATOS DEL COMPROBANTE")
@@ -2281,11 +2524,12 @@ class SistemaVentas:
             tipo_op = input(f"{self.COLOR_AMARILLO}Seleccione: {self.COLOR_RESET}").strip()
             tipo_comprobante = tipo_map.get(tipo_op, 'BOLETA')
         
-        serie = input("Serie (ej. F001): ")
-        numero = input("Número: ")
+        serie = self.numeracion_service.serie_para(tipo_comprobante)
         
         # ===== AGREGAR PRODUCTOS =====
-        detalle = []
+        self.precio_bs_service.refrescar()
+        carrito = Carrito(moneda='USD', moneda_pago=moneda_pago, tasa_cambio=tasa_usd,
+                          motor_impuestos=self.motor_impuestos)
         print("\n" + "="*50)
         print("🛒 AGREGAR PRODUCTOS")
         print("="*50)
@@ -2317,8 +2561,9 @@ class SistemaVentas:
             precio_usd = art.get('precio_venta', 0)
             stock = self.inventario_service.obtener_stock_articulo(art['idarticulo'])
             
+            precio_bs = self.precio_bs_service.precio_bs_venta(art, tasa_usd)
             print(f"📌 Artículo: {art['nombre']}")
-            print(f"   Precio: ${precio_usd:.2f} USD")
+            print(f"   Precio: ${precio_usd:.2f} USD" + (f" / Bs. {precio_bs:,.2f}" if precio_bs is not None else ""))
             print(f"   Stock: {stock} und")
             
             try:
@@ -2326,38 +2571,32 @@ class SistemaVentas:
                     cantidad = float(input("Cantidad (kg): "))
                 else:
                     cantidad = int(input("Cantidad (unidades): "))
-                
-                if cantidad > stock and art.get('tipo_medida') != 'PESO':
-                    print(f"❌ Stock insuficiente")
-                    continue
             except:
                 print("❌ Cantidad inválida")
                 continue
             
-            detalle.append({
-                'idarticulo': art['idarticulo'],
-                'cantidad': cantidad,
-                'precio_venta': precio_usd,
-                'nombre': art['nombre']
-            })
-            print(f"✅ {art['nombre']} agregado")
+            # La línea se valida aquí (cantidad, precio y stock); si el artículo ya estaba se suma
+            linea = carrito.agregar(art['idarticulo'], art['nombre'], cantidad, precio_usd, stock,
+                                    art.get('id_impuesto'), precio_bs)
+            if not linea:
+                print(f"{self.COLOR_ROJO}❌ Cantidad inválida o stock insuficiente{self.COLOR_RESET}")
+                continue
+            print(f"✅ {art['nombre']} agregado ({linea.cantidad} en carrito, total ${carrito.total:.2f})")
         
-        if not detalle:
+        if not carrito:
             print("❌ Debe agregar al menos un producto")
             self.pausa()
             return
         
         # ===== RESUMEN =====
-        total_usd = sum(item['cantidad'] * item['precio_venta'] for item in detalle)
-        iva_usd = total_usd * 0.16
-        total_con_iva_usd = total_usd + iva_usd
-        total_bs = total_con_iva_usd * tasa_usd
+        total_con_iva_usd = carrito.total
+        total_bs = carrito.montos()[0]
         
         print("\n" + "="*50)
         print("📋 RESUMEN DE VENTA")
         print("="*50)
-        for item in detalle:
-            print(f"  - {item['nombre']}: {item['cantidad']} x ${item['precio_venta']:.2f} = ${item['cantidad'] * item['precio_venta']:.2f}")
+        for item in carrito.lineas():
+            print(f"  - {item.nombre}: {item.cantidad} x ${item.precio_venta:.2f} = ${item.subtotal:.2f}")
         print(f"\n💰 TOTAL USD: ${total_con_iva_usd:.2f}")
         print(f"💰 TOTAL Bs.: Bs. {total_bs:.2f} (tasa {tasa_usd:.2f})")
         print("="*50)
@@ -2369,21 +2608,19 @@ class SistemaVentas:
             return
         
         # ===== REGISTRAR =====
-        idventa = self.venta_service.registrar(
+        numero = self._numero_comprobante(serie)
+        idventa = self._enviar_venta(
+            carrito,
             usuario['idtrabajador'], 
             idcliente,
             tipo_comprobante,
             serie, 
-            numero, 
-            16.0,
-            detalle,
-            moneda='USD',
-            moneda_pago=moneda_pago,
-            tasa_cambio=tasa_usd
+            numero
         )
         
         if idventa:
-            print(f"\n{self.COLOR_VERDE}✅ Venta #{idventa} registrada correctamente{self.COLOR_RESET}")
+            print(f"\n{self.COLOR_VERDE}✅ Venta #{idventa} registrada correctamente "
+                  f"({serie}-{numero}){self.COLOR_RESET}")
             self.registrar_auditoria(
                 accion="CREAR",
                 tabla="venta",
@@ -2430,7 +2667,7 @@ class SistemaVentas:
 
     def _imprimir_factura(self, idventa):
         """Imprime una factura en formato texto"""
-        venta = self.venta_service.obtener_por_id(idventa)
+        venta = self.venta_service.obtener_por_id(idventa, usar_cache=True)
         
         if not venta:
             print(f"{self.COLOR_ROJO}❌ Factura {idventa} no encontrada{self.COLOR_RESET}")
@@ -2899,15 +3136,9 @@ class SistemaVentas:
             
             confirmacion = input(f"{self.COLOR_AMARILLO}\n¿Está seguro de anular esta venta? (s/N): {self.COLOR_RESET}").lower()
             if confirmacion == 's':
-                if self.venta_service.anular(idventa):
+                # La auditoría se registra en la misma transacción de la anulación
+                if self.venta_service.anular(idventa, motivo=f"Total: Bs.{total:.2f}"):
                     print(f"{self.COLOR_VERDE}✅ Venta anulada correctamente{self.COLOR_RESET}")
-                    
-                    self.registrar_auditoria(
-                        accion="ANULAR",
-                        tabla="venta",
-                        registro_id=idventa,
-                        datos_nuevos=f"Venta #{idventa} anulada - Total: Bs.{total:.2f}"
-                    )
                 else:
                     print(f"{self.COLOR_ROJO}❌ Error al anular la venta{self.COLOR_RESET}")
             else:
@@ -3643,6 +3874,10 @@ class SistemaVentas:
             print("4. 📆 Reporte Trimestral")
             print("5. 📆 Reporte Anual")
             print("6. 📥 Exportar a Excel/CSV")
+            print("7. 📚 Libros fiscales SENIAT (Ventas / Compras)")
+            print("8. ⏳ Trabajos en segundo plano")
+            print("9. 🔢 Huecos de numeración de comprobantes")
+            print("10. 🧾 Recalcular desglose de IVA por letra fiscal")
             print("0. Volver")
             print()
             
@@ -3660,6 +3895,14 @@ class SistemaVentas:
                 self._reporte_anual()
             elif opcion == '6':
                 self._exportar_reporte()
+            elif opcion == '7':
+                self._libros_fiscales()
+            elif opcion == '8':
+                self._trabajos_reportes()
+            elif opcion == '9':
+                self._huecos_numeracion()
+            elif opcion == '10':
+                self._recalcular_impuestos()
             elif opcion == '0':
                 break
             else:
@@ -3709,26 +3952,18 @@ class SistemaVentas:
         """Muestra reporte de ventas del trimestre"""
         self.mostrar_cabecera("📆 REPORTE TRIMESTRAL")
         
-        try:
-            datos = self.reporte_service.reporte_trimestral()
-            self._mostrar_reporte_contable(datos)
-        except Exception as e:
-            logger.error(f"Error generando reporte trimestral: {e}")
-            print(f"{self.COLOR_ROJO}❌ Error al generar reporte{self.COLOR_RESET}")
-        
+        hoy = datetime.now().date()
+        self._enviar_trabajo_reporte('reporte_periodo', hoy - timedelta(days=90), hoy,
+                                     descripcion="Reporte trimestral")
         self.pausa()
     
     def _reporte_anual(self):
         """Muestra reporte de ventas del año"""
         self.mostrar_cabecera("📆 REPORTE ANUAL")
         
-        try:
-            datos = self.reporte_service.reporte_anual()
-            self._mostrar_reporte_contable(datos)
-        except Exception as e:
-            logger.error(f"Error generando reporte anual: {e}")
-            print(f"{self.COLOR_ROJO}❌ Error al generar reporte{self.COLOR_RESET}")
-        
+        hoy = datetime.now().date()
+        self._enviar_trabajo_reporte('reporte_periodo', hoy - timedelta(days=365), hoy,
+                                     descripcion="Reporte anual")
         self.pausa()
     
     def _mostrar_reporte_contable(self, datos):
@@ -3797,30 +4032,162 @@ class SistemaVentas:
         print("5. Anual")
         opcion = input(f"{self.COLOR_AMARILLO}🔹 Seleccione: {self.COLOR_RESET}").strip()
         
-        if opcion == '1':
-            datos = self.reporte_service.reporte_diario()
-        elif opcion == '2':
-            datos = self.reporte_service.reporte_semanal()
-        elif opcion == '3':
-            datos = self.reporte_service.reporte_mensual()
-        elif opcion == '4':
-            datos = self.reporte_service.reporte_trimestral()
-        elif opcion == '5':
-            datos = self.reporte_service.reporte_anual()
+        if opcion not in ('1', '2', '3', '4', '5'):
+            print("❌ Opción no válida")
+            self.pausa()
+            return
+        
+        print("\nSeleccione contenido:")
+        print("1. Resumen contable (CSV)")
+        print("2. Ventas fila a fila (CSV)")
+        print("3. Ventas fila a fila (CSV comprimido .gz)")
+        print("4. Ventas fila a fila (Excel .xlsx)")
+        print("5. Movimientos de kardex (CSV comprimido .gz)")
+        contenido = input(f"{self.COLOR_AMARILLO}🔹 Seleccione [1]: {self.COLOR_RESET}").strip() or '1'
+        
+        dias = {'1': 0, '2': 7, '3': 30, '4': 90, '5': 365}[opcion]
+        fecha_fin = datetime.now().date()
+        fecha_inicio = fecha_fin - timedelta(days=dias)
+        
+        # Todo el contenido (también el resumen) se genera en el pool de reportes
+        if contenido == '5':
+            self._enviar_trabajo_reporte('exportar_kardex', fecha_inicio, fecha_fin, comprimir=True,
+                                         descripcion=f"Kardex {fecha_inicio} a {fecha_fin}")
+        elif contenido in ('2', '3', '4'):
+            formato = 'xlsx' if contenido == '4' else 'csv'
+            self._enviar_trabajo_reporte('exportar_ventas', fecha_inicio, fecha_fin,
+                                         formato=formato, comprimir=contenido == '3',
+                                         descripcion=f"Ventas {fecha_inicio} a {fecha_fin} ({formato})")
         else:
+            self._enviar_trabajo_reporte('exportar_resumen', fecha_inicio, fecha_fin,
+                                         descripcion=f"Resumen contable {fecha_inicio} a {fecha_fin}")
+        self.pausa()
+
+    def _libros_fiscales(self):
+        """Genera el Libro de Ventas o de Compras de un mes"""
+        self.mostrar_cabecera("📚 LIBROS FISCALES SENIAT")
+        
+        print("1. Libro de Ventas")
+        print("2. Libro de Compras")
+        libro = input(f"{self.COLOR_AMARILLO}🔹 Seleccione: {self.COLOR_RESET}").strip()
+        if libro not in ('1', '2'):
             print("❌ Opción no válida")
             self.pausa()
             return
         
+        hoy = datetime.now()
+        periodo = input(f"{self.COLOR_AMARILLO}🔹 Período MM/AAAA [{hoy:%m/%Y}]: {self.COLOR_RESET}").strip()
         try:
-            ruta = self.reporte_service.exportar_a_csv(datos)
-            print(f"\n{self.COLOR_VERDE}✅ Reporte exportado a: {ruta}{self.COLOR_RESET}")
-            print("   Puede abrirlo con Excel para análisis contable")
-        except Exception as e:
-            logger.error(f"Error exportando reporte: {e}")
-            print(f"{self.COLOR_ROJO}❌ Error al exportar reporte{self.COLOR_RESET}")
+            fecha = datetime.strptime(periodo, "%m/%Y") if periodo else hoy
+        except ValueError:
+            print(f"{self.COLOR_ROJO}❌ Formato de período inválido{self.COLOR_RESET}")
+            self.pausa()
+            return
         
-        self.pausa()    
+        tipo = 'ventas' if libro == '1' else 'compras'
+        self._enviar_trabajo_reporte('libro_fiscal', tipo, fecha.year, fecha.month,
+                                     descripcion=f"Libro de {tipo} {fecha:%m/%Y}")
+        self.pausa()
+    
+    def _recalcular_impuestos(self):
+        """Recalcula el desglose de IVA por letra fiscal de las ventas de un rango"""
+        self.mostrar_cabecera("🧾 RECALCULAR DESGLOSE DE IVA")
+        
+        try:
+            fecha_inicio = datetime.strptime(input("Fecha inicial (DD/MM/AAAA): ").strip(), "%d/%m/%Y").date()
+            fecha_fin = datetime.strptime(input("Fecha final (DD/MM/AAAA): ").strip(), "%d/%m/%Y").date()
+        except ValueError:
+            print(f"{self.COLOR_ROJO}❌ Fecha inválida{self.COLOR_RESET}")
+            self.pausa()
+            return
+        
+        ventas = self.venta_service.recalcular_impuestos(fecha_inicio, fecha_fin)
+        if ventas < 0:
+            print(f"{self.COLOR_ROJO}❌ No se pudo recalcular el desglose{self.COLOR_RESET}")
+        else:
+            print(f"{self.COLOR_VERDE}✅ Desglose recalculado para {ventas} ventas{self.COLOR_RESET}")
+        self.pausa()
+    
+    def _huecos_numeracion(self):
+        """Números reservados en bloques cerrados que no tienen venta"""
+        self.mostrar_cabecera("🔢 HUECOS DE NUMERACIÓN")
+        
+        huecos = self.numeracion_service.huecos()
+        if not huecos:
+            print(f"{self.COLOR_VERDE}✅ No hay números reservados sin usar{self.COLOR_RESET}")
+        else:
+            print(f"{'SERIE':<8} {'BLOQUE':>7} {'TERMINAL':<20} {'DESDE':>10} {'HASTA':>10} {'CANT.':>6}")
+            print("-" * 66)
+            for h in huecos:
+                print(f"{h['serie']:<8} {h['idbloque']:>7} {h['terminal'][:20]:<20} "
+                      f"{h['desde']:>10} {h['hasta']:>10} {h['hasta'] - h['desde'] + 1:>6}")
+            print("-" * 66)
+            print(f"Total de números sin usar: {sum(h['hasta'] - h['desde'] + 1 for h in huecos)}")
+        self.pausa()
+    
+    def _enviar_trabajo_reporte(self, tarea, *args, descripcion=None, **kwargs):
+        """Envía un reporte al pool de procesos sin bloquear la caja"""
+        try:
+            trabajo = self.ejecutor_reportes.enviar(tarea, *args, descripcion=descripcion, **kwargs)
+            print(f"\n{self.COLOR_VERDE}⏳ Trabajo #{trabajo.idtrabajo} en segundo plano: "
+                  f"{trabajo.descripcion}{self.COLOR_RESET}")
+            print("   Consulte el avance en Reportes > Trabajos en segundo plano")
+            return trabajo
+        except Exception as e:
+            logger.error(f"Error enviando trabajo de reporte: {e}")
+            print(f"{self.COLOR_ROJO}❌ No se pudo iniciar el reporte{self.COLOR_RESET}")
+            return None
+    
+    def _trabajos_reportes(self):
+        """Lista los trabajos de reportes; permite ver resultados y cancelar"""
+        while True:
+            self.mostrar_cabecera("⏳ TRABAJOS EN SEGUNDO PLANO")
+            
+            trabajos = self.ejecutor_reportes.trabajos()
+            if not trabajos:
+                print("No hay trabajos en esta sesión")
+                self.pausa()
+                return
+            
+            print(f"{'#':>4}  {'Inicio':8}  {'Estado':10}  {'Filas':>10}  Descripción")
+            print("-" * 70)
+            for t in trabajos:
+                print(f"{t.idtrabajo:>4}  {t.inicio:%H:%M:%S}  {t.estado():10}  "
+                      f"{t.progreso():>10,}  {t.descripcion}")
+            
+            print("\nV <#> ver resultado | C <#> cancelar | Enter actualizar | 0 volver")
+            opcion = input(f"{self.COLOR_AMARILLO}🔹 Seleccione: {self.COLOR_RESET}").strip().upper()
+            if opcion == '0':
+                return
+            if not opcion:
+                continue
+            
+            partes = opcion.split()
+            trabajo = None
+            if len(partes) == 2 and partes[1].isdigit():
+                trabajo = next((t for t in trabajos if t.idtrabajo == int(partes[1])), None)
+            if trabajo is None or partes[0] not in ('V', 'C'):
+                print("❌ Opción no válida")
+                self.pausa()
+                continue
+            
+            if partes[0] == 'C':
+                if trabajo.cancelar():
+                    print(f"{self.COLOR_VERDE}✅ Cancelación solicitada{self.COLOR_RESET}")
+                else:
+                    print("⚠️ El trabajo ya terminó")
+            elif not trabajo.terminado():
+                print("⚠️ El trabajo aún no termina")
+            elif trabajo.estado() != 'TERMINADO':
+                print(f"{self.COLOR_ROJO}❌ {trabajo.estado()}: {trabajo.error() or ''}{self.COLOR_RESET}")
+            else:
+                resultado = trabajo.resultado()
+                if isinstance(resultado, dict):
+                    self._mostrar_reporte_contable(resultado)
+                else:
+                    ruta, filas = resultado
+                    print(f"{self.COLOR_VERDE}✅ {filas:,} filas en: {ruta}{self.COLOR_RESET}")
+            self.pausa()
 
     # ======================================================
     # NUEVOS MÉTODOS PARA MODIFICAR TASAS DE CAMBIO
@@ -3926,8 +4293,7 @@ class SistemaVentas:
     def _ver_stock_critico(self):
         self.mostrar_cabecera("STOCK CRÍTICO (menos de 3 unidades)")
         
-        articulos = self.inventario_service.listar_con_stock()
-        criticos = [a for a in articulos if a['nivel_stock'] == 'CRÍTICO']
+        criticos = self.inventario_service.listar_alertas_stock('CRÍTICO')
         
         if not criticos:
             print("✅ No hay artículos con stock crítico")
@@ -3942,8 +4308,7 @@ class SistemaVentas:
     def _ver_stock_bajo(self):
         self.mostrar_cabecera("STOCK BAJO (entre 3 y 5 unidades)")
         
-        articulos = self.inventario_service.listar_con_stock()
-        bajos = [a for a in articulos if a['nivel_stock'] == 'BAJO']
+        bajos = self.inventario_service.listar_alertas_stock('BAJO')
         
         if not bajos:
             print("✅ No hay artículos con stock bajo")
@@ -4140,7 +4505,7 @@ class SistemaVentas:
     
     def run(self):
         """Ejecuta el sistema"""
-        if not self.conectar_db():
+        if not self.conectar_db() and not self.menu_contingencia():
             return
         
         while True:
@@ -4214,7 +4579,107 @@ class SistemaVentas:
             else:
                 print("❌ Opción no válida")
                 self.pausa()
+        
+        self.ejecutor_reportes.cerrar()
+        self.numeracion_service.liberar()
 
+    # ======================================================
+    # MODO CONTINGENCIA (SIN CONEXIÓN AL SERVIDOR)
+    # ======================================================
+    
+    def menu_contingencia(self):
+        """
+        Menú reducido para seguir vendiendo sin servidor
+        
+        Returns:
+            bool: True si se recuperó la conexión (continúa el sistema normal)
+        """
+        from capa_negocio.contingencia_service import ContingenciaService
+        from config.seniat_config import MENSAJES_LEGALES
+        servicio = ContingenciaService()
+        if not servicio.disponible():
+            print(f"{self.COLOR_ROJO}❌ Modo contingencia no disponible (inactivo o sin catálogo local){self.COLOR_RESET}")
+            return False
+        
+        while True:
+            self.mostrar_cabecera("📴 MODO CONTINGENCIA")
+            print(f"{self.COLOR_AMARILLO}{MENSAJES_LEGALES['contingencia']}{self.COLOR_RESET}")
+            print(f"Ventas pendientes de sincronizar: {servicio.contar_pendientes()}")
+            print()
+            print("1. 🛒 Registrar venta")
+            print("2. 📋 Ver ventas pendientes")
+            print("3. 🔌 Reintentar conexión con el servidor")
+            print("0. Salir")
+            opcion = input(f"{self.COLOR_AMARILLO}🔹 Seleccione: {self.COLOR_RESET}").strip()
+            
+            if opcion == '1':
+                self._venta_contingencia(servicio)
+            elif opcion == '2':
+                for p in servicio.pendientes():
+                    v = p['venta']
+                    total = sum(i['cantidad'] * i['precio_venta'] for i in v['detalle'])
+                    estado = f"❌ {p['error']}" if p['error'] else "⏳"
+                    print(f"  {v.get('serie', servicio.SERIE)}-{p['numero_contingencia']}  {v['fecha_hora']}  "
+                          f"{total:>12.2f}  {estado}")
+                self.pausa()
+            elif opcion == '3':
+                if self.conectar_db():
+                    print(f"{self.COLOR_VERDE}✅ Conexión recuperada; las ventas pendientes "
+                          f"se sincronizan en segundo plano{self.COLOR_RESET}")
+                    self.pausa()
+                    return True
+                self.pausa()
+            elif opcion == '0':
+                return False
+            else:
+                print("❌ Opción no válida")
+                self.pausa()
+    
+    def _venta_contingencia(self, servicio):
+        """Registra una venta en la base local con el catálogo respaldado"""
+        from config.seniat_config import MENSAJES_LEGALES
+        self.mostrar_cabecera("🛒 VENTA EN CONTINGENCIA")
+        
+        try:
+            idtrabajador = int(input("ID del trabajador: ").strip())
+        except ValueError:
+            print("❌ ID inválido")
+            self.pausa()
+            return
+        
+        detalle = []
+        while True:
+            codigo = input("Código o ID del artículo (Enter para terminar): ").strip()
+            if not codigo:
+                break
+            articulo = servicio.buscar_articulo(codigo)
+            if not articulo:
+                print("❌ Artículo no encontrado en el catálogo local")
+                continue
+            try:
+                cantidad = int(input(f"Cantidad de {articulo['nombre']} (stock local {articulo['stock']}): ").strip())
+            except ValueError:
+                print("❌ Cantidad inválida")
+                continue
+            detalle.append({'idarticulo': articulo['idarticulo'], 'cantidad': cantidad,
+                            'precio_venta': articulo['precio_venta']})
+        
+        if not detalle:
+            return
+        subtotal = sum(i['cantidad'] * i['precio_venta'] for i in detalle)
+        print(f"\nSubtotal: Bs. {subtotal:.2f}   IVA 16%: Bs. {subtotal * 0.16:.2f}   "
+              f"Total: Bs. {subtotal * 1.16:.2f}")
+        if input("¿Confirmar venta? (s/n): ").strip().lower() != 's':
+            return
+        
+        numero = servicio.registrar_venta(idtrabajador, detalle)
+        if numero:
+            print(f"\n{self.COLOR_VERDE}✅ Factura {servicio.serie}-{numero} emitida{self.COLOR_RESET}")
+            print(MENSAJES_LEGALES['contingencia'])
+        else:
+            print(f"{self.COLOR_ROJO}❌ No se pudo registrar la venta (ver log){self.COLOR_RESET}")
+        self.pausa()
+    
     # ======================================================
     # MÓDULO DE COMPRAS
     # ======================================================
@@ -5578,6 +6043,9 @@ class SistemaVentas:
         
         print(f"{self.COLOR_AMARILLO}💰 INFORMACIÓN DE PRECIOS:{self.COLOR_RESET}")
         print(f"  💵 Precio de venta: {self.COLOR_VERDE}${articulo.get('precio_venta', 0):.2f}{self.COLOR_RESET}")
+        precio_bs = self.precio_bs_service.precio_bs(articulo)
+        if precio_bs is not None:
+            print(f"  🇻🇪 Precio en Bs.: {self.COLOR_VERDE}Bs. {precio_bs:,.2f}{self.COLOR_RESET} (tasa {lista_precios_bs.tasa:.2f})")
         print(f"  💲 Precio de compra: {self.COLOR_VERDE}${articulo.get('precio_compra', 0):.2f}{self.COLOR_RESET}")
         print(f"  🧾 IGTF: {self.COLOR_VERDE}{'Sí' if articulo.get('igtf', False) else 'No'}{self.COLOR_RESET}")
         print()
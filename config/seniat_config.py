@@ -27,6 +27,20 @@ SENIAT_CONFIG = {
         'base_datos_local': 'sqlite:///contingencia.db'
     },
     
+    # Numeración automática de comprobantes (bloques reservados por terminal)
+    'numeracion': {
+        'series': {'FACTURA': 'F001', 'BOLETA': 'B001', 'TICKET': 'T001'},
+        'tamano_bloque': 50,            # Números reservados por viaje al servidor
+        'digitos': 8                    # Relleno con ceros: 00000123
+    },
+    
+    # Lista de precios en Bs. (se recalcula al registrar una tasa nueva)
+    'precios_bs': {
+        'moneda': 'USD',                # Moneda en que están los precios de artículo
+        'redondeo': 0.01,               # Múltiplo en Bs.: 0.01, 0.50, 1, 5, 10...
+        'modo': 'cercano'               # 'cercano' (mitad hacia arriba) o 'arriba'
+    },
+    
     # Configuración de almacenamiento
     'almacenamiento': {
         'anos_retencion': 10,           # 10 años según ley
@@ -0,0 +1,57 @@
+#!/usr/bin/env python3
+"""
+Importación masiva de artículos desde un CSV de proveedor
+
+Uso:
+    python importar_articulos.py archivo.csv [tamano_lote]
+
+Columnas: codigo_barras, nombre, precio_venta (obligatorias) y opcionalmente
+precio_referencia/precio_compra, idcategoria, id_impuesto, stock_minimo.
+"""
+import sys
+from loguru import logger
+from capa_datos.conexion import ConexionDB
+from capa_datos.articulo_repo import ArticuloRepositorio
+from capa_datos.precio_bs_repo import PrecioBsRepositorio
+from capa_negocio.importador_articulos import ImportadorArticulos
+from capa_negocio.precio_bs_service import PrecioBsService
+
+
+def main():
+    """Función principal"""
+    if len(sys.argv) < 2:
+        print(__doc__)
+        return 1
+    ruta = sys.argv[1]
+    tamano_lote = int(sys.argv[2]) if len(sys.argv) > 2 else 1000
+
+    logger.add("sistema_ventas.log", rotation="10 MB")
+    db = ConexionDB()
+    conn = db.conectar()
+    if not conn:
+        logger.error("❌ No se pudo conectar a la base de datos")
+        return 1
+
+    try:
+        importador = ImportadorArticulos(ArticuloRepositorio(conn), tamano_lote=tamano_lote)
+        resumen = importador.importar(ruta)
+        if resumen is None:
+            return 1
+
+        print(f"\n📥 Filas leídas: {resumen['leidas']}")
+        print(f"✅ Insertadas: {resumen['insertadas']} en {resumen['segundos']:.1f} s")
+        print(f"🔁 Duplicadas (código de barras): {len(resumen['duplicadas'])}")
+        print(f"⚠️ Impuesto a revisar (IA sin confianza suficiente): {len(resumen['revisar_impuesto'])}")
+        print(f"❌ Errores: {len(resumen['errores'])}")
+        for fila, motivo in resumen['errores']:
+            print(f"   Fila {fila}: {motivo}")
+
+        if resumen['insertadas']:
+            PrecioBsService(PrecioBsRepositorio(conn)).recalcular()
+        return 0 if not resumen['errores'] else 2
+    finally:
+        db.cerrar()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
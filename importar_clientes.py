@@ -0,0 +1,51 @@
+#!/usr/bin/env python3
+"""
+Importación masiva de clientes desde CSV (migración del sistema anterior)
+
+Uso:
+    python importar_clientes.py archivo.csv [tamano_lote]
+
+Columnas: nombre, apellidos, num_documento (obligatorias; V12345678,
+J-30123456-7...) y opcionalmente tipo_documento, fecha_nacimiento, sexo,
+direccion, telefono, email.
+"""
+import sys
+from loguru import logger
+from capa_datos.conexion import ConexionDB
+from capa_datos.cliente_repo import ClienteRepositorio
+from capa_negocio.importador_clientes import ImportadorClientes
+
+
+def main():
+    """Función principal"""
+    if len(sys.argv) < 2:
+        print(__doc__)
+        return 1
+    ruta = sys.argv[1]
+    tamano_lote = int(sys.argv[2]) if len(sys.argv) > 2 else 2000
+
+    logger.add("sistema_ventas.log", rotation="10 MB")
+    db = ConexionDB()
+    conn = db.conectar()
+    if not conn:
+        logger.error("❌ No se pudo conectar a la base de datos")
+        return 1
+
+    try:
+        resumen = ImportadorClientes(ClienteRepositorio(conn), tamano_lote=tamano_lote).importar(ruta)
+        if resumen is None:
+            return 1
+
+        print(f"\n📥 Filas leídas: {resumen['leidas']}")
+        print(f"✅ Insertados: {resumen['insertadas']} en {resumen['segundos']:.1f} s")
+        print(f"🔁 Duplicados (documento ya registrado): {len(resumen['duplicadas'])}")
+        print(f"❌ Errores: {len(resumen['errores'])}")
+        for fila, motivo in resumen['errores']:
+            print(f"   Fila {fila}: {motivo}")
+        return 0 if not resumen['errores'] else 2
+    finally:
+        db.cerrar()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
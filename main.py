@@ -4,12 +4,14 @@ Sistema de Ventas - Punto de entrada principal
 """
 from loguru import logger
 from capa_datos.conexion import ConexionDB
+from capa_datos.monitor_sql import configurar_log_sql_lento
 from capa_datos.categoria_repo import CategoriaRepositorio
 from capa_negocio.categoria_service import CategoriaService
 
 def main():
     """Función principal"""
     logger.add("sistema_ventas.log", rotation="10 MB")
+    configurar_log_sql_lento()
     
     logger.info("🚀 Iniciando Sistema de Ventas Python")
     
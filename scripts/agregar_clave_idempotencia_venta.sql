@@ -0,0 +1,29 @@
+-- ======================================================
+-- CLAVE DE IDEMPOTENCIA DE LA VENTA
+-- UUID generado por la terminal; reenviar la misma venta devuelve la existente
+-- ======================================================
+USE SistemaVentas;
+
+IF NOT EXISTS (SELECT * FROM sys.columns WHERE object_id = OBJECT_ID('venta') AND name = 'clave_idempotencia')
+BEGIN
+    ALTER TABLE venta ADD clave_idempotencia UNIQUEIDENTIFIER NULL;
+    PRINT '✅ Columna clave_idempotencia agregada a venta';
+END
+ELSE
+BEGIN
+    PRINT '⚠️ La columna clave_idempotencia ya existe';
+END
+GO
+
+-- Índice único filtrado: las ventas anteriores (NULL) no participan
+IF NOT EXISTS (SELECT * FROM sys.indexes WHERE name = 'UX_venta_clave_idempotencia' AND object_id = OBJECT_ID('venta'))
+BEGIN
+    CREATE UNIQUE INDEX UX_venta_clave_idempotencia
+        ON venta(clave_idempotencia)
+        WHERE clave_idempotencia IS NOT NULL;
+    PRINT '✅ Índice UX_venta_clave_idempotencia creado';
+END
+ELSE
+BEGIN
+    PRINT '⚠️ El índice UX_venta_clave_idempotencia ya existe';
+END
@@ -0,0 +1,34 @@
+-- ======================================================
+-- COSTO EN USD Y TASA EN KARDEX
+-- Permite reproducir el costo promedio en USD y Bs
+-- ======================================================
+USE SistemaVentas;
+
+IF NOT EXISTS (SELECT * FROM sys.columns WHERE object_id = OBJECT_ID('kardex') AND name = 'costo_unitario_usd')
+BEGIN
+    ALTER TABLE kardex ADD costo_unitario_usd DECIMAL(18, 4) NULL;
+    PRINT '✅ Columna costo_unitario_usd agregada a kardex';
+END
+ELSE
+BEGIN
+    PRINT '⚠️ La columna costo_unitario_usd ya existe';
+END
+
+IF NOT EXISTS (SELECT * FROM sys.columns WHERE object_id = OBJECT_ID('kardex') AND name = 'tasa_cambio')
+BEGIN
+    ALTER TABLE kardex ADD tasa_cambio DECIMAL(18, 4) NULL;
+    PRINT '✅ Columna tasa_cambio agregada a kardex';
+END
+ELSE
+BEGIN
+    PRINT '⚠️ La columna tasa_cambio ya existe';
+END
+GO
+
+-- Índice para reproducir el kardex por artículo en orden cronológico
+IF NOT EXISTS (SELECT * FROM sys.indexes WHERE name = 'IX_kardex_articulo_id')
+BEGIN
+    CREATE INDEX IX_kardex_articulo_id ON kardex(idarticulo, idkardex)
+        INCLUDE (tipo_movimiento, stock_anterior, stock_nuevo, precio_unitario, costo_unitario_usd, tasa_cambio);
+    PRINT '✅ Índice IX_kardex_articulo_id creado';
+END
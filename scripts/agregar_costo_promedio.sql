@@ -0,0 +1,25 @@
+-- ======================================================
+-- COSTO PROMEDIO PONDERADO DEL ARTÍCULO
+-- Lo mantiene la recepción de mercancía (USD y Bs a tasa BCV)
+-- ======================================================
+USE SistemaVentas;
+
+IF NOT EXISTS (SELECT * FROM sys.columns WHERE object_id = OBJECT_ID('articulo') AND name = 'costo_promedio_usd')
+BEGIN
+    ALTER TABLE articulo ADD costo_promedio_usd DECIMAL(18, 4) NOT NULL DEFAULT 0;
+    PRINT '✅ Columna costo_promedio_usd agregada a articulo';
+END
+ELSE
+BEGIN
+    PRINT '⚠️ La columna costo_promedio_usd ya existe';
+END
+
+IF NOT EXISTS (SELECT * FROM sys.columns WHERE object_id = OBJECT_ID('articulo') AND name = 'costo_promedio_bs')
+BEGIN
+    ALTER TABLE articulo ADD costo_promedio_bs DECIMAL(18, 4) NOT NULL DEFAULT 0;
+    PRINT '✅ Columna costo_promedio_bs agregada a articulo';
+END
+ELSE
+BEGIN
+    PRINT '⚠️ La columna costo_promedio_bs ya existe';
+END
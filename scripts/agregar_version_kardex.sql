@@ -0,0 +1,29 @@
+-- ======================================================
+-- MARCA DE AGUA PARA EL COSTO PROMEDIO INCREMENTAL
+-- idkardex se asigna al insertar, no al confirmar: una transacción
+-- lenta puede confirmar un idkardex menor que otro ya leído. La
+-- columna ROWVERSION con MIN_ACTIVE_ROWVERSION() permite leer solo
+-- movimientos de transacciones ya confirmadas
+-- ======================================================
+USE SistemaVentas;
+
+IF NOT EXISTS (SELECT * FROM sys.columns WHERE object_id = OBJECT_ID('kardex') AND name = 'version')
+BEGIN
+    ALTER TABLE kardex ADD version ROWVERSION;
+    PRINT '✅ Columna version (ROWVERSION) agregada a kardex';
+END
+ELSE
+BEGIN
+    PRINT '⚠️ La columna version ya existe en kardex';
+END
+GO
+
+IF NOT EXISTS (SELECT * FROM sys.indexes WHERE name = 'IX_kardex_version')
+BEGIN
+    CREATE INDEX IX_kardex_version ON kardex(version);
+    PRINT '✅ Índice IX_kardex_version creado';
+END
+ELSE
+BEGIN
+    PRINT '⚠️ El índice IX_kardex_version ya existe';
+END
@@ -0,0 +1,23 @@
+-- ======================================================
+-- MARCA DE AGUA PARA EL ÍNDICE DE VENCIMIENTOS
+-- La columna ROWVERSION cambia en cada INSERT/UPDATE del lote
+-- y permite leer solo los lotes modificados desde la última carga
+-- ======================================================
+USE SistemaVentas;
+
+IF NOT EXISTS (SELECT * FROM sys.columns WHERE object_id = OBJECT_ID('lote') AND name = 'version')
+BEGIN
+    ALTER TABLE lote ADD version ROWVERSION;
+    PRINT '✅ Columna version (ROWVERSION) agregada a lote';
+END
+ELSE
+BEGIN
+    PRINT '⚠️ La columna version ya existe en lote';
+END
+GO
+
+IF NOT EXISTS (SELECT * FROM sys.indexes WHERE name = 'IX_lote_version')
+BEGIN
+    CREATE INDEX IX_lote_version ON lote(version);
+    PRINT '✅ Índice IX_lote_version creado';
+END
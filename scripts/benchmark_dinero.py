@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""
+Comparación de float, Decimal y céntimos enteros (capa_negocio.dinero) al
+totalizar líneas de venta: subtotal, IVA 16% y conversión a divisa
+
+Uso (desde la raíz del proyecto):
+    python scripts/benchmark_dinero.py [lineas] [repeticiones]
+
+Mide por separado el coste de convertir los precios de entrada (float) a cada
+representación y el de operar con valores ya convertidos, que es el caso de
+los importes leídos de la base de datos o acumulados en reportes. Además
+muestra la deriva de sumar 0.1 muchas veces.
+"""
+import os
+import random
+import sys
+import timeit
+from decimal import Decimal
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from capa_negocio.dinero import Dinero, a_centimos, multiplicar  # noqa: E402
+
+TASA = 36.5
+IVA = 16.0
+_CENTIMO = Decimal('0.01')
+
+
+def _datos(lineas):
+    """Precios (float con 2 decimales) y cantidades reproducibles"""
+    azar = random.Random(1)
+    precios = [round(azar.uniform(0.01, 500), 2) for _ in range(lineas)]
+    cantidades = [azar.randint(1, 9) for _ in range(lineas)]
+    return precios, cantidades
+
+
+def _total_float(precios, cantidades):
+    subtotal = sum(p * q for p, q in zip(precios, cantidades))
+    total = subtotal * (1 + IVA / 100)
+    return round(total, 2), round(total / TASA, 2)
+
+
+def _total_decimal(precios, cantidades):
+    subtotal = sum(p * q for p, q in zip(precios, cantidades))
+    total = (subtotal * (1 + Decimal(str(IVA)) / 100)).quantize(_CENTIMO)
+    return total, (total / Decimal(str(TASA))).quantize(_CENTIMO)
+
+
+def _total_centimos(precios, cantidades):
+    subtotal = Dinero(sum(multiplicar(p, q) for p, q in zip(precios, cantidades)))
+    total = subtotal + subtotal.porcentaje(IVA)
+    return total.decimal(), total.convertir('USD', TASA).decimal()
+
+
+def _medir(funcion, repeticiones):
+    """Milisegundos por ejecución (mejor de `repeticiones`)"""
+    return min(timeit.repeat(funcion, number=1, repeat=repeticiones)) * 1000
+
+
+def main():
+    """Función principal"""
+    lineas = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    repeticiones = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+    precios, cantidades = _datos(lineas)
+    decimales = [Decimal(str(p)) for p in precios]
+    centimos = [a_centimos(p) for p in precios]
+
+    print(f"📊 {lineas} líneas, mejor de {repeticiones} ejecuciones (ms)\n")
+    print("1. Conversión de los precios de entrada (float)")
+    conversion_decimal = _medir(lambda: [Decimal(str(p)) for p in precios], repeticiones)
+    conversion_centimos = _medir(lambda: [a_centimos(p) for p in precios], repeticiones)
+    print(f"   Decimal(str(p)):  {conversion_decimal:8.1f}")
+    print(f"   a_centimos(p):    {conversion_centimos:8.1f}")
+
+    print("\n2. Totalización con valores ya convertidos")
+    resultados = {}
+    for nombre, funcion, datos in (('float', _total_float, precios),
+                                   ('Decimal', _total_decimal, decimales),
+                                   ('céntimos', _total_centimos, centimos)):
+        resultados[nombre] = funcion(datos, cantidades)
+        tiempo = _medir(lambda: funcion(datos, cantidades), repeticiones)
+        print(f"   {nombre:<9} {tiempo:8.1f}   total={resultados[nombre][0]} divisa={resultados[nombre][1]}")
+
+    print("\n3. Deriva al sumar 0.1 cien mil veces")
+    acumulado = 0.0
+    for _ in range(100000):
+        acumulado += 0.1
+    print(f"   float:    {acumulado!r}")
+    print(f"   céntimos: {Dinero.sumar([0.1] * 100000).decimal()}")
+
+    iguales = resultados['Decimal'] == resultados['céntimos']
+    print(f"\nDecimal y céntimos coinciden: {'SÍ ✅' if iguales else 'NO ❌'}")
+    return iguales
+
+
+if __name__ == "__main__":
+    sys.exit(0 if main() else 1)
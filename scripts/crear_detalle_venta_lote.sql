@@ -0,0 +1,36 @@
+-- ======================================================
+-- CONSUMO DE LOTES POR VENTA (FEFO)
+-- Registra qué lotes descontó cada venta para poder
+-- revertirlos al anularla
+-- ======================================================
+USE SistemaVentas;
+
+IF NOT EXISTS (SELECT * FROM sysobjects WHERE name = 'detalle_venta_lote' AND xtype = 'U')
+BEGIN
+    CREATE TABLE detalle_venta_lote (
+        iddetalle_venta_lote INT IDENTITY(1,1) PRIMARY KEY,
+        idventa INT NOT NULL,
+        idlote INT NOT NULL,
+        idarticulo INT NOT NULL,
+        cantidad INT NOT NULL,
+        revertido BIT NOT NULL DEFAULT 0,
+        fecha DATETIME NOT NULL DEFAULT GETDATE(),
+        CONSTRAINT FK_detalle_venta_lote_venta FOREIGN KEY (idventa) REFERENCES venta(idventa),
+        CONSTRAINT FK_detalle_venta_lote_lote FOREIGN KEY (idlote) REFERENCES lote(idlote)
+    );
+    
+    CREATE INDEX IX_detalle_venta_lote_venta ON detalle_venta_lote(idventa) INCLUDE (idlote, cantidad, revertido);
+    
+    PRINT '✅ Tabla detalle_venta_lote creada';
+END
+ELSE
+BEGIN
+    PRINT '⚠️ La tabla detalle_venta_lote ya existe';
+END
+
+-- Índice para cargar los lotes disponibles de varios artículos en una consulta
+IF NOT EXISTS (SELECT * FROM sys.indexes WHERE name = 'IX_lote_articulo_vencimiento')
+BEGIN
+    CREATE INDEX IX_lote_articulo_vencimiento ON lote(idarticulo, fecha_vencimiento) INCLUDE (stock_actual);
+    PRINT '✅ Índice IX_lote_articulo_vencimiento creado';
+END
@@ -0,0 +1,64 @@
+-- ======================================================
+-- NUMERACIÓN DE COMPROBANTES POR SERIE
+-- Contador por serie y bloques de números reservados por terminal:
+-- cada terminal toma un rango completo de una sola vez y numera sus
+-- ventas en memoria; los rangos nunca se solapan entre terminales
+-- ======================================================
+USE SistemaVentas;
+
+IF NOT EXISTS (SELECT * FROM sysobjects WHERE name = 'comprobante_secuencia' AND xtype = 'U')
+BEGIN
+    CREATE TABLE comprobante_secuencia (
+        serie VARCHAR(20) NOT NULL PRIMARY KEY,
+        ultimo_numero BIGINT NOT NULL DEFAULT 0,
+        fecha_actualizacion DATETIME NOT NULL DEFAULT GETDATE()
+    );
+    PRINT '✅ Tabla comprobante_secuencia creada';
+END
+ELSE
+BEGIN
+    PRINT '⚠️ La tabla comprobante_secuencia ya existe';
+END
+GO
+
+IF NOT EXISTS (SELECT * FROM sysobjects WHERE name = 'comprobante_bloque' AND xtype = 'U')
+BEGIN
+    CREATE TABLE comprobante_bloque (
+        idbloque INT IDENTITY(1,1) PRIMARY KEY,
+        serie VARCHAR(20) NOT NULL,
+        terminal VARCHAR(50) NOT NULL,
+        numero_desde BIGINT NOT NULL,
+        numero_hasta BIGINT NOT NULL,
+        estado VARCHAR(10) NOT NULL DEFAULT 'ABIERTO',   -- ABIERTO / CERRADO
+        ultimo_usado BIGINT NULL,
+        fecha_reserva DATETIME NOT NULL DEFAULT GETDATE(),
+        fecha_cierre DATETIME NULL,
+        CONSTRAINT FK_comprobante_bloque_serie FOREIGN KEY (serie) REFERENCES comprobante_secuencia(serie)
+    );
+    CREATE INDEX IX_comprobante_bloque_terminal ON comprobante_bloque (serie, terminal, estado);
+    PRINT '✅ Tabla comprobante_bloque creada';
+END
+ELSE
+BEGIN
+    PRINT '⚠️ La tabla comprobante_bloque ya existe';
+END
+GO
+
+-- Un mismo número no puede repetirse en una serie (solo si los datos existentes lo permiten)
+IF NOT EXISTS (SELECT * FROM sys.indexes WHERE name = 'UX_venta_serie_numero')
+BEGIN
+    IF NOT EXISTS (SELECT serie, numero_comprobante FROM venta
+                   GROUP BY serie, numero_comprobante HAVING COUNT(*) > 1)
+    BEGIN
+        CREATE UNIQUE INDEX UX_venta_serie_numero ON venta (serie, numero_comprobante);
+        PRINT '✅ Índice único UX_venta_serie_numero creado';
+    END
+    ELSE
+    BEGIN
+        PRINT '⚠️ Hay comprobantes duplicados en venta; corríjalos y vuelva a ejecutar para crear UX_venta_serie_numero';
+    END
+END
+ELSE
+BEGIN
+    PRINT '⚠️ El índice UX_venta_serie_numero ya existe';
+END
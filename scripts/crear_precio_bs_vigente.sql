@@ -0,0 +1,27 @@
+-- ======================================================
+-- LISTA DE PRECIOS EN BOLÍVARES VIGENTE
+-- Precio en Bs. de cada artículo calculado una sola vez por cambio de
+-- tasa; idtasa indica con qué registro de tasa_cambio se obtuvo
+-- ======================================================
+USE SistemaVentas;
+
+IF NOT EXISTS (SELECT * FROM sysobjects WHERE name = 'precio_bs_vigente' AND xtype = 'U')
+BEGIN
+    CREATE TABLE precio_bs_vigente (
+        idarticulo INT NOT NULL,
+        idtasa INT NOT NULL,
+        tasa DECIMAL(18,4) NOT NULL,
+        precio_divisa DECIMAL(18,2) NOT NULL,
+        precio_bs DECIMAL(18,2) NOT NULL,
+        fecha_calculo DATETIME NOT NULL DEFAULT GETDATE(),
+        CONSTRAINT PK_precio_bs_vigente PRIMARY KEY (idarticulo),
+        CONSTRAINT FK_precio_bs_vigente_articulo FOREIGN KEY (idarticulo) REFERENCES articulo(idarticulo),
+        CONSTRAINT FK_precio_bs_vigente_tasa FOREIGN KEY (idtasa) REFERENCES tasa_cambio(idtasa)
+    );
+
+    PRINT '✅ Tabla precio_bs_vigente creada';
+END
+ELSE
+BEGIN
+    PRINT '⚠️ La tabla precio_bs_vigente ya existe';
+END
@@ -0,0 +1,33 @@
+-- ======================================================
+-- TABLA DE STOCK ACTUAL POR ARTÍCULO
+-- Permite descontar stock con un único UPDATE condicional
+-- (WHERE cantidad >= ?) sin leer y validar en Python
+-- ======================================================
+USE SistemaVentas;
+
+IF NOT EXISTS (SELECT * FROM sysobjects WHERE name = 'stock_articulo' AND xtype = 'U')
+BEGIN
+    CREATE TABLE stock_articulo (
+        idarticulo INT NOT NULL PRIMARY KEY,
+        cantidad INT NOT NULL DEFAULT 0,
+        fecha_actualizacion DATETIME NOT NULL DEFAULT GETDATE(),
+        CONSTRAINT FK_stock_articulo_articulo FOREIGN KEY (idarticulo) REFERENCES articulo(idarticulo)
+    );
+    
+    -- Sembrar con el último stock registrado en kardex
+    INSERT INTO stock_articulo (idarticulo, cantidad)
+    SELECT a.idarticulo, ISNULL(k.stock_nuevo, 0)
+    FROM articulo a
+    OUTER APPLY (
+        SELECT TOP 1 stock_nuevo
+        FROM kardex
+        WHERE idarticulo = a.idarticulo
+        ORDER BY fecha_movimiento DESC, idkardex DESC
+    ) k;
+    
+    PRINT '✅ Tabla stock_articulo creada y sembrada desde kardex';
+END
+ELSE
+BEGIN
+    PRINT '⚠️ La tabla stock_articulo ya existe';
+END
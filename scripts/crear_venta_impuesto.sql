@@ -0,0 +1,25 @@
+-- ======================================================
+-- DESGLOSE DE IVA POR LETRA FISCAL DE CADA VENTA
+-- Base imponible e impuesto por alícuota (E, G, R, A), en la
+-- moneda de la factura, para reportes y libros fiscales
+-- ======================================================
+USE SistemaVentas;
+
+IF NOT EXISTS (SELECT * FROM sysobjects WHERE name = 'venta_impuesto' AND xtype = 'U')
+BEGIN
+    CREATE TABLE venta_impuesto (
+        idventa INT NOT NULL,
+        letra_fiscal CHAR(1) NOT NULL,
+        alicuota DECIMAL(5,4) NOT NULL,
+        base_imponible DECIMAL(18,2) NOT NULL,
+        monto_impuesto DECIMAL(18,2) NOT NULL,
+        CONSTRAINT PK_venta_impuesto PRIMARY KEY (idventa, letra_fiscal),
+        CONSTRAINT FK_venta_impuesto_venta FOREIGN KEY (idventa) REFERENCES venta(idventa)
+    );
+
+    PRINT '✅ Tabla venta_impuesto creada';
+END
+ELSE
+BEGIN
+    PRINT '⚠️ La tabla venta_impuesto ya existe';
+END
@@ -0,0 +1,23 @@
+-- ======================================================
+-- VERSIÓN DE LAS VENTAS DE CADA DÍA CERRADO
+-- Se incrementa en la misma transacción que anula una venta o sube
+-- una venta de contingencia con fecha anterior a hoy; la caché de
+-- reportes de cada terminal compara esta versión al leer
+-- ======================================================
+USE SistemaVentas;
+
+IF NOT EXISTS (SELECT * FROM sysobjects WHERE name = 'version_dia_venta' AND xtype = 'U')
+BEGIN
+    CREATE TABLE version_dia_venta (
+        fecha DATE NOT NULL,
+        version INT NOT NULL DEFAULT 0,
+        fecha_actualizacion DATETIME NOT NULL DEFAULT GETDATE(),
+        CONSTRAINT PK_version_dia_venta PRIMARY KEY (fecha)
+    );
+
+    PRINT '✅ Tabla version_dia_venta creada';
+END
+ELSE
+BEGIN
+    PRINT '⚠️ La tabla version_dia_venta ya existe';
+END
@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+Prueba de concurrencia del descuento atómico de stock:
+varias terminales venden a la vez el mismo artículo y no debe haber sobreventa
+"""
+import sys
+import threading
+from capa_datos.conexion import ConexionDB
+from capa_datos.inventario_repo import InventarioRepositorio
+
+TERMINALES = 20
+STOCK_PRUEBA = 5
+DOCUMENTO = "PRUEBA-CONCURRENCIA"
+
+def probar_concurrencia_stock(idarticulo=None):
+    """Lanza TERMINALES hilos (una conexión cada uno) vendiendo 1 unidad"""
+    print("🔍 Probando descuento concurrente de stock...")
+
+    db = ConexionDB()
+    conn = db.conectar()
+
+    if not conn:
+        print("❌ No se pudo conectar")
+        return False
+
+    repo = InventarioRepositorio(conn)
+    cursor = conn.cursor()
+    if idarticulo is None:
+        cursor.execute("SELECT TOP 1 idarticulo FROM stock_articulo ORDER BY idarticulo")
+        row = cursor.fetchone()
+        if not row:
+            print("❌ No hay artículos en stock_articulo")
+            return False
+        idarticulo = row[0]
+
+    # 1. Dejar exactamente STOCK_PRUEBA unidades (se restaura al final)
+    stock_original = repo.obtener_stock_actual(idarticulo)
+    if stock_original > STOCK_PRUEBA:
+        repo.descontar_stock_atomico(idarticulo, stock_original - STOCK_PRUEBA, DOCUMENTO, tipo_kardex='AJUSTE')
+    elif stock_original < STOCK_PRUEBA:
+        repo.reponer_stock_atomico(idarticulo, STOCK_PRUEBA - stock_original, DOCUMENTO, tipo_kardex='AJUSTE')
+    print(f"\n1. Artículo {idarticulo}: stock {stock_original} → {STOCK_PRUEBA}")
+
+    # 2. Todas las terminales venden a la vez
+    barrera = threading.Barrier(TERMINALES)
+    exitos = []
+    lock = threading.Lock()
+
+    def terminal(numero):
+        conexion = ConexionDB().conectar()
+        repo_terminal = InventarioRepositorio(conexion)
+        barrera.wait()
+        resultado = repo_terminal.descontar_stock_atomico(idarticulo, 1, f"{DOCUMENTO}-T{numero}")
+        if resultado:
+            with lock:
+                exitos.append(resultado)
+        conexion.close()
+
+    hilos = [threading.Thread(target=terminal, args=(n,)) for n in range(TERMINALES)]
+    for h in hilos:
+        h.start()
+    for h in hilos:
+        h.join()
+
+    stock_final = repo.obtener_stock_actual(idarticulo)
+    print(f"\n2. {TERMINALES} terminales, {len(exitos)} ventas aceptadas, stock final {stock_final}")
+
+    # 3. La cadena stock_anterior → stock_nuevo no debe bifurcarse
+    cursor.execute("""
+        SELECT stock_anterior, stock_nuevo FROM kardex
+        WHERE idarticulo = ? AND documento_referencia LIKE ?
+        ORDER BY idkardex
+    """, (idarticulo, f"{DOCUMENTO}-T%"))
+    cadena = cursor.fetchall()
+    cadena_ok = all(cadena[i][0] == cadena[i - 1][1] for i in range(1, len(cadena)))
+
+    correcto = len(exitos) == STOCK_PRUEBA and stock_final == 0 and cadena_ok
+    print(f"\n3. Sobreventa: {'NO ✅' if correcto else 'SÍ ❌'} (cadena kardex {'íntegra' if cadena_ok else 'bifurcada'})")
+
+    # 4. Restaurar el stock original
+    if stock_original > stock_final:
+        repo.reponer_stock_atomico(idarticulo, stock_original - stock_final, DOCUMENTO, tipo_kardex='AJUSTE')
+
+    db.cerrar()
+    return correcto
+
+if __name__ == "__main__":
+    articulo = int(sys.argv[1]) if len(sys.argv) > 1 else None
+    sys.exit(0 if probar_concurrencia_stock(articulo) else 1)
@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+"""
+Prueba del presupuesto de round trips de los flujos por lotes: registrar una
+venta de muchas líneas y anularla deben costar lo mismo que una de una línea
+(una sentencia más el COMMIT), sin importar el número de artículos. Por el
+servicio (VentaService.registrar y registrar_carrito) se suman la consulta de
+idempotencia, la de artículos (letra fiscal) y la de lotes.
+"""
+import sys
+import uuid
+from capa_datos.articulo_repo import ArticuloRepositorio
+from capa_datos.cliente_repo import ClienteRepositorio
+from capa_datos.conexion import ConexionDB
+from capa_datos.impuesto_repo import ImpuestoRepositorio
+from capa_datos.inventario_repo import InventarioRepositorio
+from capa_datos.monitor_sql import PresupuestoRoundTripsExcedido, monitor_sql
+from capa_datos.trabajador_repo import TrabajadorRepositorio
+from capa_datos.venta_repo import VentaRepositorio
+from capa_negocio.articulo_service import ArticuloService
+from capa_negocio.carrito import Carrito
+from capa_negocio.cliente_service import ClienteService
+from capa_negocio.inventario_service import InventarioService
+from capa_negocio.motor_impuestos import MotorImpuestos
+from capa_negocio.trabajador_service import TrabajadorService
+from capa_negocio.venta_service import VentaService
+
+LINEAS = 20
+SERIE = "PRUEBA-RT"
+# Un lote SQL (SET XACT_ABORT ... con OPENJSON) + COMMIT
+PRESUPUESTO_REGISTRO = 2
+PRESUPUESTO_ANULACION = 2
+# Idempotencia + artículos + lotes + lote SQL + COMMIT
+PRESUPUESTO_SERVICIO = 5
+
+
+def probar_presupuesto_round_trips(lineas=LINEAS):
+    """
+    Registra y anula ventas de `lineas` artículos (por el repositorio y por
+    VentaService) dentro de monitor_sql.presupuesto
+    """
+    print("🔍 Probando presupuesto de round trips de venta y anulación...")
+
+    db = ConexionDB()
+    conn = db.conectar()
+
+    if not conn:
+        print("❌ No se pudo conectar")
+        return False
+
+    repo = VentaRepositorio(conn)
+    inventario = InventarioRepositorio(conn)
+    cursor = conn.cursor()
+    cursor.execute(f"SELECT TOP {int(lineas)} idarticulo FROM stock_articulo WHERE cantidad >= 1 ORDER BY idarticulo")
+    articulos = [row[0] for row in cursor.fetchall()]
+    cursor.execute("SELECT TOP 1 idtrabajador FROM trabajador ORDER BY idtrabajador")
+    row = cursor.fetchone()
+    if not articulos or not row:
+        print("❌ Se necesitan artículos con stock y un trabajador")
+        return False
+    idtrabajador = row[0]
+
+    stock_inicial = {a: inventario.obtener_stock_actual(a) for a in articulos}
+    detalle = [{'idarticulo': a, 'cantidad': 1, 'precio_venta': 1.0} for a in articulos]
+    lineas_venta = [{'idarticulo': a, 'cantidad': 1, 'precio_unitario': 1.0} for a in articulos]
+    cabecera = {
+        'idtrabajador': idtrabajador, 'idcliente': None, 'tipo_comprobante': 'TICKET',
+        'serie': SERIE, 'numero_comprobante': uuid.uuid4().hex[:8], 'igv': 16.0,
+        'moneda': 'VES', 'tasa_cambio': 1.0, 'monto_bs': round(len(articulos) * 1.16, 2),
+        'monto_divisa': None, 'fecha_hora': None, 'clave_idempotencia': str(uuid.uuid4())
+    }
+    correcto = True
+
+    # 1. Registro: cabecera, detalle, stock, kardex e IVA en un solo lote
+    # (si se excede el presupuesto la excepción salta al cerrar el bloque, con la venta ya registrada)
+    idventa = None
+    try:
+        with monitor_sql.presupuesto(PRESUPUESTO_REGISTRO, f"venta de {len(articulos)} líneas") as p:
+            idventa, _, _ = repo.registrar_venta(cabecera, detalle, lineas_venta)
+        print(f"\n1. Venta #{idventa}: {p['usados']} round trips (máximo {PRESUPUESTO_REGISTRO}) ✅")
+    except PresupuestoRoundTripsExcedido as e:
+        print(f"\n1. ❌ {e}")
+        correcto = False
+    if not idventa:
+        print("❌ La venta no se registró")
+        db.cerrar()
+        return False
+
+    # 2. Anulación: estado, reposición, lotes, auditoría y versión del día en un solo lote
+    anuladas = None
+    try:
+        with monitor_sql.presupuesto(PRESUPUESTO_ANULACION, f"anulación de {len(articulos)} líneas") as p:
+            anuladas, _ = repo.anular_lote([idventa], 'prueba_round_trips', 'Prueba de round trips')
+        print(f"\n2. Anulación: {p['usados']} round trips (máximo {PRESUPUESTO_ANULACION}) ✅")
+    except PresupuestoRoundTripsExcedido as e:
+        print(f"\n2. ❌ {e}")
+        correcto = False
+    if not anuladas:
+        print("❌ La venta no se anuló")
+        correcto = False
+
+    # 3 y 4. Por el servicio, con la validación de trabajador, cliente y stock dentro del lote
+    articulo_service = ArticuloService(ArticuloRepositorio(conn))
+    motor = MotorImpuestos(ImpuestoRepositorio(conn))
+    motor.tabla()  # Se lee una vez por sesión, fuera del presupuesto
+    servicio = VentaService(repo, ClienteService(ClienteRepositorio(conn)),
+                            TrabajadorService(TrabajadorRepositorio(conn)),
+                            InventarioService(articulo_service), motor_impuestos=motor)
+    articulos_info = articulo_service.obtener_por_ids(articulos) or {}
+    carrito = Carrito(motor_impuestos=motor)
+    for a in articulos:
+        carrito.agregar(a, f"Artículo {a}", 1, 1.0,
+                        id_impuesto=articulos_info.get(a, {}).get('id_impuesto'))
+
+    registradas = []
+    for paso, descripcion, registrar in (
+        (3, "VentaService.registrar", lambda: servicio.registrar(
+            idtrabajador, None, 'TICKET', SERIE, uuid.uuid4().hex[:8], 16.0, detalle,
+            tasa_cambio=1.0, clave_idempotencia=str(uuid.uuid4()))),
+        (4, "VentaService.registrar_carrito", lambda: servicio.registrar_carrito(
+            carrito, idtrabajador, None, 'TICKET', SERIE, uuid.uuid4().hex[:8],
+            clave_idempotencia=str(uuid.uuid4()))),
+    ):
+        idservicio = None
+        try:
+            with monitor_sql.presupuesto(PRESUPUESTO_SERVICIO, f"{descripcion} de {len(articulos)} líneas") as p:
+                idservicio = registrar()
+            print(f"\n{paso}. {descripcion} #{idservicio}: {p['usados']} round trips "
+                  f"(máximo {PRESUPUESTO_SERVICIO}) ✅")
+        except PresupuestoRoundTripsExcedido as e:
+            print(f"\n{paso}. ❌ {e}")
+            correcto = False
+        if idservicio:
+            registradas.append(idservicio)
+        else:
+            print(f"❌ {descripcion} no registró la venta")
+            correcto = False
+
+    if registradas and not repo.anular_lote(registradas, 'prueba_round_trips', 'Prueba de round trips')[0]:
+        print("❌ Las ventas del servicio no se anularon")
+        correcto = False
+
+    # 5. El stock vuelve a quedar como estaba
+    stock_final = {a: inventario.obtener_stock_actual(a) for a in articulos}
+    stock_ok = stock_final == stock_inicial
+    print(f"\n5. Stock restaurado: {'SÍ ✅' if stock_ok else 'NO ❌'}")
+
+    db.cerrar()
+    return correcto and stock_ok
+
+
+if __name__ == "__main__":
+    cantidad = int(sys.argv[1]) if len(sys.argv) > 1 else LINEAS
+    sys.exit(0 if probar_presupuesto_round_trips(cantidad) else 1)